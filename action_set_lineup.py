@@ -9,9 +9,9 @@ Flujo OSM:
   3. Cada celda llama a $parents[1].setFormation($data) via KO
 """
 import json
-import time
 from playwright.sync_api import Page
 from utils import handle_popups
+from waits import wait_for_modal, settle
 
 LINEUP_URL = "https://en.onlinesoccermanager.com/Lineup"
 
@@ -50,7 +50,7 @@ def _navigate_to_lineup(page: Page) -> bool:
             loc = page.locator(sel).first
             if loc.is_visible(timeout=800):
                 loc.click()
-                time.sleep(2)
+                settle(page, site="lineup.nav")
                 if _lineup_loaded(page):
                     print(f"  ✓ Lineup cargado vía SPA ({sel})")
                     return True
@@ -60,7 +60,7 @@ def _navigate_to_lineup(page: Page) -> bool:
     print("  → Fallback: page.goto(/Lineup)...")
     try:
         page.goto(LINEUP_URL, wait_until="domcontentloaded", timeout=30000)
-        time.sleep(3)
+        settle(page, site="lineup.goto")
         handle_popups(page)
         if _lineup_loaded(page):
             return True
@@ -149,7 +149,7 @@ def _set_formation_via_modal(page: Page, formation: str) -> bool:
             print("  ⚠️ Botón .lineup-view-switch-container no visible")
             return False
         btn.click()
-        time.sleep(1)
+        wait_for_modal(page, site="lineup.formation_modal")
         print("  → Modal de formaciones abierto")
     except Exception as e:
         print(f"  ⚠️ No se pudo abrir modal de formaciones: {e}")
@@ -179,14 +179,14 @@ def _set_formation_via_modal(page: Page, formation: str) -> bool:
                 txt = cells.nth(i).locator("span").first.inner_text(timeout=500).strip()
                 if txt.lower() == formation.lower():
                     cells.nth(i).click()
-                    time.sleep(0.5)
+                    settle(page, site="lineup.formation_pick", deadline_ms=2000)
                     print(f"  ✓ Modal: formación seleccionada = {txt!r}")
                     return True
             print(f"  ⚠️ No se encontró celda para '{formation}' ({n} celdas)")
             return False
 
         cell.click()
-        time.sleep(0.5)
+        settle(page, site="lineup.formation_pick", deadline_ms=2000)
         print(f"  ✓ Modal: formación seleccionada = {formation!r}")
         return True
 
@@ -222,7 +222,7 @@ def _click_improve_lineup(page: Page) -> bool:
         if ok:
             print("  ✓ KO: improveLineup() llamado")
             page.wait_for_load_state("domcontentloaded", timeout=15000)
-            time.sleep(2)
+            settle(page, site="lineup.improve")
             handle_popups(page)
             return True
     except Exception as e:
@@ -241,7 +241,7 @@ def _click_improve_lineup(page: Page) -> bool:
                 loc.click()
                 print(f"  ✓ Clic en Mejorar ({sel})")
                 page.wait_for_load_state("domcontentloaded", timeout=15000)
-                time.sleep(2)
+                settle(page, site="lineup.improve")
                 handle_popups(page)
                 return True
         except Exception:
@@ -268,19 +268,19 @@ def set_lineup(page: Page, formation: str) -> dict:
             return {"success": False, "formation": formation, "improved": False,
                     "errors": ["page_not_loaded"]}
 
-        time.sleep(1)
+        settle(page, site="lineup.render")
         handle_popups(page)
 
         formation_set = False
 
         # Estrategia 1: KO directo (no abre modal)
         if _set_formation_via_ko(page, formation):
-            time.sleep(1)
+            settle(page, site="lineup.formation")
             formation_set = True
 
         # Estrategia 2: interacción con el modal
         elif _set_formation_via_modal(page, formation):
-            time.sleep(1)
+            settle(page, site="lineup.formation")
             formation_set = True
 
         if not formation_set:
@@ -311,29 +311,10 @@ def set_lineup_for_slot(
     """
     Encuentra el slot correspondiente a league_name, lo activa y cambia la formación.
     """
-    from utils import click_slot_and_wait_for_dashboard, wait_for_visible_slots, get_slot_info
-
-    page.goto(career_url, wait_until="domcontentloaded", timeout=30000)
-    time.sleep(2)  # dar tiempo a que el SPA inicie antes de buscar slots
-    wait_for_visible_slots(page, timeout=20000)
-    time.sleep(1)
-    handle_popups(page)
-
-    slots = page.locator(".career-teamslot")
-    count = slots.count()
-    target_idx = None
-    for i in range(count):
-        _, slot_league, _ = get_slot_info(slots.nth(i))
-        if slot_league and league_name.lower() in slot_league.lower():
-            target_idx = i
-            print(f"  ✓ Slot encontrado: índice DOM {i} → '{slot_league}'")
-            break
-
-    if target_idx is None:
-        print(f"  ❌ No se encontró slot para liga '{league_name}' (slots={count})")
-        return {"success": False, "formation": formation, "errors": [f"slot_not_found:{league_name}"]}
-
-    if not click_slot_and_wait_for_dashboard(page, target_idx):
-        return {"success": False, "formation": formation, "errors": ["slot_activation_failed"]}
+    from utils import activate_slot_for_league
+
+    slot, error = activate_slot_for_league(page, league_name, career_url)
+    if error:
+        return {"success": False, "formation": formation, "errors": [error]}
 
     return set_lineup(page, formation)
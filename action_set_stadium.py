@@ -16,9 +16,9 @@ Flujo:
 
 Nota OSM: solo se puede tener UNA ampliación activa a la vez.
 """
-import time
 from playwright.sync_api import Page
 from utils import handle_popups
+from waits import wait_for_modal, settle
 
 STADIUM_URL = "https://en.onlinesoccermanager.com/Stadium"
 
@@ -75,7 +75,7 @@ def _navigate_to_stadium(page: Page) -> bool:
             loc = page.locator(sel).first
             if loc.is_visible(timeout=800):
                 loc.click()
-                time.sleep(2)
+                settle(page, site="stadium.nav")
                 if _stadium_loaded(page):
                     print(f"  ✓ Stadium cargado vía SPA ({sel})")
                     return True
@@ -85,7 +85,7 @@ def _navigate_to_stadium(page: Page) -> bool:
     print("  → Fallback: page.goto(/Stadium)...")
     try:
         page.goto(STADIUM_URL, wait_until="domcontentloaded", timeout=30000)
-        time.sleep(3)
+        settle(page, site="stadium.goto")
         handle_popups(page)
         if _stadium_loaded(page):
             return True
@@ -291,7 +291,7 @@ def _open_finance_modal(page: Page) -> bool:
             }
         """)
         if ok:
-            time.sleep(1.5)
+            wait_for_modal(page, site="stadium.finance_modal")
             try:
                 page.wait_for_selector("#finance-modal-transfer-arrow", timeout=4000, state="visible")
             except Exception:
@@ -301,7 +301,7 @@ def _open_finance_modal(page: Page) -> bool:
         print(f"  ⚠️ open_finance_modal: {e}")
     try:
         page.locator(".wallet-container.clubfunds-wallet").first.click()
-        time.sleep(1.5)
+        wait_for_modal(page, site="stadium.finance_modal")
         return True
     except Exception:
         return False
@@ -329,13 +329,13 @@ def _do_transfer(page: Page) -> bool:
             }
         """)
         if ok:
-            time.sleep(2)
+            settle(page, site="stadium.transfer")
             return True
     except Exception as e:
         print(f"  ⚠️ do_transfer: {e}")
     try:
         page.locator("#finance-modal-transfer-arrow").first.click()
-        time.sleep(2)
+        settle(page, site="stadium.transfer")
         return True
     except Exception:
         return False
@@ -350,13 +350,13 @@ def _close_finance_modal(page: Page):
             loc = page.locator(sel).first
             if loc.is_visible(timeout=800):
                 loc.click()
-                time.sleep(0.5)
+                wait_for_modal(page, opened=False, deadline_ms=2000, site="stadium.close_modal")
                 return
         except Exception:
             pass
     try:
         page.keyboard.press("Escape")
-        time.sleep(0.5)
+        wait_for_modal(page, opened=False, deadline_ms=2000, site="stadium.close_modal")
     except Exception:
         pass
 
@@ -474,7 +474,7 @@ def _claim_stadium_part(page: Page, part_index: int) -> bool:
         """)
         if ok:
             print(f"  ✓ Panel {part_index}: claimUpgrade ({ok})")
-            time.sleep(2)
+            settle(page, site="stadium.claim")
             handle_popups(page)
             return True
     except Exception as e:
@@ -485,7 +485,7 @@ def _claim_stadium_part(page: Page, part_index: int) -> bool:
             "button[data-bind*='claimUpgrade']").first
         if btn.is_visible(timeout=1000):
             btn.click()
-            time.sleep(2)
+            settle(page, site="stadium.claim")
             handle_popups(page)
             return True
     except Exception:
@@ -516,7 +516,7 @@ def _start_stadium_upgrade(page: Page, part_index: int) -> bool:
         """)
         if ok:
             print(f"  ✓ Panel {part_index}: startUpgrade ({ok})")
-            time.sleep(2)
+            settle(page, site="stadium.start")
             handle_popups(page)
             return True
     except Exception as e:
@@ -526,7 +526,7 @@ def _start_stadium_upgrade(page: Page, part_index: int) -> bool:
             "button[data-bind*='startUpgrade']").first
         if btn.is_visible(timeout=1000):
             btn.click()
-            time.sleep(2)
+            settle(page, site="stadium.start")
             handle_popups(page)
             return True
     except Exception:
@@ -555,7 +555,7 @@ def upgrade_stadium(page: Page, preferred_parts: list[str] | None = None) -> dic
         result["errors"].append("page_not_loaded")
         return result
 
-    time.sleep(1)
+    settle(page, site="stadium.render")
     handle_popups(page)
 
     # ── Leer estado inicial ───────────────────────────────────────────────────
@@ -578,7 +578,7 @@ def upgrade_stadium(page: Page, preferred_parts: list[str] | None = None) -> dic
                 result["errors"].append(f"claim_failed:{p['type']}")
 
     if result["claimed"]:
-        time.sleep(1)
+        settle(page, site="stadium.after_claim")
         parts = _get_stadium_parts(page)
         bal   = _read_balances(page)
 
@@ -616,7 +616,7 @@ def upgrade_stadium(page: Page, preferred_parts: list[str] | None = None) -> dic
         if cost > 0 and bal["cf"] < cost and bal["savings"] > 0 and not money_moved_to_cf:
             if _transfer_savings_to_cf(page):
                 money_moved_to_cf = True
-                time.sleep(0.5)
+                settle(page, site="stadium.balances")
                 bal = _read_balances(page)
             else:
                 result["errors"].append(f"transfer_failed:{type_key}")
@@ -640,7 +640,7 @@ def upgrade_stadium(page: Page, preferred_parts: list[str] | None = None) -> dic
     final_bal = _read_balances(page)
     if final_bal["cf"] > 0:
         _transfer_cf_to_savings(page)
-        time.sleep(0.5)
+        settle(page, site="stadium.balances")
         final_bal = _read_balances(page)
 
     result["cf"]      = final_bal["cf"]
@@ -658,30 +658,11 @@ def upgrade_stadium_for_slot(
     career_url: str = "https://en.onlinesoccermanager.com/Career",
 ) -> dict:
     """Activa el slot de la liga indicada y ejecuta la lógica del estadio."""
-    from utils import click_slot_and_wait_for_dashboard, wait_for_visible_slots, get_slot_info
+    from utils import activate_slot_for_league
 
-    page.goto(career_url, wait_until="domcontentloaded", timeout=30000)
-    time.sleep(2)  # dar tiempo a que el SPA inicie antes de buscar slots
-    wait_for_visible_slots(page, timeout=20000)
-    time.sleep(1)
-    handle_popups(page)
-
-    slots = page.locator(".career-teamslot")
-    count = slots.count()
-    target_idx = None
-    for i in range(count):
-        _, slot_league, _ = get_slot_info(slots.nth(i))
-        if slot_league and league_name.lower() in slot_league.lower():
-            target_idx = i
-            print(f"  ✓ Slot encontrado: DOM {i} → '{slot_league}'")
-            break
-
-    if target_idx is None:
-        return {"claimed": [], "started": [], "skipped": [], "errors": [f"slot_not_found:{league_name}"],
-                "cf": 0.0, "savings": 0.0}
-
-    if not click_slot_and_wait_for_dashboard(page, target_idx):
-        return {"claimed": [], "started": [], "skipped": [], "errors": ["slot_activation_failed"],
+    slot, error = activate_slot_for_league(page, league_name, career_url)
+    if error:
+        return {"claimed": [], "started": [], "skipped": [], "errors": [error],
                 "cf": 0.0, "savings": 0.0}
 
     return upgrade_stadium(page, preferred_parts=preferred_parts)
@@ -4,9 +4,9 @@ Cambia las tácticas de un equipo en OSM via Playwright.
 Navega a /Tactics, modifica los carousels y sliders, y guarda.
 """
 import json
-import time
 from playwright.sync_api import Page
 from utils import handle_popups
+from waits import wait_for_network_idle, settle, pause
 
 TACTICS_URL = "https://en.onlinesoccermanager.com/Tactics"
 
@@ -194,7 +194,7 @@ def _set_carousel(page: Page, row_sel: str, target: str, max_steps: int = 25) ->
         if current.lower() == target.lower():
             return True
         page.locator(next_sel).first.click()
-        time.sleep(0.25)
+        settle(page, site="tactics.carousel", deadline_ms=1000, quiet_ms=150)
 
     # Intentar con prev si next no llegó
     prev_sel = _first_visible(prev_sels)
@@ -204,7 +204,7 @@ def _set_carousel(page: Page, row_sel: str, target: str, max_steps: int = 25) ->
             if current.lower() == target.lower():
                 return True
             page.locator(prev_sel).first.click()
-            time.sleep(0.25)
+            settle(page, site="tactics.carousel", deadline_ms=1000, quiet_ms=150)
 
     print(f"  ⚠️ No se encontró '{target}' en carousel {row_sel}. Valor actual: {_read_carousel(page, row_sel)!r}")
     return False
@@ -296,7 +296,7 @@ def _navigate_to_tactics(page: Page) -> bool:
             loc = page.locator(sel).first
             if loc.is_visible(timeout=800):
                 loc.click()
-                time.sleep(2)
+                settle(page, site="tactics.nav")
                 if _tactics_loaded(page, timeout=10000):
                     print(f"  ✓ Tácticas cargadas vía SPA ({sel})")
                     return True
@@ -307,7 +307,7 @@ def _navigate_to_tactics(page: Page) -> bool:
     print("  → Fallback: page.goto(/Tactics)...")
     try:
         page.goto(TACTICS_URL, wait_until="domcontentloaded", timeout=30000)
-        time.sleep(3)
+        settle(page, site="tactics.goto")
         handle_popups(page)
         if _tactics_loaded(page, timeout=15000):
             return True
@@ -366,7 +366,7 @@ def set_tactics(page: Page, **kwargs) -> dict:
             errors.append("page_not_loaded")
             return {"success": False, "changed": changed, "errors": errors}
 
-        time.sleep(1)
+        settle(page, site="tactics.render")
         handle_popups(page)
         _dump_ko_observables(page)
 
@@ -376,14 +376,14 @@ def set_tactics(page: Page, **kwargs) -> dict:
             changed.extend(ko_result["applied"])
 
             # Verificar que los valores quedaron escritos correctamente
-            time.sleep(0.5)
+            settle(page, site="tactics.ko_apply", deadline_ms=1500, quiet_ms=150)
             verify = _verify_ko_state(page, kwargs)
             save_methods = verify.get("save_methods", [])
 
             # Si KO aplicó todos los cambios, forzar save y retornar
             if not ko_result["failed"]:
                 _force_save(page, vm_save_methods=save_methods)
-                time.sleep(2)  # esperar que el auto-save debounce dispare
+                pause(2, site="tactics.autosave_debounce")  # esperar que el auto-save debounce dispare
                 return {"success": True, "changed": changed, "errors": []}
 
             # Si KO falló en algunos, intentar esos por UI
@@ -399,7 +399,7 @@ def set_tactics(page: Page, **kwargs) -> dict:
 
         if changed:
             _force_save(page, vm_save_methods=save_methods)
-            time.sleep(2)
+            pause(2, site="tactics.autosave_debounce")
 
     except Exception as e:
         print(f"  ❌ Error en set_tactics: {e}")
@@ -658,7 +658,7 @@ def _set_via_ui(page: Page, **kwargs) -> tuple[list, list]:
                     loc = page.locator("input.tactic-slider-input").nth(idx)
                 loc.fill(str(int(value)))
                 loc.dispatch_event("change")
-                time.sleep(0.3)
+                settle(page, site="tactics.slider", deadline_ms=1000, quiet_ms=150)
                 changed.append(field)
                 print(f"  ✓ input: {field} = {value}")
             except Exception as e:
@@ -766,7 +766,7 @@ def _navigate_carousel(page: Page, carousel_id: str, ko_prop: str | None,
                 next_loc.click()
             else:
                 prev_loc.click()
-            time.sleep(0.25)
+            settle(page, site="tactics.carousel", deadline_ms=1000, quiet_ms=150)
         except Exception as e:
             print(f"  ⚠️ click carousel #{carousel_id}: {e}")
             return False
@@ -934,7 +934,7 @@ def _toggle_offside_direct(page: Page, enable: bool) -> bool:
                 is_active = any(w in cls for w in ("active", "checked", "on", "enabled"))
                 if is_active != enable:
                     loc.click()
-                    time.sleep(0.3)
+                    settle(page, site="tactics.toggle", deadline_ms=1000, quiet_ms=150)
                 print(f"  ✓ toggle: offside_trap = {enable} ({sel})")
                 return True
         except Exception as e:
@@ -1081,7 +1081,7 @@ def _force_save(page: Page, vm_save_methods: list | None = None) -> bool:
             """)
             if saved:
                 print(f"  ✓ Save vía VM.{saved}()")
-                time.sleep(1.5)
+                wait_for_network_idle(page, deadline_ms=3000, site="tactics.save")
                 return True
         except Exception as e:
             print(f"  ⚠️ VM save error: {e}")
@@ -1100,11 +1100,11 @@ def _force_save(page: Page, vm_save_methods: list | None = None) -> bool:
             prev_loc = page.locator(f"#{cid} .carousel-prev").first
             if next_loc.is_visible(timeout=800) and prev_loc.is_visible(timeout=500):
                 next_loc.click()
-                time.sleep(0.3)
+                settle(page, site="tactics.carousel", deadline_ms=1000, quiet_ms=150)
                 prev_loc.click()
-                time.sleep(0.3)
+                settle(page, site="tactics.carousel", deadline_ms=1000, quiet_ms=150)
                 print(f"  ✓ Nudge carousel #{cid} para activar isChanged()")
-                time.sleep(2)
+                pause(2, site="tactics.autosave_debounce")
                 return True
         except Exception:
             pass
@@ -1124,7 +1124,7 @@ def _force_save(page: Page, vm_save_methods: list | None = None) -> bool:
             loc = page.locator(sel).first
             if loc.is_visible(timeout=500):
                 loc.click()
-                time.sleep(1)
+                wait_for_network_idle(page, deadline_ms=3000, site="tactics.save")
                 handle_popups(page)
                 print(f"  ✓ Save vía botón ({sel})")
                 return True
@@ -1150,31 +1150,12 @@ def set_tactics_for_slot(
 ) -> dict:
     """
     Encuentra el slot de Career que corresponde a league_name y aplica los cambios.
-    Usa get_slot_info para identificar el slot por nombre — nunca por índice DOM.
+    Usa read_career_snapshot para identificar el slot por nombre — nunca por índice DOM.
     """
-    from utils import click_slot_and_wait_for_dashboard, wait_for_visible_slots, get_slot_info
-
-    page.goto(career_url, wait_until="domcontentloaded", timeout=30000)
-    time.sleep(2)  # dar tiempo a que el SPA inicie antes de buscar slots
-    wait_for_visible_slots(page, timeout=20000)
-    time.sleep(1)
-    handle_popups(page)
-
-    slots = page.locator(".career-teamslot")
-    count = slots.count()
-    target_idx = None
-    for i in range(count):
-        _, slot_league, _ = get_slot_info(slots.nth(i))
-        if slot_league and league_name.lower() in slot_league.lower():
-            target_idx = i
-            print(f"  ✓ Slot encontrado: índice DOM {i} → '{slot_league}'")
-            break
-
-    if target_idx is None:
-        print(f"  ❌ No se encontró slot para liga '{league_name}' (slots={count})")
-        return {"success": False, "changed": [], "errors": [f"slot_not_found:{league_name}"]}
-
-    if not click_slot_and_wait_for_dashboard(page, target_idx):
-        return {"success": False, "changed": [], "errors": ["slot_activation_failed"]}
+    from utils import activate_slot_for_league
+
+    slot, error = activate_slot_for_league(page, league_name, career_url)
+    if error:
+        return {"success": False, "changed": [], "errors": [error]}
 
     return set_tactics(page, **kwargs)
@@ -10,9 +10,9 @@ Flujo por slot de entrenamiento:
   5. Buscar el mismo jugador en el modal por nombre y seleccionarlo via KO setPlayer()
 """
 import json
-import time
 from playwright.sync_api import Page
 from utils import handle_popups
+from waits import wait_for_dom, wait_for_modal, settle
 
 TRAINING_URL = "https://en.onlinesoccermanager.com/Training"
 
@@ -36,7 +36,7 @@ def _navigate_to_training(page: Page) -> bool:
             loc = page.locator(sel).first
             if loc.is_visible(timeout=800):
                 loc.click()
-                time.sleep(2)
+                settle(page, site="training.nav")
                 if _training_loaded(page):
                     print(f"  ✓ Training cargado vía SPA ({sel})")
                     return True
@@ -46,7 +46,7 @@ def _navigate_to_training(page: Page) -> bool:
     print("  → Fallback: page.goto(/Training)...")
     try:
         page.goto(TRAINING_URL, wait_until="domcontentloaded", timeout=30000)
-        time.sleep(3)
+        settle(page, site="training.goto")
         handle_popups(page)
         if _training_loaded(page):
             return True
@@ -142,27 +142,19 @@ def _wait_slot_reset(page: Page, slot_index: int, timeout: int = 15) -> bool:
     Espera (polling) a que el slot pase de panel-player → panel-trainer.
     Necesario porque OSM muestra una animación tras el claim antes de resetear.
     """
-    deadline = time.time() + timeout
-    while time.time() < deadline:
-        try:
-            result = page.evaluate(f"""
-                () => {{
-                    const containers = document.querySelectorAll('.training-slot-container');
-                    const container = containers[{slot_index}];
-                    if (!container) return 'not_found';
-                    const slot = container.querySelector('.training-slot');
-                    if (!slot) return 'no_slot';
-                    if (slot.classList.contains('panel-trainer')) return 'needs_player';
-                    if (slot.classList.contains('panel-player')) return 'in_progress';
-                    return 'unknown';
-                }}
-            """)
-            if result == 'needs_player':
-                return True
-        except Exception:
-            pass
-        time.sleep(1)
-    return False
+    return wait_for_dom(
+        page,
+        """
+            (idx) => {
+                const container = document.querySelectorAll('.training-slot-container')[idx];
+                const slot = container && container.querySelector('.training-slot');
+                return !!slot && slot.classList.contains('panel-trainer');
+            }
+        """,
+        arg=slot_index,
+        deadline_ms=timeout * 1000,
+        site="training.slot_reset",
+    )
 
 
 def _claim_slot(page: Page, slot_index: int) -> bool:
@@ -188,7 +180,7 @@ def _claim_slot(page: Page, slot_index: int) -> bool:
         """)
         if ok:
             print(f"  ✓ Slot {slot_index}: claim ({ok})")
-            time.sleep(1)
+            settle(page, site="training.claim")
             handle_popups(page)
             return True
     except Exception as e:
@@ -199,7 +191,7 @@ def _claim_slot(page: Page, slot_index: int) -> bool:
         btn = page.locator(".training-slot-container").nth(slot_index).locator("button.btn-show-result").first
         if btn.is_visible(timeout=1500):
             btn.click()
-            time.sleep(1)
+            settle(page, site="training.claim")
             handle_popups(page)
             print(f"  ✓ Slot {slot_index}: Completado (PW click)")
             return True
@@ -231,7 +223,7 @@ def _open_player_modal(page: Page, slot_index: int) -> bool:
         """)
         if ok:
             print(f"  → Slot {slot_index}: modal abierto ({ok})")
-            time.sleep(1.5)
+            wait_for_modal(page, site="training.player_modal")
             return True
     except Exception as e:
         print(f"  ⚠️ open modal slot {slot_index}: {e}")
@@ -240,7 +232,7 @@ def _open_player_modal(page: Page, slot_index: int) -> bool:
         btn = page.locator(".training-slot-container").nth(slot_index).locator("button[data-bind*='selectPlayer']").first
         if btn.is_visible(timeout=1500):
             btn.click()
-            time.sleep(1.5)
+            wait_for_modal(page, site="training.player_modal")
             return True
     except Exception:
         pass
@@ -329,7 +321,7 @@ def _select_player_in_modal(page: Page, player_name: str, coach_type: str = "")
             """)
             if selected:
                 print(f"  ✓ Modal: jugador seleccionado = {selected!r} (buscado: {player_name!r})")
-                time.sleep(1)
+                settle(page, site="training.select")
                 handle_popups(page)
                 return selected
         except Exception as e:
@@ -387,7 +379,7 @@ def _select_player_in_modal(page: Page, player_name: str, coach_type: str = "")
         """)
         if selected:
             print(f"  ✓ Modal: seleccionado por {reason} = {selected!r}")
-            time.sleep(1)
+            settle(page, site="training.select")
             handle_popups(page)
             return selected
     except Exception as e:
@@ -402,7 +394,7 @@ def _close_modal_if_open(page: Page):
         close_btn = page.locator("#modal-dialog-trainplayer button.close").first
         if close_btn.is_visible(timeout=500):
             close_btn.click()
-            time.sleep(0.5)
+            wait_for_modal(page, opened=False, deadline_ms=2000, site="training.close_modal")
     except Exception:
         pass
 
@@ -425,7 +417,7 @@ def renew_training(page: Page, queued_players: dict | None = None) -> dict:
     if not _navigate_to_training(page):
         return {"claimed": claimed, "started": started, "errors": ["page_not_loaded"]}
 
-    time.sleep(1)
+    settle(page, site="training.render")
     handle_popups(page)
 
     # ── Paso 1: leer estados y guardar jugadores antes de reclamar ────────────
@@ -451,7 +443,7 @@ def renew_training(page: Page, queued_players: dict | None = None) -> dict:
 
     # Releer estados tras los claims
     if claimed:
-        time.sleep(1)
+        settle(page, site="training.after_claim")
         states = _get_slot_states(page)
 
     # ── Paso 3: iniciar entrenamiento en slots vacíos ─────────────────────────
@@ -480,7 +472,7 @@ def renew_training(page: Page, queued_players: dict | None = None) -> dict:
             errors.append(f"select_failed:slot{s['index']}")
             _close_modal_if_open(page)
 
-        time.sleep(1)
+        settle(page, site="training.next_slot")
 
     print(f"  [training] Reclamados: {[c['player'] for c in claimed]}")
     print(f"  [training] Iniciados:  {[s['player'] for s in started]}")
@@ -498,28 +490,10 @@ def renew_training_for_slot(
 ) -> dict:
     """Activa el slot de liga indicado y renueva los entrenamientos.
     queued_players se pasa directamente a renew_training() para priorizar jugadores programados."""
-    from utils import click_slot_and_wait_for_dashboard, wait_for_visible_slots, get_slot_info
-
-    page.goto(career_url, wait_until="domcontentloaded", timeout=30000)
-    time.sleep(2)  # dar tiempo a que el SPA inicie antes de buscar slots
-    wait_for_visible_slots(page, timeout=20000)
-    time.sleep(1)
-    handle_popups(page)
+    from utils import activate_slot_for_league
 
-    slots = page.locator(".career-teamslot")
-    count = slots.count()
-    target_idx = None
-    for i in range(count):
-        _, slot_league, _ = get_slot_info(slots.nth(i))
-        if slot_league and league_name.lower() in slot_league.lower():
-            target_idx = i
-            print(f"  ✓ Slot encontrado: DOM {i} → '{slot_league}'")
-            break
-
-    if target_idx is None:
-        return {"claimed": [], "started": [], "errors": [f"slot_not_found:{league_name}"]}
-
-    if not click_slot_and_wait_for_dashboard(page, target_idx):
-        return {"claimed": [], "started": [], "errors": ["slot_activation_failed"]}
+    slot, error = activate_slot_for_league(page, league_name, career_url)
+    if error:
+        return {"claimed": [], "started": [], "errors": [error]}
 
     return renew_training(page, queued_players=queued_players)
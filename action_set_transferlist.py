@@ -8,9 +8,9 @@ Flujo:
   3. Para cada slot vacío: abrir modal → seleccionar primer candidato no listado
 """
 import json
-import time
 from playwright.sync_api import Page
-from utils import handle_popups, click_slot_and_wait_for_dashboard, wait_for_visible_slots, get_slot_info
+from utils import handle_popups, activate_slot_for_league
+from waits import wait_for_modal, settle
 
 TRANSFER_LIST_URL = "https://en.onlinesoccermanager.com/TransferList"
 
@@ -32,7 +32,7 @@ def _navigate_to_transferlist(page: Page) -> bool:
             loc = page.locator(sel).first
             if loc.is_visible(timeout=800):
                 loc.click()
-                time.sleep(2)
+                settle(page, site="transferlist.nav")
                 if _transferlist_loaded(page):
                     print(f"  ✓ TransferList cargado vía SPA ({sel})")
                     return True
@@ -42,7 +42,7 @@ def _navigate_to_transferlist(page: Page) -> bool:
     print("  → Fallback: page.goto(/TransferList)...")
     try:
         page.goto(TRANSFER_LIST_URL, wait_until="domcontentloaded", timeout=30000)
-        time.sleep(2)
+        settle(page, site="transferlist.goto")
         handle_popups(page)
         if _transferlist_loaded(page):
             return True
@@ -57,7 +57,7 @@ def _activate_sell_tab(page: Page):
         tab = page.locator("#sell-players-tab a").first
         if tab.is_visible(timeout=3000):
             tab.click()
-            time.sleep(1)
+            settle(page, site="transferlist.sell_tab")
     except Exception:
         pass
 
@@ -145,7 +145,7 @@ def _open_add_player_modal(page: Page) -> bool:
         """)
         if opened:
             print(f"  → Modal de selección abierto ({opened})")
-            time.sleep(2)
+            wait_for_modal(page, site="transferlist.select_modal")
             return True
         print("  ⚠️ No hay slots vacíos o no se pudo abrir el modal")
         return False
@@ -222,7 +222,7 @@ def _select_candidate_in_modal(page: Page, candidates: list[str],
             """)
             if selected:
                 print(f"  ✓ Jugador añadido a transferibles: {selected!r}")
-                time.sleep(1.5)
+                settle(page, site="transferlist.add")
                 handle_popups(page)
                 return selected
         except Exception as e:
@@ -232,7 +232,7 @@ def _select_candidate_in_modal(page: Page, candidates: list[str],
     print(f"  ⚠️ Ningún candidato disponible de la lista: {candidates}")
     try:
         page.keyboard.press("Escape")
-        time.sleep(0.5)
+        wait_for_modal(page, opened=False, deadline_ms=2000, site="transferlist.close_modal")
     except Exception:
         pass
     return None
@@ -254,7 +254,7 @@ def fill_transferlist(page: Page, candidates: list[str]) -> dict:
         return {"max_slots": 4, "filled_before": 0, "added": added,
                 "skipped": skipped, "errors": ["page_not_loaded"]}
 
-    time.sleep(1)
+    settle(page, site="transferlist.render")
     handle_popups(page)
     _activate_sell_tab(page)
 
@@ -285,7 +285,7 @@ def fill_transferlist(page: Page, candidates: list[str]) -> dict:
             skipped.extend(skipped_candidates)
             errors.append("pool_exhausted")
             break
-        time.sleep(1)
+        settle(page, site="transferlist.next")
 
     print(f"  [transferlist] Añadidos: {added}")
     return {"max_slots": max_slots, "filled_before": filled_before,
@@ -299,27 +299,9 @@ def fill_transferlist_for_slot(
     career_url: str = "https://en.onlinesoccermanager.com/Career",
 ) -> dict:
     """Activa el slot de la liga indicada y rellena la lista de transferibles."""
-    page.goto(career_url, wait_until="domcontentloaded", timeout=30000)
-    time.sleep(2)
-    wait_for_visible_slots(page, timeout=20000)
-    time.sleep(1)
-    handle_popups(page)
-
-    slots = page.locator(".career-teamslot")
-    target_idx = None
-    for i in range(slots.count()):
-        _, t_league, _ = get_slot_info(slots.nth(i))
-        if t_league and league_name.lower() in t_league.lower():
-            target_idx = i
-            print(f"  ✓ Slot encontrado: DOM {i} → '{t_league}'")
-            break
-
-    if target_idx is None:
-        return {"max_slots": 4, "filled_before": 0, "added": [], "skipped": [],
-                "errors": [f"slot_not_found:{league_name}"]}
-
-    if not click_slot_and_wait_for_dashboard(page, target_idx):
+    slot, error = activate_slot_for_league(page, league_name, career_url)
+    if error:
         return {"max_slots": 4, "filled_before": 0, "added": [], "skipped": [],
-                "errors": ["slot_activation_failed"]}
+                "errors": [error]}
 
     return fill_transferlist(page, candidates)
@@ -0,0 +1,209 @@
+# api_db.py
+"""
+Capa de datos async de la API (main.py) sobre un pool de asyncpg.
+
+Los endpoints de lectura esperan a Postgres sin ocupar un hilo del threadpool
+de FastAPI, y comparten entre todas las peticiones como mucho DB_POOL_MAX
+conexiones (mismas variables que el pool síncrono de db.py).
+
+- asyncpg prepara cada consulta la primera vez que la ve una conexión y la
+  reutiliza después (caché de sentencias por conexión): las lecturas repetidas
+  solo envían parámetros.
+- JSON/JSONB se decodifican en el driver y los numeric se castean a float8 en
+  el SQL, así cada fila se carga directamente en su modelo de respuesta con
+  model_construct (sin pasar por dicts intermedios ni revalidar).
+
+El pool se abre con la primera consulta y se cierra al apagar la API.
+"""
+import asyncio
+import json
+import time
+
+import asyncpg
+
+from db import DB_CONFIG, DB_POOL_MIN, DB_POOL_MAX, DB_POOL_TIMEOUT_SECONDS
+
+_pool: asyncpg.Pool | None = None
+_pool_lock = asyncio.Lock()
+_stats = {"checkouts": 0, "wait_ms": 0.0, "max_wait_ms": 0.0}
+
+
+class DatabaseUnavailable(Exception):
+    """No se pudo abrir el pool o conseguir una conexión."""
+
+
+async def _init_connection(conn):
+    for typ in ("json", "jsonb"):
+        await conn.set_type_codec(typ, encoder=json.dumps, decoder=json.loads, schema="pg_catalog")
+
+
+async def _get_pool() -> asyncpg.Pool:
+    global _pool
+    if _pool is not None:
+        return _pool
+    async with _pool_lock:
+        if _pool is None:
+            try:
+                _pool = await asyncpg.create_pool(
+                    host=DB_CONFIG["host"],
+                    port=int(DB_CONFIG["port"] or 5432),
+                    database=DB_CONFIG["dbname"],
+                    user=DB_CONFIG["user"],
+                    password=DB_CONFIG["password"],
+                    min_size=DB_POOL_MIN,
+                    max_size=DB_POOL_MAX,
+                    init=_init_connection,
+                )
+            except (OSError, asyncpg.PostgresError) as e:
+                raise DatabaseUnavailable(str(e))
+    return _pool
+
+
+async def close_pool():
+    global _pool
+    if _pool is not None:
+        await _pool.close()
+        _pool = None
+
+
+async def _fetch(sql: str, *args) -> list[asyncpg.Record]:
+    pool = await _get_pool()
+    start = time.monotonic()
+    try:
+        async with pool.acquire(timeout=DB_POOL_TIMEOUT_SECONDS) as conn:
+            waited_ms = (time.monotonic() - start) * 1000
+            _stats["checkouts"] += 1
+            _stats["wait_ms"] += waited_ms
+            _stats["max_wait_ms"] = max(_stats["max_wait_ms"], waited_ms)
+            return await conn.fetch(sql, *args)
+    except (asyncio.TimeoutError, OSError) as e:
+        raise DatabaseUnavailable(str(e) or "timeout esperando conexión")
+
+
+def _models(model, rows) -> list:
+    return [model.model_construct(**dict(row)) for row in rows]
+
+
+def get_pool_stats() -> dict:
+    pool = _pool
+    return {
+        **_stats,
+        "open": pool.get_size() if pool else 0,
+        "idle": pool.get_idle_size() if pool else 0,
+        "max": DB_POOL_MAX,
+    }
+
+
+# ── Consultas ────────────────────────────────────────────────────────────────
+
+_LEAGUES_SQL = "SELECT id, name, type FROM leagues ORDER BY name ASC;"
+
+_LEAGUE_SQL = "SELECT id, name, type, teams, managers_by_team, standings FROM leagues WHERE id = $1;"
+
+_TRANSFERS_COLUMNS = """
+    SELECT id, player_name, manager_name, transaction_type, position, round,
+           base_value::float8 AS base_value, final_price::float8 AS final_price, created_at
+    FROM transfers
+"""
+
+# Filtro de fichajes → condición SQL ({} = número de parámetro).
+# Solo entran en el WHERE los filtros presentes: cada combinación es una
+# sentencia distinta, preparada una vez, y su plan puede usar el índice que le toca.
+_TRANSFER_FILTERS = (
+    ("manager_name",     "manager_name = ${}"),
+    ("transaction_type", "transaction_type = ${}"),
+    ("position",         "position = ${}"),
+    ("round_from",       "round >= ${}"),
+    ("round_to",         "round <= ${}"),
+    ("since",            "created_at > ${}"),
+)
+
+_TACTICS_COLUMNS = """
+    SELECT id, league_id, round, team_name, game_plan, tackling,
+           pressure, mentality, tempo, forwards_tactic, midfielders_tactic,
+           defenders_tactic, offside_trap, marking, scraped_at
+    FROM match_tactics
+"""
+_TACTICS_BY_ROUND_SQL = _TACTICS_COLUMNS + " WHERE league_id = $1 AND round = $2 ORDER BY team_name;"
+_TACTICS_SQL = _TACTICS_COLUMNS + " WHERE league_id = $1 ORDER BY round DESC, team_name;"
+
+# Filtros opcionales con NULL: una sola sentencia preparada para todas las combinaciones
+_SCHEDULED_TASKS_SQL = """
+    SELECT id, user_id::text AS user_id, task_type, scheduled_at, status, metadata, created_at, executed_at
+    FROM scheduled_scrape_tasks
+    WHERE ($1::text IS NULL OR status = $1)
+      AND ($2::text IS NULL OR task_type = $2)
+    ORDER BY scheduled_at DESC
+    LIMIT 100;
+"""
+
+_PENDING_TACTICS_SCRAPES_SQL = """
+    SELECT id, task_type, scheduled_at, status, metadata, created_at
+    FROM scheduled_scrape_tasks
+    WHERE user_id = $1::uuid
+      AND task_type = 'tactics_scrape'
+      AND status = 'pending'
+    ORDER BY scheduled_at;
+"""
+
+
+async def fetch_leagues(model) -> list:
+    return _models(model, await _fetch(_LEAGUES_SQL))
+
+
+async def fetch_league(model, league_id: int):
+    rows = await _fetch(_LEAGUE_SQL, league_id)
+    return model.model_construct(**dict(rows[0])) if rows else None
+
+
+async def fetch_transfers(model, league_id: int, *, after: tuple | None = None,
+                          limit: int | None = None, **filters) -> list:
+    """
+    Fichajes de la liga ordenados por (created_at, id).
+    after:   (created_at, id) de la última fila de la página anterior (keyset).
+    limit:   filas como máximo (None = todas).
+    filters: manager_name, transaction_type, position, round_from, round_to, since;
+             los que valen None se ignoran.
+    """
+    args = [league_id]
+    where = ["league_id = $1"]
+    for name, clause in _TRANSFER_FILTERS:
+        if filters.get(name) is not None:
+            args.append(filters[name])
+            where.append(clause.format(len(args)))
+    if after is not None:
+        args.extend(after)
+        where.append(f"(created_at, id) > (${len(args) - 1}, ${len(args)})")
+    sql = _TRANSFERS_COLUMNS + " WHERE " + " AND ".join(where) + " ORDER BY created_at ASC, id ASC"
+    if limit is not None:
+        args.append(limit)
+        sql += f" LIMIT ${len(args)}"
+    return _models(model, await _fetch(sql + ";", *args))
+
+
+async def fetch_tactics(model, league_id: int, round: int | None = None) -> list:
+    """[] si la tabla match_tactics aún no existe."""
+    try:
+        if round:
+            rows = await _fetch(_TACTICS_BY_ROUND_SQL, league_id, round)
+        else:
+            rows = await _fetch(_TACTICS_SQL, league_id)
+    except asyncpg.UndefinedTableError:
+        return []
+    return _models(model, rows)
+
+
+async def fetch_scheduled_tasks(model, status: str | None, task_type: str | None) -> list:
+    """[] si la tabla scheduled_scrape_tasks aún no existe."""
+    try:
+        rows = await _fetch(_SCHEDULED_TASKS_SQL, status, task_type)
+    except asyncpg.UndefinedTableError:
+        return []
+    return _models(model, rows)
+
+
+async def fetch_pending_tactics_scrapes(user_id: str) -> list[asyncpg.Record]:
+    try:
+        return await _fetch(_PENDING_TACTICS_SCRAPES_SQL, user_id)
+    except asyncpg.UndefinedTableError:
+        return []
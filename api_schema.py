@@ -0,0 +1,70 @@
+# api_schema.py
+"""
+Helpers para normalizar las respuestas JSON de la API de OSM a la forma de la
+extracción DOM/KO. Los usan response_tap (capturas pasivas), direct_fetch
+(peticiones directas) y los normalizadores de los scrapers.
+
+Los normalizadores validan con require() todos los campos que leen y lanzan
+SchemaMismatch si la respuesta no cuadra; el llamador cae entonces al DOM/KO.
+"""
+
+
+class SchemaMismatch(Exception):
+    """La respuesta JSON no tiene la forma esperada (se usa el fallback DOM/KO)."""
+
+
+def pick(obj, *keys, default=None):
+    """Primer valor no nulo entre varias claves (la API mezcla nombres según versión)."""
+    if not isinstance(obj, dict):
+        return default
+    for key in keys:
+        if obj.get(key) is not None:
+            return obj[key]
+    return default
+
+
+def name_of(obj, default="N/A"):
+    if isinstance(obj, dict):
+        return pick(obj, "name", "Name", default=default)
+    return obj if isinstance(obj, str) and obj else default
+
+
+def rows_of(data, *keys) -> list:
+    """Lista de filas de la respuesta: la raíz o la primera clave que sea lista."""
+    if isinstance(data, list):
+        return data
+    if isinstance(data, dict):
+        for key in keys + ("items", "data", "results"):
+            if isinstance(data.get(key), list):
+                return data[key]
+    raise SchemaMismatch(f"sin lista de filas (claves: {list(data)[:8] if isinstance(data, dict) else type(data).__name__})")
+
+
+def require(rows: list, *fields_any: tuple):
+    """
+    Cada fila debe ser un objeto con al menos una clave de cada grupo (el valor
+    puede ser null si el campo lo admite). Se comprueban todas las filas.
+    """
+    if not rows:
+        raise SchemaMismatch("lista vacía")
+    for i, r in enumerate(rows):
+        if not isinstance(r, dict):
+            raise SchemaMismatch(f"fila {i} no es un objeto ({type(r).__name__})")
+        for group in fields_any:
+            if not any(k in r for k in group):
+                raise SchemaMismatch(f"fila {i} sin ninguno de {group}")
+
+
+def require_names(objs):
+    """Los equipos/jugadores/países anidados que vengan como objeto deben traer nombre."""
+    nested = [o for o in objs if isinstance(o, dict)]
+    if nested:
+        require(nested, ("name", "Name"))
+
+
+def run_normalizer(normalize, data, page):
+    """Un valor con tipo inesperado (int(None), int('abc')…) también es forma inesperada."""
+    try:
+        return normalize(data, page)
+    except (TypeError, ValueError, AttributeError) as e:
+        raise SchemaMismatch(f"valor con tipo inesperado ({e})") from e
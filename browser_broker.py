@@ -0,0 +1,344 @@
+# browser_broker.py
+"""
+Broker de navegador compartido para OSM.
+
+Proceso de larga duración que mantiene Chromium abierto y UN contexto logueado
+por usuario OSM. El bot, la API y los scripts programados le envían trabajos por
+un socket local en vez de arrancar Chromium y hacer login cada vez.
+
+Uso:
+    python browser_broker.py          # arranca el broker
+
+Cliente:
+    from browser_broker import run_browser_job, run_browser_jobs
+    timers = run_browser_job(user_id, "timers_all_slots")
+
+Si el broker no está corriendo, el cliente abre un Chromium local como antes,
+así que los llamadores no necesitan el broker para funcionar.
+"""
+import importlib
+import json
+import os
+import queue
+import socket
+import socketserver
+import threading
+import time
+from collections import OrderedDict
+
+from dotenv import load_dotenv
+
+from utils import InvalidCredentialsError
+from request_policy import format_request_stats
+from waits import reset_wait_metrics, format_wait_metrics
+from direct_fetch import format_direct_stats
+from db import connect as _db
+
+load_dotenv()
+
+BROKER_ENABLED       = os.getenv("BROWSER_BROKER_ENABLED", "true").lower() == "true"
+BROKER_HOST          = os.getenv("BROWSER_BROKER_HOST", "127.0.0.1")
+BROKER_PORT          = int(os.getenv("BROWSER_BROKER_PORT", "8765"))
+BROKER_IDLE_MINUTES  = int(os.getenv("BROWSER_BROKER_IDLE_MINUTES", "20"))
+BROKER_MAX_CONTEXTS  = int(os.getenv("BROWSER_BROKER_MAX_CONTEXTS", "3"))
+BROKER_JOB_TIMEOUT   = int(os.getenv("BROWSER_BROKER_JOB_TIMEOUT", "900"))   # segundos
+
+# Trabajos disponibles: nombre → "modulo:funcion". La función recibe la página
+# (ya logueada) como primer argumento y el resto como kwargs. Se importan al
+# ejecutarse para no cargar todos los scrapers en cada cliente.
+JOBS = {
+    "timers_all_slots":  "scraper_timers:get_timers_all_slots",
+    "set_tactics":       "action_set_tactics:set_tactics_for_slot",
+    "set_lineup":        "action_set_lineup:set_lineup_for_slot",
+    "renew_training":    "action_set_training:renew_training_for_slot",
+    "upgrade_stadium":   "action_set_stadium:upgrade_stadium_for_slot",
+    "fill_transferlist": "action_set_transferlist:fill_transferlist_for_slot",
+    "squad_for_slot":    "scraper_squad:get_squad_for_slot",
+    "spy_for_slot":      "scraper_data_analyst:spy_for_slot",
+    "tactics_for_slot":  "run_scheduled_tactics:scrape_tactics_for_slot",
+    "leagues":           "scraper_leagues:get_data_from_website",
+    "transfers":         "scraper_transfers:get_transfers_data",
+    "squad_values":      "scraper_values:get_squad_values_data",
+    "standings":         "scraper_table:get_standings_data",
+}
+
+
+class BrokerUnavailable(Exception):
+    """El broker no está escuchando (se usa el fallback local)."""
+
+
+class BrowserJobError(Exception):
+    """Un trabajo (o la sesión que lo ejecutaba) falló."""
+
+
+class MissingCredentialsError(BrowserJobError):
+    """El usuario no tiene credenciales OSM en BD."""
+
+
+# ── Ejecución de trabajos (común a broker y fallback local) ──────────────────
+
+def _resolve_job(job: str):
+    if job not in JOBS:
+        raise BrowserJobError(f"Trabajo desconocido: {job}")
+    module_name, func_name = JOBS[job].split(":")
+    return getattr(importlib.import_module(module_name), func_name)
+
+
+def _execute_steps(page, steps: list) -> list[dict]:
+    """
+    Ejecuta una lista de (job, kwargs) sobre la misma página.
+    Un fallo en un paso no impide ejecutar los siguientes.
+    """
+    results = []
+    for job, args in steps:
+        try:
+            results.append({"ok": True, "result": _resolve_job(job)(page, **(args or {}))})
+        except Exception as e:
+            print(f"  ❌ Error en trabajo '{job}': {e}")
+            results.append({"ok": False, "error": str(e)})
+    return results
+
+
+def _get_osm_credentials(conn, user_id: str):
+    with conn.cursor() as cur:
+        cur.execute(
+            "SELECT osm_username, osm_password FROM public.get_credentials_for_user(%s);",
+            (user_id,)
+        )
+        row = cur.fetchone()
+    if not row or not row["osm_username"] or not row["osm_password"]:
+        raise MissingCredentialsError(f"Sin credenciales para usuario {user_id}")
+    return row["osm_username"], row["osm_password"]
+
+
+def _login(browser, user_id: str):
+    from utils import login_with_session_cache
+
+    conn = _db()
+    try:
+        username, password = _get_osm_credentials(conn, user_id)
+        return login_with_session_cache(browser, conn, user_id, username, password)
+    finally:
+        conn.close()
+
+
+def _run_locally(user_id: str, steps: list) -> list[dict]:
+    """Fallback sin broker: Chromium propio para esta llamada."""
+    from playwright.sync_api import sync_playwright
+    from utils import launch_playwright_browser
+
+    with sync_playwright() as p:
+        browser = launch_playwright_browser(p, headless=True)
+        try:
+            context, page = _login(browser, user_id)
+            results = _execute_steps(page, steps)
+            context.close()
+            return results
+        finally:
+            browser.close()
+
+
+# ── Cliente ──────────────────────────────────────────────────────────────────
+
+def _submit(user_id: str, steps: list) -> dict:
+    try:
+        sock = socket.create_connection((BROKER_HOST, BROKER_PORT), timeout=2)
+    except OSError as e:
+        raise BrokerUnavailable(str(e))
+
+    # A partir de aquí el trabajo puede estar ejecutándose: no hay fallback local.
+    with sock:
+        sock.settimeout(BROKER_JOB_TIMEOUT + 30)
+        request = {"user_id": str(user_id), "steps": [[job, args or {}] for job, args in steps]}
+        sock.sendall(json.dumps(request, default=str).encode("utf-8") + b"\n")
+        with sock.makefile("rb") as f:
+            line = f.readline()
+    if not line:
+        raise BrowserJobError("El broker cerró la conexión sin responder")
+    return json.loads(line)
+
+
+def run_browser_jobs(user_id: str, steps: list) -> list[dict]:
+    """
+    Ejecuta varios trabajos seguidos con la sesión del usuario.
+
+    Args:
+        steps: lista de (job, kwargs) — ver JOBS.
+
+    Returns:
+        list: un {"ok": bool, "result" | "error"} por paso, en el mismo orden.
+
+    Raises:
+        InvalidCredentialsError / MissingCredentialsError / BrowserJobError si
+        falla la sesión completa (login, navegador caído...).
+    """
+    if BROKER_ENABLED:
+        try:
+            response = _submit(user_id, steps)
+        except BrokerUnavailable as e:
+            print(f"ℹ️ Broker de navegador no disponible ({e}). Usando Chromium local.")
+        else:
+            if response.get("ok"):
+                return response["results"]
+            error_type = response.get("error_type")
+            if error_type == "InvalidCredentialsError":
+                raise InvalidCredentialsError(response.get("error"))
+            if error_type == "MissingCredentialsError":
+                raise MissingCredentialsError(response.get("error"))
+            raise BrowserJobError(response.get("error", "error desconocido"))
+
+    return _run_locally(user_id, steps)
+
+
+def run_browser_job(user_id: str, job: str, **kwargs):
+    """Ejecuta un solo trabajo y devuelve su resultado (o lanza BrowserJobError)."""
+    result = run_browser_jobs(user_id, [(job, kwargs)])[0]
+    if not result["ok"]:
+        raise BrowserJobError(result["error"])
+    return result["result"]
+
+
+# ── Servidor ─────────────────────────────────────────────────────────────────
+# Playwright sync no es thread-safe: los handlers del socket solo encolan y
+# esperan; el hilo principal es el único que toca el navegador.
+
+_job_queue: "queue.Queue[dict]" = queue.Queue()
+
+
+class _ContextPool:
+    """Un contexto logueado por usuario, con desalojo LRU y por inactividad."""
+
+    def __init__(self, browser):
+        self.browser = browser
+        self.entries: "OrderedDict[str, dict]" = OrderedDict()
+
+    def get_page(self, user_id: str):
+        entry = self.entries.get(user_id)
+        if entry and not entry["page"].is_closed():
+            self.entries.move_to_end(user_id)
+            entry["last_used"] = time.time()
+            return entry["page"]
+        if entry:
+            self.drop(user_id)
+
+        while len(self.entries) >= BROKER_MAX_CONTEXTS:
+            oldest = next(iter(self.entries))
+            print(f"♻️ Máximo de contextos ({BROKER_MAX_CONTEXTS}). Cerrando {oldest}.")
+            self.drop(oldest)
+
+        print(f"🔐 Abriendo contexto para {user_id}...")
+        context, page = _login(self.browser, user_id)
+        self.entries[user_id] = {"context": context, "page": page, "last_used": time.time()}
+        return page
+
+    def drop(self, user_id: str):
+        entry = self.entries.pop(user_id, None)
+        if entry:
+            try:
+                print(f"  {format_request_stats(entry['context'])}")
+                entry["context"].close()
+            except Exception:
+                pass
+
+    def evict_idle(self):
+        limit = time.time() - BROKER_IDLE_MINUTES * 60
+        for user_id in [u for u, e in self.entries.items() if e["last_used"] < limit]:
+            print(f"💤 Contexto inactivo > {BROKER_IDLE_MINUTES} min. Cerrando {user_id}.")
+            self.drop(user_id)
+
+    def close_all(self):
+        for user_id in list(self.entries):
+            self.drop(user_id)
+
+
+class _Handler(socketserver.StreamRequestHandler):
+    def handle(self):
+        try:
+            request = json.loads(self.rfile.readline())
+            reply: "queue.Queue[dict]" = queue.Queue(maxsize=1)
+            # El cliente deja de esperar en el deadline: si el trabajo sigue en la cola
+            # para entonces, serve() lo descarta (sin efectos tardíos de acciones).
+            job = {"user_id": request["user_id"], "steps": request["steps"], "reply": reply,
+                   "deadline": time.time() + BROKER_JOB_TIMEOUT, "cancelled": False}
+            _job_queue.put(job)
+            response = reply.get(timeout=BROKER_JOB_TIMEOUT)
+        except queue.Empty:
+            job["cancelled"] = True
+            response = {"ok": False, "error": "Timeout esperando el resultado del broker"}
+        except Exception as e:
+            response = {"ok": False, "error": str(e)}
+        self.wfile.write(json.dumps(response, default=str).encode("utf-8") + b"\n")
+
+
+class _Server(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+
+def _handle_job(pool: _ContextPool, job: dict) -> dict:
+    user_id = job["user_id"]
+    try:
+        page = pool.get_page(user_id)
+    except Exception as e:
+        return {"ok": False, "error": str(e), "error_type": type(e).__name__}
+
+    reset_wait_metrics()
+    results = _execute_steps(page, job["steps"])
+    print(format_wait_metrics(top=5))
+    print(format_direct_stats(page))
+    if page.is_closed():
+        pool.drop(user_id)
+    return {"ok": True, "results": results}
+
+
+def serve():
+    from playwright.sync_api import sync_playwright
+    from utils import launch_playwright_browser
+
+    server = _Server((BROKER_HOST, BROKER_PORT), _Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    print(f"🚀 Broker de navegador escuchando en {BROKER_HOST}:{BROKER_PORT} "
+          f"(máx {BROKER_MAX_CONTEXTS} contextos, inactividad {BROKER_IDLE_MINUTES} min)")
+
+    with sync_playwright() as p:
+        browser = launch_playwright_browser(p, headless=True)
+        pool = _ContextPool(browser)
+        try:
+            while True:
+                try:
+                    job = _job_queue.get(timeout=30)
+                except queue.Empty:
+                    pool.evict_idle()
+                    continue
+
+                if not browser.is_connected():
+                    print("⚠️ Chromium se cerró. Relanzando...")
+                    pool.entries.clear()
+                    browser = launch_playwright_browser(p, headless=True)
+                    pool.browser = browser
+
+                if job["cancelled"] or time.time() >= job["deadline"]:
+                    print(f"⏭️ {len(job['steps'])} trabajo(s) de {job['user_id']} caducados en cola. Descartados.")
+                    continue
+
+                started = time.time()
+                try:
+                    response = _handle_job(pool, job)
+                    print(f"✅ {len(job['steps'])} trabajo(s) de {job['user_id']} en {time.time() - started:.1f}s")
+                except Exception as e:
+                    # Un fallo inesperado no puede parar el bucle (dejaría colgados al resto)
+                    print(f"❌ Error ejecutando trabajos de {job['user_id']}: {e}")
+                    pool.drop(job["user_id"])
+                    response = {"ok": False, "error": str(e), "error_type": type(e).__name__}
+                job["reply"].put(response)
+                pool.evict_idle()
+        except KeyboardInterrupt:
+            print("🛑 Deteniendo broker...")
+        finally:
+            pool.close_all()
+            browser.close()
+            server.shutdown()
+
+
+if __name__ == "__main__":
+    serve()
@@ -0,0 +1,102 @@
+# bulk_ingest.py
+"""
+Ingesta masiva con COPY: las filas se envían en streaming con
+COPY ... FROM STDIN a una tabla temporal de staging y se fusionan con la tabla
+real en un único INSERT ... ON CONFLICT.
+
+Frente a execute_values (un INSERT enorme con cada JSON de eventos/estadísticas
+como literal SQL) el servidor no tiene que parsear ni planificar SQL por fila,
+y las tablas temporales no escriben WAL. Se nota en las cargas grandes:
+calendario de inicio de temporada e historial de fichajes completo.
+
+    stats = copy_upsert(cur, "matches", columns, rows,
+                        conflict=("league_id", "round", "home_team", "away_team"),
+                        update=("home_goals", "away_goals", "is_active = TRUE"))
+    # {"staged": n, "inserted": i, "updated": u}
+
+Las filas deben ser únicas en la clave de conflicto (los llamadores ya
+deduplican). No hace commit: va en la transacción del llamador.
+"""
+from datetime import date, datetime
+
+
+def _copy_value(value) -> str:
+    """Valor en formato texto de COPY (\\N = NULL, escapes de \\, tab y saltos de línea)."""
+    if value is None:
+        return r"\N"
+    if isinstance(value, bool):
+        return "t" if value else "f"
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return (str(value).replace("\\", "\\\\").replace("\t", "\\t")
+            .replace("\n", "\\n").replace("\r", "\\r"))
+
+
+class _CopyStream:
+    """Fichero de solo lectura que genera las líneas de COPY a medida que psycopg2 las pide."""
+
+    def __init__(self, rows):
+        self.count = 0
+        self._lines = self._generate(rows)
+        self._buffer = ""
+
+    def _generate(self, rows):
+        for row in rows:
+            self.count += 1
+            yield "\t".join(_copy_value(v) for v in row) + "\n"
+
+    def read(self, size=-1):
+        while size < 0 or len(self._buffer) < size:
+            try:
+                self._buffer += next(self._lines)
+            except StopIteration:
+                break
+        if size < 0:
+            chunk, self._buffer = self._buffer, ""
+        else:
+            chunk, self._buffer = self._buffer[:size], self._buffer[size:]
+        return chunk
+
+
+def _set_clause(update) -> str:
+    # "col" → col = EXCLUDED.col ; "col = expr" se usa tal cual
+    return ", ".join(u if "=" in u else f"{u} = EXCLUDED.{u}" for u in update)
+
+
+def copy_upsert(cur, table: str, columns, rows, conflict, update=()) -> dict:
+    """
+    COPY de `rows` (tuplas en el orden de `columns`) a staging y fusión con
+    public.<table> en un INSERT ... ON CONFLICT (conflict). Sin `update` → DO NOTHING.
+    Devuelve {"staged", "inserted", "updated"}.
+    """
+    columns = list(columns)
+    cols = ", ".join(columns)
+    stage = f"_stage_{table}"
+
+    # Solo las columnas cargadas, sin constraints ni defaults (no consume secuencias)
+    cur.execute(f"DROP TABLE IF EXISTS {stage};")
+    cur.execute(f"CREATE TEMP TABLE {stage} ON COMMIT DROP AS "
+                f"SELECT {cols} FROM public.{table} WITH NO DATA;")
+    stream = _CopyStream(rows)
+    cur.copy_expert(f"COPY {stage} ({cols}) FROM STDIN", stream)
+    if not stream.count:
+        return {"staged": 0, "inserted": 0, "updated": 0}
+
+    action = f"DO UPDATE SET {_set_clause(update)}" if update else "DO NOTHING"
+    # xmax = 0 → fila nueva; si no, la actualizó el ON CONFLICT
+    cur.execute(f"""
+        WITH merged AS (
+            INSERT INTO public.{table} ({cols})
+            SELECT {cols} FROM {stage}
+            ON CONFLICT ({", ".join(conflict)}) {action}
+            RETURNING (xmax = 0) AS inserted
+        )
+        SELECT COUNT(*) FILTER (WHERE inserted), COUNT(*) FILTER (WHERE NOT inserted) FROM merged;
+    """)
+    inserted, updated = cur.fetchone()
+    return {"staged": stream.count, "inserted": inserted, "updated": updated}
+
+
+def format_ingest_stats(label: str, stats: dict) -> str:
+    return (f"  ✓ {label}: {stats['staged']} filas vía COPY → "
+            f"{stats['inserted']} nuevas, {stats['updated']} actualizadas")
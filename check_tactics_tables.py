@@ -1,23 +1,13 @@
 # check_tactics_tables.py
 """Script de verificación de tablas de tácticas"""
-import os
 from dotenv import load_dotenv
-import psycopg2
-import psycopg2.extras
 
-load_dotenv()
+from db import connect
 
-DB_CONFIG = {
-    "host": os.getenv("DB_HOST"),
-    "port": os.getenv("DB_PORT"),
-    "dbname": os.getenv("DB_NAME"),
-    "user": os.getenv("DB_USER"),
-    "password": os.getenv("DB_PASSWORD")
-}
+load_dotenv()
 
 try:
-    conn = psycopg2.connect(**DB_CONFIG)
-    conn.cursor_factory = psycopg2.extras.DictCursor
+    conn = connect()
     cur = conn.cursor()
     
     # Verificar tablas
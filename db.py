@@ -0,0 +1,255 @@
+# db.py
+"""
+Pool de conexiones a Postgres compartido por todos los puntos de entrada
+(bot, API, scripts de actualización, broker).
+
+Abrir una conexión contra la BD alojada cuesta decenas de ms (TCP + TLS + auth);
+aquí se abren como mucho DB_POOL_MAX y se reutilizan entre llamadas e hilos.
+
+    conn = get_db_connection()       # None si no se pudo conectar tras los reintentos
+    try:
+        with conn.cursor() as cur: ...
+    finally:
+        conn.close()                 # devuelve la conexión al pool (no la cierra)
+
+La conexión entregada se usa igual que la de psycopg2 (DictCursor por defecto).
+Al devolverla se hace rollback de lo que quedara sin commit.
+
+Al sacarla del pool, si llevaba más de DB_POOL_HEALTHCHECK_IDLE_SECONDS sin usarse
+se comprueba con SELECT 1; si falla se descarta y se abre otra.
+"""
+import os
+import threading
+import time
+
+import psycopg2
+import psycopg2.extensions
+import psycopg2.extras
+from dotenv import load_dotenv
+
+load_dotenv()
+
+DB_CONFIG = {
+    "host":     os.getenv("DB_HOST"),
+    "port":     os.getenv("DB_PORT"),
+    "dbname":   os.getenv("DB_NAME"),
+    "user":     os.getenv("DB_USER"),
+    "password": os.getenv("DB_PASSWORD"),
+}
+
+DB_POOL_MIN = int(os.getenv("DB_POOL_MIN", "1"))
+DB_POOL_MAX = int(os.getenv("DB_POOL_MAX", "5"))
+DB_POOL_TIMEOUT_SECONDS = float(os.getenv("DB_POOL_TIMEOUT_SECONDS", "30"))
+DB_POOL_HEALTHCHECK_IDLE_SECONDS = float(os.getenv("DB_POOL_HEALTHCHECK_IDLE_SECONDS", "30"))
+DB_CONNECT_RETRIES = int(os.getenv("DB_CONNECT_RETRIES", "3"))
+DB_CONNECT_RETRY_SECONDS = float(os.getenv("DB_CONNECT_RETRY_SECONDS", "5"))
+
+_CONN_ARGS = {
+    **DB_CONFIG,
+    "keepalives": 1,
+    "keepalives_idle": 30,
+    "keepalives_interval": 10,
+    "keepalives_count": 5,
+}
+
+
+class PoolTimeout(psycopg2.OperationalError):
+    """No quedó ninguna conexión libre en DB_POOL_TIMEOUT_SECONDS."""
+
+
+# ── Pool ─────────────────────────────────────────────────────────────────────
+
+_lock = threading.Condition()
+_idle: list[tuple[object, float]] = []   # (conexión, monotonic de su última devolución)
+_size = 0                                # conexiones abiertas o reservadas (≤ DB_POOL_MAX)
+_stats = {"checkouts": 0, "connects": 0, "discarded": 0, "timeouts": 0,
+          "wait_ms": 0.0, "max_wait_ms": 0.0}
+
+
+def _connect():
+    """Abre una conexión nueva con la política de reintentos."""
+    for attempt in range(DB_CONNECT_RETRIES):
+        try:
+            conn = psycopg2.connect(**_CONN_ARGS)
+            conn.cursor_factory = psycopg2.extras.DictCursor
+            with _lock:
+                _stats["connects"] += 1
+            return conn
+        except psycopg2.OperationalError as e:
+            print(f"⚠️ Error conectando a DB (Intento {attempt+1}/{DB_CONNECT_RETRIES}): {e}")
+            if attempt < DB_CONNECT_RETRIES - 1:
+                time.sleep(DB_CONNECT_RETRY_SECONDS)
+            else:
+                raise
+
+
+def _healthy(conn, idle_since: float) -> bool:
+    if conn.closed:
+        return False
+    if time.monotonic() - idle_since < DB_POOL_HEALTHCHECK_IDLE_SECONDS:
+        return True
+    try:
+        with conn.cursor() as cur:
+            cur.execute("SELECT 1;")
+        conn.rollback()
+        return True
+    except psycopg2.Error:
+        return False
+
+
+def _discard(conn):
+    with _lock:
+        _stats["discarded"] += 1
+    try:
+        conn.close()
+    except Exception:
+        pass
+
+
+def _acquire():
+    global _size
+    start = time.monotonic()
+    deadline = start + DB_POOL_TIMEOUT_SECONDS
+    with _lock:
+        while True:
+            if _idle:
+                conn, idle_since = _idle.pop()
+                break
+            if _size < DB_POOL_MAX:
+                # Se reserva el hueco antes de conectar (fuera del lock)
+                _size += 1
+                conn, idle_since = None, None
+                break
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                _stats["timeouts"] += 1
+                raise PoolTimeout(f"Sin conexiones libres tras {DB_POOL_TIMEOUT_SECONDS:.0f}s "
+                                  f"(DB_POOL_MAX={DB_POOL_MAX})")
+            _lock.wait(remaining)
+
+        waited_ms = (time.monotonic() - start) * 1000
+        _stats["checkouts"] += 1
+        _stats["wait_ms"] += waited_ms
+        _stats["max_wait_ms"] = max(_stats["max_wait_ms"], waited_ms)
+
+    if conn is not None and not _healthy(conn, idle_since):
+        _discard(conn)
+        conn = None
+    if conn is None:
+        try:
+            conn = _connect()
+        except Exception:
+            with _lock:
+                _size -= 1
+                _lock.notify()
+            raise
+    return conn
+
+
+def _release(conn):
+    global _size
+    keep = not conn.closed
+    if keep:
+        try:
+            if conn.info.transaction_status != psycopg2.extensions.TRANSACTION_STATUS_IDLE:
+                conn.rollback()
+            conn.autocommit = False
+        except psycopg2.Error:
+            keep = False
+            _discard(conn)
+    with _lock:
+        if keep:
+            _idle.append((conn, time.monotonic()))
+        else:
+            _size -= 1
+        _lock.notify()
+
+
+class PooledConnection:
+    """Conexión prestada por el pool: misma API que psycopg2; close() la devuelve."""
+
+    def __init__(self, conn):
+        object.__setattr__(self, "_conn", conn)
+
+    def __getattr__(self, name):
+        if name == "_conn":
+            raise AttributeError(name)
+        return getattr(self._conn, name)
+
+    def __setattr__(self, name, value):
+        setattr(self._conn, name, value)
+
+    def __enter__(self):
+        self._conn.__enter__()
+        return self
+
+    def __exit__(self, *exc):
+        return self._conn.__exit__(*exc)
+
+    @property
+    def closed(self):
+        return 1 if self._conn is None else self._conn.closed
+
+    def close(self):
+        conn = self._conn
+        if conn is not None:
+            object.__setattr__(self, "_conn", None)
+            _release(conn)
+
+    def __del__(self):
+        # Red de seguridad para quien olvide close(): no perder el hueco del pool
+        try:
+            self.close()
+        except Exception:
+            pass
+
+
+def connect() -> PooledConnection:
+    """Conexión del pool. Lanza psycopg2.OperationalError si no se puede conectar."""
+    return PooledConnection(_acquire())
+
+
+def get_db_connection():
+    """Conexión del pool o None si no se pudo conectar tras los reintentos."""
+    try:
+        return connect()
+    except psycopg2.OperationalError as e:
+        print(f"❌ Error Fatal: No se pudo conectar a la base de datos: {e}")
+        return None
+
+
+def warm_up():
+    """Abre DB_POOL_MIN conexiones por adelantado (arranque del bot / API)."""
+    conns = [get_db_connection() for _ in range(DB_POOL_MIN)]
+    for conn in conns:
+        if conn:
+            conn.close()
+
+
+def close_pool():
+    """Cierra las conexiones libres (al apagar el proceso)."""
+    global _size
+    with _lock:
+        while _idle:
+            conn, _ = _idle.pop()
+            _size -= 1
+            try:
+                conn.close()
+            except Exception:
+                pass
+
+
+# ── Métricas ─────────────────────────────────────────────────────────────────
+
+def get_pool_stats() -> dict:
+    with _lock:
+        return {**_stats, "open": _size, "idle": len(_idle), "max": DB_POOL_MAX}
+
+
+def format_pool_stats() -> str:
+    stats = get_pool_stats()
+    avg = stats["wait_ms"] / stats["checkouts"] if stats["checkouts"] else 0
+    return (f"🗄️ Pool BD: {stats['checkouts']} préstamos | {stats['connects']} conexiones nuevas "
+            f"| espera media {avg:.1f} ms (máx {stats['max_wait_ms']:.0f} ms) "
+            f"| abiertas {stats['open']}/{stats['max']} ({stats['idle']} libres) "
+            f"| {stats['discarded']} descartadas | {stats['timeouts']} timeouts")
@@ -0,0 +1,212 @@
+# direct_fetch.py
+"""
+Lectura directa de la API JSON de OSM con la sesión del navegador.
+
+Muchas lecturas (timers, clasificación, valores de plantilla…) solo necesitan
+datos, no una página renderizada. Este módulo llama a los endpoints JSON con
+`page.request` (el APIRequestContext del contexto logueado: mismas cookies) más
+el token de la SPA, sin navegar ni esperar a Knockout.
+
+Es opcional (OSM_DIRECT_FETCH=true). Si el endpoint responde != 200, faltan los
+ids del equipo o el JSON no tiene la forma esperada, try_fetch() devuelve None y
+el llamador sigue por el camino del navegador de siempre.
+
+Los endpoints se registran con register_api_endpoint(clave, ruta, normalizador);
+la ruta admite {league_id} y {team_id}. Los normalizadores son los mismos que
+usa response_tap (lanzan SchemaMismatch si la forma no cuadra).
+
+Uso:
+    ids = slot_api_ids(slot)                          # del snapshot de Career
+    standings = try_fetch(page, "standings", **ids)   # None → navegador
+"""
+import os
+import time
+
+from dotenv import load_dotenv
+
+from response_tap import ENDPOINTS as TAP_ENDPOINTS
+from api_schema import SchemaMismatch, pick, name_of, rows_of, require, require_names, run_normalizer
+
+load_dotenv()
+
+DIRECT_FETCH_ENABLED = os.getenv("OSM_DIRECT_FETCH", "false").lower() in ("1", "true", "yes")
+API_BASE_URL = os.getenv("OSM_API_BASE_URL", "https://web-api.onlinesoccermanager.com/api/v1").rstrip("/")
+DIRECT_FETCH_TIMEOUT_MS = int(os.getenv("OSM_DIRECT_FETCH_TIMEOUT_MS", "8000"))
+
+_HEADERS_ATTR = "_osm_api_headers"
+_STATS_ATTR = "_osm_direct_stats"
+
+# La SPA guarda el token OAuth en localStorage; la clave cambia según versión.
+_AUTH_TOKEN_JS = """
+() => {
+    for (const store of [window.localStorage, window.sessionStorage]) {
+        for (let i = 0; i < store.length; i++) {
+            const key = store.key(i);
+            if (!/token/i.test(key)) continue;
+            const raw = store.getItem(key);
+            try {
+                const obj = JSON.parse(raw);
+                const token = obj && (obj.access_token || obj.accessToken || obj.token);
+                if (token) return token;
+            } catch (e) {
+                if (raw && raw.length > 20 && !raw.includes(' ')) return raw;
+            }
+        }
+    }
+    return null;
+}
+"""
+
+
+class DirectFetchUnavailable(Exception):
+    """El endpoint no devolvió datos utilizables (se usa el camino del navegador)."""
+
+
+# ── Registro de endpoints ────────────────────────────────────────────────────
+# clave → ruta relativa a API_BASE_URL + normalizador(data, page).
+
+API_ENDPOINTS: dict[str, dict] = {}
+
+
+def register_api_endpoint(key: str, path: str, normalizer=None):
+    """
+    Añade o sustituye un endpoint de lectura directa.
+    Sin normalizador se reutiliza el de response_tap con la misma clave (si existe).
+    """
+    if normalizer is None:
+        normalizer = TAP_ENDPOINTS[key]["normalize"] if key in TAP_ENDPOINTS else (lambda data, page: data)
+    API_ENDPOINTS[key] = {"path": path, "normalize": normalizer}
+
+
+def _money(value) -> str:
+    """Valor crudo de la API → mismo texto que muestra la web ('12.3M'), para parse_value_string."""
+    try:
+        return f"{float(value) / 1_000_000:.1f}M"
+    except (TypeError, ValueError):
+        return "0"
+
+
+def _normalize_squad_values(data, page) -> list:
+    rows = rows_of(data, "standings", "teams")
+    require(rows, ("squadValue", "teamValue", "value"), ("team", "teamName", "club"),
+             ("playerCount", "players", "numberOfPlayers"))
+    require_names(pick(r, "team", "club") for r in rows)
+    ranked = []
+    for r in rows:
+        team = pick(r, "team", "club")
+        manager = pick(team, "manager") if isinstance(team, dict) else None
+        value = float(pick(r, "squadValue", "teamValue", "value"))
+        players = int(pick(r, "playerCount", "players", "numberOfPlayers"))
+        ranked.append({
+            "Club": name_of(team) if team is not None else pick(r, "teamName", default="N/A"),
+            "Manager": name_of(manager) if manager else pick(r, "managerName", default="N/A"),
+            "Value": _money(value),
+            "Players": players,
+            "AverageValue": _money(pick(r, "averageValue", default=(float(value) / players) if players else 0)),
+            "_raw": value,
+        })
+    # La pestaña 'Squad Value' ordena por valor; la API no siempre trae el ranking
+    ranked.sort(key=lambda x: x["_raw"], reverse=True)
+    for position, row in enumerate(ranked, start=1):
+        row["Position"] = position
+        del row["_raw"]
+    return ranked
+
+
+register_api_endpoint("standings",    "/leagues/{league_id}/standings")
+register_api_endpoint("squad_values", "/leagues/{league_id}/teams", _normalize_squad_values)
+
+
+# ── Petición ─────────────────────────────────────────────────────────────────
+
+def slot_api_ids(slot: dict | None) -> dict:
+    """{league_id, team_id} de un slot del snapshot de Career (vacío si OSM no los expone)."""
+    if not slot or not slot.get("team_id") or not slot.get("league_id"):
+        return {}
+    return {"league_id": slot["league_id"], "team_id": slot["team_id"]}
+
+
+def _auth_headers(page) -> dict:
+    """Cabeceras de la SPA (token Bearer), cacheadas en la página."""
+    headers = getattr(page, _HEADERS_ATTR, None)
+    if headers is not None:
+        return headers
+    headers = {"Accept": "application/json"}
+    try:
+        token = page.evaluate(_AUTH_TOKEN_JS)
+        if token:
+            headers["Authorization"] = f"Bearer {token}"
+    except Exception:
+        pass
+    setattr(page, _HEADERS_ATTR, headers)
+    return headers
+
+
+def _stats(page) -> dict:
+    stats = getattr(page, _STATS_ATTR, None)
+    if stats is None:
+        stats = {"hits": 0, "fallbacks": 0, "ms": 0}
+        setattr(page, _STATS_ATTR, stats)
+    return stats
+
+
+def fetch_endpoint(page, key: str, **ids):
+    """
+    Llama al endpoint `key` con la sesión de la página y devuelve los datos normalizados.
+    Lanza DirectFetchUnavailable si no hay ids, el status no es 200 o el JSON no cuadra.
+    """
+    endpoint = API_ENDPOINTS.get(key)
+    if not endpoint:
+        raise DirectFetchUnavailable(f"endpoint '{key}' no registrado")
+    try:
+        url = API_BASE_URL + endpoint["path"].format(**ids)
+    except KeyError as e:
+        raise DirectFetchUnavailable(f"falta {e} para '{key}'")
+
+    response = page.request.get(url, headers=_auth_headers(page), timeout=DIRECT_FETCH_TIMEOUT_MS,
+                                fail_on_status_code=False)
+    if response.status == 401:
+        # Token caducado: se vuelve a leer en la siguiente llamada
+        setattr(page, _HEADERS_ATTR, None)
+    if response.status != 200:
+        raise DirectFetchUnavailable(f"HTTP {response.status}")
+    try:
+        data = response.json()
+    except ValueError as e:
+        raise DirectFetchUnavailable(f"respuesta no JSON ({e})")
+    try:
+        return run_normalizer(endpoint["normalize"], data, page)
+    except SchemaMismatch as e:
+        raise DirectFetchUnavailable(f"forma inesperada ({e})")
+
+
+def try_fetch(page, key: str, **ids):
+    """
+    fetch_endpoint() que nunca lanza: None si el modo está desactivado o falla
+    (el llamador sigue por el navegador).
+    """
+    if not DIRECT_FETCH_ENABLED:
+        return None
+    stats = _stats(page)
+    start = time.monotonic()
+    try:
+        data = fetch_endpoint(page, key, **ids)
+    except DirectFetchUnavailable as e:
+        stats["fallbacks"] += 1
+        print(f"    ⚠️ API directa '{key}' no disponible: {e}. Usando navegador.")
+        return None
+    except Exception as e:
+        stats["fallbacks"] += 1
+        print(f"    ⚠️ API directa '{key}' falló: {e}. Usando navegador.")
+        return None
+    finally:
+        stats["ms"] += int((time.monotonic() - start) * 1000)
+    stats["hits"] += 1
+    return data
+
+
+def format_direct_stats(page) -> str:
+    stats = getattr(page, _STATS_ATTR, None)
+    if not stats:
+        return "⚡ API directa: sin uso"
+    return f"⚡ API directa: {stats['hits']} lecturas | {stats['fallbacks']} fallbacks | {stats['ms']} ms"
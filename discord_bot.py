@@ -7,8 +7,6 @@ import os
 import sys
 import json
 import asyncio
-import psycopg2
-import psycopg2.extras
 from datetime import datetime, timezone
 from typing import Optional
 
@@ -17,6 +15,11 @@ from discord import app_commands
 from discord.ext import tasks
 from dotenv import load_dotenv
 
+import timer_projection
+from squad_store import load_squad, save_squad_snapshots, invalidate_squads
+from db import connect as _db, warm_up as _warm_up_db
+from migrations import migrate_on_startup
+
 def _utcnow() -> datetime:
     return datetime.now(timezone.utc)
 
@@ -28,14 +31,6 @@ DISCORD_GUILD_ID = os.getenv("DISCORD_GUILD_ID")   # Opcional: sync instantáneo
 DISCORD_OWNER_ID = int(os.getenv("DISCORD_OWNER_ID", "0"))
 OSM_USER_ID      = os.getenv("OSM_USER_ID")
 
-DB_CONFIG = {
-    "host":     os.getenv("DB_HOST"),
-    "port":     os.getenv("DB_PORT"),
-    "dbname":   os.getenv("DB_NAME"),
-    "user":     os.getenv("DB_USER"),
-    "password": os.getenv("DB_PASSWORD"),
-}
-
 DISCORD_ALERT_CHANNEL_ID = int(os.getenv("DISCORD_ALERT_CHANNEL_ID", "0"))
 TIMER_WARNING_MINUTES    = int(os.getenv("TIMER_WARNING_MINUTES", "30"))
 TIMER_CHECK_MINUTES      = int(os.getenv("TIMER_CHECK_MINUTES", "20"))
@@ -46,7 +41,7 @@ EVENT_DELAY_HOURS        = int(os.getenv("EVENT_DELAY_HOURS", "2"))
 OSM_COLOR   = 0x22D3EE   # Cyan del tema OSM
 ERROR_COLOR = 0xFF6B6B
 
-# Caché en memoria para el scrape de timers (evita doble scrape entre /timers y notifs)
+# Último resultado de timers (scrape real o proyectado desde timer_projection)
 _last_scrape_time:   Optional[datetime]   = None
 _last_scrape_result: list[dict]           = []
 
@@ -140,12 +135,7 @@ tree    = app_commands.CommandTree(client)
 
 
 # ── ACCESO A BD (sync, se ejecuta en thread) ─────────────────────────────────
-
-def _db():
-    conn = psycopg2.connect(**DB_CONFIG)
-    conn.cursor_factory = psycopg2.extras.DictCursor
-    return conn
-
+# _db() presta una conexión del pool de db.py; conn.close() la devuelve.
 
 def _get_active_leagues(user_id: str) -> list[dict]:
     conn = _db()
@@ -381,106 +371,69 @@ def _get_osm_credentials(user_id: str) -> tuple[Optional[str], Optional[str]]:
 # ── SCRAPERS EN VIVO (sync → se lanza en thread) ─────────────────────────────
 
 def _scrape_timers_sync(user_id: str) -> list[dict]:
-    from playwright.sync_api import sync_playwright
-    from utils import login_with_session_cache, launch_playwright_browser
-    from scraper_timers import get_timers_all_slots
+    from browser_broker import run_browser_job
 
     username, password = _get_osm_credentials(user_id)
     if not username:
         print("❌ Sin credenciales para scrape de timers.")
         return []
 
-    conn = _db()
     try:
-        with sync_playwright() as p:
-            browser = launch_playwright_browser(p, headless=True)
-            context, page = login_with_session_cache(browser, conn, user_id, username, password)
-            result = get_timers_all_slots(page)
-            context.close()
-            browser.close()
-            return result
+        return run_browser_job(user_id, "timers_all_slots")
     except Exception as e:
         print(f"❌ Error en scrape de timers: {e}")
         return []
-    finally:
-        conn.close()
 
 
 def _scrape_settactics_sync(user_id: str, league_name: str, kwargs: dict) -> dict:
-    from playwright.sync_api import sync_playwright
-    from utils import login_with_session_cache, launch_playwright_browser
-    from action_set_tactics import set_tactics_for_slot
+    from browser_broker import run_browser_job
 
     username, password = _get_osm_credentials(user_id)
     if not username:
         return {"success": False, "changed": [], "errors": ["no_credentials"]}
 
-    conn = _db()
     try:
-        with sync_playwright() as p:
-            browser = launch_playwright_browser(p, headless=True)
-            context, page = login_with_session_cache(browser, conn, user_id, username, password)
-            result = set_tactics_for_slot(page, league_name, **kwargs)
-            context.close()
-            browser.close()
-            return result
+        return run_browser_job(user_id, "set_tactics", league_name=league_name, **kwargs)
     except Exception as e:
         print(f"❌ Error en scrape de tácticas: {e}")
         return {"success": False, "changed": [], "errors": [str(e)]}
-    finally:
-        conn.close()
 
 
 def _scrape_setlineup_sync(user_id: str, league_name: str, formation: str) -> dict:
-    from playwright.sync_api import sync_playwright
-    from utils import login_with_session_cache, launch_playwright_browser
-    from action_set_lineup import set_lineup_for_slot
+    from browser_broker import run_browser_job
 
     username, password = _get_osm_credentials(user_id)
     if not username:
         return {"success": False, "formation": formation, "errors": ["no_credentials"]}
 
-    conn = _db()
     try:
-        with sync_playwright() as p:
-            browser = launch_playwright_browser(p, headless=True)
-            context, page = login_with_session_cache(browser, conn, user_id, username, password)
-            result = set_lineup_for_slot(page, league_name, formation)
-            context.close()
-            browser.close()
-            return result
+        result = run_browser_job(user_id, "set_lineup", league_name=league_name, formation=formation)
+        if result.get("success"):
+            _invalidate_squads(user_id, [league_name], "alineación")
+        return result
     except Exception as e:
         print(f"❌ Error en scrape de lineup: {e}")
         return {"success": False, "formation": formation, "errors": [str(e)]}
-    finally:
-        conn.close()
 
 
 def _scrape_renewtraining_sync(user_id: str, league_name: str) -> dict:
     """Renueva entrenamiento para un solo slot (usado por /renewtraining manual)."""
-    from playwright.sync_api import sync_playwright
-    from utils import login_with_session_cache, launch_playwright_browser
-    from action_set_training import renew_training_for_slot
+    from browser_broker import run_browser_job
 
     username, password = _get_osm_credentials(user_id)
     if not username:
         return {"claimed": [], "started": [], "errors": ["no_credentials"]}
 
-    conn = _db()
     try:
-        with sync_playwright() as p:
-            browser = launch_playwright_browser(p, headless=True)
-            context, page = login_with_session_cache(browser, conn, user_id, username, password)
-            queued = _training_queue.get(league_name) or None
-            result = renew_training_for_slot(page, league_name, queued_players=queued)
-            context.close()
-            browser.close()
-            return result
+        queued = _training_queue.get(league_name) or None
+        result = run_browser_job(user_id, "renew_training", league_name=league_name, queued_players=queued)
+        _invalidate_timers_if_changed([result], "entrenamiento")
+        if _claimed_or_started(result):
+            _invalidate_squads(user_id, [league_name], "entrenamiento")
+        return result
     except Exception as e:
         print(f"❌ Error en scrape de training: {e}")
         return {"claimed": [], "started": [], "errors": [str(e)]}
-    finally:
-        conn.close()
 
 
 def _scrape_renewtraining_batch_sync(user_id: str, renewals: list[tuple[str, str]]) -> dict[str, dict]:
@@ -489,67 +442,54 @@ def _scrape_renewtraining_batch_sync(user_id: str, renewals: list[tuple[str, str
     renewals: lista de (team_name, league_name)
     Devuelve dict { team_name: result_dict }
     """
-    from playwright.sync_api import sync_playwright
-    from utils import login_with_session_cache, launch_playwright_browser
-    from action_set_training import renew_training_for_slot
+    from browser_broker import run_browser_jobs
 
     username, password = _get_osm_credentials(user_id)
     if not username:
         return {team: {"claimed": [], "started": [], "errors": ["no_credentials"]}
                 for team, _ in renewals}
 
-    conn = _db()
+    steps = [("renew_training", {"league_name": league_name,
+                                 "queued_players": _training_queue.get(league_name) or None})
+             for _, league_name in renewals]
     results = {}
     try:
-        with sync_playwright() as p:
-            browser = launch_playwright_browser(p, headless=True)
-            context, page = login_with_session_cache(browser, conn, user_id, username, password)
-            for team, league_name in renewals:
-                print(f"  [batch training] Renovando: {team} ({league_name})")
-                try:
-                    queued = _training_queue.get(league_name) or None
-                    results[team] = renew_training_for_slot(page, league_name, queued_players=queued)
-                except Exception as e:
-                    print(f"  ❌ Error renovando {team}: {e}")
-                    results[team] = {"claimed": [], "started": [], "errors": [str(e)]}
-            context.close()
-            browser.close()
+        for (team, league_name), res in zip(renewals, run_browser_jobs(user_id, steps)):
+            print(f"  [batch training] {team} ({league_name})")
+            if res["ok"]:
+                results[team] = res["result"]
+            else:
+                print(f"  ❌ Error renovando {team}: {res['error']}")
+                results[team] = {"claimed": [], "started": [], "errors": [res["error"]]}
     except Exception as e:
         print(f"❌ Error en batch training: {e}")
         for team, _ in renewals:
             if team not in results:
                 results[team] = {"claimed": [], "started": [], "errors": [str(e)]}
-    finally:
-        conn.close()
+    _invalidate_timers_if_changed(results.values(), "entrenamiento")
+    _invalidate_squads(user_id, [league_name for team, league_name in renewals
+                                 if _claimed_or_started(results.get(team, {}))], "entrenamiento")
     return results
 
 
 def _scrape_upgradestadium_sync(user_id: str, league_name: str,
                                  preferred_parts: list[str] | None = None) -> dict:
     """Upgrade de estadio para un slot (usado por /upgradestadium manual)."""
-    from playwright.sync_api import sync_playwright
-    from utils import login_with_session_cache, launch_playwright_browser
-    from action_set_stadium import upgrade_stadium_for_slot
+    from browser_broker import run_browser_job
 
     username, password = _get_osm_credentials(user_id)
     if not username:
         return {"claimed": [], "started": [], "skipped": [], "errors": ["no_credentials"],
                 "cf": 0.0, "savings": 0.0}
-    conn = _db()
     try:
-        with sync_playwright() as p:
-            browser = launch_playwright_browser(p, headless=True)
-            context, page = login_with_session_cache(browser, conn, user_id, username, password)
-            result = upgrade_stadium_for_slot(page, league_name, preferred_parts)
-            context.close()
-            browser.close()
-            return result
+        result = run_browser_job(user_id, "upgrade_stadium", league_name=league_name,
+                                 preferred_parts=preferred_parts)
+        _invalidate_timers_if_changed([result], "estadio")
+        return result
     except Exception as e:
         print(f"❌ Error en upgrade estadio: {e}")
         return {"claimed": [], "started": [], "skipped": [], "errors": [str(e)],
                 "cf": 0.0, "savings": 0.0}
-    finally:
-        conn.close()
 
 
 def _scrape_upgradestadium_batch_sync(user_id: str,
@@ -558,45 +498,37 @@ def _scrape_upgradestadium_batch_sync(user_id: str,
     Upgrade de estadio para múltiples slots en UNA sola sesión.
     renewals: lista de (team_name, league_name, preferred_parts_or_None)
     """
-    from playwright.sync_api import sync_playwright
-    from utils import login_with_session_cache, launch_playwright_browser
-    from action_set_stadium import upgrade_stadium_for_slot
+    from browser_broker import run_browser_jobs
 
     username, password = _get_osm_credentials(user_id)
     if not username:
         return {t: {"claimed": [], "started": [], "skipped": [], "errors": ["no_credentials"],
                     "cf": 0.0, "savings": 0.0} for t, _, _ in renewals}
-    conn = _db()
+
+    steps = [("upgrade_stadium", {"league_name": league_name, "preferred_parts": preferred})
+             for _, league_name, preferred in renewals]
     results = {}
     try:
-        with sync_playwright() as p:
-            browser = launch_playwright_browser(p, headless=True)
-            context, page = login_with_session_cache(browser, conn, user_id, username, password)
-            for team, league_name, preferred in renewals:
-                print(f"  [batch stadium] {team} ({league_name})")
-                try:
-                    results[team] = upgrade_stadium_for_slot(page, league_name, preferred)
-                except Exception as e:
-                    print(f"  ❌ Error stadium {team}: {e}")
-                    results[team] = {"claimed": [], "started": [], "skipped": [],
-                                     "errors": [str(e)], "cf": 0.0, "savings": 0.0}
-            context.close()
-            browser.close()
+        for (team, league_name, _), res in zip(renewals, run_browser_jobs(user_id, steps)):
+            print(f"  [batch stadium] {team} ({league_name})")
+            if res["ok"]:
+                results[team] = res["result"]
+            else:
+                print(f"  ❌ Error stadium {team}: {res['error']}")
+                results[team] = {"claimed": [], "started": [], "skipped": [],
+                                 "errors": [res["error"]], "cf": 0.0, "savings": 0.0}
     except Exception as e:
         print(f"❌ Error en batch stadium: {e}")
         for team, _, _ in renewals:
             if team not in results:
                 results[team] = {"claimed": [], "started": [], "skipped": [],
                                  "errors": [str(e)], "cf": 0.0, "savings": 0.0}
-    finally:
-        conn.close()
+    _invalidate_timers_if_changed(results.values(), "estadio")
     return results
 
 
 def _scrape_filltransferlist_sync(user_id: str, league_name: str) -> dict:
-    from playwright.sync_api import sync_playwright
-    from utils import login_with_session_cache, launch_playwright_browser
-    from action_set_transferlist import fill_transferlist_for_slot
+    from browser_broker import run_browser_job
 
     username, password = _get_osm_credentials(user_id)
     if not username:
@@ -608,128 +540,134 @@ def _scrape_filltransferlist_sync(user_id: str, league_name: str) -> dict:
         return {"max_slots": 4, "filled_before": 0, "added": [], "skipped": [],
                 "errors": ["no_candidates_configured"]}
 
-    conn = _db()
     try:
-        with sync_playwright() as p:
-            browser = launch_playwright_browser(p, headless=True)
-            context, page = login_with_session_cache(browser, conn, user_id, username, password)
-            result = fill_transferlist_for_slot(page, league_name, candidates)
-            context.close()
-            browser.close()
-            return result
+        result = run_browser_job(user_id, "fill_transferlist", league_name=league_name,
+                                 candidates=candidates)
+        if result.get("added"):
+            _invalidate_squads(user_id, [league_name], "transferibles")
+        return result
     except Exception as e:
         print(f"❌ Error en fill transferlist: {e}")
         return {"max_slots": 4, "filled_before": 0, "added": [], "skipped": [],
                 "errors": [str(e)]}
-    finally:
-        conn.close()
 
 
 def _scrape_filltransferlist_batch_sync(
     user_id: str, renewals: list[tuple[str, str]]
 ) -> dict[str, dict]:
     """Rellena la lista de transferibles de múltiples slots en una sola sesión."""
-    from playwright.sync_api import sync_playwright
-    from utils import login_with_session_cache, launch_playwright_browser
-    from action_set_transferlist import fill_transferlist_for_slot
+    from browser_broker import run_browser_jobs
 
     username, password = _get_osm_credentials(user_id)
     if not username:
         return {team: {"added": [], "errors": ["no_credentials"]} for team, _ in renewals}
 
-    conn = _db()
     results = {}
+    pending = []
+    for team, league_name in renewals:
+        candidates = _get_transfer_candidates(league_name)
+        if not candidates:
+            results[team] = {"added": [], "errors": ["no_candidates"]}
+            continue
+        pending.append((team, ("fill_transferlist", {"league_name": league_name,
+                                                     "candidates": candidates})))
+    if not pending:
+        return results
+
     try:
-        with sync_playwright() as p:
-            browser = launch_playwright_browser(p, headless=True)
-            context, page = login_with_session_cache(browser, conn, user_id, username, password)
-            for team, league_name in renewals:
-                candidates = _get_transfer_candidates(league_name)
-                if not candidates:
-                    results[team] = {"added": [], "errors": ["no_candidates"]}
-                    continue
-                try:
-                    results[team] = fill_transferlist_for_slot(page, league_name, candidates)
-                except Exception as e:
-                    print(f"  ❌ Error fill transfer {team}: {e}")
-                    results[team] = {"added": [], "errors": [str(e)]}
-            context.close()
-            browser.close()
+        batch = run_browser_jobs(user_id, [step for _, step in pending])
+        for (team, _), res in zip(pending, batch):
+            if res["ok"]:
+                results[team] = res["result"]
+            else:
+                print(f"  ❌ Error fill transfer {team}: {res['error']}")
+                results[team] = {"added": [], "errors": [res["error"]]}
     except Exception as e:
         print(f"❌ Error en batch fill transfer: {e}")
         for team, _ in renewals:
             if team not in results:
                 results[team] = {"added": [], "errors": [str(e)]}
-    finally:
-        conn.close()
+    _invalidate_squads(user_id, [league_name for team, league_name in renewals
+                                 if results.get(team, {}).get("added")], "transferibles")
     return results
 
 
 def _scrape_squad_sync(user_id: str, league_name: str) -> dict:
-    from playwright.sync_api import sync_playwright
-    from utils import login_with_session_cache, launch_playwright_browser
-    from scraper_squad import get_squad_for_slot
+    from browser_broker import run_browser_job
 
     username, password = _get_osm_credentials(user_id)
     if not username:
         return {"players": [], "team_name": "", "league_name": league_name,
                 "matchday": None, "error": "no_credentials"}
 
-    conn = _db()
     try:
-        with sync_playwright() as p:
-            browser = launch_playwright_browser(p, headless=True)
-            context, page = login_with_session_cache(browser, conn, user_id, username, password)
-            result = get_squad_for_slot(page, league_name)
-            context.close()
-            browser.close()
-            return result
+        return run_browser_job(user_id, "squad_for_slot", league_name=league_name)
     except Exception as e:
         print(f"❌ Error en scrape de plantilla: {e}")
         return {"players": [], "team_name": "", "league_name": league_name,
                 "matchday": None, "error": str(e)}
-    finally:
-        conn.close()
+
+
+def _get_squad_sync(user_id: str, league_name: str, league_id: Optional[int] = None,
+                    max_age_minutes: Optional[int] = None) -> dict:
+    """
+    Plantilla de la liga: desde squad_snapshots si se leyó hace menos de
+    SQUAD_CACHE_TTL_MINUTES (o max_age_minutes); si no, scrape en vivo que se
+    guarda para las siguientes consultas. Sin league_id siempre es en vivo.
+    """
+    if league_id:
+        try:
+            conn = _db()
+            try:
+                cached = load_squad(conn, user_id, league_id, max_age_minutes)
+            finally:
+                conn.close()
+            if cached:
+                cached["league_name"] = league_name
+                return cached
+        except Exception as e:
+            print(f"⚠️ No se pudo leer la plantilla guardada: {e}")
+
+    slot_data = _scrape_squad_sync(user_id, league_name)
+    if league_id and slot_data.get("players"):
+        try:
+            conn = _db()
+            try:
+                save_squad_snapshots(conn, user_id, [{**slot_data, "league_id": league_id}])
+            finally:
+                conn.close()
+        except Exception as e:
+            print(f"⚠️ No se pudo guardar la plantilla: {e}")
+    return slot_data
 
 
 def _scrape_spy_sync(user_id: str, league_name: str) -> dict:
     """Activa el slot y ejecuta spy_for_slot (inicia spy o lee resultados)."""
-    from playwright.sync_api import sync_playwright
-    from utils import login_with_session_cache, launch_playwright_browser
-    from scraper_data_analyst import spy_for_slot
+    from browser_broker import run_browser_job
 
     username, password = _get_osm_credentials(user_id)
     if not username:
         return {"action": "error", "team_name": None, "error": "no_credentials"}
 
-    conn = _db()
     try:
-        with sync_playwright() as p:
-            browser = launch_playwright_browser(p, headless=True)
-            context, page = login_with_session_cache(browser, conn, user_id, username, password)
-            result = spy_for_slot(page, league_name)
-            context.close()
-            browser.close()
-            return result
+        result = run_browser_job(user_id, "spy_for_slot", league_name=league_name)
+        if result.get("action") in ("started", "results"):
+            timer_projection.invalidate("analista de datos")
+        return result
     except Exception as e:
         print(f"❌ Error en spy: {e}")
         return {"action": "error", "team_name": None, "error": str(e)}
-    finally:
-        conn.close()
 
 
 def _run_agent_transfer_sync(
     user_id: str, league_name: str, league_id: int
 ) -> dict:
     """
-    Scrapa la plantilla actual, consulta el historial de ventas en BD y ejecuta
+    Lee la plantilla (BD o scrape), consulta el historial de ventas en BD y ejecuta
     el agente LLM para decidir qué jugadores poner como candidatos de venta.
     Actualiza _transfer_queue y lo persiste en transfer_queue.json.
     Returns: { candidates, reasoning, error? }
     """
-    from playwright.sync_api import sync_playwright
-    from utils import login_with_session_cache, launch_playwright_browser
-    from scraper_squad import get_squad_for_slot
     from agent_transfer import analyze_squad_for_transfers
 
     username, password = _get_osm_credentials(user_id)
@@ -740,25 +678,12 @@ def _run_agent_transfer_sync(
     recent_sales = _get_recent_sales(league_id)
     current_candidates = _get_transfer_candidates(league_name)
 
-    # Scraping de plantilla actual
-    conn = _db()
-    squad = []
+    # Plantilla actual (guardada si es reciente, si no en vivo)
     try:
-        with sync_playwright() as p:
-            browser = launch_playwright_browser(p, headless=True)
-            context, page = login_with_session_cache(browser, conn, user_id, username, password)
-            slot_data = get_squad_for_slot(page, league_name)
-            squad = slot_data.get("players", [])
-            context.close()
-            browser.close()
+        slot_data = _get_squad_sync(user_id, league_name, league_id)
+        squad = slot_data.get("players", [])
     except Exception as e:
-        conn.close()
         return {"candidates": [], "reasoning": "", "error": f"scrape_failed:{e}"}
-    finally:
-        try:
-            conn.close()
-        except Exception:
-            pass
 
     if not squad:
         return {"candidates": [], "reasoning": "", "error": "empty_squad"}
@@ -790,9 +715,6 @@ def _run_agent_tactics_sync(
     Obtiene datos de la BD y del scraper para ejecutar el agente táctico.
     Returns: { formation, game_plan, ... , reasoning, error? }
     """
-    from playwright.sync_api import sync_playwright
-    from utils import login_with_session_cache, launch_playwright_browser
-    from scraper_squad import get_squad_for_slot
     from agent_tactics import analyze_tactics
 
     username, password = _get_osm_credentials(user_id)
@@ -802,27 +724,11 @@ def _run_agent_tactics_sync(
     standings       = _get_standings_for_league(league_id)
     current_tactics = _get_latest_tactics(league_id) or {}
 
-    conn = _db()
-    squad = []
     try:
-        with sync_playwright() as p:
-            browser = launch_playwright_browser(p, headless=True)
-            context, page = login_with_session_cache(browser, conn, user_id, username, password)
-            slot_data = get_squad_for_slot(page, league_name)
-            squad = slot_data.get("players", [])
-            context.close()
-            browser.close()
+        slot_data = _get_squad_sync(user_id, league_name, league_id)
+        squad = slot_data.get("players", [])
     except Exception as e:
-        try:
-            conn.close()
-        except Exception:
-            pass
         return {"error": f"scrape_failed:{e}", "reasoning": ""}
-    finally:
-        try:
-            conn.close()
-        except Exception:
-            pass
 
     if not squad:
         return {"error": "empty_squad", "reasoning": ""}
@@ -839,17 +745,57 @@ def _run_agent_tactics_sync(
         return {"error": f"llm_failed:{e}", "reasoning": ""}
 
 
-async def _get_timers_cached() -> list[dict]:
-    """Devuelve los timers scrapeados, reutilizando resultado si tiene menos de TIMER_CHECK_MINUTES."""
+def _claimed_or_started(result: dict) -> bool:
+    return bool(result.get("claimed") or result.get("started"))
+
+
+def _invalidate_timers_if_changed(results, reason: str):
+    """Tras renovar/ampliar, la proyección de timers ya no refleja OSM."""
+    if any(_claimed_or_started(r) for r in results):
+        timer_projection.invalidate(reason)
+
+
+def _invalidate_squads(user_id: str, league_names: list[str], reason: str):
+    """Tras una acción que cambia la plantilla, la guardada en squad_rosters ya no vale."""
+    if not league_names:
+        return
+    try:
+        conn = _db()
+        try:
+            count = invalidate_squads(conn, user_id, league_names)
+        finally:
+            conn.close()
+        print(f"🔄 Plantilla guardada invalidada ({reason}): {count} liga(s).")
+    except Exception as e:
+        print(f"⚠️ No se pudo invalidar la plantilla guardada: {e}")
+
+
+def _remember_timers(slots: list[dict]):
+    """Guarda un scrape real de timers en la caché y en la proyección."""
     global _last_scrape_time, _last_scrape_result
-    now = _utcnow()
-    max_age = TIMER_CHECK_MINUTES * 60 * 0.9
-    if _last_scrape_time and (now - _last_scrape_time).total_seconds() < max_age:
-        return _last_scrape_result
-    result = await asyncio.to_thread(_scrape_timers_sync, OSM_USER_ID)
-    _last_scrape_time   = now
-    _last_scrape_result = result
-    return result
+    if not slots:
+        return
+    _last_scrape_time   = _utcnow()
+    _last_scrape_result = slots
+    timer_projection.record(slots)
+
+
+async def _get_timers_cached() -> list[dict]:
+    """
+    Devuelve los timers proyectados desde el último scrape (timer_projection).
+    Solo abre el navegador cuando no hay proyección, está caducada o un timer
+    expira antes de la siguiente vuelta del loop.
+    """
+    global _last_scrape_result
+    due, reason = timer_projection.needs_scrape(TIMER_CHECK_MINUTES * 60)
+    if due:
+        print(f"  [timers] scrape real ({reason})")
+        _remember_timers(await asyncio.to_thread(_scrape_timers_sync, OSM_USER_ID))
+    # Si el scrape falló se sigue con la última proyección disponible
+    projected = timer_projection.project()
+    if projected:
+        _last_scrape_result = projected
+    return projected
 
 
 # ── HELPERS DE FORMATO ────────────────────────────────────────────────────────
@@ -1289,9 +1235,11 @@ def embed_squad(slot: dict) -> discord.Embed:
         cur, tot = matchday["current"], matchday["total"]
         md_str = f"  ·  📅 Jornada **{cur}/{tot}**" + (" ✅" if matchday["finished"] else "")
 
+    cached_str = f" · 💾 guardada {_time_ago(slot['scraped_at'])}" if slot.get("from_cache") else ""
+
     embed = discord.Embed(
         title=f"👕  Plantilla — {team}",
-        description=f"Liga: **{league}**{md_str} · {len(players)} jugadores",
+        description=f"Liga: **{league}**{md_str} · {len(players)} jugadores{cached_str}",
         color=OSM_COLOR,
         timestamp=_utcnow(),
     )
@@ -1675,6 +1623,7 @@ class PanelView(discord.ui.View):
         await interaction.response.defer(thinking=True)
         try:
             slots = await asyncio.to_thread(_scrape_timers_sync, OSM_USER_ID)
+            _remember_timers(slots)
             if not slots:
                 await interaction.followup.send("No se pudieron obtener timers. Revisa los logs.", ephemeral=True)
                 return
@@ -2138,6 +2087,7 @@ async def cmd_timers(interaction: discord.Interaction):
     await interaction.response.defer(thinking=True)
     try:
         slots = await asyncio.to_thread(_scrape_timers_sync, OSM_USER_ID)
+        _remember_timers(slots)
         if not slots:
             await interaction.followup.send("No se pudieron obtener timers. Revisa los logs del servidor.")
             return
@@ -2690,7 +2640,8 @@ async def cmd_settransferqueue(interaction: discord.Interaction, slot: str = "0"
             await interaction.followup.send("Equipo no encontrado.")
             return
         league_name = leagues[idx]["league_name"]
-        slot_data   = await asyncio.to_thread(_scrape_squad_sync, OSM_USER_ID, league_name)
+        slot_data   = await asyncio.to_thread(_get_squad_sync, OSM_USER_ID, league_name,
+                                          leagues[idx]["league_id"])
         players     = slot_data.get("players", [])
         team_name   = slot_data.get("team_name", league_name)
 
@@ -2877,7 +2828,8 @@ async def cmd_queuetraining(interaction: discord.Interaction, slot: str = "0"):
             await interaction.followup.send("Equipo no encontrado. Usa el autocompletado para seleccionarlo.")
             return
         league_name = leagues[idx]["league_name"]
-        slot_data   = await asyncio.to_thread(_scrape_squad_sync, OSM_USER_ID, league_name)
+        slot_data   = await asyncio.to_thread(_get_squad_sync, OSM_USER_ID, league_name,
+                                          leagues[idx]["league_id"])
         players     = slot_data.get("players", [])
         team_name   = slot_data.get("team_name", league_name)
 
@@ -2908,10 +2860,10 @@ async def cmd_queuetraining(interaction: discord.Interaction, slot: str = "0"):
         await interaction.followup.send(f"❌ Error: {e}")
 
 
-@tree.command(name="squad", description="Lee la plantilla completa de un equipo en tiempo real (~30s)")
-@app_commands.describe(slot="Selecciona tu equipo")
+@tree.command(name="squad", description="Muestra la plantilla completa de un equipo (guardada o en vivo ~30s)")
+@app_commands.describe(slot="Selecciona tu equipo", en_vivo="Ignora la plantilla guardada y la lee de OSM")
 @app_commands.autocomplete(slot=_slot_autocomplete)
-async def cmd_squad(interaction: discord.Interaction, slot: str = "0"):
+async def cmd_squad(interaction: discord.Interaction, slot: str = "0", en_vivo: bool = False):
     if not _is_owner(interaction):
         await interaction.response.send_message("No autorizado.", ephemeral=True)
         return
@@ -2924,7 +2876,8 @@ async def cmd_squad(interaction: discord.Interaction, slot: str = "0"):
             await interaction.followup.send("Equipo no encontrado. Usa el autocompletado para seleccionarlo.")
             return
         league_name = leagues[idx]["league_name"]
-        slot_data = await asyncio.to_thread(_scrape_squad_sync, OSM_USER_ID, league_name)
+        slot_data = await asyncio.to_thread(_get_squad_sync, OSM_USER_ID, league_name,
+                                            leagues[idx]["league_id"], 0 if en_vivo else None)
         if slot_data.get("error") and not slot_data.get("players"):
             await interaction.followup.send(f"❌ Error al leer plantilla: `{slot_data['error']}`")
             return
@@ -2939,6 +2892,12 @@ async def cmd_squad(interaction: discord.Interaction, slot: str = "0"):
 async def on_ready():
     _load_training_queue()
     _load_transfer_queue()
+    timer_projection.load()
+    await asyncio.to_thread(_warm_up_db)
+    try:
+        await asyncio.to_thread(migrate_on_startup)
+    except Exception as e:
+        print(f"⚠️ No se pudieron aplicar las migraciones de BD: {e}")
     print(f"✅ Bot conectado como {client.user} (ID: {client.user.id})")
 
     if DISCORD_GUILD_ID:
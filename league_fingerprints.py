@@ -0,0 +1,81 @@
+# league_fingerprints.py
+"""
+Índice de huellas de managers para reconocer a qué instancia de liga
+pertenece una clasificación scrapeada.
+
+Una liga popular ("Spain", "England"…) puede tener cientos de instancias con el
+mismo nombre. En lugar de comparar los managers contra todas ellas en Python,
+league_manager_fingerprints guarda los pares (league_id, equipo, manager) y el
+índice por (equipo, manager) devuelve directamente las instancias que comparten
+algún par: el coste depende del número de equipos, no del de instancias.
+
+La mantiene sync_league_details (run_update_for_user.py) con cada clasificación
+leída; la tabla la crea y rellena la migración 0008.
+"""
+import psycopg2.extras
+
+# Fracción mínima de managers guardados que deben coincidir para considerar
+# que la clasificación es del mismo room.
+MIN_MATCH_RATIO = 0.50
+
+
+def _clean(managers_by_team: dict) -> dict:
+    return {team: mgr for team, mgr in (managers_by_team or {}).items() if team and mgr and mgr != "N/A"}
+
+
+def save_fingerprints(cur, managers_by_league: dict):
+    """
+    Reemplaza la huella de cada liga: {league_id: {equipo: manager}}.
+    Sin commit (va en la transacción del llamador).
+    """
+    if not managers_by_league:
+        return
+    cur.execute("DELETE FROM league_manager_fingerprints WHERE league_id = ANY(%s);",
+                (list(managers_by_league),))
+    rows = [(league_id, team, mgr)
+            for league_id, mgrs in managers_by_league.items()
+            for team, mgr in _clean(mgrs).items()]
+    if rows:
+        psycopg2.extras.execute_values(cur, """
+            INSERT INTO league_manager_fingerprints (league_id, team_name, manager_name)
+            VALUES %s;
+        """, rows)
+
+
+def match_league(conn, dashboard_name: str, current_managers_dict: dict, excluded_ids=None):
+    """
+    Instancia activa de `dashboard_name` que mejor coincide con los managers
+    actuales, en una consulta sobre el índice (equipo, manager).
+    ratio = managers coincidentes / managers guardados de la liga.
+    Devuelve (league_id, ratio, teams) o None si ninguna supera MIN_MATCH_RATIO.
+    Las ligas sin managers guardados nunca coinciden (no se distinguen rooms).
+    """
+    current = _clean(current_managers_dict)
+    if not current:
+        return None
+    with conn.cursor() as cur:
+        cur.execute("""
+            SELECT m.league_id, l.teams, m.matches::float8 / m.total AS ratio
+            FROM (
+                SELECT f.league_id, COUNT(*) AS matches,
+                       (SELECT COUNT(*) FROM league_manager_fingerprints a
+                        WHERE a.league_id = f.league_id) AS total
+                FROM unnest(%s::text[], %s::text[]) AS s(team_name, manager_name)
+                JOIN league_manager_fingerprints f
+                  ON f.team_name = s.team_name AND f.manager_name = s.manager_name
+                WHERE NOT (f.league_id = ANY(%s))
+                GROUP BY f.league_id
+            ) m
+            JOIN leagues l ON l.id = m.league_id
+            WHERE l.name = %s
+              AND m.matches::float8 / m.total > %s
+              AND EXISTS (SELECT 1 FROM user_leagues ul
+                          WHERE ul.league_id = m.league_id AND ul.is_active = TRUE)
+            ORDER BY ratio DESC, m.league_id
+            LIMIT 1;
+        """, (list(current), list(current.values()), list(excluded_ids or []),
+              dashboard_name, MIN_MATCH_RATIO))
+        row = cur.fetchone()
+    if not row:
+        return None
+    return row['league_id'], row['ratio'], row['teams']
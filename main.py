@@ -1,17 +1,21 @@
 # main.py
+import asyncio
+import base64
 import datetime
 import json
 import os
-import psycopg2
-import psycopg2.extras
-from fastapi import FastAPI, HTTPException, Security, status
+from contextlib import asynccontextmanager
+
+import asyncpg
+from fastapi import FastAPI, HTTPException, Query, Response, Security, status
 from fastapi.security import APIKeyHeader
 from fastapi.middleware.cors import CORSMiddleware 
 
-from scraper_leagues import get_data_from_website
-from scraper_transfers import get_transfers_data
-from scraper_values import get_squad_values_data
-from scraper_table import get_standings_data
+from browser_broker import run_browser_job
+import api_db
+from api_db import DatabaseUnavailable
+from db import get_pool_stats
+from migrations import migrate_on_startup
 from dotenv import load_dotenv
 
 # --- NUEVO: Importar Pydantic ---
@@ -21,12 +25,27 @@ from typing import List, Optional
 
 # --- CONFIGURACIÓN ---
 load_dotenv()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    try:
+        await asyncio.to_thread(migrate_on_startup)
+    except Exception as e:
+        print(f"⚠️ No se pudieron aplicar las migraciones de BD: {e}")
+    yield
+    await api_db.close_pool()
+
+
 app = FastAPI(
     title="OSM Analysis API",
     description="API para servir datos de OSM y ejecutar scrapers.",
-    version="3.0.0"
+    version="3.0.0",
+    lifespan=lifespan,
 )
 API_KEY = os.getenv("API_KEY")
+# Usuario OSM cuya sesión usan los endpoints /refresh-* (vía broker de navegador)
+OSM_USER_ID = os.getenv("OSM_USER_ID")
 api_key_header = APIKeyHeader(name="X-API-Key", auto_error=False)
 
 # --- NUEVO: Configuración de CORS ---
@@ -47,17 +66,10 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
 
-# --- NUEVO: Conexión a la base de datos ---
-DB_CONFIG = {
-    "host": os.getenv("DB_HOST"), "port": os.getenv("DB_PORT"),
-    "dbname": os.getenv("DB_NAME"), "user": os.getenv("DB_USER"),
-    "password": os.getenv("DB_PASSWORD")
-}
-
-
 class CamelModel(BaseModel):
     """Un modelo base que convierte snake_case a camelCase automáticamente."""
     class Config:
@@ -90,15 +102,24 @@ class Transfer(CamelModel):
     class Config:
         from_attributes = True
 
-def get_db_connection():
-    """Establece y devuelve una conexión a la base de datos."""
+def _encode_transfer_cursor(transfer: Transfer) -> str:
+    """Cursor opaco con la clave de orden (created_at, id) de la última fila devuelta."""
+    raw = json.dumps([transfer.created_at.isoformat(), transfer.id])
+    return base64.urlsafe_b64encode(raw.encode()).decode()
+
+
+def _decode_transfer_cursor(cursor: str) -> tuple:
     try:
-        conn = psycopg2.connect(**DB_CONFIG)
-        # Usar un cursor de diccionario para obtener resultados como objetos {columna: valor}
-        conn.cursor_factory = psycopg2.extras.DictCursor
-        return conn
-    except psycopg2.OperationalError as e:
-        raise HTTPException(status_code=500, detail=f"Error de conexión con la base de datos: {e}")
+        created_at, transfer_id = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+        return datetime.datetime.fromisoformat(created_at), int(transfer_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Cursor inválido")
+
+
+def _db_error(e: Exception) -> HTTPException:
+    if isinstance(e, DatabaseUnavailable):
+        return HTTPException(status_code=500, detail=f"Error de conexión con la base de datos: {e}")
+    return HTTPException(status_code=500, detail=str(e))
     
 
 # --- LÓGICA DE SEGURIDAD (sin cambios) ---
@@ -113,49 +134,62 @@ async def get_api_key(api_key_header: str = Security(api_key_header)):
         
 
 # --- ENDPOINTS DE LECTURA (MODIFICADOS) --- 
+# Lecturas async sobre el pool de asyncpg (api_db.py): no ocupan hilos del threadpool.
 @app.get("/api/leagues", response_model=List[League], response_model_by_alias=True)
-def get_all_leagues():
-    conn = get_db_connection()
+async def get_all_leagues():
     try:
-        with conn.cursor() as cur:
-            cur.execute("SELECT id, name, type FROM leagues ORDER BY name ASC;")
-            leagues_data = cur.fetchall()
-            # CORRECCIÓN: Reintroducir la conversión explícita a dict
-            return [dict(row) for row in leagues_data]
-    finally:
-        conn.close()
+        return await api_db.fetch_leagues(League)
+    except (DatabaseUnavailable, asyncpg.PostgresError) as e:
+        raise _db_error(e)
 
 
 @app.get("/api/leagues/{league_id}", response_model=LeagueDetails, response_model_by_alias=True)
-def get_league_data(league_id: int):
-    conn = get_db_connection()
+async def get_league_data(league_id: int):
     try:
-        with conn.cursor() as cur:
-            cur.execute("SELECT id, name, type, teams, managers_by_team, standings FROM leagues WHERE id = %s;", (league_id,))
-            league_data = cur.fetchone()
-            if not league_data:
-                raise HTTPException(status_code=404, detail="Liga no encontrada")
-            # CORRECCIÓN: Reintroducir la conversión explícita a dict
-            return dict(league_data)
-    finally:
-        conn.close()
+        league = await api_db.fetch_league(LeagueDetails, league_id)
+    except (DatabaseUnavailable, asyncpg.PostgresError) as e:
+        raise _db_error(e)
+    if league is None:
+        raise HTTPException(status_code=404, detail="Liga no encontrada")
+    return league
 
 @app.get("/api/leagues/{league_id}/transfers", response_model=List[Transfer], response_model_by_alias=True)
-def get_league_transfers(league_id: int):
-    conn = get_db_connection()
+async def get_league_transfers(
+    league_id: int,
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=1000),
+    cursor: Optional[str] = None,
+    manager: Optional[str] = None,
+    transaction_type: Optional[str] = Query(None, alias="transactionType"),
+    round_from: Optional[int] = Query(None, alias="roundFrom"),
+    round_to: Optional[int] = Query(None, alias="roundTo"),
+    position: Optional[str] = None,
+    since: Optional[datetime.datetime] = None,
+):
+    """
+    Fichajes de la liga ordenados por (createdAt, id).
+    Sin `limit` devuelve todos (comportamiento anterior). Con `limit`, si quedan más
+    filas la cabecera X-Next-Cursor trae el `cursor` para pedir la página siguiente.
+    `since` devuelve solo los fichajes posteriores a esa fecha (carga incremental).
+    """
+    after = _decode_transfer_cursor(cursor) if cursor else None
+    if since is not None and since.tzinfo is not None:
+        # created_at se guarda en hora local sin zona
+        since = since.astimezone().replace(tzinfo=None)
     try:
-        with conn.cursor() as cur:
-            cur.execute("""
-                SELECT id, player_name, manager_name, transaction_type, position, round, base_value, final_price, created_at 
-                FROM transfers 
-                WHERE league_id = %s 
-                ORDER BY created_at ASC;
-            """, (league_id,))
-            transfers_data = cur.fetchall()
-            # CORRECCIÓN: Reintroducir la conversión explícita a dict
-            return [dict(row) for row in transfers_data]
-    finally:
-        conn.close()
+        transfers = await api_db.fetch_transfers(
+            Transfer, league_id, after=after,
+            # Una fila de más para saber si hay página siguiente
+            limit=limit + 1 if limit else None,
+            manager_name=manager, transaction_type=transaction_type, position=position,
+            round_from=round_from, round_to=round_to, since=since,
+        )
+    except (DatabaseUnavailable, asyncpg.PostgresError) as e:
+        raise _db_error(e)
+    if limit and len(transfers) > limit:
+        transfers = transfers[:limit]
+        response.headers["X-Next-Cursor"] = _encode_transfer_cursor(transfers[-1])
+    return transfers
 
 
 
@@ -165,6 +199,11 @@ def get_league_transfers(league_id: int):
 def read_root():
     return {"mensaje": "Bienvenido a tu API privada. Usa /data o /refresh-data."}
 
+@app.get("/api/db-pool", dependencies=[Security(get_api_key)])
+def get_db_pool_stats():
+    """Métricas de los pools de conexiones (préstamos, espera media/máxima, conexiones abiertas)."""
+    return {"sync": get_pool_stats(), "async": api_db.get_pool_stats()}
+
 @app.get("/data", dependencies=[Security(get_api_key)])
 def get_data():
     if not cache or cache["data"] is None:
@@ -178,7 +217,7 @@ def get_data():
 def refresh_data():
     print("Solicitud recibida en /refresh-data. Iniciando scraper...")
     try:
-        scraped_data = get_data_from_website()
+        scraped_data = run_browser_job(OSM_USER_ID, "leagues")
         
         if "error" in scraped_data:
              raise HTTPException(status_code=500, detail=scraped_data["error"])
@@ -204,7 +243,7 @@ def refresh_transfers_data():
     """
     print("Solicitud recibida en /refresh-fichajes. Iniciando scraper...")
     try:
-        scraped_data = get_transfers_data()
+        scraped_data = run_browser_job(OSM_USER_ID, "transfers")
 
         if "error" in scraped_data:
              raise HTTPException(status_code=500, detail=scraped_data["error"])
@@ -228,7 +267,7 @@ def refresh_squad_values_data():
     """
     print("Solicitud recibida en /refresh-squad-values. Iniciando scraper...")
     try:
-        scraped_data = get_squad_values_data()
+        scraped_data = run_browser_job(OSM_USER_ID, "squad_values")
         if "error" in scraped_data:
              raise HTTPException(status_code=500, detail=scraped_data["error"])
 
@@ -250,7 +289,7 @@ def refresh_standings_league():
     """
     print("Solicitud recibida en /refresh-squad-values. Iniciando scraper...")
     try:
-        scraped_data = get_standings_data()
+        scraped_data = run_browser_job(OSM_USER_ID, "standings")
         if "error" in scraped_data:
              raise HTTPException(status_code=500, detail=scraped_data["error"])
 
@@ -285,42 +324,16 @@ class MatchTacticsResponse(CamelModel):
 
 
 @app.get("/api/leagues/{league_id}/tactics", response_model=List[MatchTacticsResponse], response_model_by_alias=True)
-def get_league_tactics(league_id: int, round: Optional[int] = None):
+async def get_league_tactics(league_id: int, round: Optional[int] = None):
     """
     Obtiene las tácticas registradas para una liga.
     Opcionalmente filtra por jornada.
     """
-    conn = get_db_connection()
     try:
-        with conn.cursor() as cur:
-            if round:
-                cur.execute("""
-                    SELECT id, league_id, round, team_name, game_plan, tackling, 
-                           pressure, mentality, tempo, forwards_tactic, midfielders_tactic, 
-                           defenders_tactic, offside_trap, marking, scraped_at
-                    FROM match_tactics 
-                    WHERE league_id = %s AND round = %s
-                    ORDER BY team_name;
-                """, (league_id, round))
-            else:
-                cur.execute("""
-                    SELECT id, league_id, round, team_name, game_plan, tackling, 
-                           pressure, mentality, tempo, forwards_tactic, midfielders_tactic, 
-                           defenders_tactic, offside_trap, marking, scraped_at
-                    FROM match_tactics 
-                    WHERE league_id = %s
-                    ORDER BY round DESC, team_name;
-                """, (league_id,))
-            
-            tactics_data = cur.fetchall()
-            return [dict(row) for row in tactics_data]
-    except psycopg2.Error as e:
-        # La tabla puede no existir todavía
-        if "does not exist" in str(e):
-            return []
-        raise HTTPException(status_code=500, detail=str(e))
-    finally:
-        conn.close()
+        # La tabla puede no existir todavía (devuelve [])
+        return await api_db.fetch_tactics(MatchTacticsResponse, league_id, round)
+    except (DatabaseUnavailable, asyncpg.PostgresError) as e:
+        raise _db_error(e)
 
 
 class ScheduledTaskResponse(CamelModel):
@@ -335,40 +348,15 @@ class ScheduledTaskResponse(CamelModel):
 
 
 @app.get("/api/scheduled-tasks", response_model=List[ScheduledTaskResponse], response_model_by_alias=True)
-def get_scheduled_tasks(status: Optional[str] = "pending", task_type: Optional[str] = None):
+async def get_scheduled_tasks(status: Optional[str] = "pending", task_type: Optional[str] = None):
     """
     Obtiene las tareas programadas.
     Filtra por status (pending, completed, failed) y/o tipo de tarea.
     """
-    conn = get_db_connection()
     try:
-        with conn.cursor() as cur:
-            query = """
-                SELECT id, user_id::text, task_type, scheduled_at, status, metadata, created_at, executed_at
-                FROM scheduled_scrape_tasks
-                WHERE 1=1
-            """
-            params = []
-            
-            if status:
-                query += " AND status = %s"
-                params.append(status)
-            
-            if task_type:
-                query += " AND task_type = %s"
-                params.append(task_type)
-            
-            query += " ORDER BY scheduled_at DESC LIMIT 100;"
-            
-            cur.execute(query, params)
-            tasks = cur.fetchall()
-            return [dict(row) for row in tasks]
-    except psycopg2.Error as e:
-        if "does not exist" in str(e):
-            return []
-        raise HTTPException(status_code=500, detail=str(e))
-    finally:
-        conn.close()
+        return await api_db.fetch_scheduled_tasks(ScheduledTaskResponse, status or None, task_type or None)
+    except (DatabaseUnavailable, asyncpg.PostgresError) as e:
+        raise _db_error(e)
 
 
 @app.post("/run-scheduled-tactics", dependencies=[Security(get_api_key)])
@@ -386,40 +374,25 @@ def trigger_scheduled_tactics():
 
 
 @app.get("/api/next-matches/{user_id}")
-def get_user_next_matches(user_id: str, api_key: str = Security(get_api_key)):
+async def get_user_next_matches(user_id: str, api_key: str = Security(get_api_key)):
     """
     Obtiene información de los próximos partidos programados para un usuario.
     Incluye la información del countdown y cuándo se ejecutará el scraping de tácticas.
     """
-    conn = get_db_connection()
     try:
-        with conn.cursor() as cur:
-            cur.execute("""
-                SELECT id, task_type, scheduled_at, status, metadata, created_at
-                FROM scheduled_scrape_tasks
-                WHERE user_id = %s 
-                  AND task_type = 'tactics_scrape' 
-                  AND status = 'pending'
-                ORDER BY scheduled_at;
-            """, (user_id,))
-            
-            tasks = cur.fetchall()
-            return {
-                "user_id": user_id,
-                "pending_tactics_scrapes": [
-                    {
-                        "id": row['id'],
-                        "scheduled_at": row['scheduled_at'].isoformat() if row['scheduled_at'] else None,
-                        "metadata": row['metadata'],
-                        "created_at": row['created_at'].isoformat() if row['created_at'] else None
-                    }
-                    for row in tasks
-                ]
+        tasks = await api_db.fetch_pending_tactics_scrapes(user_id)
+    except (DatabaseUnavailable, asyncpg.PostgresError) as e:
+        raise _db_error(e)
+    return {
+        "user_id": user_id,
+        "pending_tactics_scrapes": [
+            {
+                "id": row['id'],
+                "scheduled_at": row['scheduled_at'].isoformat() if row['scheduled_at'] else None,
+                "metadata": row['metadata'],
+                "created_at": row['created_at'].isoformat() if row['created_at'] else None
             }
-    except psycopg2.Error as e:
-        if "does not exist" in str(e):
-            return {"user_id": user_id, "pending_tactics_scrapes": []}
-        raise HTTPException(status_code=500, detail=str(e))
-    finally:
-        conn.close()
+            for row in tasks
+        ]
+    }
 
@@ -0,0 +1,35 @@
+-- Tácticas propias scrapeadas por jornada (antes: ensure_tactics_table_exists)
+CREATE TABLE IF NOT EXISTS public.match_tactics (
+    id SERIAL PRIMARY KEY,
+    user_id UUID NOT NULL,
+    league_id INTEGER NOT NULL REFERENCES leagues(id),
+    round INTEGER NOT NULL,
+    team_name VARCHAR(255) NOT NULL,
+
+    -- Tácticas básicas
+    game_plan VARCHAR(50),
+    tackling VARCHAR(50),
+
+    -- Sliders (0-100)
+    pressure INTEGER,
+    mentality INTEGER,
+    tempo INTEGER,
+
+    -- Tácticas de línea
+    forwards_tactic VARCHAR(50),
+    midfielders_tactic VARCHAR(50),
+    defenders_tactic VARCHAR(50),
+
+    -- Configuración adicional
+    offside_trap BOOLEAN DEFAULT FALSE,
+    marking VARCHAR(50),
+
+    -- Metadatos
+    scraped_at TIMESTAMP DEFAULT NOW(),
+
+    -- Constraint para evitar duplicados
+    CONSTRAINT unique_match_tactics UNIQUE (league_id, round, team_name)
+);
+
+CREATE INDEX IF NOT EXISTS idx_tactics_league_round ON match_tactics(league_id, round);
+CREATE INDEX IF NOT EXISTS idx_tactics_user ON match_tactics(user_id);
@@ -0,0 +1,17 @@
+-- Tareas programadas, p. ej. scrape de tácticas post-partido (antes: ensure_scheduled_tasks_table_exists)
+CREATE TABLE IF NOT EXISTS public.scheduled_scrape_tasks (
+    id SERIAL PRIMARY KEY,
+    user_id UUID NOT NULL,
+    task_type VARCHAR(50) NOT NULL,
+    scheduled_at TIMESTAMP NOT NULL,
+    status VARCHAR(20) DEFAULT 'pending',
+    metadata JSONB,
+    created_at TIMESTAMP DEFAULT NOW(),
+    executed_at TIMESTAMP,
+
+    CONSTRAINT unique_pending_task UNIQUE (user_id, task_type, scheduled_at)
+);
+
+CREATE INDEX IF NOT EXISTS idx_scheduled_tasks_pending ON scheduled_scrape_tasks(scheduled_at)
+    WHERE status = 'pending';
+CREATE INDEX IF NOT EXISTS idx_scheduled_tasks_user ON scheduled_scrape_tasks(user_id);
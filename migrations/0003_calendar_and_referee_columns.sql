@@ -0,0 +1,4 @@
+-- Antes: ensure_calendar_column_exists / ensure_matches_columns_exist
+ALTER TABLE user_leagues ADD COLUMN IF NOT EXISTS calendar_scraped BOOLEAN DEFAULT FALSE;
+ALTER TABLE matches ADD COLUMN IF NOT EXISTS referee VARCHAR(255);
+ALTER TABLE matches ADD COLUMN IF NOT EXISTS referee_strictness VARCHAR(50);
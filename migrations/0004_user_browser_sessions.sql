@@ -0,0 +1,6 @@
+-- Caché de sesión Playwright (antes: CREATE TABLE IF NOT EXISTS en cada load/save_session_to_db)
+CREATE TABLE IF NOT EXISTS public.user_browser_sessions (
+    user_id UUID PRIMARY KEY,
+    session_state TEXT NOT NULL,
+    saved_at TIMESTAMP DEFAULT NOW()
+);
@@ -0,0 +1,2 @@
+-- Huella de leagues.teams para upsert solo de ligas cambiadas (antes: ensure_content_hash_column)
+ALTER TABLE leagues ADD COLUMN IF NOT EXISTS content_hash TEXT;
@@ -0,0 +1,11 @@
+-- Índices de GET /api/leagues/{id}/transfers (antes: ensure_transfer_indexes).
+-- Todos terminan en (created_at, id), el orden de la paginación por cursor.
+-- transaction_type solo tiene dos valores: se filtra sobre el índice base.
+CREATE INDEX IF NOT EXISTS idx_transfers_league_created
+    ON transfers(league_id, created_at, id);
+CREATE INDEX IF NOT EXISTS idx_transfers_league_manager
+    ON transfers(league_id, manager_name, created_at, id);
+CREATE INDEX IF NOT EXISTS idx_transfers_league_position
+    ON transfers(league_id, position, created_at, id);
+CREATE INDEX IF NOT EXISTS idx_transfers_league_round
+    ON transfers(league_id, round, created_at, id);
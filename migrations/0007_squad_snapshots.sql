@@ -0,0 +1,23 @@
+-- Plantillas persistidas (squad_store.py; antes: ensure_squad_tables)
+CREATE TABLE IF NOT EXISTS public.squad_snapshots (
+    id BIGSERIAL PRIMARY KEY,
+    user_id UUID NOT NULL,
+    league_id INTEGER NOT NULL REFERENCES leagues(id),
+    player_name VARCHAR(255) NOT NULL,
+    data JSONB NOT NULL,
+    content_hash TEXT NOT NULL,
+    scraped_at TIMESTAMP DEFAULT NOW()
+);
+
+CREATE INDEX IF NOT EXISTS idx_squad_snapshots_latest
+    ON squad_snapshots(user_id, league_id, player_name, scraped_at DESC);
+
+CREATE TABLE IF NOT EXISTS public.squad_rosters (
+    user_id UUID NOT NULL,
+    league_id INTEGER NOT NULL REFERENCES leagues(id),
+    team_name VARCHAR(255),
+    matchday JSONB,
+    players TEXT[] NOT NULL,
+    scraped_at TIMESTAMP DEFAULT NOW(),
+    PRIMARY KEY (user_id, league_id)
+);
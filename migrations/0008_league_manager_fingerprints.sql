@@ -0,0 +1,20 @@
+-- Huella de managers por liga (league_fingerprints.py; antes: ensure_fingerprints_table).
+-- Se rellena desde user_leagues.managers_by_team.
+CREATE TABLE IF NOT EXISTS public.league_manager_fingerprints (
+    league_id INTEGER NOT NULL REFERENCES leagues(id) ON DELETE CASCADE,
+    team_name VARCHAR(255) NOT NULL,
+    manager_name VARCHAR(255) NOT NULL,
+    PRIMARY KEY (league_id, team_name)
+);
+
+CREATE INDEX IF NOT EXISTS idx_fingerprints_team_manager
+    ON league_manager_fingerprints(team_name, manager_name);
+
+INSERT INTO league_manager_fingerprints (league_id, team_name, manager_name)
+SELECT DISTINCT ON (ul.league_id, m.key) ul.league_id, m.key, m.value
+FROM user_leagues ul
+CROSS JOIN LATERAL jsonb_each_text(ul.managers_by_team::jsonb) AS m
+WHERE ul.managers_by_team IS NOT NULL
+  AND m.value IS NOT NULL AND m.value NOT IN ('', 'N/A')
+ORDER BY ul.league_id, m.key, ul.last_scraped_at DESC NULLS LAST
+ON CONFLICT DO NOTHING;
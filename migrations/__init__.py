@@ -0,0 +1,100 @@
+# migrations/__init__.py
+"""
+Migraciones versionadas del esquema.
+
+Cada fichero NNNN_descripcion.sql de esta carpeta es una versión; se aplican en
+orden y cada una queda registrada en la tabla schema_version. Se ejecutan una
+vez al desplegar (python -m migrations) o al arrancar cada proceso:
+
+    ensure_schema(conn)   # 1 consulta la primera vez; después, nada
+
+Para cambiar el esquema se añade un fichero con el siguiente número; los ya
+aplicados no se editan. El código de runtime no consulta el catálogo
+(information_schema / to_regclass) ni lanza DDL.
+"""
+import os
+import re
+
+from db import connect
+
+MIGRATIONS_DIR = os.path.dirname(os.path.abspath(__file__))
+# Clave fija de pg_advisory_xact_lock: dos procesos arrancando a la vez no migran en paralelo
+_LOCK_KEY = 50_211_001
+
+_schema_ready = False
+
+
+def list_migrations() -> list[tuple[int, str, str]]:
+    """[(versión, nombre, ruta)] ordenadas por versión."""
+    found = []
+    for filename in os.listdir(MIGRATIONS_DIR):
+        match = re.match(r"^(\d+)_(\w+)\.sql$", filename)
+        if match:
+            found.append((int(match.group(1)), match.group(2), os.path.join(MIGRATIONS_DIR, filename)))
+    return sorted(found)
+
+
+LATEST_VERSION = max((v for v, _, _ in list_migrations()), default=0)
+
+
+def current_version(conn) -> int:
+    """Versión aplicada en la BD (0 si nunca se migró)."""
+    with conn.cursor() as cur:
+        cur.execute("SELECT to_regclass('public.schema_version');")
+        if cur.fetchone()[0] is None:
+            conn.rollback()
+            return 0
+        cur.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version;")
+        version = cur.fetchone()[0]
+    conn.rollback()
+    return version
+
+
+def apply_migrations(conn) -> int:
+    """Aplica las migraciones pendientes en una transacción. Devuelve la versión final."""
+    with conn.cursor() as cur:
+        cur.execute("SELECT pg_advisory_xact_lock(%s);", (_LOCK_KEY,))
+        cur.execute("""
+            CREATE TABLE IF NOT EXISTS public.schema_version (
+                version INTEGER PRIMARY KEY,
+                name TEXT NOT NULL,
+                applied_at TIMESTAMP DEFAULT NOW()
+            );
+        """)
+        # Releer con el lock tomado: otro proceso pudo migrar mientras esperábamos
+        cur.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version;")
+        version = cur.fetchone()[0]
+
+        for number, name, path in list_migrations():
+            if number <= version:
+                continue
+            print(f"🔧 Migrando BD: {number:04d}_{name}...")
+            with open(path, encoding="utf-8") as f:
+                cur.execute(f.read())
+            cur.execute("INSERT INTO schema_version (version, name) VALUES (%s, %s);", (number, name))
+            version = number
+    conn.commit()
+    return version
+
+
+def ensure_schema(conn):
+    """
+    Deja la BD en LATEST_VERSION. Solo consulta la versión la primera vez por
+    proceso; las siguientes llamadas no tocan la BD.
+    """
+    global _schema_ready
+    if _schema_ready:
+        return
+    if current_version(conn) < LATEST_VERSION:
+        version = apply_migrations(conn)
+        print(f"✅ Esquema de BD en la versión {version}.")
+    _schema_ready = True
+
+
+def migrate_on_startup():
+    """ensure_schema con una conexión del pool (arranque del bot / API)."""
+    conn = connect()
+    try:
+        ensure_schema(conn)
+    finally:
+        conn.close()
@@ -0,0 +1,32 @@
+# migrations/__main__.py
+"""
+Aplica las migraciones pendientes (despliegue):
+
+    python -m migrations            # migra hasta la última versión
+    python -m migrations --status   # solo muestra versión aplicada / disponible
+"""
+import sys
+
+from db import connect
+from migrations import LATEST_VERSION, apply_migrations, current_version, list_migrations
+
+
+def main():
+    conn = connect()
+    try:
+        version = current_version(conn)
+        if "--status" in sys.argv:
+            print(f"Versión aplicada: {version} | disponible: {LATEST_VERSION}")
+            for number, name, _ in list_migrations():
+                print(f"  {'✓' if number <= version else '·'} {number:04d}_{name}")
+            return
+        if version >= LATEST_VERSION:
+            print(f"✅ Esquema al día (versión {version}).")
+            return
+        print(f"✅ Esquema de BD en la versión {apply_migrations(conn)}.")
+    finally:
+        conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+# popup_killer.py
+"""
+Supresión de popups basada en eventos para OSM.
+
+Se instala UNA vez por contexto con add_init_script: un MutationObserver
+acepta los banners de consentimiento/privacidad y oculta modales promocionales
+conocidos en cuanto aparecen, y lleva un registro de lo que descartó.
+
+handle_popups() (utils) ya no prueba ~20 selectores con timeouts: llama a
+sweep(), que en una sola evaluación hace la limpieza "a demanda" (botones de
+'Entendido/Continuar/...', modales abiertos, desbloqueo de slots) y devuelve el
+informe acumulado.
+"""
+
+_CONTEXT_ATTR = "_osm_popup_killer"
+
+POPUP_KILLER_JS = r"""
+(() => {
+    if (window.__osmPopupKiller) return;
+
+    // Contenedores de consentimiento: se aceptan automáticamente (siempre es seguro)
+    const CONSENT_BUTTONS = [
+        '#onetrust-accept-btn-handler',
+        '.qc-cmp2-footer button[mode="primary"]',
+        '.qc-cmp2-summary-buttons button[mode="primary"]',
+        '#didomi-notice-agree-button',
+        '.fc-cta-consent',
+    ];
+    // Elementos que nunca necesitamos: overlays, banners y modales promocionales
+    const HIDE_CSS = `
+        #preloader-image, .modal-backdrop, #genericModalContainer,
+        .social-login-modal, #social-login-container, .facebook-login-button,
+        iframe[src*="facebook"], #manager-social-login,
+        #skillRatingUpdate-modal-content, .tier-up-title, .shield-animation-container,
+        .modal-dialog .close-button-container, .loading-overlay, .vwo-overlay,
+        #onetrust-banner-sdk, .qc-cmp2-container, .fc-consent-root {
+            display: none !important;
+            visibility: hidden !important;
+            pointer-events: none !important;
+        }
+        .career-teamslot {
+            visibility: visible !important;
+            opacity: 1 !important;
+        }
+    `;
+    const REMOVE_SELECTORS = '.modal-backdrop, #preloader-image, .loading-overlay, #onetrust-banner-sdk';
+
+    // Solo en sweep() (a demanda): botones genéricos de "cerrar aviso".
+    // Como el antiguo handle_popups: como mucho UN click por selector, y el texto
+    // debe coincidir entero (nunca Cancelar/Confirmar de una acción u oferta).
+    const SWEEP_BUTTONS = [
+        { sel: 'button, div.btn-new', texts: ['i understand', 'entiendo', 'continue', 'continuar',
+            'skip', 'saltar', 'view later', 'ver más tarde', 'accept', 'aceptar', 'agree',
+            'aceptar todo', 'accept all', 'got it!'] },
+        // Sin filtro de texto solo dentro de los modales promocionales/de aviso conocidos
+        { sel: '#genericModalContainer .modal-content .btn-new, #skillRatingUpdate-modal-content .btn-new, ' +
+               '.social-login-modal .btn-new', texts: null },
+        { sel: '.btn-primary', texts: ['ok'] },
+    ];
+
+    const state = { dismissed: [], removed: 0, sweeps: 0 };
+
+    const isVisible = (el) => !!(el && (el.offsetWidth || el.offsetHeight || el.getClientRects().length));
+    const label = (el) => (el.id ? '#' + el.id : el.tagName.toLowerCase()) +
+        (el.innerText ? ` "${el.innerText.trim().slice(0, 40)}"` : '');
+
+    function ensureStyle() {
+        if (document.getElementById('osm-popup-killer-style')) return;
+        const root = document.head || document.documentElement;
+        if (!root) return;
+        const style = document.createElement('style');
+        style.id = 'osm-popup-killer-style';
+        style.textContent = HIDE_CSS;
+        root.appendChild(style);
+    }
+
+    function passive() {
+        ensureStyle();
+        for (const sel of CONSENT_BUTTONS) {
+            const btn = document.querySelector(sel);
+            if (btn && isVisible(btn)) {
+                btn.click();
+                state.dismissed.push('consent:' + label(btn));
+            }
+        }
+        document.querySelectorAll(REMOVE_SELECTORS).forEach(el => { el.remove(); state.removed++; });
+        if (document.body && document.body.classList.contains('modal-open') &&
+            !document.querySelector('.modal.in, .modal.show')) {
+            document.body.classList.remove('modal-open');
+        }
+    }
+
+    function sweep() {
+        passive();
+        for (const { sel, texts } of SWEEP_BUTTONS) {
+            const el = Array.from(document.querySelectorAll(sel)).find(el =>
+                isVisible(el) && (!texts || texts.includes((el.innerText || '').trim().toLowerCase())));
+            if (!el) continue;
+            el.click();
+            state.dismissed.push('button:' + label(el));
+        }
+        document.querySelectorAll('.modal.in, .modal.show').forEach(el => {
+            state.dismissed.push('modal:' + label(el));
+            el.style.display = 'none';
+            el.remove();
+        });
+        if (document.body) {
+            document.body.classList.remove('modal-open');
+            document.body.style.overflow = 'auto';
+            document.body.style.pointerEvents = 'auto';
+        }
+        // Desbloqueo de slots de Career (ancestros ocultos)
+        document.querySelectorAll('.career-teamslot').forEach(slot => {
+            let curr = slot;
+            while (curr && curr !== document.body) {
+                const style = getComputedStyle(curr);
+                if (style.display === 'none') curr.style.setProperty('display', 'block', 'important');
+                if (style.visibility === 'hidden') curr.style.setProperty('visibility', 'visible', 'important');
+                if (parseFloat(style.opacity) === 0) curr.style.setProperty('opacity', '1', 'important');
+                curr = curr.parentElement;
+            }
+        });
+        state.sweeps++;
+        const report = { dismissed: state.dismissed.slice(), removed: state.removed, sweeps: state.sweeps };
+        state.dismissed = [];
+        return report;
+    }
+
+    // KO genera muchas mutaciones: agrupamos en un tick
+    let scheduled = false;
+    const observer = new MutationObserver(() => {
+        if (scheduled) return;
+        scheduled = true;
+        setTimeout(() => { scheduled = false; try { passive(); } catch (e) {} }, 50);
+    });
+    const start = () => {
+        try { passive(); } catch (e) {}
+        observer.observe(document.documentElement, { childList: true, subtree: true });
+    };
+    if (document.documentElement) start();
+    else document.addEventListener('readystatechange', start, { once: true });
+
+    window.__osmPopupKiller = {
+        sweep,
+        report: () => ({ dismissed: state.dismissed.slice(), removed: state.removed, sweeps: state.sweeps }),
+    };
+})();
+"""
+
+
+def install_popup_killer(context):
+    """Registra el popup-killer en el contexto (antes de crear páginas)."""
+    if getattr(context, _CONTEXT_ATTR, False):
+        return
+    context.add_init_script(POPUP_KILLER_JS)
+    setattr(context, _CONTEXT_ATTR, True)
+
+
+def is_installed(page) -> bool:
+    try:
+        return bool(getattr(page.context, _CONTEXT_ATTR, False))
+    except Exception:
+        return False
+
+
+def sweep_popups(page) -> dict | None:
+    """Limpieza a demanda en una sola evaluación. None si el script no está cargado."""
+    return page.evaluate("() => window.__osmPopupKiller ? window.__osmPopupKiller.sweep() : null")
@@ -0,0 +1,86 @@
+# replay_spool.py
+"""
+Re-sincroniza con la BD scrapes guardados en el spool (scrape_spool.py) sin abrir el navegador.
+
+    python replay_spool.py --list [user_id]          # spools pendientes (--all: también los sincronizados)
+    python replay_spool.py <ruta.json.gz> [--notify] [--force]  # un spool concreto (pendiente o ya sincronizado)
+    python replay_spool.py <user_id> [--notify] [--force]       # todos los pendientes del usuario, del más antiguo al más nuevo
+
+Por defecto no se envían notificaciones push (ya se enviaron o están desfasadas); --notify las envía.
+
+Un spool anterior al último scrape ya sincronizado del usuario no se vuelca:
+devolvería el mercado, la clasificación y las huellas de managers a un estado
+viejo. Con un user_id se omite; con una ruta se rechaza. --force lo vuelca igualmente.
+"""
+import os
+import sys
+
+from db import get_db_connection
+from migrations import ensure_schema
+from notifications import init_firebase_admin
+from run_update_for_user import sync_scraped
+from scrape_spool import is_synced, latest_synced_run, list_spools, mark_synced, read_spool, spool_run_id
+
+
+def replay(path: str, notify: bool = False, force: bool = False) -> bool | None:
+    """True/False según termine la sincronización; None si se omite por estar desfasado."""
+    envelope = read_spool(path)
+    latest = latest_synced_run(envelope["user_id"])
+    if latest and spool_run_id(path) < latest and not force:
+        print(f"⏭️ {path} es anterior al último scrape sincronizado ({latest}). "
+              f"Se omite (--force para volcarlo igualmente).")
+        return None
+    print(f"\n♻️ Re-sincronizando {path} (usuario {envelope['user_id']}, scrape {envelope['scraped_at']:%Y-%m-%d %H:%M})")
+    ok = sync_scraped(envelope["user_id"], envelope["payload"], envelope["scraped_at"],
+                      envelope["options"].get("needs_calendar", False), notify=notify)
+    if ok and not is_synced(path):
+        mark_synced(path)
+    return ok
+
+
+def main(argv: list[str]) -> int:
+    flags = {a for a in argv if a.startswith("--")}
+    args = [a for a in argv if not a.startswith("--")]
+
+    if "--list" in flags:
+        paths = list_spools(args[0] if args else None, include_synced="--all" in flags)
+        for path in paths:
+            print(f"{'✓' if is_synced(path) else '·'} {path} ({os.path.getsize(path) / 1024:.0f} KB)")
+        if not paths:
+            print("ℹ️ No hay spools pendientes.")
+        return 0
+
+    if not args:
+        print(__doc__)
+        return 1
+
+    target = args[0]
+    paths = [target] if os.path.isfile(target) else list_spools(target)
+    if not paths:
+        print(f"ℹ️ No hay spools pendientes para '{target}'.")
+        return 0
+
+    conn = get_db_connection()
+    if not conn:
+        return 1
+    try:
+        ensure_schema(conn)
+    finally:
+        conn.close()
+
+    notify = "--notify" in flags
+    if notify:
+        init_firebase_admin()
+    results = {path: replay(path, notify=notify, force="--force" in flags) for path in paths}
+    failed = [path for path, ok in results.items() if ok is False]
+    skipped = [path for path, ok in results.items() if ok is None]
+    if failed:
+        print(f"❌ {len(failed)} spool(s) sin sincronizar: {', '.join(failed)}")
+        return 1
+    print(f"✅ {len(paths) - len(skipped)} spool(s) sincronizado(s), {len(skipped)} omitido(s) por desfasados.")
+    # Una ruta concreta desfasada se rechaza
+    return 1 if skipped and os.path.isfile(target) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(sys.argv[1:]))
@@ -0,0 +1,198 @@
+# request_policy.py
+"""
+Capa de interceptación de peticiones (context.route) para OSM.
+
+Los scrapers leen el viewmodel KO.js, así que imágenes, fuentes, escudos,
+anuncios y analítica solo consumen ancho de banda y retrasan cada navegación.
+Esta capa aborta esas peticiones según un perfil (tipos de recurso bloqueados +
+lista de dominios permitidos) y cuenta los bytes ahorrados.
+
+Activar la interceptación desactiva la caché HTTP de Chromium, así que los
+scripts y hojas de estilo de OSM se sirven desde una caché en memoria propia.
+
+Uso:
+    install_request_policy(context)                  # en login_with_session_cache
+    with request_profile(page, "squad"):             # override por scraper
+        ...
+    print(format_request_stats(context))
+"""
+import os
+import time
+from contextlib import contextmanager
+from urllib.parse import urlparse
+
+from dotenv import load_dotenv
+
+# Se importa vía utils antes de que los scripts carguen el .env
+load_dotenv()
+
+REQUEST_BLOCKING_ENABLED = os.getenv("REQUEST_BLOCKING_ENABLED", "true").lower() == "true"
+
+# Dominios permitidos (y sus subdominios). Cualquier otro host se aborta.
+ALLOWED_DOMAINS = [
+    d.strip().lower()
+    for d in os.getenv("REQUEST_ALLOWED_DOMAINS", "onlinesoccermanager.com,gamebasics.com").split(",")
+    if d.strip()
+]
+
+# Perfiles: qué tipos de recurso se bloquean y si se aplica la lista de dominios.
+PROFILES = {
+    "full":    {"blocked_types": set(),                                      "allow_list": False},
+    "default": {"blocked_types": {"image", "media", "font"},                 "allow_list": True},
+    "lean":    {"blocked_types": {"image", "media", "font", "stylesheet"},   "allow_list": True},
+}
+
+# Override por scraper. Solo usan "lean" (sin CSS) los que leen exclusivamente
+# KO.js; los que dependen de visibilidad/layout (carruseles de tácticas,
+# is_visible en acciones) se quedan en "default".
+SCRAPER_PROFILES = {
+    "squad": "lean",
+}
+
+# Tamaños medios estimados de lo que se aborta (no se descarga, así que no
+# conocemos el tamaño real).
+ESTIMATED_BYTES = {
+    "image": 25_000,
+    "media": 200_000,
+    "font": 40_000,
+    "stylesheet": 30_000,
+    "script": 60_000,
+}
+DEFAULT_ESTIMATED_BYTES = 5_000
+
+STATIC_CACHE_TTL_SECONDS = int(os.getenv("REQUEST_STATIC_CACHE_TTL_SECONDS", str(6 * 3600)))
+STATIC_CACHE_MAX_BYTES = 64 * 1024 * 1024
+_CACHEABLE_TYPES = {"script", "stylesheet"}
+
+# url → {"status", "headers", "body", "stored_at"}; compartida entre contextos
+_static_cache: dict[str, dict] = {}
+_static_cache_bytes = 0
+
+_STATE_ATTR = "_osm_request_policy"
+
+
+def _new_stats() -> dict:
+    return {
+        "blocked": 0,
+        "blocked_by_type": {},
+        "blocked_by_domain": {},
+        "cache_hits": 0,
+        "bytes_saved_estimated": 0,
+        "bytes_saved_cache": 0,
+    }
+
+
+def _host_allowed(host: str) -> bool:
+    host = host.lower()
+    return any(host == d or host.endswith("." + d) for d in ALLOWED_DOMAINS)
+
+
+def _abort(route, state: dict, rtype: str, host: str, reason: str):
+    stats = state["stats"]
+    stats["blocked"] += 1
+    stats["blocked_by_type"][rtype] = stats["blocked_by_type"].get(rtype, 0) + 1
+    if reason == "domain":
+        stats["blocked_by_domain"][host] = stats["blocked_by_domain"].get(host, 0) + 1
+    stats["bytes_saved_estimated"] += ESTIMATED_BYTES.get(rtype, DEFAULT_ESTIMATED_BYTES)
+    try:
+        route.abort("blockedbyclient")
+    except Exception:
+        pass
+
+
+def _store_static(url: str, status: int, headers: dict, body: bytes):
+    global _static_cache_bytes
+    if _static_cache_bytes + len(body) > STATIC_CACHE_MAX_BYTES:
+        _static_cache.clear()
+        _static_cache_bytes = 0
+    _static_cache[url] = {"status": status, "headers": headers, "body": body, "stored_at": time.time()}
+    _static_cache_bytes += len(body)
+
+
+def _serve_static(route, state: dict) -> bool:
+    """Sirve JS/CSS de OSM desde memoria (o los descarga y guarda). True si respondió."""
+    url = route.request.url
+    cached = _static_cache.get(url)
+    if cached and time.time() - cached["stored_at"] < STATIC_CACHE_TTL_SECONDS:
+        state["stats"]["cache_hits"] += 1
+        state["stats"]["bytes_saved_cache"] += len(cached["body"])
+        route.fulfill(status=cached["status"], headers=cached["headers"], body=cached["body"])
+        return True
+
+    response = route.fetch()
+    body = response.body()
+    if response.status == 200:
+        _store_static(url, response.status, response.headers, body)
+    route.fulfill(response=response, body=body)
+    return True
+
+
+def _handle_route(route, state: dict):
+    request = route.request
+    rtype = request.resource_type
+    host = urlparse(request.url).hostname or ""
+    profile = PROFILES.get(state["profile"], PROFILES["default"])
+
+    try:
+        is_main_document = rtype == "document" and request.frame.parent_frame is None
+    except Exception:
+        is_main_document = False
+
+    if not is_main_document:
+        if profile["allow_list"] and host and not _host_allowed(host):
+            return _abort(route, state, rtype, host, "domain")
+        if rtype in profile["blocked_types"]:
+            return _abort(route, state, rtype, host, "type")
+
+    if rtype in _CACHEABLE_TYPES and request.method == "GET" and _host_allowed(host):
+        try:
+            if _serve_static(route, state):
+                return
+        except Exception:
+            pass
+
+    try:
+        route.continue_()
+    except Exception:
+        pass
+
+
+def install_request_policy(context, profile: str = "default"):
+    """Instala la interceptación en un contexto nuevo (idempotente)."""
+    if not REQUEST_BLOCKING_ENABLED or getattr(context, _STATE_ATTR, None):
+        return
+    state = {"profile": profile, "stats": _new_stats()}
+    setattr(context, _STATE_ATTR, state)
+    context.route("**/*", lambda route: _handle_route(route, state))
+
+
+@contextmanager
+def request_profile(page, scraper: str):
+    """
+    Cambia temporalmente el perfil del contexto según SCRAPER_PROFILES.
+    Afecta a las peticiones hechas dentro del bloque (incluida la carga de
+    documento tras un page.goto).
+    """
+    state = getattr(page.context, _STATE_ATTR, None)
+    if not state:
+        yield
+        return
+    previous = state["profile"]
+    state["profile"] = SCRAPER_PROFILES.get(scraper, previous)
+    try:
+        yield
+    finally:
+        state["profile"] = previous
+
+
+def get_request_stats(context) -> dict:
+    state = getattr(context, _STATE_ATTR, None)
+    return dict(state["stats"]) if state else _new_stats()
+
+
+def format_request_stats(context) -> str:
+    stats = get_request_stats(context)
+    saved_mb = (stats["bytes_saved_estimated"] + stats["bytes_saved_cache"]) / (1024 * 1024)
+    by_type = ", ".join(f"{t}={n}" for t, n in sorted(stats["blocked_by_type"].items())) or "-"
+    return (f"🚫 Peticiones bloqueadas: {stats['blocked']} ({by_type}) | "
+            f"caché JS/CSS: {stats['cache_hits']} hits | ~{saved_mb:.1f} MB ahorrados")
@@ -0,0 +1,279 @@
+# response_tap.py
+"""
+Captura pasiva de las respuestas JSON de la API de OSM.
+
+La SPA de OSM pide por XHR los datos de clasificación, mercado, plantilla y
+calendario y luego los pinta con Knockout. Este módulo escucha las respuestas
+de la página y guarda las de los endpoints conocidos (ENDPOINTS). Los scrapers
+las leen primero con read_captured() y, si no hay captura o no tiene la forma
+esperada, siguen con su extracción DOM/KO de siempre.
+
+Solo se aceptan capturas posteriores a la última navegación de la página, para
+no mezclar datos de otro equipo/slot. El cuerpo se parsea al leerlo (no en el
+handler), así que capturar no cuesta nada si nadie lo lee.
+
+Uso:
+    install_response_tap(page)                       # en login_with_session_cache
+    standings = read_captured(page, "standings")     # None → fallback DOM
+"""
+import re
+import time
+
+from api_schema import SchemaMismatch, pick, name_of, rows_of, require, require_names, run_normalizer
+
+_TAP_ATTR = "_osm_response_tap"
+
+# Enumeraciones de posición de OSM (window.PlayerPosition / PlayerSpecificPosition)
+_POSITION_LABELS = {"A": "A", "M": "M", "D": "D", "G": "G"}
+_SPECIFIC_LABELS = {"GK": "GK", "RB": "RB", "CB": "CB", "LB": "LB", "RM": "RM", "CDM": "CDM",
+                    "CM": "CM", "CAM": "CAM", "LM": "LM", "RF": "RW", "ST": "ST", "LF": "LW"}
+
+
+def _enum_labels(page) -> tuple[dict, dict]:
+    """Valor numérico → etiqueta para las enumeraciones de posición (cacheado por página)."""
+    cached = getattr(page, "_osm_position_enums", None)
+    if cached:
+        return cached
+    enums = page.evaluate("""
+        () => ({
+            position: window.PlayerPosition || {},
+            specific: window.PlayerSpecificPosition || {},
+        })
+    """) or {}
+    labels = (
+        {v: _POSITION_LABELS[k] for k, v in enums.get("position", {}).items() if k in _POSITION_LABELS},
+        {v: _SPECIFIC_LABELS[k] for k, v in enums.get("specific", {}).items() if k in _SPECIFIC_LABELS},
+    )
+    setattr(page, "_osm_position_enums", labels)
+    return labels
+
+
+# ── Normalizadores (misma forma que la extracción DOM/KO) ────────────────────
+
+def _normalize_standings(data, page) -> list:
+    rows = rows_of(data, "standings", "teams", "table")
+    require(rows, ("position", "rank", "ranking"), ("team", "teamName", "club"),
+             ("played", "matchesPlayed"), ("won", "wins"), ("drew", "draws", "drawn"),
+             ("lost", "losses"), ("points", "pts"),
+             ("goalsFor", "goalsScored"), ("goalsAgainst", "goalsConceded"))
+    require_names(pick(r, "team", "club") for r in rows)
+    standings = []
+    for r in rows:
+        team = pick(r, "team", "club")
+        # Sin manager = equipo de la CPU (mismo 'N/A' que el DOM)
+        manager = pick(team, "manager") if isinstance(team, dict) else None
+        goals_for = int(pick(r, "goalsFor", "goalsScored"))
+        goals_against = int(pick(r, "goalsAgainst", "goalsConceded"))
+        standings.append({
+            "Position": int(pick(r, "position", "rank", "ranking")),
+            "Club": name_of(team) if team is not None else pick(r, "teamName", default="N/A"),
+            "Manager": name_of(manager) if manager else pick(r, "managerName", default="N/A"),
+            "Played": int(pick(r, "played", "matchesPlayed")),
+            "Won": int(pick(r, "won", "wins")),
+            "Drew": int(pick(r, "drew", "draws", "drawn")),
+            "Lost": int(pick(r, "lost", "losses")),
+            "Points": int(pick(r, "points", "pts")),
+            "GoalsFor": goals_for,
+            "GoalsAgainst": goals_against,
+            "GoalDifference": int(pick(r, "goalDifference", default=goals_for - goals_against)),
+        })
+    standings.sort(key=lambda x: x["Position"])
+    return standings
+
+
+def _normalize_transfer_list(data, page) -> list:
+    rows = rows_of(data, "transferPlayers", "players")
+    require(rows, ("price",))
+    entries = [pick(r, "player", "playerPartial", default=r) for r in rows]
+    require(entries, ("name", "Name"), ("nationality",), ("position",), ("age",),
+             ("statAtt",), ("statDef",), ("statOvr",), ("value",))
+    require_names(pick(p, "nationality") for p in entries)
+    positions, _ = _enum_labels(page)
+    players = []
+    for r, player in zip(rows, entries):
+        # Sin equipo vendedor = jugador de la CPU (mismo 'CPU' que el DOM)
+        team = pick(r, "team", "teamPartial", "sellerTeam")
+        manager = pick(team, "manager", "managerPartial") if isinstance(team, dict) else None
+        position = pick(player, "position")
+        players.append({
+            "name": name_of(player),
+            "nationality": name_of(pick(player, "nationality")),
+            "position": positions.get(position, str(position) if position is not None else "N/A"),
+            "age": int(pick(player, "age", default=0)),
+            "seller_team": name_of(team, "CPU") if team else "CPU",
+            "seller_manager": name_of(manager, "CPU") if manager else "CPU",
+            "attack": int(pick(player, "statAtt", default=0)),
+            "defense": int(pick(player, "statDef", default=0)),
+            "overall": int(pick(player, "statOvr", default=0)),
+            # Mismo formato crudo que la extracción KO: el llamador convierte a millones
+            "price_val": pick(r, "price", default=0),
+            "value_val": pick(player, "value", default=0),
+        })
+    return players
+
+
+def _normalize_squad(data, page) -> list:
+    rows = rows_of(data, "players")
+    require(rows, ("name",), ("squadNumber", "squadOrLineupNumber"), ("position",),
+             ("specificPosition",), ("age",), ("nationality",),
+             ("statAtt",), ("statDef",), ("statOvr",), ("fitness",), ("morale",),
+             ("goals",), ("value",), ("yellowCards",),
+             ("isInLineup", "inLineup"), ("isInSelection", "inSelection"),
+             ("isInTraining", "inTraining"), ("isInjured", "injured"),
+             ("isSuspended", "suspended"), ("isInForm",), ("isWorldStar",), ("isLegend",))
+    nationalities = [pick(p, "nationality") for p in rows]
+    require([n for n in nationalities if n is not None], ("code",), ("name",))
+    positions, specifics = _enum_labels(page)
+    players = []
+    for p, nat in zip(rows, nationalities):
+        nat = nat or {}
+        players.append({
+            "name":              str(pick(p, "name", default="")),
+            # Sin dorsal asignado → "" (como el DOM)
+            "squad_number":      pick(p, "squadNumber", "squadOrLineupNumber", default=""),
+            "position":          positions.get(pick(p, "position"), str(pick(p, "position", default=""))),
+            "specific_position": specifics.get(pick(p, "specificPosition"), ""),
+            "age":               int(pick(p, "age", default=0)),
+            "nationality_code":  (pick(nat, "code", default="") or "").lower(),
+            "nationality_name":  pick(nat, "name", default=""),
+            "stat_att":          int(pick(p, "statAtt", default=0)),
+            "stat_def":          int(pick(p, "statDef", default=0)),
+            "stat_ovr":          int(pick(p, "statOvr", default=0)),
+            "fitness":           int(pick(p, "fitness", default=0)),
+            "morale":            int(pick(p, "morale", default=0)),
+            "goals":             int(pick(p, "goals", default=0)),
+            "value":             pick(p, "value", default=0),
+            "in_lineup":         bool(pick(p, "isInLineup", "inLineup", default=False)),
+            "in_selection":      bool(pick(p, "isInSelection", "inSelection", default=False)),
+            "in_training":       bool(pick(p, "isInTraining", "inTraining", default=False)),
+            "is_injured":        bool(pick(p, "isInjured", "injured", default=False)),
+            "is_suspended":      bool(pick(p, "isSuspended", "suspended", default=False)),
+            "is_in_form":        bool(pick(p, "isInForm", default=False)),
+            "is_world_star":     bool(pick(p, "isWorldStar", default=False)),
+            "is_legend":         bool(pick(p, "isLegend", default=False)),
+            "yellow_cards":      int(pick(p, "yellowCards", default=0)),
+        })
+    return players
+
+
+def _normalize_fixtures(data, page) -> list:
+    """Calendario completo → filas como las de la tabla de /League/Results (sin idx)."""
+    rows = rows_of(data, "fixtures", "matches", "matchdays")
+    # Agrupado por jornada: [{weekNr, matches: [...]}, ...]
+    if rows and isinstance(rows[0], dict) and isinstance(pick(rows[0], "matches", "fixtures"), list):
+        rows = [dict(m, weekNr=pick(day, "weekNr", "matchday", "round"))
+                for day in rows for m in pick(day, "matches", "fixtures", default=[])]
+    # Los goles pueden venir a null en partidos sin jugar, pero la clave tiene que estar
+    require(rows, ("homeTeam", "home"), ("awayTeam", "away"), ("weekNr", "round", "matchday"),
+             ("homeGoals", "homeScore"), ("awayGoals", "awayScore"))
+    require_names(pick(r, side) for r in rows for side in ("homeTeam", "home", "awayTeam", "away"))
+    fixtures = []
+    for r in rows:
+        home = pick(r, "homeTeam", "home")
+        away = pick(r, "awayTeam", "away")
+        home_goals = pick(r, "homeGoals", "homeScore")
+        away_goals = pick(r, "awayGoals", "awayScore")
+        played = pick(r, "isPlayed", "played",
+                       default=home_goals is not None and away_goals is not None and home_goals >= 0)
+        fixtures.append({
+            "round": int(pick(r, "weekNr", "round", "matchday")),
+            "is_played": bool(played),
+            "home_team": name_of(home, ""),
+            "away_team": name_of(away, ""),
+            "home_manager": name_of(pick(home, "manager") if isinstance(home, dict) else None, "CPU"),
+            "away_manager": name_of(pick(away, "manager") if isinstance(away, dict) else None, "CPU"),
+            "home_goals": int(home_goals or 0) if played else 0,
+            "away_goals": int(away_goals or 0) if played else 0,
+        })
+    return fixtures
+
+
+def _passthrough(data, page):
+    return data
+
+
+# ── Registro de endpoints ────────────────────────────────────────────────────
+# clave → patrón de URL (regex, sin distinguir mayúsculas) + normalizador.
+
+ENDPOINTS: dict[str, dict] = {}
+
+
+def register_endpoint(key: str, pattern: str, normalizer=_passthrough):
+    """Añade o sustituye un endpoint capturable."""
+    ENDPOINTS[key] = {"pattern": re.compile(pattern, re.IGNORECASE), "normalize": normalizer}
+
+
+register_endpoint("standings",     r"/leagues/\d+/(standings|table)\b", _normalize_standings)
+register_endpoint("transfer_list", r"/(transferlist|transferplayers)\b", _normalize_transfer_list)
+register_endpoint("squad",         r"/teams/\d+/players/?(\?|$)", _normalize_squad)
+register_endpoint("fixtures",      r"/leagues/\d+/(fixtures|matches)\b", _normalize_fixtures)
+register_endpoint("transfers",     r"/leagues/\d+/transfers\b")
+
+
+# ── Captura ──────────────────────────────────────────────────────────────────
+
+def _on_response(state: dict, response):
+    try:
+        if response.request.resource_type not in ("xhr", "fetch") or response.status != 200:
+            return
+        if "json" not in (response.headers.get("content-type") or ""):
+            return
+        url = response.url
+        for key, endpoint in ENDPOINTS.items():
+            if endpoint["pattern"].search(url):
+                state["captures"][key] = {"response": response, "nav_seq": state["nav_seq"],
+                                          "captured_at": time.time(), "url": url}
+                state["stats"]["captured"] += 1
+                return
+    except Exception:
+        pass
+
+
+def _on_navigated(page, state: dict, frame):
+    if frame == page.main_frame:
+        state["nav_seq"] += 1
+
+
+def install_response_tap(page):
+    """Empieza a escuchar respuestas de la página (idempotente)."""
+    if getattr(page, _TAP_ATTR, None):
+        return
+    state = {"captures": {}, "nav_seq": 0, "stats": {"captured": 0, "hits": 0, "misses": 0, "mismatches": 0}}
+    setattr(page, _TAP_ATTR, state)
+    page.on("response", lambda response: _on_response(state, response))
+    page.on("framenavigated", lambda frame: _on_navigated(page, state, frame))
+
+
+def read_captured(page, key: str):
+    """
+    Datos normalizados del último JSON capturado para `key` desde la última
+    navegación, o None si no hay captura válida (el llamador hace fallback).
+    """
+    state = getattr(page, _TAP_ATTR, None)
+    if not state:
+        return None
+    capture = state["captures"].get(key)
+    if not capture or capture["nav_seq"] != state["nav_seq"]:
+        state["stats"]["misses"] += 1
+        return None
+    try:
+        data = run_normalizer(ENDPOINTS[key]["normalize"], capture["response"].json(), page)
+    except SchemaMismatch as e:
+        state["stats"]["mismatches"] += 1
+        print(f"    ⚠️ Captura '{key}' con forma inesperada ({e}). Usando DOM/KO.")
+        return None
+    except Exception as e:
+        state["stats"]["misses"] += 1
+        print(f"    ⚠️ No se pudo leer la captura '{key}': {e}")
+        return None
+    state["stats"]["hits"] += 1
+    return data
+
+
+def format_tap_stats(page) -> str:
+    state = getattr(page, _TAP_ATTR, None)
+    if not state:
+        return "📡 Capturas API: no instalado"
+    s = state["stats"]
+    return (f"📡 Capturas API: {s['captured']} respuestas | {s['hits']} usadas | "
+            f"{s['misses']} sin captura | {s['mismatches']} forma inesperada")
@@ -7,50 +7,21 @@ Busca tareas pendientes cuyo scheduled_at ya ha pasado y ejecuta el scraping
 de tácticas para esos usuarios/ligas específicos.
 """
 import sys
-import os
 import json
 import time
 from datetime import datetime
 from dotenv import load_dotenv
-import psycopg2
-import psycopg2.extras
-from playwright.sync_api import sync_playwright
 
 # --- Módulos Locales ---
-from utils import login_to_osm, InvalidCredentialsError, handle_popups, safe_navigate, launch_playwright_browser
+from utils import InvalidCredentialsError, handle_popups, safe_navigate
+from browser_broker import run_browser_jobs
 from scraper_tactics import get_tactics_data, extract_tactics_from_page
+from db import get_db_connection
+from migrations import ensure_schema
 
 # --- CONFIGURACIÓN ---
 load_dotenv()
 
-DB_CONFIG = {
-    "host": os.getenv("DB_HOST"),
-    "port": os.getenv("DB_PORT"),
-    "dbname": os.getenv("DB_NAME"),
-    "user": os.getenv("DB_USER"),
-    "password": os.getenv("DB_PASSWORD")
-}
-
-
-def get_db_connection(max_retries=3):
-    conn_args = {
-        **DB_CONFIG,
-        "keepalives": 1,
-        "keepalives_idle": 30,
-        "keepalives_interval": 10,
-        "keepalives_count": 5
-    }
-    for attempt in range(max_retries):
-        try:
-            conn = psycopg2.connect(**conn_args)
-            conn.cursor_factory = psycopg2.extras.DictCursor
-            return conn
-        except psycopg2.OperationalError as e:
-            print(f"⚠️ Error conectando a DB (Intento {attempt+1}/{max_retries}): {e}")
-            time.sleep(5)
-    print("❌ Error Fatal: No se pudo conectar a la base de datos.")
-    return None
-
 
 def get_pending_tactics_tasks(conn):
     """
@@ -221,7 +192,7 @@ def scrape_tactics_for_slot(page, slot_index):
 def process_user_tasks(conn, user_id, tasks):
     """
     Procesa todas las tareas pendientes de un usuario.
-    Usa una sola sesión de navegador para eficiencia.
+    Usa una sola sesión de navegador (la del broker si está corriendo).
     """
     print(f"\n🎯 Procesando {len(tasks)} tareas para usuario {user_id}")
     
@@ -233,60 +204,48 @@ def process_user_tasks(conn, user_id, tasks):
             mark_task_failed(conn, task['id'], "No credentials found")
         return
     
+    # Una sola sesión (broker compartido o Chromium local) para todas las tareas
+    steps = [("tactics_for_slot", {"slot_index": task['metadata'].get('slot_index', 0)})
+             for task in tasks]
     try:
-        with sync_playwright() as p:
-            browser = launch_playwright_browser(p)
-            context = browser.new_context(viewport={'width': 1280, 'height': 720})
-            page = context.new_page()
-            
-            # Login
-            try:
-                if not login_to_osm(page, osm_username, osm_password):
-                    raise Exception("Login fallido")
-            except InvalidCredentialsError:
-                print(f"  ❌ Credenciales inválidas para {user_id}")
-                for task in tasks:
-                    mark_task_failed(conn, task['id'], "Invalid credentials")
-                return
-            except Exception as e:
-                print(f"  ❌ Error login: {e}")
-                for task in tasks:
-                    mark_task_failed(conn, task['id'], str(e))
-                return
-            
-            # Procesar cada tarea
-            for task in tasks:
-                meta = task['metadata']
-                slot_index = meta.get('slot_index', 0)
-                league_id = meta.get('league_id')
-                matchday = meta.get('matchday')
-                team_name = meta.get('team_name')
-                league_name = meta.get('league_name')
-                
-                print(f"  📋 Procesando: {league_name} Jornada {matchday} (Slot {slot_index})")
-                
-                try:
-                    tactics = scrape_tactics_for_slot(page, slot_index)
-                    
-                    if tactics:
-                        save_tactics_to_db(conn, user_id, league_id, matchday, team_name, tactics)
-                        mark_task_complete(conn, task['id'])
-                        print(f"    ✅ Tácticas guardadas")
-                    else:
-                        mark_task_failed(conn, task['id'], "Could not extract tactics")
-                        print(f"    ⚠️ No se pudieron extraer tácticas")
-                        
-                except Exception as e:
-                    print(f"    ❌ Error: {e}")
-                    mark_task_failed(conn, task['id'], str(e))
-            
-            browser.close()
-            
+        results = run_browser_jobs(user_id, steps)
+    except InvalidCredentialsError:
+        print(f"  ❌ Credenciales inválidas para {user_id}")
+        for task in tasks:
+            mark_task_failed(conn, task['id'], "Invalid credentials")
+        return
     except Exception as e:
         print(f"  ❌ Error general: {e}")
         for task in tasks:
-            if task.get('_processed'):
-                continue
+            mark_task_failed(conn, task['id'], str(e))
+        return
+
+    # Procesar cada tarea
+    for task, res in zip(tasks, results):
+        meta = task['metadata']
+        slot_index = meta.get('slot_index', 0)
+        league_id = meta.get('league_id')
+        matchday = meta.get('matchday')
+        team_name = meta.get('team_name')
+        league_name = meta.get('league_name')
+
+        print(f"  📋 Procesando: {league_name} Jornada {matchday} (Slot {slot_index})")
+
+        try:
+            if not res["ok"]:
+                raise Exception(res["error"])
+
+            tactics = res["result"]
+            if tactics:
+                save_tactics_to_db(conn, user_id, league_id, matchday, team_name, tactics)
+                mark_task_complete(conn, task['id'])
+                print(f"    ✅ Tácticas guardadas")
+            else:
+                mark_task_failed(conn, task['id'], "Could not extract tactics")
+                print(f"    ⚠️ No se pudieron extraer tácticas")
+
+        except Exception as e:
+            print(f"    ❌ Error: {e}")
             mark_task_failed(conn, task['id'], str(e))
 
 
@@ -304,6 +263,8 @@ def run_scheduled_tactics():
         return
     
     try:
+        ensure_schema(conn)
+
         # Obtener todas las tareas pendientes agrupadas por usuario
         tasks_by_user = get_pending_tactics_tasks(conn)
         
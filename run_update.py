@@ -1,13 +1,12 @@
 # run_update.py
 import json
-import os
-import psycopg2
-import psycopg2.extras
 from collections import defaultdict
 from datetime import datetime
 from dotenv import load_dotenv
 from playwright.sync_api import sync_playwright
 from utils import login_to_osm
+from db import get_db_connection
+from bulk_ingest import copy_upsert, format_ingest_stats
 
 # --- AÑADIDO: Importar las funciones de los scrapers ---
 from scraper_transfers import get_transfers_data
@@ -17,28 +16,8 @@ from scraper_league_details import get_league_data
 load_dotenv()
 LEAGUES_TO_IGNORE = ["Champions Cup 25/26", "Greece"]
 
-DB_CONFIG = {
-    "host": os.getenv("DB_HOST"),
-    "port": os.getenv("DB_PORT"),
-    "dbname": os.getenv("DB_NAME"),
-    "user": os.getenv("DB_USER"),
-    "password": os.getenv("DB_PASSWORD")
-}
-
 # --- FUNCIONES AUXILIARES ---
 
-def get_db_connection():
-    """Establece y devuelve una conexión a la base de datos."""
-    try:
-        conn = psycopg2.connect(**DB_CONFIG)
-        # Usamos DictCursor para que sea más fácil trabajar con los resultados
-        conn.cursor_factory = psycopg2.extras.DictCursor
-        print("✅ Conexión con PostgreSQL establecida.")
-        return conn
-    except psycopg2.OperationalError as e:
-        print(f"❌ ERROR: No se pudo conectar a PostgreSQL. Revisa tus credenciales en .env y que la BD esté en ejecución. Error: {e}")
-        return None # Devuelve None en lugar de salir para un manejo más limpio
-
 def parse_value_string(value_str):
     if not isinstance(value_str, str): return 0
     # CORREGIDO: Eliminada línea duplicada
@@ -169,48 +148,34 @@ def upload_data_to_postgres(conn, grouped_transfers, league_id_map):
     # Ya no borramos todo. En su lugar, insertamos de forma incremental.
     print("\n🔄 Sincronizando fichajes de forma inteligente...")
     
-    with conn.cursor() as cur:
-        total_new_transfers = 0
-        for league_name, transfers in grouped_transfers.items():
-            if league_name in LEAGUES_TO_IGNORE:
-                continue
-            
-            league_id = league_id_map.get(league_name)
-            if not league_id: continue
-            
-            new_transfers_in_league = 0
-            
-            # --- INICIO DE LA LÓGICA INTELIGENTE ---
-            # Preparamos la sentencia SQL con la cláusula ON CONFLICT
-            sql = """
-                INSERT INTO transfers (
-                    league_id, player_name, manager_name, transaction_type, 
-                    position, round, base_value, final_price, created_at
-                ) VALUES (
-                    %(league_id)s, %(playerName)s, %(managerName)s, %(transactionType)s, 
-                    %(position)s, %(round)s, %(baseValue)s, %(finalPrice)s, %(createdAt)s
-                )
-                ON CONFLICT (league_id, round, player_name, manager_name, final_price)
-                DO NOTHING;
-            """
-            
-            # Iteramos sobre cada fichaje scrapeado
-            for t in transfers:
-                # Añadimos el league_id a cada diccionario de fichaje
-                t_with_id = {**t, "league_id": league_id}
-                
-                # Ejecutamos la inserción para este fichaje
-                cur.execute(sql, t_with_id)
-                
-                # 'cur.rowcount' será 1 si la inserción fue exitosa (el fichaje era nuevo)
-                # y 0 si hubo un conflicto (el fichaje ya existía y no se hizo nada).
-                if cur.rowcount > 0:
-                    new_transfers_in_league += 1
-            # --- FIN DE LA LÓGICA INTELIGENTE ---
-            
-            if new_transfers_in_league > 0:
-                print(f"  - Liga '{league_name}': {new_transfers_in_league} nuevos fichajes insertados.")
-                total_new_transfers += new_transfers_in_league
+    # Todas las ligas en un solo COPY + INSERT ... ON CONFLICT DO NOTHING (bulk_ingest.py)
+    unique = {}
+    for league_name, transfers in grouped_transfers.items():
+        if league_name in LEAGUES_TO_IGNORE:
+            continue
+        
+        league_id = league_id_map.get(league_name)
+        if not league_id: continue
+        
+        for t in transfers:
+            key = (league_id, t["round"], t["playerName"], t["managerName"], t["finalPrice"])
+            unique.setdefault(key, (
+                league_id, t["playerName"], t["managerName"], t["transactionType"],
+                t["position"], t["round"], t["baseValue"], t["finalPrice"], t["createdAt"],
+            ))
+
+    total_new_transfers = 0
+    if unique:
+        with conn.cursor() as cur:
+            stats = copy_upsert(
+                cur, "transfers",
+                ("league_id", "player_name", "manager_name", "transaction_type",
+                 "position", "round", "base_value", "final_price", "created_at"),
+                unique.values(),
+                conflict=("league_id", "round", "player_name", "manager_name", "final_price"),
+            )
+            print(format_ingest_stats("Fichajes", stats))
+            total_new_transfers = stats["inserted"]
 
     if total_new_transfers == 0:
         print("  - No se encontraron nuevos fichajes en ninguna liga.")
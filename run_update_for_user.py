@@ -21,63 +21,41 @@ from playwright.sync_api import sync_playwright
 
 
 # --- Módulos Locales ---
-from utils import login_to_osm, InvalidCredentialsError, login_with_session_cache, launch_playwright_browser
+from utils import login_to_osm, InvalidCredentialsError, login_with_session_cache, launch_playwright_browser, parse_millions
 from notifications import init_firebase_admin, analyze_and_notify
+from request_policy import format_request_stats
+from waits import reset_wait_metrics, format_wait_metrics
+from response_tap import format_tap_stats
+from direct_fetch import format_direct_stats
+from squad_store import save_squad_snapshots
+from scrape_spool import write_spool, read_spool, mark_synced
+from bulk_ingest import copy_upsert, format_ingest_stats
+from league_fingerprints import save_fingerprints, match_league
+from migrations import ensure_schema
+from db import get_db_connection, format_pool_stats
 
 # --- Importar las funciones de los scrapers ---
-from scraper_league_details import get_league_data
-from scraper_market_data import get_market_data
-from scraper_match_results import get_match_results
-from scraper_tactics import get_tactics_data
-from scraper_next_match import get_next_match_info
+from scrape_pipeline import run_slot_pipeline
 
 # --- CONFIGURACIÓN ---
 load_dotenv()
-LEAGUES_TO_IGNORE = ["Africa 2024", "All Stars Battle League", "Americas Cup 2019", "Americas Cup 2024", "Asia 2024", "Boss Tournament", "Club History A", "Club History B", "Club Stars", "Community League M", "Community League S", "Europe 2024", "Knockout Royale", "World 2002"]
+# true = recorrer siempre el historial de fichajes completo (sin marca de agua)
+TRANSFER_HISTORY_FULL = os.getenv("TRANSFER_HISTORY_FULL", "false").lower() in ("1", "true", "yes")
+# Jornadas jugadas más recientes cuyos detalles de partido se vuelven a leer aunque ya estén en BD
+MATCH_DETAILS_REFRESH_ROUNDS = int(os.getenv("MATCH_DETAILS_REFRESH_ROUNDS", "0"))
 
-DB_CONFIG = {
-    "host": os.getenv("DB_HOST"),
-    "port": os.getenv("DB_PORT"),
-    "dbname": os.getenv("DB_NAME"),
-    "user": os.getenv("DB_USER"),
-    "password": os.getenv("DB_PASSWORD")
-}
+LEAGUES_TO_IGNORE = ["Africa 2024", "All Stars Battle League", "Americas Cup 2019", "Americas Cup 2024", "Asia 2024", "Boss Tournament", "Club History A", "Club History B", "Club Stars", "Community League M", "Community League S", "Europe 2024", "Knockout Royale", "World 2002"]
 
 # ==========================================
 # 1. FUNCIONES AUXILIARES BÁSICAS
 # ==========================================
 
-def get_db_connection(max_retries=3):
-    conn_args = {
-        **DB_CONFIG,
-        "keepalives": 1,
-        "keepalives_idle": 30,
-        "keepalives_interval": 10,
-        "keepalives_count": 5
-    }
-    for attempt in range(max_retries):
-        try:
-            conn = psycopg2.connect(**conn_args)
-            conn.cursor_factory = psycopg2.extras.DictCursor
-            return conn
-        except psycopg2.OperationalError as e:
-            print(f"⚠️ Error conectando a DB (Intento {attempt+1}/{max_retries}): {e}")
-            time.sleep(5)
-    print("❌ Error Fatal: No se pudo conectar a la base de datos.")
-    return None
-
-def parse_value_string(value_str):
-    if not isinstance(value_str, str): return 0
-    value_str = value_str.lower().strip().replace(',', '')
-    if 'm' in value_str: return float(value_str.replace('m', ''))
-    if 'k' in value_str: return float(value_str.replace('k', '')) / 1000
-    try: return float(value_str) / 1_000_000
-    except: return 0
-
-def parse_osm_date(date_str):
-    if not isinstance(date_str, str): return datetime.now()
+def parse_osm_date(date_str, now=None):
+    # Las fechas relativas ("15:30", "yesterday") son relativas al momento del scrape,
+    # no al de la sincronización (que puede ser un replay del spool días después)
+    now = now or datetime.now()
+    if not isinstance(date_str, str): return now
     date_str = date_str.strip()
-    now = datetime.now()
     import re
     
     # Format: "00:16" or "15:30" (Today's time)
@@ -96,7 +74,7 @@ def parse_osm_date(date_str):
     # Format "15/03/2026", "13 Mar", or similar dates
     try:
         from dateutil import parser
-        parsed = parser.parse(date_str, fuzzy=True)
+        parsed = parser.parse(date_str, fuzzy=True, default=now.replace(hour=0, minute=0, second=0, microsecond=0))
         return parsed
     except:
         pass
@@ -198,179 +176,171 @@ def resolve_active_leagues(fichajes_data, all_leagues_data, league_details_data,
 
     return active_leagues_list
 
-def find_matching_active_league(conn, user_id, dashboard_name, current_managers_dict, excluded_ids=None):
+def prefetch_league_candidates(conn, user_id, dashboard_names):
     """
-    Busca una liga existente en TODA la BD que coincida con el fingerprint de managers.
-    Prioridad: 1) usuario ya vinculado (re-ejecución), 2) ratio de managers > 50%.
-    Nunca asigna a una liga con managers vacíos para evitar mezclar rooms distintos.
+    Ligas activas del usuario con los nombres del dashboard, en UNA consulta.
+    Devuelve {nombre: [{id, teams}, ...]}. Las instancias a las que el usuario
+    aún no está vinculado se buscan por huella de managers (league_fingerprints).
     """
-    if excluded_ids is None: excluded_ids = set()
-
+    names = list({n for n in dashboard_names if n})
+    if not names:
+        return {}
     with conn.cursor() as cur:
-        sql = """
-            SELECT DISTINCT ON (l.id) l.id, ul.managers_by_team, ul.user_id AS linked_user_id
+        cur.execute("""
+            SELECT l.id, l.name, l.teams
             FROM leagues l
             JOIN user_leagues ul ON ul.league_id = l.id
-            WHERE l.name = %s AND ul.is_active = TRUE;
-        """
-        cur.execute(sql, (dashboard_name,))
-        candidates = cur.fetchall()
-
-    # Paso 1: si el usuario ya está vinculado a alguna de estas ligas, retornarla
-    # directamente (caso de re-ejecución o actualización periódica).
-    for row in candidates:
-        if row['id'] in excluded_ids:
-            continue
-        if str(row['linked_user_id']) == str(user_id):
-            return row['id'], False  # Ya vinculado, no necesita nuevo link
-
-    # Paso 2: buscar la liga cuyo fingerprint de managers coincida mejor.
-    # NUNCA asignar a una liga con managers vacíos: no podemos distinguir rooms.
-    best_id = None
-    best_ratio = 0.0
-    seen_ids = set()
-
-    for row in candidates:
-        if row['id'] in excluded_ids or row['id'] in seen_ids:
-            continue
-        seen_ids.add(row['id'])
+            WHERE l.name = ANY(%s) AND ul.user_id = %s AND ul.is_active = TRUE;
+        """, (names, user_id))
+        rows = cur.fetchall()
 
-        saved_mgrs_clean = {
-            k: v for k, v in (row['managers_by_team'] or {}).items()
-            if v and v != "N/A"
-        }
+    candidates = defaultdict(list)
+    for row in rows:
+        candidates[row['name']].append({"id": row['id'], "teams": row['teams']})
+    return dict(candidates)
 
-        if not saved_mgrs_clean:
-            # Sin managers guardados no podemos confirmar que es el mismo room.
-            continue
-
-        matches = sum(1 for team, mgr in saved_mgrs_clean.items()
-                      if current_managers_dict.get(team) == mgr)
-        ratio = matches / len(saved_mgrs_clean)
-
-        if ratio > best_ratio:
-            best_ratio = ratio
-            best_id = row['id']
-
-    # Requerir al menos 50% de coincidencia para considerar que es el mismo room.
-    if best_id and best_ratio > 0.50:
-        return best_id, True  # Liga encontrada, hay que vincular al usuario
+def find_matching_active_league(conn, dashboard_name, current_managers_dict, linked, excluded_ids=None):
+    """
+    Busca la liga existente que corresponde a la clasificación scrapeada.
+    Prioridad: 1) usuario ya vinculado (re-ejecución), 2) huella de managers > 50%.
+    Nunca asigna a una liga con managers vacíos para evitar mezclar rooms distintos.
+    linked: ligas del usuario con ese nombre (prefetch_league_candidates).
+    Devuelve (league_id, needs_link, teams) o (None, False, None).
+    """
+    if excluded_ids is None: excluded_ids = set()
 
-    return None, False
+    # Paso 1: si el usuario ya está vinculado a alguna de estas ligas, retornarla
+    # directamente (caso de re-ejecución o actualización periódica).
+    for row in linked:
+        if row['id'] not in excluded_ids:
+            return row['id'], False, row['teams']  # Ya vinculado, no necesita nuevo link
+
+    # Paso 2: la liga cuya huella de managers coincida mejor (consulta indexada).
+    match = match_league(conn, dashboard_name, current_managers_dict, excluded_ids)
+    if match:
+        league_id, ratio, teams = match
+        print(f"    🔎 Huella de managers: liga {league_id} ({ratio:.0%} coincidencia)")
+        return league_id, True, teams  # Liga encontrada, hay que vincular al usuario
+
+    return None, False, None
+
+def _merge_new_teams(existing_teams, standings):
+    """Equipos guardados + los clubs de la clasificación que falten. None si no hay ninguno nuevo."""
+    if isinstance(existing_teams, str):
+        try: existing_teams = json.loads(existing_teams)
+        except json.JSONDecodeError: existing_teams = []
+    teams = list(existing_teams or [])
+    known = {t.get("name", t.get("Club")) for t in teams}
+    added = False
+    for s in standings:
+        club_name = s.get("Club")
+        if club_name and club_name not in known:
+            teams.append({"name": club_name, "initialValue": 0, "fixedIncomePerRound": 0})
+            known.add(club_name)
+            added = True
+    return teams if added else None
 
 def sync_leagues_smart(conn, active_leagues_list, all_leagues_data, user_id, standings_data):
+    """
+    Resuelve el ID de cada liga activa y la vincula al usuario en UNA transacción:
+    las candidatas se leen con una sola consulta y los vínculos, renombrados,
+    equipos nuevos y last_scraped_at se escriben en bloque al final.
+    """
     print("\n🔄 Sincronizando IDs de ligas...")
     
     processed_leagues = []
     confirmed_ids = set()
+    candidates_by_name = prefetch_league_candidates(
+        conn, user_id, [item["dashboard_name"] for item in active_leagues_list])
 
-    for item in active_leagues_list:
-        dash_name = item["dashboard_name"]
-        off_name = item["official_name"]
-        idx = item["data_index"]
-        
-        # Recuperar datos usando el índice
-        ls_data = standings_data[idx]
-        
-        curr_mgrs_dict = {}
-        for t in ls_data.get("standings", []):
-            m = t.get("Manager", "N/A")
-            if m and m != "N/A": 
-                curr_mgrs_dict[t["Club"]] = m
-        
-        matched_id, needs_link = find_matching_active_league(conn, user_id, dash_name, curr_mgrs_dict, confirmed_ids)
-        
-        final_id = None
-        
-        if matched_id:
-            print(f"    ✅ [{idx}] Liga existente ID {matched_id}." + (" (Vinculando usuario)" if needs_link else ""))
-            final_id = matched_id
-            with conn.cursor() as cur:
-                if needs_link:
-                    # Usuario nuevo en esta liga global, crear vínculo
-                    cur.execute("""
-                        INSERT INTO user_leagues (user_id, league_id, is_active, last_scraped_at)
-                        VALUES (%s, %s, TRUE, NOW())
-                        ON CONFLICT (user_id, league_id) DO UPDATE SET is_active = TRUE, last_scraped_at = NOW()
-                    """, (user_id, final_id))
-                else:
-                    # Asegurarnos de que el vínculo esté activo
-                    cur.execute("UPDATE user_leagues SET is_active = TRUE WHERE user_id = %s AND league_id = %s", (user_id, final_id))
-                    
-                cur.execute("UPDATE leagues SET name = %s WHERE id = %s", (dash_name, final_id))
-                
-                # Actualizar la lista de equipos (teams) si hay nuevos
-                cur.execute("SELECT teams FROM leagues WHERE id = %s", (final_id,))
-                row = cur.fetchone()
-                existing_teams = []
-                if row and row[0]:
-                    try:
-                        existing_teams = json.loads(row[0]) if isinstance(row[0], str) else row[0]
-                    except Exception:
-                        existing_teams = []
-                
-                existing_team_names = {t.get("name", t.get("Club")) for t in existing_teams}
-                added_new_teams = False
-                
-                for s in ls_data.get("standings", []):
-                    club_name = s.get("Club")
-                    if club_name and club_name not in existing_team_names:
-                        existing_teams.append({
-                            "name": club_name,
-                            "initialValue": 0,
-                            "fixedIncomePerRound": 0
-                        })
-                        existing_team_names.add(club_name)
-                        added_new_teams = True
-                
-                if added_new_teams:
-                    cur.execute("UPDATE leagues SET teams = %s WHERE id = %s", (json.dumps(existing_teams), final_id))
+    links = []          # ligas (existentes o nuevas) a vincular/activar para el usuario
+    renames = []        # (nombre, id)
+    teams_updates = []  # (teams json, id)
+    existing_ids = []   # ligas existentes: last_scraped_at de TODOS sus usuarios
 
-                # Actualizar last_scraped_at para TODOS los usuarios de esta liga
-                cur.execute("UPDATE user_leagues SET last_scraped_at = NOW() WHERE league_id = %s", (final_id,))
-            conn.commit()
-        else:
-            print(f"    ✨ [{idx}] Creando NUEVA instancia para '{dash_name}'...")
+    with conn.cursor() as cur:
+        for item in active_leagues_list:
+            dash_name = item["dashboard_name"]
+            off_name = item["official_name"]
+            idx = item["data_index"]
             
-            league_info_db = next((l for l in all_leagues_data if l.get('league_name') == off_name), None)
-            raw_clubs = league_info_db.get("clubs", []) if league_info_db else []
+            # Recuperar datos usando el índice
+            ls_data = standings_data[idx]
             
-            if not raw_clubs:
-                raw_clubs = [{"name": t["Club"], "initialValue": 0} for t in ls_data.get("standings", [])]
+            curr_mgrs_dict = {}
+            for t in ls_data.get("standings", []):
+                m = t.get("Manager", "N/A")
+                if m and m != "N/A": 
+                    curr_mgrs_dict[t["Club"]] = m
+            
+            matched_id, needs_link, matched_teams = find_matching_active_league(
+                conn, dash_name, curr_mgrs_dict, candidates_by_name.get(dash_name, []), confirmed_ids)
+            
+            if matched_id:
+                print(f"    ✅ [{idx}] Liga existente ID {matched_id}." + (" (Vinculando usuario)" if needs_link else ""))
+                final_id = matched_id
+                links.append(final_id)
+                renames.append((dash_name, final_id))
+                existing_ids.append(final_id)
+                # Actualizar la lista de equipos (teams) si hay nuevos
+                new_teams = _merge_new_teams(matched_teams, ls_data.get("standings", []))
+                if new_teams is not None:
+                    teams_updates.append((json.dumps(new_teams), final_id))
+            else:
+                print(f"    ✨ [{idx}] Creando NUEVA instancia para '{dash_name}'...")
+                
+                league_info_db = next((l for l in all_leagues_data if l.get('league_name') == off_name), None)
+                raw_clubs = league_info_db.get("clubs", []) if league_info_db else []
+                
+                if not raw_clubs:
+                    raw_clubs = [{"name": t["Club"], "initialValue": 0} for t in ls_data.get("standings", [])]
 
-            teams_db = []
-            for c in raw_clubs:
-                c_name = c.get("name") or c.get("Club")
-                c_val = c.get("initialValue") or parse_value_string(c.get("squad_value", "0"))
-                teams_db.append({"name": c_name, "initialValue": c_val, "fixedIncomePerRound": 0})
+                teams_db = []
+                for c in raw_clubs:
+                    c_name = c.get("name") or c.get("Club")
+                    c_val = c.get("initialValue") or parse_millions(c.get("squad_value", "0"))
+                    teams_db.append({"name": c_name, "initialValue": c_val, "fixedIncomePerRound": 0})
 
-            with conn.cursor() as cur:
+                # Liga nueva (caso raro): necesita su id antes de seguir
                 cur.execute(
                     "INSERT INTO leagues (name, teams) VALUES (%s, %s) RETURNING id;",
                     (dash_name, json.dumps(teams_db))
                 )
                 final_id = cur.fetchone()['id']
-                cur.execute(
-                    "INSERT INTO user_leagues (user_id, league_id, is_active, last_scraped_at) VALUES (%s, %s, TRUE, NOW())",
-                    (user_id, final_id)
-                )
-            conn.commit()
+                links.append(final_id)
 
-        confirmed_ids.add(final_id)
-        
-        # Agregamos el ID al objeto y lo guardamos en la lista final
-        item["league_id"] = final_id
-        processed_leagues.append(item)
-
-    # Limpieza
-    with conn.cursor() as cur:
-        cur.execute("SELECT league_id FROM user_leagues WHERE user_id = %s AND is_active = TRUE", (user_id,))
-        active_db_ids = {row['league_id'] for row in cur.fetchall()}
-        ids_to_deactivate = active_db_ids - confirmed_ids
+            confirmed_ids.add(final_id)
+            
+            # Agregamos el ID al objeto y lo guardamos en la lista final
+            item["league_id"] = final_id
+            processed_leagues.append(item)
+
+        if links:
+            psycopg2.extras.execute_values(cur, """
+                INSERT INTO user_leagues (user_id, league_id, is_active, last_scraped_at)
+                VALUES %s
+                ON CONFLICT (user_id, league_id) DO UPDATE SET is_active = TRUE, last_scraped_at = NOW();
+            """, [(user_id, league_id) for league_id in links], template="(%s, %s, TRUE, NOW())")
+        if renames:
+            psycopg2.extras.execute_batch(
+                cur, "UPDATE leagues SET name = %s WHERE id = %s AND name IS DISTINCT FROM %s",
+                [(name, league_id, name) for name, league_id in renames])
+        if teams_updates:
+            psycopg2.extras.execute_batch(cur, "UPDATE leagues SET teams = %s WHERE id = %s", teams_updates)
+        if existing_ids:
+            # Actualizar last_scraped_at para TODOS los usuarios de estas ligas
+            cur.execute("UPDATE user_leagues SET last_scraped_at = NOW() WHERE league_id = ANY(%s)", (existing_ids,))
+
+        # Limpieza
+        cur.execute("""
+            UPDATE user_leagues SET is_active = FALSE
+            WHERE user_id = %s AND is_active = TRUE AND NOT (league_id = ANY(%s))
+            RETURNING league_id
+        """, (user_id, list(confirmed_ids)))
+        ids_to_deactivate = {row['league_id'] for row in cur.fetchall()}
         if ids_to_deactivate:
             print(f"    ❄️ Archivando ligas no detectadas: {ids_to_deactivate}")
-            cur.execute("UPDATE user_leagues SET is_active = FALSE WHERE user_id = %s AND league_id IN %s", (user_id, tuple(ids_to_deactivate)))
-            conn.commit()
+    conn.commit()
 
     return processed_leagues
 
@@ -379,8 +349,9 @@ def sync_leagues_smart(conn, active_leagues_list, all_leagues_data, user_id, sta
 # ==========================================
 
 def sync_league_details(conn, standings_data, squad_values_data, processed_leagues, user_id):
-    """Sincroniza detalles de liga para TODOS los usuarios vinculados."""
+    """Sincroniza detalles de liga para TODOS los usuarios vinculados y su huella de managers."""
     print("\n🔄 Sincronizando detalles...")
+    managers_by_league = {}
     with conn.cursor() as cur:
         for item in processed_leagues:
             idx = item["data_index"]
@@ -397,6 +368,8 @@ def sync_league_details(conn, standings_data, squad_values_data, processed_leagu
             # Actualizar para TODOS los usuarios vinculados a esta liga (no solo el actual)
             sql = "UPDATE user_leagues SET standings=%s, squad_values=%s, managers_by_team=%s WHERE league_id=%s"
             cur.execute(sql, (json.dumps(standings), json.dumps(squad_vals), json.dumps(mgrs), league_id))
+            managers_by_league[league_id] = mgrs
+        save_fingerprints(cur, managers_by_league)
     conn.commit()
 
 def find_data_for_team(data_list, team_name, league_name=None):
@@ -414,7 +387,7 @@ def find_data_for_team(data_list, team_name, league_name=None):
             return block
     return None
 
-def translate_and_group_transfers(fichajes_data, processed_leagues):
+def translate_and_group_transfers(fichajes_data, processed_leagues, scraped_at=None):
     grouped = defaultdict(list)
     processed_keys = set()
 
@@ -452,9 +425,9 @@ def translate_and_group_transfers(fichajes_data, processed_leagues):
                     "transactionType": ttype,
                     "position": transfer.get("Position"),
                     "round": int(transfer.get("Gameweek", 0)),
-                    "baseValue": parse_value_string(transfer.get("Value")),
-                    "finalPrice": parse_value_string(transfer.get("Price")),
-                    "createdAt": parse_osm_date(transfer.get("Date"))
+                    "baseValue": parse_millions(transfer.get("Value")),
+                    "finalPrice": parse_millions(transfer.get("Price")),
+                    "createdAt": parse_osm_date(transfer.get("Date"), scraped_at)
                 })
             except: continue
     return dict(grouped)
@@ -462,150 +435,134 @@ def translate_and_group_transfers(fichajes_data, processed_leagues):
 def sync_transfer_list(conn, transfer_list_data, processed_leagues, user_id, ts):
     # Transfer list son datos compartidos de la liga
     print(f"  - Sincronizando mercado...")
-    with conn.cursor() as cur:
-        for item in processed_leagues:
-            league_id = item["league_id"]
-            managed_team = item.get("managed_team", "")
-            
-            team_block = find_data_for_team(transfer_list_data, managed_team, item.get("dashboard_name"))
-            if not team_block: continue
-            
-            players = team_block.get("players_on_sale", [])
-
-            # Archivar viejos solo para ESTA liga
-            cur.execute("UPDATE public.transfer_list_players SET is_active = FALSE WHERE league_id=%s AND is_active=TRUE", (league_id,))
-            
-            if not players: continue
+    scraped_league_ids = []
+    data = []
+    for item in processed_leagues:
+        league_id = item["league_id"]
+        managed_team = item.get("managed_team", "")
+        
+        team_block = find_data_for_team(transfer_list_data, managed_team, item.get("dashboard_name"))
+        if not team_block: continue
+        scraped_league_ids.append(league_id)
+        
+        players = team_block.get("players_on_sale", [])
+        if not players: continue
 
-            unique = {}
-            for p in players: unique[(p['name'], p['seller_manager'])] = p
-            
-            data = [
-                (league_id, p['name'], p['seller_manager'], p.get('nationality', 'N/A'),
-                 p['position'], p['age'], p['seller_team'], p['attack'], p['defense'], p['overall'], 
-                 p['price'], p.get('value', 0), ts, ts, True) 
-                for p in unique.values()
-            ]
+        unique = {}
+        for p in players: unique[(p['name'], p['seller_manager'])] = p
+        
+        data.extend(
+            (league_id, p['name'], p['seller_manager'], p.get('nationality', 'N/A'),
+             p['position'], p['age'], p['seller_team'], p['attack'], p['defense'], p['overall'], 
+             p['price'], p.get('value', 0), ts, ts, True) 
+            for p in unique.values()
+        )
+        print(f"    - Liga ID {league_id}: {len(unique)} en venta.")
 
-            sql = """
-                INSERT INTO public.transfer_list_players (
-                    league_id, name, seller_manager, nationality, position, age, 
-                    seller_team, attack, defense, overall, price, base_value, 
-                    scrape_id, scraped_at, is_active
-                ) VALUES %s
-                ON CONFLICT (league_id, name, seller_manager)
-                DO UPDATE SET
-                    price=EXCLUDED.price, base_value=EXCLUDED.base_value, 
-                    scraped_at=EXCLUDED.scraped_at, is_active=TRUE;
-            """
-            psycopg2.extras.execute_values(cur, sql, data)
-            print(f"    - Liga ID {league_id}: {len(data)} en venta.")
+    with conn.cursor() as cur:
+        # Archivar viejos solo para las ligas leídas
+        if scraped_league_ids:
+            cur.execute("UPDATE public.transfer_list_players SET is_active = FALSE WHERE league_id = ANY(%s) AND is_active=TRUE",
+                        (scraped_league_ids,))
+        if data:
+            stats = copy_upsert(
+                cur, "transfer_list_players",
+                ("league_id", "name", "seller_manager", "nationality", "position", "age",
+                 "seller_team", "attack", "defense", "overall", "price", "base_value",
+                 "scrape_id", "scraped_at", "is_active"),
+                data,
+                conflict=("league_id", "name", "seller_manager"),
+                update=("price", "base_value", "scraped_at", "is_active = TRUE"),
+            )
+            print(format_ingest_stats("Mercado", stats))
     conn.commit()
 
+def sync_squads(conn, squad_data, processed_leagues, user_id, scraped_at=None):
+    """Guarda las plantillas del pipeline en squad_snapshots (solo jugadores con cambios)."""
+    print("  - Sincronizando plantillas...")
+    squads = []
+    for item in processed_leagues:
+        team_block = find_data_for_team(squad_data, item.get("managed_team", ""), item.get("dashboard_name"))
+        if not team_block:
+            continue
+        squads.append({
+            "league_id": item["league_id"],
+            "team_name": team_block["team_name"],
+            "matchday":  team_block.get("matchday"),
+            "players":   team_block.get("players", []),
+        })
+    save_squad_snapshots(conn, user_id, squads, scraped_at)
+
+_MATCH_COLUMNS = (
+    "user_id", "league_id", "round", "home_team", "home_manager", "away_team", "away_manager",
+    "home_goals", "away_goals", "events", "statistics", "ratings", "referee", "referee_strictness",
+)
+_MATCH_KEY = ("league_id", "round", "home_team", "away_team")
+
 def sync_matches(conn, matches_data, processed_leagues, user_id):
     print("\n⚽ Sincronizando resultados de partidos...")
-    with conn.cursor() as cur:
-        for item in processed_leagues:
-            league_id = item["league_id"]
-            managed_team = item.get("managed_team", "")
-            
-            matches_info = find_data_for_team(matches_data, managed_team, item.get("dashboard_name"))
-            if not matches_info or "matches" not in matches_info: continue
-
-            data_tuples = []
-            for m in matches_info["matches"]:
-                # FIX: Invertir orden de tarjetas visitantes (Away Cards) para corregir visualización en App
-                # El usuario reporta que las amarillas salen como rojas. Invertimos "X Y" a "Y X".
-                if 'statistics' in m and 'Cards' in m['statistics'] and 'away' in m['statistics']['Cards']:
-                    val = str(m['statistics']['Cards']['away']).strip()
-                    parts = val.split()
-                    if len(parts) == 2:
-                        m['statistics']['Cards']['away'] = f"{parts[1]} {parts[0]}"
-
-                data_tuples.append((
-                    user_id, league_id, m['round'], m['home_team'], m['home_manager'], 
-                    m['away_team'], m['away_manager'], m['home_goals'], m['away_goals'], 
-                    json.dumps(m['events']), json.dumps(m['statistics']), json.dumps(m['ratings']),
-                    m.get('referee'), m.get('referee_strictness')
-                ))
-            
-            if data_tuples:
-                # Deduplicate to avoid CardinalityViolation (ON CONFLICT constraint)
-                # Key: (league_id, round, home_team, away_team)
-                seen = set()
-                unique_tuples = []
-                for dt in data_tuples:
-                    # dt structure: (user_id, league_id, round, home, h_mgr, away, a_mgr, ...)
-                    # Indices: league_id=1, round=2, home=3, away=5
-                    key = (dt[1], dt[2], dt[3], dt[5])
-                    if key not in seen:
-                        seen.add(key)
-                        unique_tuples.append(dt)
-
-                sql = """
-                    INSERT INTO public.matches (
-                        user_id, league_id, round, home_team, home_manager, away_team, away_manager,
-                        home_goals, away_goals, events, statistics, ratings, referee, referee_strictness
-                    ) VALUES %s
-                    ON CONFLICT (league_id, round, home_team, away_team) 
-                    DO UPDATE SET
-                        user_id = EXCLUDED.user_id,
-                        home_manager = EXCLUDED.home_manager, away_manager = EXCLUDED.away_manager,
-                        home_goals = EXCLUDED.home_goals, away_goals = EXCLUDED.away_goals,
-                        events = EXCLUDED.events, statistics = EXCLUDED.statistics, ratings = EXCLUDED.ratings,
-                        referee = EXCLUDED.referee, referee_strictness = EXCLUDED.referee_strictness;
-                """
-                psycopg2.extras.execute_values(cur, sql, unique_tuples)
-                print(f"  - Liga ID {league_id}: {len(unique_tuples)} partidos.")
-                
-    conn.commit()
+    all_full, all_cached = [], []
+    for item in processed_leagues:
+        league_id = item["league_id"]
+        managed_team = item.get("managed_team", "")
+        
+        matches_info = find_data_for_team(matches_data, managed_team, item.get("dashboard_name"))
+        if not matches_info or "matches" not in matches_info: continue
+
+        data_tuples = []
+        cached_keys = set()
+        for m in matches_info["matches"]:
+            if m.get("details_cached"):
+                cached_keys.add((league_id, m['round'], m['home_team'], m['away_team']))
+            # FIX: Invertir orden de tarjetas visitantes (Away Cards) para corregir visualización en App
+            # El usuario reporta que las amarillas salen como rojas. Invertimos "X Y" a "Y X".
+            if 'statistics' in m and 'Cards' in m['statistics'] and 'away' in m['statistics']['Cards']:
+                val = str(m['statistics']['Cards']['away']).strip()
+                parts = val.split()
+                if len(parts) == 2:
+                    m['statistics']['Cards']['away'] = f"{parts[1]} {parts[0]}"
+
+            data_tuples.append((
+                user_id, league_id, m['round'], m['home_team'], m['home_manager'], 
+                m['away_team'], m['away_manager'], m['home_goals'], m['away_goals'], 
+                json.dumps(m['events']), json.dumps(m['statistics']), json.dumps(m['ratings']),
+                m.get('referee'), m.get('referee_strictness')
+            ))
+        
+        if data_tuples:
+            # Deduplicate to avoid CardinalityViolation (ON CONFLICT constraint)
+            # Key: (league_id, round, home_team, away_team)
+            seen = set()
+            unique_tuples = []
+            for dt in data_tuples:
+                # dt structure: (user_id, league_id, round, home, h_mgr, away, a_mgr, ...)
+                # Indices: league_id=1, round=2, home=3, away=5
+                key = (dt[1], dt[2], dt[3], dt[5])
+                if key not in seen:
+                    seen.add(key)
+                    unique_tuples.append(dt)
+
+            # Partidos sin modal (detalles ya en BD): solo marcador y managers
+            cached_tuples = [dt for dt in unique_tuples if (dt[1], dt[2], dt[3], dt[5]) in cached_keys]
+            unique_tuples = [dt for dt in unique_tuples if (dt[1], dt[2], dt[3], dt[5]) not in cached_keys]
+            all_cached.extend(cached_tuples)
+            all_full.extend(unique_tuples)
+            print(f"  - Liga ID {league_id}: {len(unique_tuples)} partidos"
+                  + (f" (+{len(cached_tuples)} sin cambios en detalles)." if cached_tuples else "."))
 
-def ensure_tactics_table_exists(conn):
-    """Auto-migration: Create match_tactics table if it doesn't exist."""
     with conn.cursor() as cur:
-        cur.execute("""
-            SELECT to_regclass('public.match_tactics');
-        """)
-        if cur.fetchone()[0] is None:
-            print("🔧 Migrando BD: Creando tabla 'match_tactics'...")
-            cur.execute("""
-                CREATE TABLE public.match_tactics (
-                    id SERIAL PRIMARY KEY,
-                    user_id UUID NOT NULL,
-                    league_id INTEGER NOT NULL REFERENCES leagues(id),
-                    round INTEGER NOT NULL,
-                    team_name VARCHAR(255) NOT NULL,
-                    
-                    -- Tácticas básicas
-                    game_plan VARCHAR(50),
-                    tackling VARCHAR(50),
-                    
-                    -- Sliders (0-100)
-                    pressure INTEGER,
-                    mentality INTEGER,
-                    tempo INTEGER,
-                    
-                    -- Tácticas de línea
-                    forwards_tactic VARCHAR(50),
-                    midfielders_tactic VARCHAR(50),
-                    defenders_tactic VARCHAR(50),
-                    
-                    -- Configuración adicional
-                    offside_trap BOOLEAN DEFAULT FALSE,
-                    marking VARCHAR(50),
-                    
-                    -- Metadatos
-                    scraped_at TIMESTAMP DEFAULT NOW(),
-                    
-                    -- Constraint para evitar duplicados
-                    CONSTRAINT unique_match_tactics UNIQUE (league_id, round, team_name)
-                );
-                
-                CREATE INDEX idx_tactics_league_round ON match_tactics(league_id, round);
-                CREATE INDEX idx_tactics_user ON match_tactics(user_id);
-            """)
-            conn.commit()
-            print("✅ Tabla 'match_tactics' creada correctamente.")
+        if all_cached:
+            stats = copy_upsert(cur, "matches", _MATCH_COLUMNS, all_cached, conflict=_MATCH_KEY, update=(
+                "user_id", "home_manager", "away_manager", "home_goals", "away_goals",
+            ))
+            print(format_ingest_stats("Partidos (solo marcador)", stats))
+        if all_full:
+            stats = copy_upsert(cur, "matches", _MATCH_COLUMNS, all_full, conflict=_MATCH_KEY, update=(
+                "user_id", "home_manager", "away_manager", "home_goals", "away_goals",
+                "events", "statistics", "ratings", "referee", "referee_strictness",
+            ))
+            print(format_ingest_stats("Partidos", stats))
+    conn.commit()
 
 def sync_tactics(conn, tactics_data, processed_leagues, user_id, current_round_map):
     """
@@ -619,7 +576,6 @@ def sync_tactics(conn, tactics_data, processed_leagues, user_id, current_round_m
         current_round_map: Diccionario {league_name: round} con la jornada actual de cada liga
     """
     print("\n🎯 Sincronizando tácticas...")
-    ensure_tactics_table_exists(conn)
     
     with conn.cursor() as cur:
         for item in processed_leagues:
@@ -682,35 +638,6 @@ def sync_tactics(conn, tactics_data, processed_leagues, user_id, current_round_m
     
     conn.commit()
 
-def ensure_scheduled_tasks_table_exists(conn):
-    """Auto-migration: Create scheduled_scrape_tasks table if it doesn't exist."""
-    with conn.cursor() as cur:
-        cur.execute("""
-            SELECT to_regclass('public.scheduled_scrape_tasks');
-        """)
-        if cur.fetchone()[0] is None:
-            print("🔧 Migrando BD: Creando tabla 'scheduled_scrape_tasks'...")
-            cur.execute("""
-                CREATE TABLE public.scheduled_scrape_tasks (
-                    id SERIAL PRIMARY KEY,
-                    user_id UUID NOT NULL,
-                    task_type VARCHAR(50) NOT NULL,
-                    scheduled_at TIMESTAMP NOT NULL,
-                    status VARCHAR(20) DEFAULT 'pending',
-                    metadata JSONB,
-                    created_at TIMESTAMP DEFAULT NOW(),
-                    executed_at TIMESTAMP,
-                    
-                    CONSTRAINT unique_pending_task UNIQUE (user_id, task_type, scheduled_at)
-                );
-                
-                CREATE INDEX idx_scheduled_tasks_pending ON scheduled_scrape_tasks(scheduled_at) 
-                    WHERE status = 'pending';
-                CREATE INDEX idx_scheduled_tasks_user ON scheduled_scrape_tasks(user_id);
-            """)
-            conn.commit()
-            print("✅ Tabla 'scheduled_scrape_tasks' creada correctamente.")
-
 def schedule_tactics_scrape(conn, user_id, next_match_info, processed_leagues):
     """
     Programa tareas de scraping de tácticas basándose en los próximos partidos.
@@ -722,7 +649,6 @@ def schedule_tactics_scrape(conn, user_id, next_match_info, processed_leagues):
         processed_leagues: Lista de ligas procesadas
     """
     print("\n📅 Programando scraping de tácticas...")
-    ensure_scheduled_tasks_table_exists(conn)
     
     # Crear un mapa de league_name -> league_id
     league_id_map = {item["dashboard_name"]: item["league_id"] for item in processed_leagues}
@@ -819,42 +745,10 @@ def mark_tactics_task_complete(conn, task_id):
 # 4. SEGURIDAD Y ORQUESTACIÓN
 # ==========================================
 
-def ensure_calendar_column_exists(conn):
-    """Auto-migration: Ensure user_leagues table has calendar_scraped column."""
-    with conn.cursor() as cur:
-        # Check if column exists
-        cur.execute("""
-            SELECT column_name 
-            FROM information_schema.columns 
-            WHERE table_name='user_leagues' AND column_name='calendar_scraped';
-        """)
-        if not cur.fetchone():
-            print("🔧 Migrando BD: Agregando columna 'calendar_scraped'...")
-            cur.execute("ALTER TABLE user_leagues ADD COLUMN calendar_scraped BOOLEAN DEFAULT FALSE;")
-            conn.commit()
-
-def ensure_matches_columns_exist(conn):
-    """Auto-migration: Ensure matches table has referee columns."""
-    with conn.cursor() as cur:
-        # 1. Check referee
-        cur.execute("SELECT column_name FROM information_schema.columns WHERE table_name='matches' AND column_name='referee';")
-        if not cur.fetchone():
-            print("🔧 Migrando BD: Agregando columna 'referee'...")
-            cur.execute("ALTER TABLE matches ADD COLUMN referee VARCHAR(255);")
-        
-        # 2. Check strictness
-        cur.execute("SELECT column_name FROM information_schema.columns WHERE table_name='matches' AND column_name='referee_strictness';")
-        if not cur.fetchone():
-            print("🔧 Migrando BD: Agregando columna 'referee_strictness'...")
-            cur.execute("ALTER TABLE matches ADD COLUMN referee_strictness VARCHAR(50);")
-        conn.commit()
-
 def check_if_calendar_needed(conn, user_id):
     """
     Returns True if any active league for the user has not scraped the calendar yet.
     """
-    ensure_calendar_column_exists(conn)
-    ensure_matches_columns_exist(conn) # Ensure matches schema is ready too
     with conn.cursor() as cur:
         cur.execute("""
             SELECT 1 FROM user_leagues 
@@ -863,6 +757,68 @@ def check_if_calendar_needed(conn, user_id):
         """, (user_id,))
         return cur.fetchone() is not None
 
+def _drop_shared_names(conn, user_id, by_name: dict) -> dict:
+    """
+    Quita los nombres de liga que corresponden a más de una liga activa del
+    usuario (dos rooms con el mismo nombre): el scraper solo ve el nombre y
+    no sabe cuál es cuál, así que esas ligas se leen completas.
+    """
+    with conn.cursor() as cur:
+        cur.execute("""
+            SELECT LOWER(l.name) AS league_name
+            FROM user_leagues ul
+            JOIN leagues l ON l.id = ul.league_id
+            WHERE ul.user_id = %s AND ul.is_active = TRUE
+            GROUP BY LOWER(l.name)
+            HAVING COUNT(*) > 1;
+        """, (user_id,))
+        for row in cur.fetchall():
+            by_name.pop(row["league_name"], None)
+    return by_name
+
+def get_transfer_watermarks(conn, user_id):
+    """
+    Marca de agua del historial de fichajes por liga activa del usuario:
+    última jornada con fichajes en BD y las claves (jornada, jugador, precio)
+    de esa jornada. Indexado por nombre de liga en minúsculas (leagues.name es
+    el nombre del dashboard). Las ligas sin fichajes o con el nombre repetido
+    no aparecen → historial completo.
+    """
+    with conn.cursor() as cur:
+        cur.execute("""
+            SELECT l.name AS league_name, t.round, t.player_name, t.final_price
+            FROM user_leagues ul
+            JOIN leagues l ON l.id = ul.league_id
+            JOIN transfers t ON t.league_id = ul.league_id
+            WHERE ul.user_id = %s AND ul.is_active = TRUE
+              AND t.round = (SELECT MAX(round) FROM transfers WHERE league_id = ul.league_id);
+        """, (user_id,))
+        watermarks = {}
+        for row in cur.fetchall():
+            wm = watermarks.setdefault(row["league_name"].lower(), {"round": row["round"], "keys": set()})
+            wm["keys"].add((row["round"], row["player_name"], round(float(row["final_price"] or 0), 2)))
+    return _drop_shared_names(conn, user_id, watermarks)
+
+def get_known_match_details(conn, user_id):
+    """
+    Partidos que ya tienen eventos en public.matches, por liga activa del usuario:
+    {league_name.lower(): {(round, home_team, away_team)}}. El scraper no abre su modal.
+    Los nombres de liga repetidos no aparecen (se abren todos sus detalles).
+    """
+    with conn.cursor() as cur:
+        cur.execute("""
+            SELECT l.name AS league_name, m.round, m.home_team, m.away_team
+            FROM user_leagues ul
+            JOIN leagues l ON l.id = ul.league_id
+            JOIN public.matches m ON m.league_id = ul.league_id
+            WHERE ul.user_id = %s AND ul.is_active = TRUE
+              AND m.events IS NOT NULL AND m.events::text NOT IN ('[]', 'null');
+        """, (user_id,))
+        known = {}
+        for row in cur.fetchall():
+            known.setdefault(row["league_name"].lower(), set()).add((row["round"], row["home_team"], row["away_team"]))
+    return _drop_shared_names(conn, user_id, known)
+
 def mark_calendar_as_scraped(conn, user_id, processed_leagues):
     """Mark synced leagues as calendar_scraped = True"""
     if not processed_leagues: return
@@ -899,112 +855,53 @@ def invalidate_user_credentials(conn, user_id):
 def upload_data_to_postgres(conn, grouped_transfers, user_id):
     # Transfers son datos compartidos de la liga, no necesitan user_id
     print("\n📦 Sincronizando fichajes...")
-    with conn.cursor() as cur:
-        for league_id, transfers in grouped_transfers.items():
-            if not transfers: continue
-            
-            unique_batch = {}
-            for t in transfers:
-                key = (league_id, t['round'], t['playerName'], t['managerName'], t['finalPrice'])
-                unique_batch[key] = t
-            
-            data = [
-                (league_id, t['playerName'], t['managerName'], t['transactionType'],
-                 t['position'], t['round'], t['baseValue'], t['finalPrice'], t['createdAt'],
-                 t['seller_manager'], t['buyer_manager'], t['from_text'], t['to_text']) 
-                for t in unique_batch.values()
-            ]
-            
-            sql = """
-                INSERT INTO transfers (league_id, player_name, manager_name, transaction_type, position, round, base_value, final_price, created_at, seller_manager, buyer_manager, from_text, to_text) 
-                VALUES %s ON CONFLICT (league_id, round, player_name, manager_name, final_price) 
-                DO UPDATE SET seller_manager=EXCLUDED.seller_manager, buyer_manager=EXCLUDED.buyer_manager;
-            """
-            psycopg2.extras.execute_values(cur, sql, data, page_size=200)
-            print(f"  - Liga ID {league_id}: {len(data)} fichajes.")
+    data = []
+    for league_id, transfers in grouped_transfers.items():
+        if not transfers: continue
+        
+        unique_batch = {}
+        for t in transfers:
+            key = (league_id, t['round'], t['playerName'], t['managerName'], t['finalPrice'])
+            unique_batch[key] = t
+        
+        data.extend(
+            (league_id, t['playerName'], t['managerName'], t['transactionType'],
+             t['position'], t['round'], t['baseValue'], t['finalPrice'], t['createdAt'],
+             t['seller_manager'], t['buyer_manager'], t['from_text'], t['to_text']) 
+            for t in unique_batch.values()
+        )
+        print(f"  - Liga ID {league_id}: {len(unique_batch)} fichajes.")
+
+    if data:
+        with conn.cursor() as cur:
+            stats = copy_upsert(
+                cur, "transfers",
+                ("league_id", "player_name", "manager_name", "transaction_type", "position", "round",
+                 "base_value", "final_price", "created_at", "seller_manager", "buyer_manager",
+                 "from_text", "to_text"),
+                data,
+                conflict=("league_id", "round", "player_name", "manager_name", "final_price"),
+                update=("seller_manager", "buyer_manager"),
+            )
+            print(format_ingest_stats("Fichajes", stats))
     conn.commit()
 
-def run_update_for_user(user_id):
-    print(f"🚀 Iniciando actualización para usuario: {user_id}")
-    
-    conn = get_db_connection()
-    if not conn: return
-    
-    try:
-        needs_calendar = check_if_calendar_needed(conn, user_id)
-        if needs_calendar:
-            print("📅 DETECTADO: Ligas nuevas/pendientes. Se activará el escaneo de calendario.")
-        else:
-            print("⏩ Calendario al día. Se escanearán solo resultados recientes.")
-    except Exception as e:
-        print(f"⚠️ Error verificando estado calendario: {e}")
-        needs_calendar = False
-
-    # 1. Credenciales
-    try:
-        osm_username, osm_password, user_fcm_token = get_osm_credentials(conn, user_id)
-        if not osm_username:
-            print("⚠️ Sin credenciales.")
-            conn.close(); return
-    except Exception as e:
-        print(f"? Error DB: {e}")
-        conn.close(); return
-
-    # Variables para almacenar datos scrapeados
-    transfer_list_data = []
-    fichajes_data = []
-    standings_data = []
-    squad_values_data = []
-    matches_data = []
-    tactics_data = []
-    next_match_info = []
-
-    # 2. Scraping
-    try:
-        scrape_timestamp = datetime.now() 
-        with sync_playwright() as p:
-            browser = launch_playwright_browser(p)
-            
-            try:
-                context, page = login_with_session_cache(
-                    browser, conn, user_id, osm_username, osm_password
-                )
-            except InvalidCredentialsError:
-                print("❌ ERROR FATAL: Credenciales incorrectas.")
-                invalidate_user_credentials(conn, user_id)
-                # Eliminar sesión cacheada inválida
-                try:
-                    with conn.cursor() as cur:
-                        cur.execute("DELETE FROM public.user_browser_sessions WHERE user_id = %s", (user_id,))
-                    conn.commit()
-                except: pass
-                conn.close(); return
-            except Exception as e:
-                print(f"❌ Error durante login: {e}")
-                conn.close(); return
-
-            print("\n[1/4] 📡 Scraping datos principales...")
-            transfer_list_data, fichajes_data = get_market_data(page)
-            standings_data, squad_values_data = get_league_data(page)
-            matches_data = get_match_results(page, scrape_future_fixtures=needs_calendar)
-            
-            print("\n[2/4] ⏱️ Obteniendo info de próximos partidos...")
-            next_match_info = get_next_match_info(page)
-            
-            print("\n[3/4] 🎯 Scraping tácticas actuales...")
-            tactics_data = get_tactics_data(page)
-            
-            print("✅ Scraping OK.")
-            context.close()
-            
-    except Exception as e:
-        print(f"❌ Error scraping: {e}")
-        import traceback
-        traceback.print_exc()
-        return
-
-    # 3. Sincronización
-    print("\n[4/4] 💾 Sincronizando BD...")
+def sync_scraped(user_id, scraped, scrape_timestamp, needs_calendar, notify=True):
+    """
+    Fase de sincronización: vuelca un scrape (run_slot_pipeline) en la BD.
+    Idempotente (todo son upserts), así que se puede repetir con el mismo
+    scrape desde el spool. Devuelve True si terminó.
+    """
+    transfer_list_data = scraped["market"]
+    fichajes_data = scraped["history"]
+    standings_data = scraped["standings"]
+    squad_values_data = scraped["squad_values"]
+    matches_data = scraped["results"]
+    next_match_info = scraped["next_match"]
+    tactics_data = scraped["tactics"]
+    squad_data = scraped["squad"]
+
+    print("\n[2/2] 💾 Sincronizando BD...")
     max_retries = 3
     
     for attempt in range(max_retries):
@@ -1019,7 +916,7 @@ def run_update_for_user(user_id):
             
             if not processed_leagues:
                 print("ℹ️ No hay ligas.")
-                return
+                return True
 
             # B. Sync IDs
             processed_leagues = sync_leagues_smart(conn, processed_leagues, all_leagues_db, user_id, standings_data)
@@ -1028,11 +925,15 @@ def run_update_for_user(user_id):
             sync_league_details(conn, standings_data, squad_values_data, processed_leagues, user_id)
             
             # D. Fichajes
-            grouped = translate_and_group_transfers(fichajes_data, processed_leagues)
+            grouped = translate_and_group_transfers(fichajes_data, processed_leagues, scrape_timestamp)
             upload_data_to_postgres(conn, grouped, user_id)
             
             # E. Mercado
             sync_transfer_list(conn, transfer_list_data, processed_leagues, user_id, scrape_timestamp)
+
+            # E2. Plantillas
+            if squad_data:
+                sync_squads(conn, squad_data, processed_leagues, user_id, scrape_timestamp)
             
             # F. Partidos
             if matches_data:
@@ -1093,12 +994,15 @@ def run_update_for_user(user_id):
                     print("ℹ️ No hay partidos pendientes. No se programan tareas de tácticas.")
             
             # 4. Notificaciones
-            print("\n🔔 Notificaciones...")
-            flat_transfers = [t for sublist in grouped.values() for t in sublist]
-            analyze_and_notify(user_fcm_token, transfer_list_data, flat_transfers, osm_username)
+            if notify:
+                print("\n🔔 Notificaciones...")
+                osm_username, _, user_fcm_token = get_osm_credentials(conn, user_id)
+                flat_transfers = [t for sublist in grouped.values() for t in sublist]
+                analyze_and_notify(user_fcm_token, transfer_list_data, flat_transfers, osm_username)
 
             print("\n✨ FIN.")
-            break
+            print(format_pool_stats())
+            return True
         except Exception as e:
             print(f"❌ Error sync (Intento {attempt+1}): {e}")
             if attempt < max_retries - 1: time.sleep(10)
@@ -1107,6 +1011,121 @@ def run_update_for_user(user_id):
                 traceback.print_exc()
         finally:
             if conn: conn.close()
+    return False
+
+def run_update_for_user(user_id):
+    print(f"🚀 Iniciando actualización para usuario: {user_id}")
+    
+    conn = get_db_connection()
+    if not conn: return
+    ensure_schema(conn)
+    
+    try:
+        needs_calendar = check_if_calendar_needed(conn, user_id)
+        if needs_calendar:
+            print("📅 DETECTADO: Ligas nuevas/pendientes. Se activará el escaneo de calendario.")
+        else:
+            print("⏩ Calendario al día. Se escanearán solo resultados recientes.")
+    except Exception as e:
+        print(f"⚠️ Error verificando estado calendario: {e}")
+        needs_calendar = False
+
+    transfer_watermarks = {}
+    if not TRANSFER_HISTORY_FULL:
+        try:
+            transfer_watermarks = get_transfer_watermarks(conn, user_id)
+            print(f"🔖 Historial de fichajes incremental en {len(transfer_watermarks)} liga(s).")
+        except Exception as e:
+            conn.rollback()
+            print(f"⚠️ Error leyendo marcas de agua de fichajes (historial completo): {e}")
+
+    known_match_details = {}
+    try:
+        known_match_details = get_known_match_details(conn, user_id)
+        print(f"🔖 {sum(len(v) for v in known_match_details.values())} partido(s) con detalles ya guardados.")
+    except Exception as e:
+        conn.rollback()
+        print(f"⚠️ Error leyendo partidos guardados (se abrirán todos los detalles): {e}")
+
+    # 1. Credenciales
+    try:
+        osm_username, osm_password, user_fcm_token = get_osm_credentials(conn, user_id)
+        if not osm_username:
+            print("⚠️ Sin credenciales.")
+            conn.close(); return
+    except Exception as e:
+        print(f"? Error DB: {e}")
+        conn.close(); return
+
+    # 2. Scraping
+    spool_path = None
+    try:
+        scrape_timestamp = datetime.now() 
+        reset_wait_metrics()
+        with sync_playwright() as p:
+            browser = launch_playwright_browser(p)
+            
+            try:
+                context, page = login_with_session_cache(
+                    browser, conn, user_id, osm_username, osm_password
+                )
+            except InvalidCredentialsError:
+                print("❌ ERROR FATAL: Credenciales incorrectas.")
+                invalidate_user_credentials(conn, user_id)
+                # Eliminar sesión cacheada inválida
+                try:
+                    with conn.cursor() as cur:
+                        cur.execute("DELETE FROM public.user_browser_sessions WHERE user_id = %s", (user_id,))
+                    conn.commit()
+                except: pass
+                conn.close(); return
+            except Exception as e:
+                print(f"❌ Error durante login: {e}")
+                conn.close(); return
+
+            # Un solo pase por slot: mercado, historial, clasificación, valores,
+            # resultados, próximo partido, tácticas y plantilla sobre el equipo activo.
+            print("\n[1/2] 📡 Scraping slot a slot (mercado, liga, partidos, próximo partido, tácticas, plantilla)...")
+            scraped = run_slot_pipeline(page, options={
+                "scrape_future_fixtures": needs_calendar,
+                "transfer_watermarks": transfer_watermarks,
+                "full_transfer_history": TRANSFER_HISTORY_FULL,
+                "known_match_details": known_match_details,
+                "refresh_latest_rounds": MATCH_DETAILS_REFRESH_ROUNDS,
+            })
+            try:
+                spool_path = write_spool(user_id, scraped, scrape_timestamp,
+                                         {"needs_calendar": needs_calendar})
+            except (OSError, TypeError) as e:
+                print(f"⚠️ No se pudo guardar el spool (se sincroniza solo en memoria): {e}")
+            
+            print("✅ Scraping OK.")
+            print(format_request_stats(context))
+            print(format_wait_metrics())
+            print(format_tap_stats(page))
+            print(format_direct_stats(page))
+            context.close()
+            
+    except Exception as e:
+        print(f"❌ Error scraping: {e}")
+        import traceback
+        traceback.print_exc()
+        return
+    conn.close()
+
+    # 3. Sincronización DESDE el spool (si falla, se re-sincroniza con replay_spool.py).
+    # Así cada ejecución usa el mismo payload serializado que un replay.
+    if spool_path:
+        try:
+            scraped = read_spool(spool_path)["payload"]
+        except (OSError, ValueError) as e:
+            print(f"⚠️ No se pudo releer el spool (se sincroniza en memoria): {e}")
+    synced = sync_scraped(user_id, scraped, scrape_timestamp, needs_calendar)
+    if spool_path:
+        if synced:
+            mark_synced(spool_path)
+        else:
+            print(f"⚠️ Scrape pendiente de sincronizar: python replay_spool.py {spool_path}")
 
 if __name__ == "__main__":
     init_firebase_admin()
@@ -0,0 +1,248 @@
+# scrape_pipeline.py
+"""
+Pipeline de scraping slot a slot para OSM.
+
+En lugar de que cada scraper recorra los 4 slots de Career por su cuenta
+(≈20 activaciones por actualización), aquí se activa cada slot UNA vez y se
+ejecutan sobre el equipo activo todos los extractores registrados.
+
+Cada extractor declara la página que necesita; los extractores que comparten
+página se ejecutan seguidos tras una sola navegación.
+"""
+import time
+from playwright.sync_api import Page
+from waits import settle
+from utils import (
+    handle_popups, safe_navigate, wait_for_visible_slots, career_slot_info,
+    click_slot_and_wait_for_dashboard, read_career_snapshot,
+)
+
+from scraper_market_data import (
+    TRANSFERS_URL, extract_transfer_list_from_page, extract_transfer_history_from_page,
+)
+from scraper_league_details import (
+    LEAGUE_TABLE_URL, extract_standings_from_page, extract_squad_values_from_page,
+)
+from scraper_match_results import _navigate_to_league_tab_in_spa, extract_matches_for_active_team
+from scraper_next_match import extract_next_match_from_dashboard, add_tactics_schedule
+from scraper_tactics import TACTICS_URL, extract_tactics_from_page
+from scraper_squad import open_squad_page, extract_squad_from_page
+from request_policy import request_profile
+
+CAREER_URL = "https://en.onlinesoccermanager.com/Career"
+DASHBOARD_URL = "https://en.onlinesoccermanager.com/Dashboard"
+NUM_SLOTS = 4
+
+
+# ── Páginas ──────────────────────────────────────────────────────────────────
+# Cada página se identifica por una clave y una función que navega a ella
+# (con el slot ya activo) y devuelve True si la página quedó lista.
+
+def _goto_dashboard(page: Page) -> bool:
+    # click_slot_and_wait_for_dashboard ya nos deja aquí; solo navegamos si no.
+    if "/Dashboard" in page.url and page.locator("#timers").count() > 0:
+        return True
+    return safe_navigate(page, DASHBOARD_URL, verify_selector="#timers")
+
+
+def _goto_tactics(page: Page) -> bool:
+    if not safe_navigate(page, TACTICS_URL, verify_selector="#tactics-overall"):
+        return False
+    settle(page, site="tactics.render")
+    handle_popups(page)
+    return True
+
+
+PAGES = {
+    "dashboard": _goto_dashboard,
+    "transferlist": lambda page: safe_navigate(page, TRANSFERS_URL, verify_selector="#transfer-list"),
+    "standings": lambda page: safe_navigate(page, LEAGUE_TABLE_URL, verify_selector="#standings-list"),
+    "results": lambda page: _navigate_to_league_tab_in_spa(page, "/League/Results", verify_selector="table.table-sticky"),
+    "tactics": _goto_tactics,
+    "squad": open_squad_page,
+}
+
+
+# ── Registro de extractores ──────────────────────────────────────────────────
+# Un extractor recibe (page, slot, options) con el equipo ya activo y la página
+# declarada ya cargada. Devuelve un dict que se añade a la salida del pipeline
+# (junto a team_name/league_name) o None si no hay datos para este slot.
+
+EXTRACTORS: list[dict] = []
+
+
+def register_extractor(name: str, page_key: str, func):
+    """Registra un extractor. El orden de registro define el orden de páginas."""
+    if page_key not in PAGES:
+        raise ValueError(f"Página desconocida para el extractor '{name}': {page_key}")
+    EXTRACTORS.append({"name": name, "page": page_key, "func": func})
+
+
+def _extract_next_match(page, slot, options):
+    match_info = extract_next_match_from_dashboard(page)
+    match_info["slot_index"] = slot["index"]
+    add_tactics_schedule(match_info)
+    print(f"  ✓ Info extraída: Jornada {match_info['matchday']}, {match_info['seconds_remaining']}s restantes")
+    return match_info
+
+
+def _extract_market(page, slot, options):
+    return {"players_on_sale": extract_transfer_list_from_page(page)}
+
+
+def _by_league(options, key, slot):
+    """
+    Dato por nombre de liga de las opciones (marca de agua, detalles conocidos).
+    None si otro slot comparte el nombre: no se sabe a qué room corresponde.
+    """
+    if slot["league_shared"]:
+        return None
+    return options.get(key, {}).get(slot["league_name"].lower())
+
+
+def _extract_history(page, slot, options):
+    # Sin marca de agua para la liga (nueva, repetida o modo completo) se carga todo el historial
+    watermark = None
+    if not options.get("full_transfer_history"):
+        watermark = _by_league(options, "transfer_watermarks", slot)
+    hist_list = extract_transfer_history_from_page(page, watermark)
+    return None if hist_list is None else {"transfers": hist_list}
+
+
+def _extract_standings(page, slot, options):
+    return {"standings": extract_standings_from_page(page)}
+
+
+def _extract_squad_values(page, slot, options):
+    return {"squad_values_ranking": extract_squad_values_from_page(page)}
+
+
+def _extract_results(page, slot, options):
+    scrape_future_fixtures = options.get("scrape_future_fixtures", False)
+    known_details = _by_league(options, "known_match_details", slot)
+    return {"matches": extract_matches_for_active_team(
+        page, scrape_future_fixtures,
+        known_details=known_details,
+        refresh_latest_rounds=options.get("refresh_latest_rounds", 0),
+    )}
+
+
+def _extract_tactics(page, slot, options):
+    return extract_tactics_from_page(page)
+
+
+def _extract_squad(page, slot, options):
+    with request_profile(page, "squad"):
+        players = extract_squad_from_page(page)
+    return {"players": players, "matchday": slot["matchday"]} if players else None
+
+
+# El dashboard va primero: es donde aterrizamos al activar el slot.
+register_extractor("next_match", "dashboard", _extract_next_match)
+register_extractor("market", "transferlist", _extract_market)
+register_extractor("history", "transferlist", _extract_history)
+register_extractor("standings", "standings", _extract_standings)
+register_extractor("squad_values", "standings", _extract_squad_values)
+register_extractor("results", "results", _extract_results)
+register_extractor("tactics", "tactics", _extract_tactics)
+register_extractor("squad", "squad", _extract_squad)
+
+
+# ── Pipeline ─────────────────────────────────────────────────────────────────
+
+def _group_by_page(extractors: list[dict]) -> list[tuple[str, list[dict]]]:
+    groups: dict[str, list[dict]] = {}
+    for ext in extractors:
+        groups.setdefault(ext["page"], []).append(ext)
+    return list(groups.items())
+
+
+def _open_slot(page: Page, slot_index: int):
+    """
+    Vuelve a Career, lee el slot y lo activa.
+    Devuelve (team_name, league_name, matchday, league_shared) o None si no es
+    procesable; league_shared = otro slot listo tiene una liga con el mismo nombre.
+    """
+    if not page.url.endswith("/Career"):
+        page.goto(CAREER_URL, wait_until="domcontentloaded", timeout=30000)
+    if not wait_for_visible_slots(page, timeout=20000):
+        raise Exception("No se encontraron slots de carrera a tiempo")
+
+    slots = page.locator(".career-teamslot")
+    if slots.count() <= slot_index:
+        return None
+
+    team_name, league_name, matchday = career_slot_info(page, slot_index)
+    if not team_name:
+        print(f"Slot #{slot_index + 1} no es procesable (Searching/Unavailable/Empty). Saltando.")
+        return None
+
+    league_shared = sum(1 for s in read_career_snapshot(page)["slots"]
+                        if s["state"] == "ready" and s["league_name"].lower() == league_name.lower()) > 1
+
+    print(f"Procesando: {team_name} en {league_name}")
+    if not click_slot_and_wait_for_dashboard(page, slot_index):
+        print(f"  ❌ No se pudo activar el slot {slot_index + 1}. Saltando.")
+        return None
+    return team_name, league_name, matchday, league_shared
+
+
+def run_slot_pipeline(page: Page, options: dict | None = None, only: list[str] | None = None) -> dict:
+    """
+    Recorre los slots de Career activando cada uno una sola vez y ejecuta los
+    extractores registrados (o solo los indicados en `only`).
+
+    Returns:
+        dict: {nombre_extractor: [entrada_por_slot, ...]} con el mismo formato
+              que devolvían los scrapers de todos los slots.
+    """
+    options = options or {}
+    extractors = [e for e in EXTRACTORS if only is None or e["name"] in only]
+    page_groups = _group_by_page(extractors)
+    results = {e["name"]: [] for e in extractors}
+
+    print(f"\n--- Pipeline por slot ({', '.join(results)}) ---")
+    start = time.time()
+
+    for i in range(NUM_SLOTS):
+        print(f"\n--- Slot #{i + 1} ---")
+        try:
+            slot_info = _open_slot(page, i)
+        except Exception as e:
+            print(f"  ❌ Error abriendo Career: {e}")
+            break
+        if not slot_info:
+            continue
+
+        team_name, league_name, matchday, league_shared = slot_info
+        slot = {"index": i, "team_name": team_name, "league_name": league_name, "matchday": matchday,
+                "league_shared": league_shared}
+
+        for page_key, group in page_groups:
+            try:
+                if not PAGES[page_key](page):
+                    print(f"  ❌ No se pudo abrir '{page_key}' para {team_name}. Saltando {[e['name'] for e in group]}.")
+                    continue
+            except Exception as e:
+                print(f"  ❌ Error navegando a '{page_key}': {e}")
+                continue
+
+            for ext in group:
+                try:
+                    payload = ext["func"](page, slot, options)
+                except Exception as e:
+                    print(f"  ⚠️ Error en extractor '{ext['name']}' para {team_name}: {e}")
+                    continue
+                if payload is None:
+                    continue
+                payload["team_name"] = team_name
+                payload["league_name"] = league_name
+                results[ext["name"]].append(payload)
+
+    print(f"\n✅ Pipeline completado en {time.time() - start:.1f}s "
+          f"({', '.join(f'{k}={len(v)}' for k, v in results.items())})")
+    return results
+
+
+if __name__ == "__main__":
+    print("Este módulo está diseñado para ser importado y recibir el objeto 'page'.")
@@ -0,0 +1,142 @@
+# scrape_spool.py
+"""
+Spool local de scrapes: separa el scraping (10+ min de navegador) de la
+sincronización con la BD.
+
+run_update_for_user escribe aquí el resultado de run_slot_pipeline nada más
+terminar el scraping y después sincroniza DESDE el fichero. Si la
+sincronización falla o el proceso muere, el scrape no se pierde: se vuelve a
+sincronizar con replay_spool.py sin abrir el navegador.
+
+Un fichero por usuario y ejecución:
+
+    SCRAPE_SPOOL_DIR/<user_id>/<run_id>.json.gz           pendiente de sincronizar
+    SCRAPE_SPOOL_DIR/<user_id>/<run_id>.synced.json.gz    ya sincronizado
+
+Formato: JSON comprimido con gzip dentro de un sobre versionado
+({"format": SPOOL_FORMAT, "user_id", "run_id", "scraped_at", "options", "payload"}).
+Los datetime se guardan como {"__datetime__": iso} y se restauran al leer.
+No se guardan credenciales.
+"""
+import gzip
+import json
+import os
+from datetime import datetime
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+SCRAPE_SPOOL_DIR = os.getenv("SCRAPE_SPOOL_DIR", "scrape_spool")
+# Spools ya sincronizados que se conservan por usuario (para re-sincronizar a mano).
+# Siempre queda al menos el último: marca qué pendientes son anteriores (replay_spool).
+SCRAPE_SPOOL_KEEP_SYNCED = max(1, int(os.getenv("SCRAPE_SPOOL_KEEP_SYNCED", "3")))
+
+SPOOL_FORMAT = 1
+_PENDING_SUFFIX = ".json.gz"
+_SYNCED_SUFFIX = ".synced.json.gz"
+
+
+def _encode(obj):
+    if isinstance(obj, datetime):
+        return {"__datetime__": obj.isoformat()}
+    if isinstance(obj, (set, tuple)):
+        return list(obj)
+    raise TypeError(f"No serializable en el spool: {type(obj).__name__}")
+
+
+def _decode(obj: dict):
+    if len(obj) == 1 and "__datetime__" in obj:
+        return datetime.fromisoformat(obj["__datetime__"])
+    return obj
+
+
+def _user_dir(user_id) -> str:
+    return os.path.join(SCRAPE_SPOOL_DIR, str(user_id))
+
+
+def write_spool(user_id, payload: dict, scraped_at: datetime, options: dict | None = None) -> str:
+    """Guarda el scrape de forma atómica (tmp + rename). Devuelve la ruta del spool."""
+    directory = _user_dir(user_id)
+    os.makedirs(directory, exist_ok=True)
+    run_id = scraped_at.strftime("%Y%m%dT%H%M%S")
+    path = os.path.join(directory, run_id + _PENDING_SUFFIX)
+    envelope = {
+        "format": SPOOL_FORMAT,
+        "user_id": str(user_id),
+        "run_id": run_id,
+        "scraped_at": scraped_at,
+        "options": options or {},
+        "payload": payload,
+    }
+    tmp_path = path + ".tmp"
+    with gzip.open(tmp_path, "wt", encoding="utf-8") as f:
+        json.dump(envelope, f, ensure_ascii=False, separators=(",", ":"), default=_encode)
+    os.replace(tmp_path, path)
+    print(f"💾 Scrape guardado en spool: {path} ({os.path.getsize(path) / 1024:.0f} KB)")
+    return path
+
+
+def read_spool(path: str) -> dict:
+    """Sobre completo del spool. ValueError si el formato no es compatible."""
+    with gzip.open(path, "rt", encoding="utf-8") as f:
+        envelope = json.load(f, object_hook=_decode)
+    if envelope.get("format") != SPOOL_FORMAT:
+        raise ValueError(f"Formato de spool no soportado ({envelope.get('format')}) en {path}")
+    return envelope
+
+
+def is_synced(path: str) -> bool:
+    return path.endswith(_SYNCED_SUFFIX)
+
+
+def spool_run_id(path: str) -> str:
+    """run_id del nombre del fichero (%Y%m%dT%H%M%S: ordena cronológicamente)."""
+    return os.path.basename(path).split(".", 1)[0]
+
+
+def latest_synced_run(user_id) -> str | None:
+    """run_id del último scrape ya sincronizado del usuario, o None."""
+    directory = _user_dir(user_id)
+    if not os.path.isdir(directory):
+        return None
+    synced = sorted(f for f in os.listdir(directory) if f.endswith(_SYNCED_SUFFIX))
+    return spool_run_id(synced[-1]) if synced else None
+
+
+def mark_synced(path: str) -> str:
+    """Renombra el spool a .synced y limpia los sincronizados más antiguos."""
+    if is_synced(path):
+        return path
+    synced_path = path[:-len(_PENDING_SUFFIX)] + _SYNCED_SUFFIX
+    os.replace(path, synced_path)
+    _prune_synced(os.path.dirname(synced_path))
+    return synced_path
+
+
+def _prune_synced(directory: str):
+    synced = sorted(f for f in os.listdir(directory) if f.endswith(_SYNCED_SUFFIX))
+    for filename in synced[:max(0, len(synced) - SCRAPE_SPOOL_KEEP_SYNCED)]:
+        try:
+            os.remove(os.path.join(directory, filename))
+        except OSError as e:
+            print(f"⚠️ No se pudo borrar el spool {filename}: {e}")
+
+
+def list_spools(user_id=None, include_synced: bool = False) -> list[str]:
+    """Rutas de los spools (más antiguos primero), de un usuario o de todos."""
+    if not os.path.isdir(SCRAPE_SPOOL_DIR):
+        return []
+    users = [str(user_id)] if user_id else sorted(os.listdir(SCRAPE_SPOOL_DIR))
+    paths = []
+    for uid in users:
+        directory = _user_dir(uid)
+        if not os.path.isdir(directory):
+            continue
+        for filename in sorted(os.listdir(directory)):
+            if not filename.endswith(_PENDING_SUFFIX):
+                continue
+            if is_synced(filename) and not include_synced:
+                continue
+            paths.append(os.path.join(directory, filename))
+    return paths
@@ -12,9 +12,9 @@ Datos del spy (cuando está disponible):
   - Plantilla del rival (jugadores con stats)
   - Historial de partidos recientes (últimos 5)
 """
-import time
 from playwright.sync_api import Page
 from utils import handle_popups
+from waits import wait_for_dom, wait_for_ko, settle
 
 DATA_ANALYST_URL = "https://en.onlinesoccermanager.com/DataAnalist"
 
@@ -42,7 +42,7 @@ def _loaded(page: Page, timeout: int = 12000) -> bool:
     try:
         if "DataAnalist" in page.url or "dataanalist" in page.url.lower():
             print(f"  ℹ️ DataAnalist URL ok — esperando KO bindings...")
-            time.sleep(3)
+            wait_for_ko(page, deadline_ms=3000, site="analyst.ko")
             try:
                 page.wait_for_selector("[data-bind]", timeout=6000, state="attached")
                 print(f"  ✓ DataAnalist KO bindings detectados")
@@ -68,7 +68,7 @@ def _navigate(page: Page) -> bool:
             loc = page.locator(sel).first
             if loc.is_visible(timeout=800):
                 loc.click()
-                time.sleep(2)
+                settle(page, site="analyst.nav")
                 if _loaded(page):
                     return True
         except Exception:
@@ -77,7 +77,7 @@ def _navigate(page: Page) -> bool:
     try:
         print(f"  → Navegando a {DATA_ANALYST_URL}...")
         page.goto(DATA_ANALYST_URL, wait_until="domcontentloaded", timeout=30000)
-        time.sleep(2)
+        settle(page, site="analyst.goto")
         handle_popups(page)
         loaded = _loaded(page)
         print(f"  → _loaded={loaded}  url={page.url}")
@@ -104,7 +104,7 @@ def get_data_analyst_state(page: Page) -> dict:
         return {"next_opponent": None, "teams": [], "active_spy_team": None,
                 "error": "page_not_loaded"}
 
-    time.sleep(1)
+    settle(page, site="analyst.render")
     handle_popups(page)
 
     try:
@@ -289,7 +289,8 @@ def _claim_spy(page: Page) -> bool:
             return False
         print("  → Reclamando spy completado (botón Complete)...")
         btn.click()
-        time.sleep(3)
+        wait_for_dom(page, "() => !document.querySelector('button[data-bind*=\"claimSpyInstruction\"]')?.offsetParent",
+                     deadline_ms=5000, site="analyst.claim")
         handle_popups(page)
         print("  ✓ Spy reclamado")
         return True
@@ -311,7 +312,7 @@ def start_spy(page: Page, team_name: str | None = None) -> dict:
         return {"started": False, "team_name": team_name, "cost": 0,
                 "error": "page_not_loaded"}
 
-    time.sleep(1)
+    settle(page, site="analyst.render")
     handle_popups(page)
 
     # Si team_name no fue provisto, necesitamos leer el estado para descubrirlo.
@@ -379,7 +380,8 @@ def start_spy(page: Page, team_name: str | None = None) -> dict:
             return {"started": False, "team_name": team_name, "cost": 0,
                     "error": "team_not_found_or_spy_active"}
         print(f"  ✓ Clic en equipo: {clicked!r}")
-        time.sleep(2)
+        wait_for_dom(page, "() => !!document.querySelector('.modal.in, .modal[style*=\"display: block\"]')",
+                     deadline_ms=4000, site="analyst.spy_modal")
     except Exception as e:
         return {"started": False, "team_name": team_name, "cost": 0,
                 "error": f"click_failed:{e}"}
@@ -413,7 +415,8 @@ def start_spy(page: Page, team_name: str | None = None) -> dict:
         """)
         if confirmed and confirmed.get("ok"):
             print(f"  ✓ Spy iniciado — timer ~1h")
-            time.sleep(1)
+            wait_for_dom(page, "() => !document.querySelector('.modal.in, .modal[style*=\"display: block\"]')",
+                         deadline_ms=3000, site="analyst.spy_confirm")
             handle_popups(page)
             return {"started": True, "team_name": team_name,
                     "cost": confirmed.get("cost", 0)}
@@ -446,7 +449,7 @@ def get_spy_results(page: Page, team_name: str | None = None) -> dict:
         return {"team_name": None, "tactics": {}, "squad": [], "last_matches": [],
                 "error": "page_not_loaded"}
 
-    time.sleep(1)
+    settle(page, site="analyst.render")
     handle_popups(page)
 
     try:
@@ -600,30 +603,11 @@ def spy_for_slot(
         "start_result": dict | None,   # solo si action == "started"
     }
     """
-    from utils import click_slot_and_wait_for_dashboard, wait_for_visible_slots, get_slot_info
+    from utils import activate_slot_for_league
 
-    page.goto(career_url, wait_until="domcontentloaded", timeout=30000)
-    time.sleep(2)
-    wait_for_visible_slots(page, timeout=20000)
-    time.sleep(1)
-    handle_popups(page)
-
-    slots = page.locator(".career-teamslot")
-    target_idx = None
-    for i in range(slots.count()):
-        _, t_league, _ = get_slot_info(slots.nth(i))
-        if t_league and league_name.lower() in t_league.lower():
-            target_idx = i
-            print(f"  ✓ Slot encontrado: DOM {i} → '{t_league}'")
-            break
-
-    if target_idx is None:
-        return {"action": "error", "team_name": None,
-                "error": f"slot_not_found:{league_name}"}
-
-    if not click_slot_and_wait_for_dashboard(page, target_idx):
-        return {"action": "error", "team_name": None,
-                "error": "slot_activation_failed"}
+    slot, error = activate_slot_for_league(page, league_name, career_url)
+    if error:
+        return {"action": "error", "team_name": None, "error": error}
 
     # Leer estado del DataAnalyst
     state = get_data_analyst_state(page)
@@ -1,29 +1,74 @@
 # scraper_league_details.py
 import os
-import time
 import json
 from dotenv import load_dotenv
 from playwright.sync_api import TimeoutError, Error as PlaywrightError
 from utils import handle_popups, safe_int, safe_navigate
+from waits import wait_for_dom
+from response_tap import read_captured
+from direct_fetch import DIRECT_FETCH_ENABLED, try_fetch, slot_api_ids
 
 load_dotenv()
 
+MAIN_DASHBOARD_URL = "https://en.onlinesoccermanager.com/Career"
+LEAGUE_TABLE_URL = "https://en.onlinesoccermanager.com/League/Standings"
+
+def _league_data_direct(page, num_slots):
+    """
+    Clasificación y valores de equipo por la API directa, sin activar slots.
+    Devuelve (standings, squad_values, handled) con los índices ya resueltos;
+    los slots sin ids o con fallo se dejan para el camino del navegador.
+    """
+    from utils import wait_for_visible_slots, read_career_snapshot
+
+    standings, squad_values, handled = [], [], set()
+    try:
+        if page.url != MAIN_DASHBOARD_URL:
+            page.goto(MAIN_DASHBOARD_URL)
+        if not wait_for_visible_slots(page, timeout=35000):
+            return standings, squad_values, handled
+        slots = read_career_snapshot(page)["slots"][:num_slots]
+    except (TimeoutError, PlaywrightError) as e:
+        print(f"  ⚠️ API directa: no se pudo leer Career ({e})")
+        return standings, squad_values, handled
+
+    for slot in slots:
+        ids = slot_api_ids(slot)
+        if slot["state"] != "ready" or not ids:
+            continue
+        standings_list = try_fetch(page, "standings", **ids)
+        squad_values_list = try_fetch(page, "squad_values", **ids) if standings_list is not None else None
+        if squad_values_list is None:
+            continue
+        print(f"  ⚡ {slot['team_name']} en {slot['league_name']}: {len(standings_list)} equipos vía API")
+        standings.append({"team_name": slot["team_name"], "league_name": slot["league_name"],
+                          "standings": standings_list})
+        squad_values.append({"team_name": slot["team_name"], "league_name": slot["league_name"],
+                             "squad_values_ranking": squad_values_list})
+        handled.add(slot["index"])
+    return standings, squad_values, handled
+
+
 def get_league_data(page):
     """
     Extrae TANTO la clasificación general COMO los valores de equipo 
     para cada liga gestionada en un solo pase.
     
     CORREGIDO: Detecta equipos no 'clickable' (campeones/propios) y asegura Managers.
+    Con OSM_DIRECT_FETCH se leen por la API; los slots que fallen van por navegador.
     """
     try:
-        MAIN_DASHBOARD_URL = "https://en.onlinesoccermanager.com/Career"
-        LEAGUE_TABLE_URL = "https://en.onlinesoccermanager.com/League/Standings"
-        
         all_leagues_standings = []
         all_leagues_squad_values = []
         NUM_SLOTS = 4
+        handled = set()
+
+        if DIRECT_FETCH_ENABLED:
+            all_leagues_standings, all_leagues_squad_values, handled = _league_data_direct(page, NUM_SLOTS)
 
         for i in range(NUM_SLOTS):
+            if i in handled:
+                continue
             print(f"\n--- Analizando Slot de Equipo #{i + 1} ---")
             
             # Navegar de vuelta al dashboard si es necesario
@@ -58,105 +103,8 @@ def get_league_data(page):
                 print(f"  - Navegando a la página de clasificación...")
                 if safe_navigate(page, LEAGUE_TABLE_URL, verify_selector="#standings-list"):
                 
-                    # === PARTE 1: EXTRAER CLASIFICACIÓN GENERAL ===
-                    print(f"  - Extrayendo clasificación general...")
-                    
-                    # Asegurar pestaña General
-                    try:
-                        page.locator("a[href='#standings-list']").click()
-                        time.sleep(1)
-                    except: pass
-
-                    standings_table_selector = "table.table-sticky:has(th:has-text('Pts'))"
-                    page.wait_for_selector(standings_table_selector, timeout=40000)
-                    
-                    standings_list = []
-                    
-                    # --- CORRECCIÓN CLAVE ---
-                    # Usamos 'tbody tr' en lugar de 'tbody tr.clickable' para no perder tu equipo
-                    rows = page.locator(f"{standings_table_selector} tbody tr")
-                    
-                    for row in rows.all():
-                        if not row.is_visible(): continue
-                        try:
-                            # Verificamos que sea una fila válida buscando la celda de ranking
-                            if row.locator("td.td-ranking").count() == 0: continue
-
-                            position = row.locator("td.td-ranking").inner_text()
-                            club_name = row.locator("span.ellipsis").inner_text()
-                            
-                            manager_locator = row.locator("span.text-italic")
-                            manager_name = manager_locator.inner_text() if manager_locator.count() > 0 else "N/A"
-                            
-                            # Usamos índices fijos para las columnas estadísticas
-                            cols = row.locator("td")
-                            
-                            standings_list.append({
-                                "Position": safe_int(position),
-                                "Club": club_name,
-                                "Manager": manager_name,
-                                "Played": safe_int(cols.nth(4).inner_text()),
-                                "Won": safe_int(cols.nth(6).inner_text()),
-                                "Drew": safe_int(cols.nth(7).inner_text()),
-                                "Lost": safe_int(cols.nth(8).inner_text()),
-                                "Points": safe_int(cols.nth(9).inner_text()),
-                                "GoalsFor": safe_int(cols.nth(10).inner_text()),
-                                "GoalsAgainst": safe_int(cols.nth(12).inner_text()),
-                                "GoalDifference": safe_int(row.locator("td.td-goaldifference").inner_text())
-                            })
-                        except Exception as e:
-                            # print(f"  - Saltando fila irrelevante o error menor: {e}")
-                            continue
-                    
-                    # Ordenamos por si el DOM no estaba en orden
-                    standings_list.sort(key=lambda x: x["Position"])
-                    print(f"  ✓ Clasificación extraída: {len(standings_list)} equipos")
-                    
-                    # === PARTE 2: EXTRAER VALORES DE EQUIPO ===
-                    print(f"  - Cambiando a la pestaña 'Squad Value'...")
-                    page.locator("a[href='#standings-squad']").click()
-                    
-                    squad_value_panel = page.locator("#standings-squad")
-                    squad_value_panel.wait_for(state="visible", timeout=40000)
-                    
-                    squad_values_list = []
-                    
-                    # --- CORRECCIÓN CLAVE ---
-                    # Igual aquí, quitamos .clickable
-                    rows = squad_value_panel.locator("tbody tr")
-                    
-                    for row in rows.all():
-                        if not row.is_visible(): continue
-                        try:
-                            if row.locator("td.td-ranking").count() == 0: continue
-
-                            position = safe_int(row.locator("td.td-ranking").inner_text())
-                            club_name = row.locator("span.ellipsis").inner_text()
-                            
-                            # MANTENEMOS EL CAMPO MANAGER QUE FALTABA EN LA VERSIÓN NUEVA
-                            manager_locator = row.locator("span.text-italic")
-                            manager_name = manager_locator.inner_text() if manager_locator.count() > 0 else "N/A"
-                            
-                            cols = row.locator("td")
-                            
-                            squad_value = cols.nth(2).locator("span.club-funds-amount").inner_text()
-                            player_count = safe_int(cols.nth(3).inner_text())
-                            avg_value = cols.nth(4).locator("span.club-funds-amount").inner_text()
-                            
-                            squad_values_list.append({
-                                "Position": position,
-                                "Club": club_name,
-                                "Manager": manager_name,  # Restaurado
-                                "Value": squad_value,
-                                "Players": player_count,
-                                "AverageValue": avg_value
-                            })
-                        except Exception as e:
-                            continue
-                    
-                    squad_values_list.sort(key=lambda x: x["Position"])
-                    print(f"  ✓ Valores de equipo extraídos: {len(squad_values_list)} equipos")
-                    
+                    standings_list, squad_values_list = extract_league_tables_from_page(page)
+
                     # === PARTE 3: AGREGAR A LAS LISTAS SEPARADAS (FORMATO ORIGINAL) ===
                     all_leagues_standings.append({
                         "team_name": team_name,
@@ -195,5 +143,134 @@ def get_league_data(page):
         # MANTENIDO EL RETORNO DE ERRORES ORIGINAL
         return {"error": error_message}, {"error": error_message}
 
+# Filas crudas de las dos tablas de /League/Standings en un solo evaluate.
+# Se usan 'tbody tr' con td.td-ranking (no solo .clickable) para no perder el equipo propio.
+_LEAGUE_TABLES_JS = """(which) => {
+    const text = el => el ? (el.innerText || el.textContent || '').trim() : '';
+    const rowsOf = table => !table ? [] : Array.from(table.querySelectorAll('tbody tr'))
+        .filter(r => r.querySelector('td.td-ranking') && getComputedStyle(r).display !== 'none');
+    const out = {};
+    if (which.includes('standings')) {
+        const table = Array.from(document.querySelectorAll('table.table-sticky'))
+            .find(t => Array.from(t.querySelectorAll('th')).some(th => text(th).includes('Pts')));
+        out.standings = rowsOf(table).map(r => {
+            const td = r.querySelectorAll('td');
+            return {
+                position: text(r.querySelector('td.td-ranking')), club: text(r.querySelector('span.ellipsis')),
+                manager: r.querySelector('span.text-italic') ? text(r.querySelector('span.text-italic')) : null,
+                played: text(td[4]), won: text(td[6]), drew: text(td[7]), lost: text(td[8]),
+                points: text(td[9]), goals_for: text(td[10]), goals_against: text(td[12]),
+                goal_difference: text(r.querySelector('td.td-goaldifference')),
+            };
+        });
+    }
+    if (which.includes('squad_values')) {
+        out.squad_values = rowsOf(document.querySelector('#standings-squad')).map(r => {
+            const td = r.querySelectorAll('td');
+            return {
+                position: text(r.querySelector('td.td-ranking')), club: text(r.querySelector('span.ellipsis')),
+                manager: r.querySelector('span.text-italic') ? text(r.querySelector('span.text-italic')) : null,
+                value: text(td[2] && td[2].querySelector('span.club-funds-amount')), players: text(td[3]),
+                average: text(td[4] && td[4].querySelector('span.club-funds-amount')),
+            };
+        });
+    }
+    return out;
+}"""
+
+
+def _standings_rows(raw: list) -> list:
+    standings_list = [{
+        "Position": safe_int(r["position"]),
+        "Club": r["club"],
+        "Manager": r["manager"] if r["manager"] is not None else "N/A",
+        "Played": safe_int(r["played"]),
+        "Won": safe_int(r["won"]),
+        "Drew": safe_int(r["drew"]),
+        "Lost": safe_int(r["lost"]),
+        "Points": safe_int(r["points"]),
+        "GoalsFor": safe_int(r["goals_for"]),
+        "GoalsAgainst": safe_int(r["goals_against"]),
+        "GoalDifference": safe_int(r["goal_difference"]),
+    } for r in raw if r["club"]]
+    # Ordenamos por si el DOM no estaba en orden
+    standings_list.sort(key=lambda x: x["Position"])
+    return standings_list
+
+
+def _squad_value_rows(raw: list) -> list:
+    squad_values_list = [{
+        "Position": safe_int(r["position"]),
+        "Club": r["club"],
+        "Manager": r["manager"] if r["manager"] is not None else "N/A",
+        "Value": r["value"],
+        "Players": safe_int(r["players"]),
+        "AverageValue": r["average"],
+    } for r in raw if r["club"]]
+    squad_values_list.sort(key=lambda x: x["Position"])
+    return squad_values_list
+
+
+def _open_squad_value_tab(page):
+    print(f"  - Cambiando a la pestaña 'Squad Value'...")
+    page.locator("a[href='#standings-squad']").click()
+    page.locator("#standings-squad").wait_for(state="visible", timeout=40000)
+    wait_for_dom(page, "() => document.querySelectorAll('#standings-squad tbody tr td.td-ranking').length > 0",
+                 deadline_ms=5000, site="standings.squad_rows")
+
+
+def extract_league_tables_from_page(page, which=("standings", "squad_values")) -> tuple[list, list]:
+    """
+    Extrae clasificación y valores de equipo de /League/Standings (equipo activo)
+    con un solo page.evaluate para ambas tablas.
+
+    Returns:
+        (standings_list, squad_values_list) — lista vacía para la tabla no pedida.
+    """
+    which = list(which)
+    standings_list, squad_values_list = [], []
+
+    if "standings" in which:
+        captured = read_captured(page, "standings")
+        if captured:
+            print(f"  ✓ Clasificación extraída de la respuesta API: {len(captured)} equipos")
+            standings_list = captured
+            which.remove("standings")
+        else:
+            page.wait_for_selector("table.table-sticky:has(th:has-text('Pts'))", state="attached", timeout=40000)
+
+    if not which:
+        return standings_list, squad_values_list
+
+    raw = page.evaluate(_LEAGUE_TABLES_JS, which)
+    if "standings" in which:
+        standings_list = _standings_rows(raw["standings"])
+        print(f"  ✓ Clasificación extraída: {len(standings_list)} equipos")
+    if "squad_values" in which:
+        if not raw["squad_values"]:
+            # El panel de valores se rellena al abrir su pestaña
+            _open_squad_value_tab(page)
+            raw = page.evaluate(_LEAGUE_TABLES_JS, ["squad_values"])
+        squad_values_list = _squad_value_rows(raw["squad_values"])
+        print(f"  ✓ Valores de equipo extraídos: {len(squad_values_list)} equipos")
+    return standings_list, squad_values_list
+
+
+def extract_standings_from_page(page) -> list:
+    """
+    Extrae la clasificación general desde /League/Standings (equipo activo).
+    Detecta equipos no 'clickable' (campeones/propios) y asegura Managers.
+    """
+    print(f"  - Extrayendo clasificación general...")
+    return extract_league_tables_from_page(page, ("standings",))[0]
+
+
+def extract_squad_values_from_page(page) -> list:
+    """
+    Extrae el ranking de la pestaña 'Squad Value' de /League/Standings.
+    """
+    return extract_league_tables_from_page(page, ("squad_values",))[1]
+
+
 if __name__ == "__main__":
     print("Este módulo está diseñado para ser importado.")
\ No newline at end of file
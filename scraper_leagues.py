@@ -2,132 +2,148 @@
 import os
 import time
 import json
+import queue
+import threading
 from dotenv import load_dotenv
-from playwright.sync_api import TimeoutError, Error as PlaywrightError
+from playwright.sync_api import sync_playwright, TimeoutError, Error as PlaywrightError
+from utils import launch_playwright_browser
+from request_policy import install_request_policy
+from popup_killer import install_popup_killer
 
 load_dotenv()
 
+LEAGUE_TYPES_URL = "https://en.onlinesoccermanager.com/LeagueTypes"
+LIST_ROWS_SELECTOR = "table#leaguetypes-table tbody tr.clickable"
+DETAIL_HEADER_SELECTOR = "table#leaguetypes-table thead th:has-text('Club')"
+
+# Navegadores en paralelo para crawl_leagues_parallel (1 = secuencial)
+LEAGUE_CRAWLER_WORKERS = int(os.getenv("LEAGUE_CRAWLER_WORKERS", "4"))
+
+# Todas las filas de la tabla de detalle tienen ya su valor de plantilla renderizado
+_VALUES_READY_JS = """
+    () => {
+        const rows = document.querySelectorAll("table#leaguetypes-table tbody tr.clickable");
+        if (rows.length === 0) return false; // Aún no hay filas, seguir esperando.
+
+        let populatedRows = 0;
+        for (const row of rows) {
+            // Buscamos el span en la 3ª celda (Valor de Plantilla)
+            const squadValueSpan = row.querySelector('td:nth-child(3) span.club-funds-amount');
+            // La fila está poblada si el span existe y tiene contenido de texto.
+            if (squadValueSpan && squadValueSpan.innerText.trim() !== '') {
+                populatedRows++;
+            }
+        }
+        // La condición es verdadera solo si todas las filas encontradas están pobladas y hay al menos una.
+        return populatedRows > 0 && populatedRows === rows.length;
+    }
+"""
+
+# Clubes de la página de detalle en un solo evaluate
+_CLUBS_JS = """
+    () => Array.from(document.querySelectorAll("table#leaguetypes-table tbody tr.clickable")).map(row => {
+        const td = row.querySelectorAll("td");
+        const name = td[0] && td[0].querySelector("span[data-bind*='text: name']");
+        if (!name) return null;
+        const amount = cell => {
+            const span = cell && cell.querySelector("span.club-funds-amount");
+            return span ? span.innerText.trim() : "N/A";
+        };
+        return {
+            club: name.innerText.trim(), objective: td[1] ? td[1].innerText.trim() : "",
+            squad_value: amount(td[2]), fixed_income: amount(td[3])
+        };
+    }).filter(c => c)
+"""
+
+
+def _open_league_list(page):
+    page.goto(LEAGUE_TYPES_URL, wait_until="domcontentloaded", timeout=60000)
+    page.wait_for_selector(LIST_ROWS_SELECTOR, timeout=40000)
+
+
+def _list_league_names(page) -> list[str]:
+    return page.evaluate(f"""
+        () => Array.from(document.querySelectorAll("{LIST_ROWS_SELECTOR}"))
+            .map(r => (r.querySelector("td span.semi-bold") || r).innerText.trim())
+    """)
+
+
+def _back_to_list(page):
+    try:
+        page.go_back(timeout=30000)
+        page.wait_for_selector(LIST_ROWS_SELECTOR, timeout=40000)
+    except (PlaywrightError, TimeoutError):
+        _open_league_list(page)
+
+
+def _open_league_detail(page, index: int, league_name: str, max_retries: int = 3) -> bool:
+    """Hace clic en la fila `index` de la lista (ya cargada) y espera la tabla de clubes."""
+    for attempt in range(max_retries):
+        try:
+            # El orden de la lista puede variar entre navegadores: comprobar el nombre
+            names = _list_league_names(page)
+            if index >= len(names) or names[index] != league_name:
+                if league_name not in names:
+                    print(f"  - ERROR: '{league_name}' ya no está en la lista de ligas.")
+                    return False
+                index = names.index(league_name)
+            page.locator(LIST_ROWS_SELECTOR).nth(index).click()
+            page.wait_for_selector(DETAIL_HEADER_SELECTOR, timeout=45000)
+            return True
+        except TimeoutError:
+            print(f"  - ADVERTENCIA: Intento {attempt + 1}/{max_retries} falló para '{league_name}'.")
+            if attempt < max_retries - 1:
+                try:
+                    _back_to_list(page)
+                except (PlaywrightError, TimeoutError):
+                    print("    ERROR: No se pudo volver a la página de lista. Saltando esta liga.")
+                    break
+    return False
+
+
+def _extract_league_detail(page, league_name: str) -> dict:
+    """Clubes de la página de detalle de una liga (ya abierta)."""
+    # Solo esperamos los datos de valor si la liga NO es una de las especiales sin valor.
+    is_special_league = "Fantasy 150" in league_name or "Fantasy Tournament" in league_name
+    if not is_special_league:
+        try:
+            page.wait_for_function(_VALUES_READY_JS, timeout=25000)
+        except TimeoutError:
+            print(f"  - ADVERTENCIA: Timeout esperando los valores para '{league_name}'. Se procederá con los datos disponibles (pueden ser incompletos).")
+
+    clubs = page.evaluate(_CLUBS_JS)
+    print(f"  - {league_name}: {len(clubs)} clubes.")
+    return {"league_name": league_name, "clubs": clubs}
+
+
 def get_data_from_website(page):
     """
     Función principal de scraping con lógica de espera corregida para extraer todas las ligas y sus equipos.
+    Recorre las ligas una a una en la página dada (ver crawl_leagues_parallel para N navegadores).
     """
     try:
-            
-        # --- FASE 2: NAVEGACIÓN A LA LISTA DE LIGAS ---
         print("Navegando a la página de la lista de ligas...")
-        page.goto("https://en.onlinesoccermanager.com/LeagueTypes")
-        
-        # --- FASE 3: EXTRACCIÓN DE DATOS ---
-        print("Esperando a que la tabla de ligas cargue...")
-        page.wait_for_selector("table#leaguetypes-table tbody tr.clickable", timeout=40000)
-        
-        league_rows = page.locator("table#leaguetypes-table tbody tr.clickable")
-        num_leagues = league_rows.count()
-        print(f"Se encontraron {num_leagues} ligas. Empezando a procesar una por una...")
+        _open_league_list(page)
+        league_names = _list_league_names(page)
+        print(f"Se encontraron {len(league_names)} ligas. Empezando a procesar una por una...")
 
         all_leagues_data = []
-
-        for i in range(num_leagues):
-            # Es crucial volver a localizar las filas en cada iteración para evitar elementos "stale"
-            current_row = page.locator("table#leaguetypes-table tbody tr.clickable").nth(i)
-            league_name = current_row.locator("td span.semi-bold").inner_text()
+        for i, league_name in enumerate(league_names):
             print(f"\nProcesando Liga #{i+1}: {league_name}")
-
-            MAX_RETRIES = 3
-            detail_page_loaded = False
-            for attempt in range(MAX_RETRIES):
-                try:
-                    page.locator("table#leaguetypes-table tbody tr.clickable").nth(i).click()
-                    page.wait_for_selector("table#leaguetypes-table thead th:has-text('Club')", timeout=45000)
-                    print(f"  - Página de detalle cargada con éxito en el intento {attempt + 1}.")
-                    detail_page_loaded = True
-                    break
-                except TimeoutError:
-                    print(f"  - ADVERTENCIA: Intento {attempt + 1}/{MAX_RETRIES} falló para '{league_name}'.")
-                    if attempt < MAX_RETRIES - 1:
-                        print("    Volviendo a la página de lista para reintentar...")
-                        try:
-                            page.go_back(wait_until="domcontentloaded", timeout=40000)
-                            page.wait_for_selector("table#leaguetypes-table tbody tr", timeout=40000)
-                        except (PlaywrightError, TimeoutError):
-                            print("    ERROR: No se pudo volver a la página de lista. Saltando esta liga.")
-                            break
-            
-            if not detail_page_loaded:
+            if not _open_league_detail(page, i, league_name):
                 print(f"  - ERROR CRÍTICO: Imposible cargar la página de detalle para '{league_name}'. Saltando esta liga.")
                 try:
-                    page.goto("https://en.onlinesoccermanager.com/LeagueTypes", timeout=30000)
-                    page.wait_for_selector("table#leaguetypes-table tbody tr", timeout=40000)
+                    _open_league_list(page)
                 except (PlaywrightError, TimeoutError):
                     raise Exception("Fallo catastrófico: No se pudo volver a la página de lista de ligas.")
                 continue
-            
-            # --- LÓGICA DE EXTRACCIÓN CORREGIDA Y ROBUSTA ---
-            league_details = {"league_name": league_name, "clubs": []}
-            
-            # --- NUEVA ESPERA INTELIGENTE ---
-            # Solo esperamos los datos de valor si la liga NO es una de las especiales sin valor.
-            is_special_league = "Fantasy 150" in league_name or "Fantasy Tournament" in league_name
-            
-            if not is_special_league:
-                try:
-                    print("  - Es una liga estándar. Esperando a que todos los valores de equipo se rendericen...")
-                    # Esta función espera hasta que TODAS las filas de la tabla tengan sus datos de valor cargados.
-                    page.wait_for_function("""
-                        () => {
-                            const rows = document.querySelectorAll("table#leaguetypes-table tbody tr.clickable");
-                            if (rows.length === 0) return false; // Aún no hay filas, seguir esperando.
-
-                            let populatedRows = 0;
-                            for (const row of rows) {
-                                // Buscamos el span en la 3ª celda (Valor de Plantilla)
-                                const squadValueSpan = row.querySelector('td:nth-child(3) span.club-funds-amount');
-                                // La fila está poblada si el span existe y tiene contenido de texto.
-                                if (squadValueSpan && squadValueSpan.innerText.trim() !== '') {
-                                    populatedRows++;
-                                }
-                            }
-                            // La condición es verdadera solo si todas las filas encontradas están pobladas y hay al menos una.
-                            return populatedRows > 0 && populatedRows === rows.length;
-                        }
-                    """, timeout=25000) # Timeout de 25 segundos
-                    print("  - Todos los valores de equipo se han cargado.")
-                except TimeoutError:
-                    print(f"  - ADVERTENCIA: Timeout esperando los valores para '{league_name}'. Se procederá con los datos disponibles (pueden ser incompletos).")
-            else:
-                print("  - Es una liga Fantasy. No se esperarán valores de equipo.")
-
-
-            club_rows = page.locator("table#leaguetypes-table tbody tr.clickable")
-            
-            for club_row in club_rows.all():
-                try:
-                    club_name = club_row.locator("td").nth(0).locator("span[data-bind*='text: name']").inner_text()
-                    objective = club_row.locator("td").nth(1).inner_text()
-                    
-                    squad_value_elements = club_row.locator("td").nth(2).locator("span.club-funds-amount").all()
-                    fixed_income_elements = club_row.locator("td").nth(3).locator("span.club-funds-amount").all()
-                    
-                    squad_value = squad_value_elements[0].inner_text() if squad_value_elements else "N/A"
-                    fixed_income = fixed_income_elements[0].inner_text() if fixed_income_elements else "N/A"
-                    
-                    league_details["clubs"].append({
-                        "club": club_name, "objective": objective,
-                        "squad_value": squad_value, "fixed_income": fixed_income
-                    })
-                except Exception as e:
-                    print(f"  - ADVERTENCIA: Saltando una fila de club en '{league_name}'. Error: {e}")
-                    continue
-            
-            print(f"Se extrajeron datos de {len(league_details['clubs'])} clubes.")
-            all_leagues_data.append(league_details)
-            
-            print("Volviendo a la lista de ligas...")
+
+            all_leagues_data.append(_extract_league_detail(page, league_name))
             try:
-                page.go_back(timeout=30000)
-                page.wait_for_selector("table#leaguetypes-table tbody tr.clickable", timeout=40000)
+                _back_to_list(page)
             except (PlaywrightError, TimeoutError) as e:
-                    raise Exception(f"Fallo catastrófico al volver a la lista de ligas: {e}")
+                raise Exception(f"Fallo catastrófico al volver a la lista de ligas: {e}")
 
         return all_leagues_data
 
@@ -140,7 +156,98 @@ def get_data_from_website(page):
         except Exception as screenshot_error:
             print(f"No se pudo tomar la captura de pantalla. Error: {screenshot_error}")
         return {"error": error_message}
-    
+
+
+# ── Crawler paralelo ─────────────────────────────────────────────────────────
+# La lista maestra no depende del slot activo, así que cada worker abre su
+# propio navegador con la sesión del login principal (storage_state) y va
+# sacando ligas de una cola compartida. La API sync de Playwright no es
+# thread-safe: cada hilo tiene su propia instancia.
+
+def _crawl_worker(worker_id: int, storage_state: dict, tasks: queue.Queue, results: dict):
+    try:
+        with sync_playwright() as p:
+            browser = launch_playwright_browser(p, headless=True)
+            context = browser.new_context(storage_state=storage_state, viewport={'width': 1280, 'height': 720})
+            install_request_policy(context)
+            install_popup_killer(context)
+            page = context.new_page()
+            _open_league_list(page)
+
+            while True:
+                try:
+                    index, league_name = tasks.get_nowait()
+                except queue.Empty:
+                    break
+                try:
+                    if _open_league_detail(page, index, league_name):
+                        results[index] = _extract_league_detail(page, league_name)
+                        _back_to_list(page)
+                    else:
+                        _open_league_list(page)
+                except (PlaywrightError, TimeoutError) as e:
+                    print(f"  - [worker {worker_id}] Error en '{league_name}': {e}")
+                    try:
+                        _open_league_list(page)
+                    except (PlaywrightError, TimeoutError):
+                        break
+            browser.close()
+    except Exception as e:
+        print(f"  - [worker {worker_id}] Abortado: {e}")
+
+
+def crawl_leagues_parallel(page, workers: int = LEAGUE_CRAWLER_WORKERS):
+    """
+    Igual que get_data_from_website, repartiendo las ligas entre `workers`
+    navegadores con la sesión de `page` (ya logueada). Las ligas que fallen en
+    los workers se reintentan al final en `page`, una a una.
+    """
+    if workers <= 1:
+        return get_data_from_website(page)
+
+    try:
+        print("Navegando a la página de la lista de ligas...")
+        _open_league_list(page)
+        league_names = _list_league_names(page)
+        storage_state = page.context.storage_state()
+    except Exception as e:
+        error_message = f"Ocurrió un error inesperado CRÍTICO: {e}"
+        print(error_message)
+        return {"error": error_message}
+
+    workers = min(workers, len(league_names)) or 1
+    print(f"Se encontraron {len(league_names)} ligas. Repartiendo entre {workers} navegadores...")
+    start = time.time()
+
+    tasks = queue.Queue()
+    for i, league_name in enumerate(league_names):
+        tasks.put((i, league_name))
+    results: dict[int, dict] = {}
+
+    threads = [threading.Thread(target=_crawl_worker, args=(w + 1, storage_state, tasks, results), daemon=True)
+               for w in range(workers)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    missing = [i for i in range(len(league_names)) if i not in results]
+    if missing:
+        print(f"Reintentando {len(missing)} liga(s) en el navegador principal...")
+        try:
+            _open_league_list(page)
+            for i in missing:
+                if _open_league_detail(page, i, league_names[i]):
+                    results[i] = _extract_league_detail(page, league_names[i])
+                    _back_to_list(page)
+                else:
+                    _open_league_list(page)
+        except (PlaywrightError, TimeoutError) as e:
+            print(f"  - ERROR reintentando ligas: {e}")
+
+    print(f"✅ {len(results)}/{len(league_names)} ligas extraídas en {time.time() - start:.1f}s.")
+    return [results[i] for i in sorted(results)]
+
 
 # Bloque para probar este script de forma independiente
 if __name__ == "__main__":
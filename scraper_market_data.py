@@ -1,7 +1,8 @@
 # scraper_market_data.py
-import time
 from playwright.sync_api import Page, expect, TimeoutError
-from utils import handle_popups, safe_int, safe_navigate
+from utils import handle_popups, safe_int, safe_navigate, parse_millions
+from waits import settle
+from response_tap import read_captured
 
 def parse_price(price_text):
     if not isinstance(price_text, str): return 0
@@ -28,11 +29,18 @@ def parse_price(price_text):
     except:
         return 0
 
-def get_market_data(page: Page):
+MAIN_DASHBOARD_URL = "https://en.onlinesoccermanager.com/Career"
+TRANSFERS_URL = "https://en.onlinesoccermanager.com/Transferlist"
+
+
+def get_market_data(page: Page, watermarks: dict | None = None):
+    """
+    watermarks: {league_name.lower(): marca de agua} para el historial incremental
+    (ver extract_transfer_history_from_page). Ligas sin marca cargan el historial completo.
+    """
+    watermarks = watermarks or {}
     print("\n--- Scraper de Mercado V10 (Robust Extraction) ---")
-    MAIN_DASHBOARD_URL = "https://en.onlinesoccermanager.com/Career"
-    TRANSFERS_URL = "https://en.onlinesoccermanager.com/Transferlist"
-    
+
     all_teams_transfer_list = []
     all_teams_transfer_history = []
 
@@ -42,20 +50,20 @@ def get_market_data(page: Page):
             print(f"\n--- Slot #{i + 1} ---")
             if not page.url.endswith("/Career"):
                 page.goto(MAIN_DASHBOARD_URL, wait_until="domcontentloaded")
-            
+
             from utils import wait_for_visible_slots
             if not wait_for_visible_slots(page, timeout=20000):
                 break
 
             slot = page.locator(".career-teamslot").nth(i)
-            
+
             from utils import get_slot_info
             team_name, league_name, _ = get_slot_info(slot)
-            
+
             if not team_name:
                 print(f"Slot #{i + 1} no es procesable (Searching/Unavailable/Empty). Saltando.")
                 continue
-                
+
             print(f"Procesando: {team_name} en {league_name}")
 
             # Hacer clic en el slot para activar ese equipo de forma robusta
@@ -64,156 +72,222 @@ def get_market_data(page: Page):
                 print(f"  ❌ No se pudo activar el slot {i+1}. Saltando.")
                 continue
 
-            
+
             # --- EXTRACCIÓN CON FALLBACK ---
             print("  - Extrayendo datos de jugadores...")
             try:
-                
                 if safe_navigate(page, TRANSFERS_URL, verify_selector="#transfer-list"):
-                    # B. ESPERA INTELIGENTE DE DATOS
-                    print("  - Esperando renderizado de jugadores...")
-                    try:
-                        page.wait_for_selector("#transfer-list table.table-sticky tbody tr.clickable", state="visible", timeout=15000)
-                        time.sleep(2) 
-                    except TimeoutError:
-                        print("    ⚠️ Tiempo de espera agotado: La tabla sigue vacía (¿Mercado vacío o fallo de carga?).")
-                    
-                    
-                    # JS mejorado para encontrar los datos sin importar la estructura exacta
-                    players_on_sale_raw = page.evaluate("""
-                        () => {
-                            const rows = Array.from(document.querySelectorAll("#transfer-list table.table-sticky tbody tr.clickable"));
-                            return rows.map(row => {
-                                const data = ko.dataFor(row);
-                                if (!data) return null;
-                                
-                                const player = data.playerPartial ? data.playerPartial() : null;
-                                if (!player) return null;
-                                
-                                const cols = row.querySelectorAll("td");
-                                
-                                // FALLBACK PARA EL PRECIO: 
-                                let price = 0;
-                                if (typeof data.price === 'function') price = data.price();
-                                else if (data.price) price = data.price;
-                                else {
-                                    const priceText = cols[cols.length - 1].innerText;
-                                    price = priceText.replace(/[^0-9.]/g, ''); // Limpieza básica
-                                }
-
-                                return {
-                                    name: player.name || "N/A",
-                                    nationality: (player.nationality && player.nationality.name) ? player.nationality.name : "N/A",
-                                    position: cols[2] ? cols[2].innerText.trim() : "N/A",
-                                    age: player.age || 0,
-                                    seller_team: data.teamPartial ? data.teamPartial().name : "CPU",
-                                    seller_manager: (data.teamPartial && data.teamPartial().managerPartial()) 
-                                                    ? data.teamPartial().managerPartial().name 
-                                                    : "CPU",
-                                    attack: player.statAtt || 0,
-                                    defense: player.statDef || 0,
-                                    overall: player.statOvr || 0,
-                                    price_val: price,
-                                    value_val: player.value || 0
-                                };
-                            }).filter(p => p !== null);
-                        }
-                    """)
-                    
-                    # Procesamiento en Python (Millones)
-                    players_on_sale = []
-                    for p in players_on_sale_raw:
-                        try:
-                            raw_p = str(p.get('price_val', 0)).lower()
-                            raw_v = str(p.get('value_val', 0)).lower()
-                            
-                            def to_million(val_str):
-                                clean = ''.join(filter(lambda x: x.isdigit() or x == '.' or x == ',', val_str)).replace(',', '.')
-                                if not clean: return 0.0
-                                num = float(clean)
-                                if num > 10000: return round(num / 1_000_000, 2)
-                                return round(num, 2)
-
-                            p['price'] = to_million(raw_p)
-                            p['value'] = to_million(raw_v)
-                            
-                            del p['price_val']
-                            del p['value_val']
-                            players_on_sale.append(p)
-                        except: continue
-
+                    players_on_sale = extract_transfer_list_from_page(page)
                     all_teams_transfer_list.append({
-                        "team_name": team_name, 
-                        "league_name": league_name, 
+                        "team_name": team_name,
+                        "league_name": league_name,
                         "players_on_sale": players_on_sale
                     })
-                    print(f"  ✓ {len(players_on_sale)} jugadores extraídos.")
 
             except Exception as e:
                 print(f"  ⚠️ Error extrayendo mercado: {e}")
 
             # --- HISTORIAL (Misma lógica de extracción rápida) ---
-            print("  - Historial...")
-            history_tab = page.locator("a[href='#transfer-history']")
-            if history_tab.is_visible():
-                history_tab.click()
-                try:
-                    page.wait_for_selector("#transfer-history table.table", timeout=10000)
-                    
-                    # Cargar historial exhaustivo con límite de seguridad e inicio de espera inteligente y dinámica
-                    max_clicks = 150
-                    clicks_done = 0
-                    
-                    while clicks_done < max_clicks:
-                        btn = page.locator('button:has-text("More transfers")')
-                        
-                        if btn.is_visible(timeout=1000):
-                            if btn.is_disabled():
-                                print("    ℹ️ El botón 'More transfers' está deshabilitado. Historial completo.")
-                                break
-                            
-                            try:
-                                # Obtener el conteo de filas actual antes del click
-                                old_count = page.locator("#transfer-history table.table tbody tr").count()
-                                
-                                # Hacer click con timeout bajo
-                                btn.click(timeout=3000)
-                                
-                                # Esperar dinámicamente (hasta 5s) a que el conteo de filas aumente
-                                page.wait_for_function(
-                                    f"document.querySelectorAll('#transfer-history table.table tbody tr').length > {old_count}",
-                                    timeout=5000
-                                )
-                                clicks_done += 1
-                            except Exception as wait_err:
-                                print(f"    ℹ️ Finalizada la carga de historial (no se detectaron más filas nuevas): {wait_err}")
-                                break
-                        else:
-                            # El botón ya no es visible, se cargó todo el historial
-                            break
-                            
-                    if clicks_done == max_clicks:
-                        print("    ⚠️ Se alcanzó el límite máximo de clicks en el historial.")
-
-                    hist_list = page.evaluate("""() => {
-                        const rows = Array.from(document.querySelectorAll("#transfer-history table.table tbody tr"));
-                        return rows.map(r => {
-                            const c = r.querySelectorAll("td");
-                            if(c.length < 8) return null;
-                            return {
-                                Name: c[0].innerText.trim(), From: c[1].innerText.trim(),
-                                To: c[2].innerText.trim(), Position: c[3].innerText.trim(),
-                                Gameweek: c[4].innerText.trim(), Value: c[5].innerText.trim(),
-                                Price: c[6].innerText.trim(), Date: c[7].innerText.trim()
-                            };
-                        }).filter(x => x);
-                    }""")
-                    all_teams_transfer_history.append({
-                        "team_name": team_name, "league_name": league_name, "transfers": hist_list
-                    })
-                except: pass
+            hist_list = extract_transfer_history_from_page(page, watermarks.get(league_name.lower()))
+            if hist_list is not None:
+                all_teams_transfer_history.append({
+                    "team_name": team_name, "league_name": league_name, "transfers": hist_list
+                })
 
     except Exception as e:
         print(f"❌ Error crítico mercado: {e}")
 
     return all_teams_transfer_list, all_teams_transfer_history
+
+
+def extract_transfer_list_from_page(page: Page) -> list:
+    """
+    Extrae los jugadores en venta de /Transferlist para el equipo activo.
+    Asume que la página ya está cargada (verificado '#transfer-list').
+    """
+    # A. RESPUESTA API CAPTURADA (sin esperar al render)
+    players_on_sale_raw = read_captured(page, "transfer_list")
+    if players_on_sale_raw is not None:
+        print("  - Jugadores leídos de la respuesta API capturada.")
+    else:
+        players_on_sale_raw = _extract_transfer_list_ko(page)
+
+    return _to_millions(players_on_sale_raw)
+
+
+def _extract_transfer_list_ko(page: Page) -> list:
+    """Fallback: espera al render de la tabla y lee el viewmodel KO de cada fila."""
+    # B. ESPERA INTELIGENTE DE DATOS
+    print("  - Esperando renderizado de jugadores...")
+    try:
+        page.wait_for_selector("#transfer-list table.table-sticky tbody tr.clickable", state="visible", timeout=15000)
+        # Las filas llegan en varias tandas: esperar a que la tabla deje de crecer
+        settle(page, site="transferlist.rows", quiet_ms=400)
+    except TimeoutError:
+        print("    ⚠️ Tiempo de espera agotado: La tabla sigue vacía (¿Mercado vacío o fallo de carga?).")
+
+
+    # JS mejorado para encontrar los datos sin importar la estructura exacta
+    return page.evaluate("""
+        () => {
+            const rows = Array.from(document.querySelectorAll("#transfer-list table.table-sticky tbody tr.clickable"));
+            return rows.map(row => {
+                const data = ko.dataFor(row);
+                if (!data) return null;
+
+                const player = data.playerPartial ? data.playerPartial() : null;
+                if (!player) return null;
+
+                const cols = row.querySelectorAll("td");
+
+                // FALLBACK PARA EL PRECIO:
+                let price = 0;
+                if (typeof data.price === 'function') price = data.price();
+                else if (data.price) price = data.price;
+                else {
+                    const priceText = cols[cols.length - 1].innerText;
+                    price = priceText.replace(/[^0-9.]/g, ''); // Limpieza básica
+                }
+
+                return {
+                    name: player.name || "N/A",
+                    nationality: (player.nationality && player.nationality.name) ? player.nationality.name : "N/A",
+                    position: cols[2] ? cols[2].innerText.trim() : "N/A",
+                    age: player.age || 0,
+                    seller_team: data.teamPartial ? data.teamPartial().name : "CPU",
+                    seller_manager: (data.teamPartial && data.teamPartial().managerPartial())
+                                    ? data.teamPartial().managerPartial().name
+                                    : "CPU",
+                    attack: player.statAtt || 0,
+                    defense: player.statDef || 0,
+                    overall: player.statOvr || 0,
+                    price_val: price,
+                    value_val: player.value || 0
+                };
+            }).filter(p => p !== null);
+        }
+    """)
+
+
+def _to_millions(players_on_sale_raw: list) -> list:
+    # Procesamiento en Python (Millones)
+    players_on_sale = []
+    for p in players_on_sale_raw:
+        try:
+            raw_p = str(p.get('price_val', 0)).lower()
+            raw_v = str(p.get('value_val', 0)).lower()
+
+            def to_million(val_str):
+                clean = ''.join(filter(lambda x: x.isdigit() or x == '.' or x == ',', val_str)).replace(',', '.')
+                if not clean: return 0.0
+                num = float(clean)
+                if num > 10000: return round(num / 1_000_000, 2)
+                return round(num, 2)
+
+            p['price'] = to_million(raw_p)
+            p['value'] = to_million(raw_v)
+
+            del p['price_val']
+            del p['value_val']
+            players_on_sale.append(p)
+        except: continue
+
+    print(f"  ✓ {len(players_on_sale)} jugadores extraídos.")
+    return players_on_sale
+
+
+# Filas del historial a partir de un índice (para leer solo lo recién cargado)
+_HISTORY_ROWS_JS = """(start) => {
+    const rows = Array.from(document.querySelectorAll("#transfer-history table.table tbody tr")).slice(start);
+    return rows.map(r => {
+        const c = r.querySelectorAll("td");
+        if(c.length < 8) return null;
+        return {
+            Name: c[0].innerText.trim(), From: c[1].innerText.trim(),
+            To: c[2].innerText.trim(), Position: c[3].innerText.trim(),
+            Gameweek: c[4].innerText.trim(), Value: c[5].innerText.trim(),
+            Price: c[6].innerText.trim(), Date: c[7].innerText.trim()
+        };
+    }).filter(x => x);
+}"""
+
+
+def _is_known_transfer(row: dict, watermark: dict) -> bool:
+    """
+    True si la fila ya está en BD según la marca de agua:
+    jornada anterior a la última guardada, o misma (jornada, jugador, precio).
+    """
+    rnd = safe_int(row.get("Gameweek"), -1)
+    if rnd < watermark["round"]:
+        return True
+    # Mismo parseo que usa run_update_for_user al guardar final_price
+    return (rnd, row.get("Name"), round(parse_millions(row.get("Price")), 2)) in watermark["keys"]
+
+
+def _page_is_known(rows: list, watermark: dict | None) -> bool:
+    return bool(watermark) and bool(rows) and all(_is_known_transfer(r, watermark) for r in rows)
+
+
+def extract_transfer_history_from_page(page: Page, watermark: dict | None = None):
+    """
+    Abre la pestaña de historial en /Transferlist, pagina con 'More transfers'
+    y devuelve las filas. Devuelve None si la pestaña no está disponible.
+
+    watermark: {"round": int, "keys": {(round, player_name, final_price)}} con lo
+    último que ya hay en `transfers` para esta liga. Si se indica, se deja de
+    paginar en cuanto una página solo trae filas conocidas. Sin marca (liga
+    nueva o modo completo) se carga el historial entero.
+    """
+    print("  - Historial..." + (f" (incremental desde jornada {watermark['round']})" if watermark else ""))
+    history_tab = page.locator("a[href='#transfer-history']")
+    if not history_tab.is_visible():
+        return None
+    history_tab.click()
+    try:
+        page.wait_for_selector("#transfer-history table.table", timeout=10000)
+
+        # Cargar historial exhaustivo con límite de seguridad e inicio de espera inteligente y dinámica
+        max_clicks = 150
+        clicks_done = 0
+        rows = page.evaluate(_HISTORY_ROWS_JS, 0)
+        caught_up = _page_is_known(rows, watermark)
+
+        while not caught_up and clicks_done < max_clicks:
+            btn = page.locator('button:has-text("More transfers")')
+
+            if btn.is_visible(timeout=1000):
+                if btn.is_disabled():
+                    print("    ℹ️ El botón 'More transfers' está deshabilitado. Historial completo.")
+                    break
+
+                try:
+                    # Obtener el conteo de filas actual antes del click
+                    old_count = page.locator("#transfer-history table.table tbody tr").count()
+
+                    # Hacer click con timeout bajo
+                    btn.click(timeout=3000)
+
+                    # Esperar dinámicamente (hasta 5s) a que el conteo de filas aumente
+                    page.wait_for_function(
+                        f"document.querySelectorAll('#transfer-history table.table tbody tr').length > {old_count}",
+                        timeout=5000
+                    )
+                    clicks_done += 1
+                    batch = page.evaluate(_HISTORY_ROWS_JS, old_count)
+                    rows.extend(batch)
+                    caught_up = _page_is_known(batch, watermark)
+                except Exception as wait_err:
+                    print(f"    ℹ️ Finalizada la carga de historial (no se detectaron más filas nuevas): {wait_err}")
+                    break
+            else:
+                # El botón ya no es visible, se cargó todo el historial
+                break
+
+        if caught_up:
+            print(f"    ⏹️ Historial al día con la BD tras {clicks_done} página(s) extra ({len(rows)} filas).")
+        elif clicks_done == max_clicks:
+            print("    ⚠️ Se alcanzó el límite máximo de clicks en el historial.")
+
+        return rows
+    except:
+        return None
@@ -1,10 +1,11 @@
 import os
-import time
 import json
 import re
 from dotenv import load_dotenv
 from playwright.sync_api import TimeoutError, Error as PlaywrightError
 from utils import handle_popups, safe_int, safe_navigate
+from waits import wait_for_dom, wait_for_text_change, settle, pause
+from response_tap import read_captured
 
 load_dotenv()
 
@@ -17,6 +18,101 @@ RESULTS_TABLE_SELECTORS = [
     ".league-results table",
 ]
 
+MATCHDAY_TITLE_SELECTOR = "th.text-center span[data-bind*='weekNr'], .matchday-title"
+
+# Tabla de resultados con filas ya renderizadas por KO
+_TABLE_ROWS_JS = """(sels) => sels.some(sel => {
+    const t = document.querySelector(sel);
+    return !!t && t.querySelectorAll('tbody tr').length > 0;
+})"""
+
+# Modal de detalles poblado: árbitro con nombre y estadísticas con filas
+_MATCH_DETAILS_READY_JS = """() => {
+    const modal = document.querySelector('.modal-content');
+    if (!modal) return false;
+    const ref = modal.querySelector('#match-details-referee');
+    const stats = modal.querySelectorAll('#table-match-statistics tr, .table-match-events tr').length;
+    return !!ref && ref.innerText.trim().length > 0 && stats > 0;
+}"""
+
+
+# Calendario completo desde el viewmodel de /League/Fixtures: recorre los objetos
+# del contexto KO buscando partidos (homeTeam/awayTeam) y hereda la jornada
+# (weekNr) del grupo que los contiene. null si solo está la jornada visible.
+_FIXTURES_CALENDAR_JS = """() => {
+    const table = document.querySelector('#fixtures-list table, table.table-sticky') || document.body;
+    const ctx = window.ko && ko.contextFor(table);
+    if (!ctx) return null;
+    const v = o => ko.isObservable(o) ? o() : o;
+    const name = t => { t = v(t); return !t ? '' : typeof t === 'string' ? t : (v(t.name) || ''); };
+    const roundOf = o => { const r = v(o.weekNr) ?? v(o.matchday) ?? v(o.round); return typeof r === 'number' ? r : null; };
+    const seen = new WeakSet(), matches = [];
+
+    function walk(o, round, depth) {
+        o = v(o);
+        if (!o || typeof o !== 'object' || seen.has(o) || depth > 5 || o.nodeType) return;
+        seen.add(o);
+        if (Array.isArray(o)) { o.forEach(x => walk(x, round, depth + 1)); return; }
+        if (typeof o.getItems === 'function') { try { walk(o.getItems(), round, depth + 1); } catch (e) {} }
+        const r = roundOf(o) ?? round;
+        const home = o.homeTeam ?? o.home, away = o.awayTeam ?? o.away;
+        if (home !== undefined && away !== undefined && r !== null) {
+            const h = v(home), a = v(away);
+            const hg = v(o.homeGoals ?? o.homeScore), ag = v(o.awayGoals ?? o.awayScore);
+            const played = v(o.isPlayed) ?? v(o.played) ?? (typeof hg === 'number' && typeof ag === 'number' && hg >= 0);
+            matches.push({
+                round: r, is_played: !!played,
+                home_team: name(h), away_team: name(a),
+                home_manager: (h && name(h.manager)) || 'CPU', away_manager: (a && name(a.manager)) || 'CPU',
+                home_goals: played ? (hg || 0) : 0, away_goals: played ? (ag || 0) : 0,
+            });
+            return;
+        }
+        for (const key of Object.keys(o)) {
+            if (key.startsWith('_') || key === '$root' || key === '$parent') continue;
+            try { walk(o[key], r, depth + 1); } catch (e) {}
+        }
+    }
+
+    [ctx.$root, ctx.$data].forEach(vm => walk(vm, null, 0));
+    const rounds = new Set(matches.filter(m => m.home_team && m.away_team).map(m => m.round));
+    return rounds.size > 1 ? matches.filter(m => m.home_team && m.away_team) : null;
+}"""
+
+
+def _read_fixtures_calendar(page) -> list | None:
+    """
+    Todas las jornadas de la temporada en una sola lectura: JSON capturado de la
+    API o, si no, el viewmodel de Fixtures. None → escaneo jornada a jornada.
+    """
+    calendar = read_captured(page, "fixtures")
+    if calendar:
+        return calendar
+    try:
+        return page.evaluate(_FIXTURES_CALENDAR_JS)
+    except Exception as e:
+        print(f"    ⚠️ No se pudo leer el calendario del viewmodel: {e}")
+        return None
+
+
+def _new_match(m_info: dict, m_round: int) -> dict:
+    """Partido en el formato que consume sync_matches (sin detalles)."""
+    return {
+        "round": m_round, "home_team": m_info['home_team'], "home_manager": m_info['home_manager'],
+        "away_team": m_info['away_team'], "away_manager": m_info['away_manager'],
+        "home_goals": m_info['home_goals'], "away_goals": m_info['away_goals'],
+        "is_played": m_info['is_played'], "referee": "", "referee_strictness": "",
+        "events": [], "statistics": {}, "ratings": {"home": [], "away": []}
+    }
+
+
+def _matchday_title(page) -> str:
+    try:
+        header = page.locator(MATCHDAY_TITLE_SELECTOR).first
+        return header.inner_text() if header.count() > 0 else ""
+    except Exception:
+        return ""
+
 def _navigate_to_league_tab_in_spa(page, tab_href: str, verify_selector: str, timeout_ms: int = 15000) -> bool:
     """
     Navega a una pestaña de la SPA de OSM usando el menú interno.
@@ -41,7 +137,7 @@ def _navigate_to_league_tab_in_spa(page, tab_href: str, verify_selector: str, ti
     for attempt in range(3):
         try:
             page.goto(full_url, wait_until="domcontentloaded", timeout=30000)
-            time.sleep(2)
+            settle(page, site="results.goto")
             for sel in RESULTS_TABLE_SELECTORS + [verify_selector]:
                 try:
                     page.wait_for_selector(sel, timeout=12000, state="visible")
@@ -49,15 +145,19 @@ def _navigate_to_league_tab_in_spa(page, tab_href: str, verify_selector: str, ti
                     return True
                 except: continue
             page.reload(wait_until="domcontentloaded")
-            time.sleep(2)
+            settle(page, site="results.reload")
         except Exception as e:
-            time.sleep(3)
+            pause(3, site="results.backoff")
     return False
 
-def get_match_results(page, scrape_future_fixtures=False):
+def get_match_results(page, scrape_future_fixtures=False, known_details=None, refresh_latest_rounds=0):
     """
     Extrae los resultados. V4.2 - Navegación condicional por jornadas y calendario completo.
+
+    known_details: {league_name.lower(): {(round, home_team, away_team)}} con los
+    partidos que ya tienen detalles en BD (ver extract_matches_for_active_team).
     """
+    known_details = known_details or {}
     print("--- 🟢 EJECUTANDO SCRAPER MATCH RESULTS V4.2 ---")
     
     try:
@@ -93,219 +193,263 @@ def get_match_results(page, scrape_future_fixtures=False):
 
             
             try:
-                tabs_to_visit = ["/League/Results"]
-                if scrape_future_fixtures:
-                    tabs_to_visit.append("/League/Fixtures")
-                
-                league_matches = []
-                seen_matches = set()
-
-                for tab_path in tabs_to_visit:
-                    print(f"  - Navegando a {tab_path}...")
-                    if not _navigate_to_league_tab_in_spa(page, tab_path, verify_selector="table.table-sticky"):
-                        continue
-                    
-                    time.sleep(1)
-
-                    is_fixtures = "/Fixtures" in tab_path
-                    if is_fixtures and scrape_future_fixtures:
-                        print("    📂 Iniciando escaneo completo de calendario...")
-                        prev_btn = page.locator(".fixtures-matchday-nav-prev, .btn-prev").first
-                        while prev_btn.count() > 0 and prev_btn.is_visible(timeout=500):
-                            try:
-                                prev_btn.click()
-                                time.sleep(0.3)
-                            except: break
-                        time.sleep(0.5)
-
-                    while True:
-                        round_number = 0
-                        try:
-                            header_span = page.locator("th.text-center span[data-bind*='weekNr'], .matchday-title").first
-                            if header_span.count() > 0:
-                                txt = header_span.inner_text()
-                                round_number = safe_int(re.search(r'(\d+)', txt).group(1)) if re.search(r'(\d+)', txt) else 0
-                        except: pass
-                        
-                        match_rows_data = page.evaluate("""() => {
-                            const tableSelectors = ['table.table-sticky', '#results-list table', '#matches-list table', '.league-results table', 'table'];
-                            let tableEl = null;
-                            for (const sel of tableSelectors) {
-                                tableEl = document.querySelector(sel);
-                                if (tableEl) break;
+                league_matches = extract_matches_for_active_team(
+                    page, scrape_future_fixtures,
+                    known_details=known_details.get(league_name.lower()),
+                    refresh_latest_rounds=refresh_latest_rounds,
+                )
+                all_leagues_matches.append({"league_name": league_name, "team_name": team_name, "matches": league_matches})
+            except Exception as e:
+                print(f"  ❌ Error en slot {i}: {e}")
+        return all_leagues_matches
+    except Exception as e:
+        print(f"❌ Error crítico en scraper: {e}")
+        return []
+
+
+def extract_matches_for_active_team(page, scrape_future_fixtures=False,
+                                    known_details=None, refresh_latest_rounds=0) -> list:
+    """
+    Extrae los partidos (y detalles de los jugados) del equipo activo.
+    Si ya estamos en /League/Results no se vuelve a navegar.
+
+    known_details: claves (round, home_team, away_team) que ya tienen eventos en
+    public.matches; no se abre su modal y el partido sale con details_cached=True
+    (sync_matches conserva los detalles guardados). refresh_latest_rounds > 0
+    vuelve a abrir igualmente las últimas N jornadas jugadas.
+    """
+    tabs_to_visit = ["/League/Results"]
+    if scrape_future_fixtures:
+        tabs_to_visit.append("/League/Fixtures")
+
+    known_details = known_details or set()
+    league_matches = []
+    seen_matches = set()
+    latest_round = 0
+    skipped_details = 0
+
+    for tab_path in tabs_to_visit:
+        print(f"  - Navegando a {tab_path}...")
+        if tab_path not in page.url and not _navigate_to_league_tab_in_spa(page, tab_path, verify_selector="table.table-sticky"):
+            continue
+
+        wait_for_dom(page, _TABLE_ROWS_JS, arg=RESULTS_TABLE_SELECTORS, deadline_ms=5000, site="results.table_rows")
+
+        is_fixtures = "/Fixtures" in tab_path
+        if is_fixtures and scrape_future_fixtures:
+            calendar = _read_fixtures_calendar(page)
+            if calendar:
+                added = 0
+                for m_info in calendar:
+                    m_key = (m_info['home_team'], m_info['away_team'], m_info['round'])
+                    if m_key in seen_matches: continue
+                    seen_matches.add(m_key)
+                    match_obj = _new_match(m_info, m_info['round'])
+                    # Jugado pero no visto en Results: no pisar los detalles que haya en BD
+                    if m_info['is_played']:
+                        match_obj["details_cached"] = True
+                    league_matches.append(match_obj)
+                    added += 1
+                print(f"    📅 Calendario completo en una lectura: {len(calendar)} partidos ({added} nuevos).")
+                continue
+
+            print("    📂 Iniciando escaneo completo de calendario...")
+            prev_btn = page.locator(".fixtures-matchday-nav-prev, .btn-prev").first
+            while prev_btn.count() > 0 and prev_btn.is_visible(timeout=500):
+                try:
+                    before = _matchday_title(page)
+                    prev_btn.click()
+                    # Si la jornada no cambia, ya estamos en la primera
+                    if not wait_for_text_change(page, MATCHDAY_TITLE_SELECTOR, before,
+                                                deadline_ms=2000, site="fixtures.prev"):
+                        break
+                except: break
+
+        while True:
+            round_number = 0
+            try:
+                header_span = page.locator(MATCHDAY_TITLE_SELECTOR).first
+                if header_span.count() > 0:
+                    txt = header_span.inner_text()
+                    round_number = safe_int(re.search(r'(\d+)', txt).group(1)) if re.search(r'(\d+)', txt) else 0
+            except: pass
+
+            match_rows_data = page.evaluate("""() => {
+                const tableSelectors = ['table.table-sticky', '#results-list table', '#matches-list table', '.league-results table', 'table'];
+                let tableEl = null;
+                for (const sel of tableSelectors) {
+                    tableEl = document.querySelector(sel);
+                    if (tableEl) break;
+                }
+                const rows = tableEl ? Array.from(tableEl.querySelectorAll('tbody tr')) : [];
+                let currentRound = 0;
+                const extracted = [];
+                for(let i=0; i<rows.length; i++){
+                    const r = rows[i];
+                    const headerEl = r.querySelector('td[colspan] span') || r.querySelector('td span') || r;
+                    const txtFull = headerEl.innerText.trim();
+                    const matchdayRegex = /(?:matchday|jornada|round|week|rodada|rnd)\\s*(\\d+)/i;
+                    const m = txtFull.match(matchdayRegex);
+                    if (m) {
+                        currentRound = parseInt(m[1], 10);
+                        continue;
+                    }
+                    const home = r.querySelector('.td-home .font-sm'), away = r.querySelector('.td-away .font-sm');
+                    if(!home || !away) continue;
+                    const scoreEl = r.querySelector('.match-score span') || r.querySelector('span[data-bind*="score"]');
+                    let isPlayed = false, hGoals = 0, aGoals = 0;
+                    if (scoreEl) {
+                        const txt = scoreEl.innerText.trim();
+                        if(txt.includes('-') && !txt.includes(':')) {
+                            const parts = txt.split('-');
+                            if(parts.length === 2) { isPlayed = true; hGoals = parseInt(parts[0]); aGoals = parseInt(parts[1]); }
+                        }
+                    }
+                    const hMgrEl = r.querySelector('.td-home .text-secondary'), aMgrEl = r.querySelector('.td-away .text-secondary');
+                    extracted.push({
+                        idx: i, round: currentRound, is_played: isPlayed,
+                        home_team: home.innerText.trim(), away_team: away.innerText.trim(),
+                        home_manager: hMgrEl ? hMgrEl.innerText.trim() : "CPU",
+                        away_manager: aMgrEl ? aMgrEl.innerText.trim() : "CPU",
+                        home_goals: hGoals, away_goals: aGoals
+                    });
+                }
+                return extracted;
+            }""")
+
+            print(f"    - Jornada {round_number}: {len(match_rows_data)} partidos.")
+            latest_round = max([latest_round] + [m["round"] or round_number for m in match_rows_data if m["is_played"]])
+
+            for m_info in match_rows_data:
+                m_round = m_info.get("round") if m_info.get("round") > 0 else round_number
+                m_key = (m_info['home_team'], m_info['away_team'], m_round)
+                if m_key in seen_matches: continue
+                seen_matches.add(m_key)
+
+                if not scrape_future_fixtures and not m_info['is_played']: continue
+
+                match_obj = _new_match(m_info, m_round)
+
+                needs_details = m_info['is_played']
+                if needs_details and (m_round, m_info['home_team'], m_info['away_team']) in known_details:
+                    if not refresh_latest_rounds or m_round <= latest_round - refresh_latest_rounds:
+                        needs_details = False
+                        match_obj["details_cached"] = True
+                        skipped_details += 1
+
+                if needs_details:
+                    print(f"    🔍 Detalles: {m_info['home_team']} vs {m_info['away_team']}")
+                    table_sel = "table.table-sticky"
+                    for _sel in RESULTS_TABLE_SELECTORS:
+                        if page.locator(_sel).count() > 0:
+                            table_sel = _sel
+                            break
+                    row_locator = page.locator(f"{table_sel} tbody tr").nth(m_info['idx'])
+                    try:
+                        # Click con retry y verificación de modal
+                        row_locator.click(position={"x": 5, "y": 5}, force=True)
+
+                        # Esperar a que el modal aparezca y TENGA CONTENIDO
+                        # Esperamos al referee o a la tabla de eventos/stats
+                        if not wait_for_dom(page, _MATCH_DETAILS_READY_JS, deadline_ms=6000, site="results.match_details"):
+                            print("      ⚠️ El contenido del modal tardó demasiado en aparecer.")
+
+                        details_data = page.evaluate(r"""() => {
+                            const modal = document.querySelector('.modal-content');
+                            if (!modal) return null;
+
+                            // Reintentar encontrar elementos si están vacíos (pequeño loop interno)
+                            let refName = "", strictness = "Unknown";
+                            const refDiv = modal.querySelector('#match-details-referee');
+                            if (refDiv) {
+                                const spanName = refDiv.querySelector('span[data-bind*="text: name"]');
+                                if(spanName) refName = spanName.innerText.trim();
+                                const icon = refDiv.querySelector('span.icon-referee');
+                                if(icon) {
+                                    if(icon.classList.contains('verylenient')) strictness = 'Very Lenient';
+                                    else if(icon.classList.contains('lenient')) strictness = 'Lenient';
+                                    else if(icon.classList.contains('average')) strictness = 'Average';
+                                    else if(icon.classList.contains('strict')) strictness = 'Strict';
+                                    else if(icon.classList.contains('verystrict')) strictness = 'Very Strict';
+                                }
                             }
-                            const rows = tableEl ? Array.from(tableEl.querySelectorAll('tbody tr')) : [];
-                            let currentRound = 0;
-                            const extracted = [];
-                            for(let i=0; i<rows.length; i++){
-                                const r = rows[i];
-                                const headerEl = r.querySelector('td[colspan] span') || r.querySelector('td span') || r;
-                                const txtFull = headerEl.innerText.trim();
-                                const matchdayRegex = /(?:matchday|jornada|round|week|rodada|rnd)\\s*(\\d+)/i;
-                                const m = txtFull.match(matchdayRegex);
-                                if (m) {
-                                    currentRound = parseInt(m[1], 10);
-                                    continue;
+                            const events = [];
+                            Array.from(modal.querySelectorAll('table.table-match-events tbody tr')).forEach(r => {
+                                const minEl = r.querySelector('.td-event-home-minute span') || r.querySelector('.td-event-away-minute span');
+                                if(!minEl) return;
+                                const side = (r.querySelector('.td-event-home-names > div')?.children.length > 0) ? 'home' : 'away';
+                                let type = "other";
+                                const icon = r.querySelector('.td-event-home-icon span, .td-event-away-icon span');
+                                if (icon) {
+                                    const cls = icon.className.toLowerCase();
+                                    if (cls.includes('yellowcard')) type = 'yellow_card';
+                                    else if (cls.includes('redcard')) type = 'red_card';
+                                    else if (cls.includes('injury')) type = 'injury';
+                                    else if (cls.includes('sub')) type = 'substitution';
+                                    else if (cls.includes('penaltymiss')) type = 'penalty_miss';
+                                    else if (cls.includes('goal')) type = 'goal';
                                 }
-                                const home = r.querySelector('.td-home .font-sm'), away = r.querySelector('.td-away .font-sm');
-                                if(!home || !away) continue;
-                                const scoreEl = r.querySelector('.match-score span') || r.querySelector('span[data-bind*="score"]');
-                                let isPlayed = false, hGoals = 0, aGoals = 0;
-                                if (scoreEl) {
-                                    const txt = scoreEl.innerText.trim();
-                                    if(txt.includes('-') && !txt.includes(':')) {
-                                        const parts = txt.split('-');
-                                        if(parts.length === 2) { isPlayed = true; hGoals = parseInt(parts[0]); aGoals = parseInt(parts[1]); }
+                                const cell = r.querySelector(`.td-event-${side}-names`);
+                                const player = cell?.querySelector('.semi-bold')?.innerText.trim() || "";
+                                const detail = Array.from(cell?.querySelectorAll('div') || []).find(d => !d.classList.contains('semi-bold'))?.innerText.trim() || "";
+                                events.push({ minute: parseInt(minEl.innerText) || 0, side, type, player, detail });
+                            });
+                            const stats = {};
+                            Array.from(modal.querySelectorAll('#table-match-statistics tbody tr')).forEach(r => {
+                                const title = r.querySelector('.td-match-stat-title')?.innerText.trim();
+                                if(title) {
+                                    const hEl = r.querySelector('.td-match-stat-home'), aEl = r.querySelector('.td-match-stat-away');
+                                    let hVal = hEl?.innerText.trim() || "0", aVal = aEl?.innerText.trim() || "0";
+                                    if (title !== 'Formation') { hVal = hVal.replace(/[^\d]/g, ''); aVal = aVal.replace(/[^\d]/g, ''); }
+                                    if(title === 'Cards') {
+                                        const hY = hEl.querySelector('.icon-player-yellowcard')?.innerText.trim() || "0";
+                                        const hR = hEl.querySelector('.icon-player-redcard')?.innerText.trim() || "0";
+                                        const aY = aEl.querySelector('.icon-player-yellowcard')?.innerText.trim() || "0";
+                                        const aR = aEl.querySelector('.icon-player-redcard')?.innerText.trim() || "0";
+                                        hVal = `${hY} ${hR}`; aVal = `${aY} ${aR}`;
                                     }
+                                    stats[title] = { home: hVal, away: aVal };
                                 }
-                                const hMgrEl = r.querySelector('.td-home .text-secondary'), aMgrEl = r.querySelector('.td-away .text-secondary');
-                                extracted.push({
-                                    idx: i, round: currentRound, is_played: isPlayed,
-                                    home_team: home.innerText.trim(), away_team: away.innerText.trim(),
-                                    home_manager: hMgrEl ? hMgrEl.innerText.trim() : "CPU",
-                                    away_manager: aMgrEl ? aMgrEl.innerText.trim() : "CPU",
-                                    home_goals: hGoals, away_goals: aGoals
-                                });
-                            }
-                            return extracted;
+                            });
+                            const ratings = { home: [], away: [] };
+                            const exRat = (tbl, arr) => tbl?.querySelectorAll('tbody tr').forEach(tr => {
+                                const n = tr.querySelector('.td-playergrade-name .semi-bold')?.innerText.trim();
+                                const g = tr.querySelector('.playergrade span')?.innerText.trim();
+                                if(n && g) arr.push({ player: n, grade: g === '-' ? "0" : g });
+                            });
+                            exRat(modal.querySelector('.table-playergrades-home table'), ratings.home);
+                            exRat(modal.querySelector('.table-playergrades-away table'), ratings.away);
+                            return { referee: refName, strictness, events, stats, ratings };
                         }""")
-                        
-                        print(f"    - Jornada {round_number}: {len(match_rows_data)} partidos.")
-
-                        for m_info in match_rows_data:
-                            m_round = m_info.get("round") if m_info.get("round") > 0 else round_number
-                            m_key = (m_info['home_team'], m_info['away_team'], m_round)
-                            if m_key in seen_matches: continue
-                            seen_matches.add(m_key)
-
-                            if not scrape_future_fixtures and not m_info['is_played']: continue
-
-                            match_obj = {
-                                "round": m_round, "home_team": m_info['home_team'], "home_manager": m_info['home_manager'],
-                                "away_team": m_info['away_team'], "away_manager": m_info['away_manager'],
-                                "home_goals": m_info['home_goals'], "away_goals": m_info['away_goals'],
-                                "is_played": m_info['is_played'], "referee": "", "referee_strictness": "",
-                                "events": [], "statistics": {}, "ratings": {"home": [], "away": []}
-                            }
+                        if details_data:
+                            match_obj.update({
+                                'referee': details_data['referee'], 'referee_strictness': details_data['strictness'],
+                                'statistics': details_data['stats'], 'ratings': details_data['ratings'],
+                                'events': details_data['events']
+                            })
+                    except: pass
+                    try:
+                        close_btn = page.locator("button.close, [data-dismiss='modal']").first
+                        if close_btn.count() > 0 and close_btn.is_visible(timeout=500): close_btn.click()
+                        else: page.keyboard.press("Escape")
+                        page.wait_for_selector(".modal-content", state="hidden", timeout=1500)
+                    except:
+                        page.evaluate("() => { document.querySelectorAll('.modal, .modal-backdrop').forEach(el => el.remove()); document.body.classList.remove('modal-open'); }")
+                league_matches.append(match_obj)
 
-                            if m_info['is_played']:
-                                print(f"    🔍 Detalles: {m_info['home_team']} vs {m_info['away_team']}")
-                                table_sel = "table.table-sticky"
-                                for _sel in RESULTS_TABLE_SELECTORS:
-                                    if page.locator(_sel).count() > 0:
-                                        table_sel = _sel
-                                        break
-                                row_locator = page.locator(f"{table_sel} tbody tr").nth(m_info['idx'])
-                                try:
-                                    # Click con retry y verificación de modal
-                                    row_locator.click(position={"x": 5, "y": 5}, force=True)
-                                    
-                                    # Esperar a que el modal aparezca y TENGA CONTENIDO
-                                    # Esperamos al referee o a la tabla de eventos/stats
-                                    try:
-                                        page.wait_for_selector(".modal-content #match-details-referee, .modal-content .table-match-events, .modal-content #table-match-statistics", 
-                                                              state="visible", timeout=5000)
-                                        # Un pequeño respiro extra para que el AJAX termine de poblar todo
-                                        time.sleep(1.2)
-                                    except:
-                                        print("      ⚠️ El contenido del modal tardó demasiado en aparecer.")
-
-                                    details_data = page.evaluate(r"""() => {
-                                        const modal = document.querySelector('.modal-content');
-                                        if (!modal) return null;
-                                        
-                                        // Reintentar encontrar elementos si están vacíos (pequeño loop interno)
-                                        let refName = "", strictness = "Unknown";
-                                        const refDiv = modal.querySelector('#match-details-referee');
-                                        if (refDiv) {
-                                            const spanName = refDiv.querySelector('span[data-bind*="text: name"]');
-                                            if(spanName) refName = spanName.innerText.trim();
-                                            const icon = refDiv.querySelector('span.icon-referee');
-                                            if(icon) {
-                                                if(icon.classList.contains('verylenient')) strictness = 'Very Lenient';
-                                                else if(icon.classList.contains('lenient')) strictness = 'Lenient';
-                                                else if(icon.classList.contains('average')) strictness = 'Average';
-                                                else if(icon.classList.contains('strict')) strictness = 'Strict';
-                                                else if(icon.classList.contains('verystrict')) strictness = 'Very Strict';
-                                            }
-                                        }
-                                        const events = [];
-                                        Array.from(modal.querySelectorAll('table.table-match-events tbody tr')).forEach(r => {
-                                            const minEl = r.querySelector('.td-event-home-minute span') || r.querySelector('.td-event-away-minute span');
-                                            if(!minEl) return;
-                                            const side = (r.querySelector('.td-event-home-names > div')?.children.length > 0) ? 'home' : 'away';
-                                            let type = "other";
-                                            const icon = r.querySelector('.td-event-home-icon span, .td-event-away-icon span');
-                                            if (icon) {
-                                                const cls = icon.className.toLowerCase();
-                                                if (cls.includes('yellowcard')) type = 'yellow_card';
-                                                else if (cls.includes('redcard')) type = 'red_card';
-                                                else if (cls.includes('injury')) type = 'injury';
-                                                else if (cls.includes('sub')) type = 'substitution';
-                                                else if (cls.includes('penaltymiss')) type = 'penalty_miss';
-                                                else if (cls.includes('goal')) type = 'goal';
-                                            }
-                                            const cell = r.querySelector(`.td-event-${side}-names`);
-                                            const player = cell?.querySelector('.semi-bold')?.innerText.trim() || "";
-                                            const detail = Array.from(cell?.querySelectorAll('div') || []).find(d => !d.classList.contains('semi-bold'))?.innerText.trim() || "";
-                                            events.push({ minute: parseInt(minEl.innerText) || 0, side, type, player, detail });
-                                        });
-                                        const stats = {};
-                                        Array.from(modal.querySelectorAll('#table-match-statistics tbody tr')).forEach(r => {
-                                            const title = r.querySelector('.td-match-stat-title')?.innerText.trim();
-                                            if(title) {
-                                                const hEl = r.querySelector('.td-match-stat-home'), aEl = r.querySelector('.td-match-stat-away');
-                                                let hVal = hEl?.innerText.trim() || "0", aVal = aEl?.innerText.trim() || "0";
-                                                if (title !== 'Formation') { hVal = hVal.replace(/[^\d]/g, ''); aVal = aVal.replace(/[^\d]/g, ''); }
-                                                if(title === 'Cards') {
-                                                    const hY = hEl.querySelector('.icon-player-yellowcard')?.innerText.trim() || "0";
-                                                    const hR = hEl.querySelector('.icon-player-redcard')?.innerText.trim() || "0";
-                                                    const aY = aEl.querySelector('.icon-player-yellowcard')?.innerText.trim() || "0";
-                                                    const aR = aEl.querySelector('.icon-player-redcard')?.innerText.trim() || "0";
-                                                    hVal = `${hY} ${hR}`; aVal = `${aY} ${aR}`;
-                                                }
-                                                stats[title] = { home: hVal, away: aVal };
-                                            }
-                                        });
-                                        const ratings = { home: [], away: [] };
-                                        const exRat = (tbl, arr) => tbl?.querySelectorAll('tbody tr').forEach(tr => {
-                                            const n = tr.querySelector('.td-playergrade-name .semi-bold')?.innerText.trim();
-                                            const g = tr.querySelector('.playergrade span')?.innerText.trim();
-                                            if(n && g) arr.push({ player: n, grade: g === '-' ? "0" : g });
-                                        });
-                                        exRat(modal.querySelector('.table-playergrades-home table'), ratings.home);
-                                        exRat(modal.querySelector('.table-playergrades-away table'), ratings.away);
-                                        return { referee: refName, strictness, events, stats, ratings };
-                                    }""")
-                                    if details_data:
-                                        match_obj.update({
-                                            'referee': details_data['referee'], 'referee_strictness': details_data['strictness'],
-                                            'statistics': details_data['stats'], 'ratings': details_data['ratings'],
-                                            'events': details_data['events']
-                                        })
-                                except: pass
-                                try:
-                                    close_btn = page.locator("button.close, [data-dismiss='modal']").first
-                                    if close_btn.count() > 0 and close_btn.is_visible(timeout=500): close_btn.click()
-                                    else: page.keyboard.press("Escape")
-                                    page.wait_for_selector(".modal-content", state="hidden", timeout=1500)
-                                except:
-                                    page.evaluate("() => { document.querySelectorAll('.modal, .modal-backdrop').forEach(el => el.remove()); document.body.classList.remove('modal-open'); }")
-                                    time.sleep(0.2)
-                            league_matches.append(match_obj)
-
-                        if is_fixtures and scrape_future_fixtures:
-                            next_btn = page.locator(".fixtures-matchday-nav-next, .btn-next").first
-                            if next_btn.count() > 0 and next_btn.is_visible(timeout=1000):
-                                try: next_btn.click(); time.sleep(0.5)
-                                except: break
-                            else: break
-                        else: break
+            if is_fixtures and scrape_future_fixtures:
+                next_btn = page.locator(".fixtures-matchday-nav-next, .btn-next").first
+                if next_btn.count() > 0 and next_btn.is_visible(timeout=1000):
+                    try:
+                        before = _matchday_title(page)
+                        next_btn.click()
+                        if not wait_for_text_change(page, MATCHDAY_TITLE_SELECTOR, before,
+                                                    deadline_ms=2000, site="fixtures.next"):
+                            break
+                    except: break
+                else: break
+            else: break
 
-                all_leagues_matches.append({"league_name": league_name, "team_name": team_name, "matches": league_matches})
-            except Exception as e:
-                print(f"  ❌ Error en slot {i}: {e}")
-        return all_leagues_matches
-    except Exception as e:
-        print(f"❌ Error crítico en scraper: {e}")
-        return []
\ No newline at end of file
+    if skipped_details:
+        print(f"    ⏩ {skipped_details} partido(s) con detalles ya guardados (modal omitido).")
+    return league_matches
@@ -4,10 +4,10 @@ Scraper de Próximo Partido para OSM
 Obtiene información sobre el próximo partido y calcula cuándo ejecutar el scraping de tácticas.
 """
 import re
-import time
 from datetime import datetime, timedelta
 from playwright.sync_api import Page, TimeoutError as PlaywrightTimeoutError
 from utils import handle_popups, safe_int
+from waits import wait_for_selector, settle, pause
 
 
 def parse_countdown(countdown_text: str) -> int:
@@ -80,14 +80,14 @@ def get_next_match_info(page: Page):
                     if not wait_for_visible_slots(page, timeout=20000):
                         raise Exception("No se encontraron slots de carrera a tiempo")
                     
-                    # Pequeña pausa para estabilizar el DOM
-                    time.sleep(1)
+                    # Esperar a que el DOM se estabilice
+                    settle(page, site="career.stabilize")
                     break
                     
                 except Exception as nav_error:
                     print(f"  ⚠️ Error navegación (intento {nav_attempt + 1}): {nav_error}")
                     if nav_attempt < max_nav_retries - 1:
-                        time.sleep(2)
+                        pause(2, site="career.nav_backoff")
                     else:
                         print(f"  ❌ No se pudo navegar a Career. Saltando slot {i+1}.")
                         continue
@@ -129,17 +129,7 @@ def get_next_match_info(page: Page):
                 match_info["team_name"] = team_name
                 match_info["league_name"] = league_name
                 match_info["slot_index"] = i
-                
-                # Calcular timestamp para scraping de tácticas
-                if match_info["seconds_remaining"] > 0:
-                    # El partido comienza en X segundos, añadimos 5 minutos (300s) de margen
-                    tactics_scrape_delay = match_info["seconds_remaining"] + 300
-                    match_info["tactics_scrape_at"] = datetime.now() + timedelta(seconds=tactics_scrape_delay)
-                    match_info["tactics_scrape_delay_seconds"] = tactics_scrape_delay
-                else:
-                    # El partido ya empezó o no hay countdown
-                    match_info["tactics_scrape_at"] = None
-                    match_info["tactics_scrape_delay_seconds"] = 0
+                add_tactics_schedule(match_info)
                 
                 all_next_matches.append(match_info)
                 print(f"  ✓ Info extraída: Jornada {match_info['matchday']}, {match_info['seconds_remaining']}s restantes")
@@ -156,6 +146,23 @@ def get_next_match_info(page: Page):
     return all_next_matches
 
 
+def add_tactics_schedule(match_info: dict) -> dict:
+    """
+    Calcula cuándo scrapear las tácticas del partido (countdown + 5 min de margen).
+    Modifica y devuelve el mismo diccionario.
+    """
+    if match_info["seconds_remaining"] > 0:
+        # El partido comienza en X segundos, añadimos 5 minutos (300s) de margen
+        tactics_scrape_delay = match_info["seconds_remaining"] + 300
+        match_info["tactics_scrape_at"] = datetime.now() + timedelta(seconds=tactics_scrape_delay)
+        match_info["tactics_scrape_delay_seconds"] = tactics_scrape_delay
+    else:
+        # El partido ya empezó o no hay countdown
+        match_info["tactics_scrape_at"] = None
+        match_info["tactics_scrape_delay_seconds"] = 0
+    return match_info
+
+
 def extract_next_match_from_dashboard(page: Page) -> dict:
     """
     Extrae la información del próximo partido desde el dashboard del equipo.
@@ -176,12 +183,11 @@ def extract_next_match_from_dashboard(page: Page) -> dict:
             "is_cup_match": False
         }
         
-        # Pequeña espera para renderizado
-        time.sleep(1.5)
+        # Esperar a que el dashboard termine de renderizar
+        settle(page, site="dashboard.render")
         
         # === CERRAR MODALES ===
         handle_popups(page)
-        time.sleep(0.2)
         
         # === MÉTODO 1: Buscar en .next-match-info-container (Dashboard principal) ===
         try:
@@ -251,8 +257,9 @@ def extract_next_match_from_dashboard(page: Page) -> dict:
                         else:
                             pass # Si ya recargamos y sigue fallando, desistimos
                     
-                    # Si el click funcionó:
-                    time.sleep(1)
+                    # Si el click funcionó: esperar al contador del dropdown
+                    wait_for_selector(page, ".next-match-container span[data-bind*='secondsRemaining']",
+                                      state="attached", deadline_ms=2000, site="dashboard.timers_dropdown")
                     
                     # Buscar en dropdown
                     nm_cont = page.locator(".next-match-container span[data-bind*='secondsRemaining']")
@@ -4,9 +4,14 @@ Extrae la plantilla completa del equipo desde /Squad para cada slot de carrera.
 Campos por jugador: nombre, número, posición, edad, nacionalidad, att/def/ovr,
                     fitness, morale, goles, valor, estado (lineup/entreno/lesión/etc.)
 """
-import time
 from playwright.sync_api import Page
-from utils import handle_popups, click_slot_and_wait_for_dashboard, wait_for_visible_slots, get_slot_info
+from utils import (
+    handle_popups, click_slot_and_wait_for_dashboard, wait_for_visible_slots,
+    career_slot_info, activate_slot_for_league,
+)
+from request_policy import request_profile
+from waits import wait_until, settle
+from response_tap import read_captured
 
 SQUAD_URL = "https://en.onlinesoccermanager.com/Squad"
 
@@ -28,7 +33,7 @@ def _navigate_to_squad(page: Page) -> bool:
             loc = page.locator(sel).first
             if loc.is_visible(timeout=800):
                 loc.click()
-                time.sleep(2)
+                settle(page, site="squad.nav")
                 if _squad_loaded(page):
                     print(f"  ✓ Squad cargado vía SPA ({sel})")
                     return True
@@ -38,7 +43,7 @@ def _navigate_to_squad(page: Page) -> bool:
     print("  → Fallback: page.goto(/Squad)...")
     try:
         page.goto(SQUAD_URL, wait_until="domcontentloaded", timeout=30000)
-        time.sleep(2)
+        settle(page, site="squad.goto")
         handle_popups(page)
         if _squad_loaded(page):
             return True
@@ -236,24 +241,32 @@ def _extract_players_dom(page: Page) -> list[dict]:
         return []
 
 
-def get_squad(page: Page) -> list[dict]:
+def open_squad_page(page: Page) -> bool:
+    """Navega a /Squad con el perfil de peticiones ligero (solo KO.js, sin CSS ni imágenes)."""
+    with request_profile(page, "squad"):
+        return _navigate_to_squad(page)
+
+
+def extract_squad_from_page(page: Page) -> list[dict]:
     """
-    Lee la plantilla completa desde /Squad.
-    Asume que el browser ya está en el contexto del equipo correcto (slot activado).
+    Lee los jugadores de /Squad ya cargado (respuesta capturada → KO → DOM).
+    Lo usan get_squad y el extractor 'squad' de scrape_pipeline.
     """
-    if not _navigate_to_squad(page):
-        print("  ❌ No se pudo cargar /Squad")
-        return []
-
-    time.sleep(1.5)
-    handle_popups(page)
+    # Si la SPA ya recibió el JSON de la plantilla no hace falta esperar al render
+    players = read_captured(page, "squad")
+    if players:
+        print("  ✓ Plantilla leída de la respuesta API capturada")
+    else:
+        settle(page, site="squad.render")
+        handle_popups(page)
 
-    try:
-        page.wait_for_selector("#squad-table tr.player-table-row", timeout=10000)
-    except Exception:
-        print("  ⚠️ Tabla de jugadores tardó en cargar, continuando...")
+        try:
+            page.wait_for_selector("#squad-table tr.player-table-row", timeout=10000)
+        except Exception:
+            print("  ⚠️ Tabla de jugadores tardó en cargar, continuando...")
 
-    players = _extract_players_ko(page)
+    if not players:
+        players = _extract_players_ko(page)
     if not players:
         print("  ⚠️ KO extract vacío — usando DOM fallback")
         players = _extract_players_dom(page)
@@ -262,6 +275,19 @@ def get_squad(page: Page) -> list[dict]:
     return players
 
 
+def get_squad(page: Page) -> list[dict]:
+    """
+    Lee la plantilla completa desde /Squad.
+    Asume que el browser ya está en el contexto del equipo correcto (slot activado).
+    """
+    # Solo lectura de KO.js: no necesitamos CSS ni imágenes
+    with request_profile(page, "squad"):
+        if not _navigate_to_squad(page):
+            print("  ❌ No se pudo cargar /Squad")
+            return []
+        return extract_squad_from_page(page)
+
+
 def get_squad_for_slot(
     page: Page,
     league_name: str,
@@ -272,42 +298,19 @@ def get_squad_for_slot(
     Análogo a renew_training_for_slot.
     Returns: { slot_index, team_name, league_name, matchday, players, error? }
     """
-    page.goto(career_url, wait_until="domcontentloaded", timeout=30000)
-    time.sleep(2)
-    wait_for_visible_slots(page, timeout=20000)
-    time.sleep(1)
-    handle_popups(page)
-
-    slots = page.locator(".career-teamslot")
-    count = slots.count()
-    target_idx  = None
-    target_team = ""
-    target_md   = None
-
-    for i in range(count):
-        t_name, t_league, t_md = get_slot_info(slots.nth(i))
-        if t_league and league_name.lower() in t_league.lower():
-            target_idx  = i
-            target_team = t_name or ""
-            target_md   = t_md
-            print(f"  ✓ Slot encontrado: DOM {i} → '{t_league}'")
-            break
-
-    if target_idx is None:
-        return {"slot_index": -1, "team_name": "", "league_name": league_name,
-                "matchday": None, "players": [], "error": f"slot_not_found:{league_name}"}
-
-    if not click_slot_and_wait_for_dashboard(page, target_idx):
-        return {"slot_index": target_idx, "team_name": target_team,
-                "league_name": league_name, "matchday": target_md,
-                "players": [], "error": "slot_activation_failed"}
+    slot, error = activate_slot_for_league(page, league_name, career_url)
+    if error:
+        slot = slot or {}
+        return {"slot_index": slot.get("index", -1), "team_name": slot.get("team_name") or "",
+                "league_name": league_name, "matchday": slot.get("matchday"),
+                "players": [], "error": error}
 
     players = get_squad(page)
     return {
-        "slot_index":  target_idx,
-        "team_name":   target_team,
+        "slot_index":  slot["index"],
+        "team_name":   slot.get("team_name") or "",
         "league_name": league_name,
-        "matchday":    target_md,
+        "matchday":    slot.get("matchday"),
         "players":     players,
     }
 
@@ -332,7 +335,7 @@ def get_squad_all_slots(page: Page, num_slots: int = 4) -> list[dict]:
             if not wait_for_visible_slots(page, timeout=20000):
                 print(f"  ❌ No se encontraron slots. Saltando.")
                 continue
-            time.sleep(1)
+            settle(page, site="career.stabilize")
         except Exception as nav_err:
             print(f"  ⚠️ Error navegando a Career: {nav_err}")
             continue
@@ -340,16 +343,13 @@ def get_squad_all_slots(page: Page, num_slots: int = 4) -> list[dict]:
         handle_popups(page)
 
         slots = page.locator(".career-teamslot")
-        for _ in range(8):
-            if slots.count() > i:
-                break
-            time.sleep(1)
+        wait_until(lambda: slots.count() > i, deadline_ms=8000, site="career.slot_count")
 
         if slots.count() <= i:
             print(f"  ℹ️ Slot #{i + 1} no existe. Fin.")
             break
 
-        team_name, league_name, matchday = get_slot_info(slots.nth(i))
+        team_name, league_name, matchday = career_slot_info(page, i)
         if not team_name:
             print(f"  ℹ️ Slot #{i + 1} vacío o no disponible. Saltando.")
             continue
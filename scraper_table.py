@@ -5,6 +5,7 @@ import json
 from dotenv import load_dotenv
 from playwright.sync_api import TimeoutError, Error as PlaywrightError
 from utils import handle_popups
+from scraper_league_details import extract_league_tables_from_page
 
 
 load_dotenv()
@@ -49,39 +50,10 @@ def get_standings_data(page):
             try:
                 print(f"  - Navegando a la clasificación de la liga...")
                 page.goto(LEAGUE_TABLE_URL)
-                
-                # --- CORRECCIÓN FINAL ---
-                # Usamos un selector que busca la tabla que CONTIENE el encabezado 'Pts'
-                standings_table_selector = "table.table-sticky:has(th:has-text('Pts'))"
-                
-                page.wait_for_selector(standings_table_selector, timeout=40000)
-                print("  - Tabla de clasificación visible.")
-
-                standings_list = []
-                rows = page.locator(f"{standings_table_selector} tbody tr.clickable")
-                # --- FIN DE LA CORRECCIÓN ---
-                
-                for row in rows.all():
-                    position = row.locator("td.td-ranking").inner_text()
-                    club_name = row.locator("span.ellipsis").inner_text()
-                    manager_name_locator = row.locator("span.text-italic")
-                    manager_name = manager_name_locator.inner_text() if manager_name_locator.count() > 0 else "N/A"
-                    played = row.locator("td").nth(4).inner_text()
-                    won = row.locator("td").nth(6).inner_text()
-                    drew = row.locator("td").nth(7).inner_text()
-                    lost = row.locator("td").nth(8).inner_text()
-                    points = row.locator("td").nth(9).inner_text()
-                    goals_for = row.locator("td").nth(10).inner_text()
-                    goals_against = row.locator("td").nth(12).inner_text()
-                    goal_difference = row.locator("td.td-goaldifference").inner_text()
-                    
-                    standings_list.append({
-                        "Position": int(position), "Club": club_name, "Manager": manager_name,
-                        "Played": int(played), "Won": int(won), "Drew": int(drew),
-                        "Lost": int(lost), "Points": int(points), "GoalsFor": int(goals_for),
-                        "GoalsAgainst": int(goals_against), "GoalDifference": int(goal_difference)
-                    })
-                
+
+                # Tabla completa en un solo evaluate (helper compartido con get_league_data)
+                standings_list, _ = extract_league_tables_from_page(page, ("standings",))
+
                 all_leagues_standings.append({
                     "league_name": league_name_on_dashboard,
                     "standings": standings_list
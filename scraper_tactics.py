@@ -3,9 +3,12 @@
 Scraper de Tácticas para OSM
 Extrae la configuración táctica actual del usuario para cada liga/equipo.
 """
-import time
 from playwright.sync_api import Page, TimeoutError as PlaywrightTimeoutError
 from utils import handle_popups, safe_int, safe_navigate
+from waits import settle, pause
+
+MAIN_DASHBOARD_URL = "https://en.onlinesoccermanager.com/Career"
+TACTICS_URL = "https://en.onlinesoccermanager.com/Tactics"
 
 
 def get_tactics_data(page: Page):
@@ -19,8 +22,6 @@ def get_tactics_data(page: Page):
         list: Lista de diccionarios con las tácticas por equipo/liga
     """
     print("\n--- Scraper de Tácticas V2.0 (Robusto) ---")
-    MAIN_DASHBOARD_URL = "https://en.onlinesoccermanager.com/Career"
-    TACTICS_URL = "https://en.onlinesoccermanager.com/Tactics"
     
     all_teams_tactics = []
     NUM_SLOTS = 4
@@ -41,13 +42,13 @@ def get_tactics_data(page: Page):
                     from utils import wait_for_visible_slots
                     if not wait_for_visible_slots(page, timeout=20000):
                         raise Exception("No se encontraron slots de carrera a tiempo")
-                    time.sleep(1)
+                    settle(page, site="career.stabilize")
                     break
                     
                 except Exception as nav_error:
                     print(f"  ⚠️ Error navegación (intento {nav_attempt + 1}): {nav_error}")
                     if nav_attempt < max_nav_retries - 1:
-                        time.sleep(2)
+                        pause(2, site="career.nav_backoff")
                     else:
                         print(f"  ❌ No se pudo navegar a Career. Saltando slot {i+1}.")
                         continue
@@ -88,7 +89,7 @@ def get_tactics_data(page: Page):
                     print(f"  ❌ No se pudo navegar a tácticas para {team_name}")
                     continue
                 
-                time.sleep(2)
+                settle(page, site="tactics.render")
                 handle_popups(page)
                 
                 tactics_data = extract_tactics_from_page(page)
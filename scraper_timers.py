@@ -6,8 +6,14 @@ Timers: Próximo partido, Entrenamiento, Ojeador, Médico, Abogado, Estadio,
 """
 import time
 from playwright.sync_api import Page
-from utils import handle_popups, click_slot_and_wait_for_dashboard, wait_for_visible_slots, get_slot_info
+from utils import handle_popups, click_slot_and_wait_for_dashboard, wait_for_visible_slots, read_career_snapshot, read_active_team_id
 from scraper_next_match import parse_countdown, extract_next_match_from_dashboard
+from waits import wait_for_dom, wait_until, settle
+from api_schema import SchemaMismatch, pick, rows_of
+from direct_fetch import DIRECT_FETCH_ENABLED, register_api_endpoint, try_fetch, slot_api_ids
+from timer_format import countdown_text
+
+CAREER_URL = "https://en.onlinesoccermanager.com/Career"
 
 
 # Mapeo de palabras clave (texto visible + clases CSS + data-bind) → tipo canónico
@@ -114,6 +120,16 @@ TIMER_LABEL_ES = {
     "unknown":          "Timer",
 }
 
+# Dropdown de #timers abierto y con entradas
+_TIMERS_MENU_OPEN_JS = """
+() => {
+    const btn = document.querySelector('#timers');
+    const parent = btn && btn.closest('.dropdown, li.dropdown, .btn-group');
+    const menu = parent && parent.querySelector('.dropdown-menu');
+    return !!menu && (menu.offsetWidth > 0 || menu.offsetHeight > 0) && menu.querySelectorAll('li').length > 0;
+}
+"""
+
 
 def _classify(text: str, meta: str = "") -> str:
     combined = (text + " " + meta).lower()
@@ -175,6 +191,191 @@ def _deduplicate(timers: list[dict]) -> list[dict]:
     return list(seen.values())
 
 
+# ── API DIRECTA ───────────────────────────────────────────────────────────────
+
+def _api_seconds(item: dict) -> int:
+    """Segundos restantes de un timer/evento de la API (segundos o timestamp de fin)."""
+    secs = pick(item, "secondsRemaining", "remainingSeconds")
+    if secs is not None:
+        return max(0, int(secs))
+    end = pick(item, "endTimestamp", "finishedTimestamp", "endTime", "readyTimestamp")
+    if end is None:
+        raise SchemaMismatch("timer sin tiempo restante")
+    end = float(end)
+    if end > 1e11:  # milisegundos
+        end /= 1000
+    return max(0, int(end - time.time()))
+
+
+def _timer_from_seconds(title: str, seconds: int, meta: str = "") -> dict:
+    return _build_timer(f"{title} {countdown_text(seconds)}", meta)
+
+
+def _normalize_api_timers(data, page) -> list[dict]:
+    timers = []
+    for item in rows_of(data, "timers", "countdownTimers"):
+        title = str(pick(item, "title", "name", "type", "timerType", default=""))
+        if not title:
+            raise SchemaMismatch("timer sin título/tipo")
+        meta = str(pick(item, "timerUrl", "type", "timerType", default="")).lower()
+        timers.append(_timer_from_seconds(title, _api_seconds(item), meta))
+    return _deduplicate(timers)
+
+
+def _normalize_api_events(data, page) -> list[dict]:
+    events = []
+    for item in rows_of(data, "events", "eventNotifications"):
+        events.append({
+            "title":       pick(item, "title", "name", default=""),
+            "explanation": pick(item, "explanation", "description", default=""),
+            "seconds":     _api_seconds(item),
+        })
+    return [ev for ev in events if ev["seconds"] > 0 or ev["title"]]
+
+
+register_api_endpoint("timers", "/leagues/{league_id}/teams/{team_id}/timers", _normalize_api_timers)
+register_api_endpoint("events", "/events", _normalize_api_events)
+
+
+def _timers_all_slots_direct(page: Page, num_slots: int) -> tuple[list[dict], set[int]]:
+    """
+    Timers por la API directa: un solo /Career para leer ids y una petición por slot.
+
+    Returns:
+        (results, handled): resultados en el formato de get_timers_all_slots y los
+        índices ya resueltos (leídos o vacíos). El resto se hace por navegador.
+    """
+    try:
+        if not page.url.endswith("/Career"):
+            page.goto(CAREER_URL, wait_until="domcontentloaded", timeout=30000)
+        if not wait_for_visible_slots(page, timeout=20000):
+            return [], set()
+        slots = read_career_snapshot(page)["slots"][:num_slots]
+    except Exception as e:
+        print(f"  ⚠️ API directa: no se pudo leer Career ({e})")
+        return [], set()
+
+    # Los eventos son globales: si no se pueden leer, todo va por navegador
+    events = try_fetch(page, "events")
+    if events is None:
+        return [], set()
+
+    results, handled = [], set()
+    for slot in slots:
+        if slot["state"] == "empty":
+            handled.add(slot["index"])
+            continue
+        ids = slot_api_ids(slot)
+        if slot["state"] != "ready" or not ids:
+            continue
+        timers = try_fetch(page, "timers", **ids)
+        if timers is None:
+            continue
+        print(f"  ⚡ Slot #{slot['index'] + 1} ({slot['team_name']}): {len(timers)} timers vía API")
+        results.append({
+            "slot_index":  slot["index"],
+            "team_name":   slot["team_name"],
+            "league_name": slot["league_name"],
+            "matchday":    slot["matchday"],
+            "timers":      timers,
+            "events":      events,
+        })
+        handled.add(slot["index"])
+    return results, handled
+
+
+# ── VIEWMODEL DEL DASHBOARD ───────────────────────────────────────────────────
+# Tras activar el slot por SPA, el menú de #timers ya está en el DOM (oculto) con
+# sus bindings KO: se leen los items del widget sin abrir el dropdown ni forzar
+# un page.goto(/Dashboard).
+
+# Widget de timers con items enlazados por KO
+_TIMERS_VM_READY_JS = """
+() => {
+    const btn = document.querySelector('#timers');
+    const parent = btn && btn.closest('.dropdown, li.dropdown, .btn-group');
+    const menu = parent && parent.querySelector('.dropdown-menu');
+    if (!menu || !window.ko) return false;
+    const li = menu.querySelector('ul.hidden-xs li.border, ul.hidden-xs li.clickable');
+    return !!li && !!ko.contextFor(li);
+}
+"""
+
+_TIMERS_VM_JS = """
+() => {
+    const btn = document.querySelector('#timers');
+    const parent = btn && btn.closest('.dropdown, li.dropdown, .btn-group');
+    const menu = parent && parent.querySelector('.dropdown-menu');
+    if (!menu || !window.ko) return null;
+
+    function koV(obs) { return typeof obs === 'function' ? obs() : obs; }
+    const items = [], seen = new Set();
+    function push(item) {
+        const title = koV(item.title) || '';
+        const url   = koV(item.timerUrl) || '';
+        if (!title || seen.has(title + '|' + url)) return;
+        seen.add(title + '|' + url);
+        items.push({ title, seconds: koV(item.secondsRemaining) || 0, meta: url.toLowerCase() });
+    }
+
+    // Mismo recorrido que el Paso A de get_all_timers_for_slot (todas las páginas)
+    menu.querySelectorAll('ul.hidden-xs').forEach(ul => {
+        const firstLi = ul.querySelector('li.border, li.clickable');
+        let vm = null;
+        try { vm = firstLi && ko.contextFor(firstLi).$parent; } catch (e) {}
+        if (!vm || typeof vm.pageItems !== 'function') return;
+        let safety = 0;
+        while (typeof vm.isGoToPreviousPageDisabled === 'function' &&
+               !vm.isGoToPreviousPageDisabled() && safety++ < 10) vm.goToPreviousPage();
+        safety = 0;
+        while (safety++ < 20) {
+            (koV(vm.pageItems) || []).forEach(push);
+            if (typeof vm.isGoToNextPageDisabled === 'function' && vm.isGoToNextPageDisabled()) break;
+            vm.goToNextPage();
+        }
+    });
+    // Items sueltos (recompensa diaria, predicción)
+    menu.querySelectorAll('span[data-bind*="secondsRemaining"]').forEach(span => {
+        try { const item = ko.dataFor(span); if (item && item.title) push(item); } catch (e) {}
+    });
+    // Próximo partido
+    const nm = menu.querySelector('.next-match-container span[data-bind*="secondsRemaining"], .nextround-timer span[data-bind*="secondsRemaining"]');
+    try {
+        const secs = nm ? koV(ko.dataFor(nm).secondsRemaining) : 0;
+        if (secs > 0) items.push({ title: 'Next match', seconds: secs, meta: 'next-match secondsremaining' });
+    } catch (e) {}
+    return items;
+}
+"""
+
+
+def _read_timers_viewmodel(page: Page, team_id=None) -> list[dict]:
+    """
+    Timers del equipo activo leídos del viewmodel KO del dashboard.
+    Lista vacía si el widget no está enlazado o no se puede comprobar que sea
+    del equipo `team_id` (tras el cambio de slot por SPA puede seguir enlazado
+    al equipo anterior); el llamador fuerza entonces /Dashboard.
+    """
+    if not team_id:
+        return []
+    if not wait_for_dom(page, _TIMERS_VM_READY_JS, deadline_ms=5000, site="timers.viewmodel"):
+        return []
+    try:
+        vm_team_id = read_active_team_id(page)
+    except Exception as e:
+        print(f"  ⚠️ _read_timers_viewmodel: {e}")
+        return []
+    if str(vm_team_id) != str(team_id):
+        print(f"  ⚠️ Viewmodel de timers del equipo {vm_team_id}, se esperaba {team_id}.")
+        return []
+    try:
+        items = page.evaluate(_TIMERS_VM_JS) or []
+    except Exception as e:
+        print(f"  ⚠️ _read_timers_viewmodel: {e}")
+        return []
+    return _deduplicate([_timer_from_seconds(i["title"], int(i["seconds"] or 0), i["meta"]) for i in items])
+
+
 # ── EXTRACCIÓN PRINCIPAL ──────────────────────────────────────────────────────
 
 def get_all_timers_for_slot(page: Page) -> list[dict]:
@@ -199,7 +400,7 @@ def get_all_timers_for_slot(page: Page) -> list[dict]:
             print(f"  ⚠️ No se pudo abrir #timers: {e}")
             return _fallback_next_match(page)
 
-        time.sleep(1.5)
+        wait_for_dom(page, _TIMERS_MENU_OPEN_JS, deadline_ms=3000, site="timers.dropdown")
 
         raw_items = page.evaluate("""
             () => {
@@ -403,7 +604,6 @@ def get_all_timers_for_slot(page: Page) -> list[dict]:
 
         try:
             page.keyboard.press("Escape")
-            time.sleep(0.3)
         except Exception:
             pass
 
@@ -466,68 +666,97 @@ def _fallback_next_match(page: Page) -> list[dict]:
 
 # ── ORQUESTADOR POR SLOTS ─────────────────────────────────────────────────────
 
+def _return_to_career(page: Page) -> bool:
+    """
+    Vuelve a /Career con los slots visibles: por el enlace del menú de la SPA si
+    está disponible (sin recargar la página) y si no con page.goto.
+    """
+    if not page.url.endswith("/Career"):
+        try:
+            link = page.locator("a[href$='/Career']").first
+            if link.count() and link.is_visible():
+                link.click(timeout=5000)
+                page.wait_for_url("**/Career", timeout=8000)
+        except Exception as e:
+            print(f"  ⚠️ Vuelta a Career por SPA falló ({e}). Usando goto().")
+        if not page.url.endswith("/Career"):
+            try:
+                page.goto(CAREER_URL, wait_until="domcontentloaded", timeout=30000)
+            except Exception as e:
+                print(f"  ⚠️ Error navegando a Career: {e}")
+                return False
+    if not wait_for_visible_slots(page, timeout=20000):
+        return False
+    settle(page, site="career.stabilize")
+    return True
+
+
 def get_timers_all_slots(page: Page, num_slots: int = 4) -> list[dict]:
     """
     Itera los slots de carrera y extrae los timers de cada uno.
+    Con OSM_DIRECT_FETCH los lee por la API sin activar ningún slot; los que
+    fallen (o todos, sin direct fetch) van por navegador: Career se lee una vez
+    y cada slot se activa con un click, volviendo a Career por la SPA.
 
     Returns:
         list de dicts: slot_index, team_name, league_name, timers: list[dict]
     """
-    results = []
-    CAREER_URL = "https://en.onlinesoccermanager.com/Career"
+    results, handled = [], set()
+    if DIRECT_FETCH_ENABLED:
+        results, handled = _timers_all_slots_direct(page, num_slots)
+
+    # Career se carga y se lee UNA vez; entre slots se vuelve por el menú de la SPA
+    if not _return_to_career(page):
+        print("  ❌ No se encontraron slots.")
+        return sorted(results, key=lambda r: r["slot_index"])
+    try:
+        snapshot_slots = read_career_snapshot(page)["slots"][:num_slots]
+    except Exception as e:
+        print(f"  ⚠️ No se pudo leer Career: {e}")
+        return sorted(results, key=lambda r: r["slot_index"])
 
-    for i in range(num_slots):
+    for slot in snapshot_slots:
+        i = slot["index"]
+        if i in handled:
+            continue
         print(f"\n--- Slot #{i + 1}: Leyendo timers ---")
-
-        try:
-            if not page.url.endswith("/Career"):
-                page.goto(CAREER_URL, wait_until="domcontentloaded", timeout=30000)
-            else:
-                page.reload(wait_until="domcontentloaded", timeout=30000)
-
-            if not wait_for_visible_slots(page, timeout=20000):
-                print(f"  ❌ No se encontraron slots. Saltando.")
-                continue
-            time.sleep(1)
-        except Exception as nav_err:
-            print(f"  ⚠️ Error navegando a Career: {nav_err}")
+        if slot["state"] != "ready":
+            print(f"  ℹ️ Slot #{i + 1} vacío o no disponible ({slot['state']}). Saltando.")
             continue
+        team_name, league_name, matchday = slot["team_name"], slot["league_name"], slot["matchday"]
 
+        if not _return_to_career(page):
+            print("  ❌ No se pudo volver a Career. Saltando.")
+            continue
         handle_popups(page)
-
-        # Esperar a que el slot i sea visible — OSM carga los slots de forma progresiva
+        # OSM pinta los slots de forma progresiva
         slots = page.locator(".career-teamslot")
-        for _wait in range(8):
-            if slots.count() > i:
-                break
-            time.sleep(1)
-
-        if slots.count() <= i:
+        if not wait_until(lambda: slots.count() > i, deadline_ms=8000, site="career.slot_count"):
             print(f"  ℹ️ Slot #{i + 1} no existe. Fin.")
             break
 
-        team_name, league_name, matchday = get_slot_info(slots.nth(i))
-        if not team_name:
-            print(f"  ℹ️ Slot #{i + 1} vacío o no disponible. Saltando.")
-            continue
-
         if not click_slot_and_wait_for_dashboard(page, i):
             print(f"  ❌ No se pudo activar el slot {i + 1}.")
             continue
 
-        # Forzar carga completa del Dashboard para que KO.js inicialice todos los bindings.
-        # La navegación SPA (click en slot) deja la página en estado parcial donde el
-        # dropdown #timers abre pero retorna vacío.
-        DASHBOARD_URL = "https://en.onlinesoccermanager.com/Dashboard"
-        try:
-            page.goto(DASHBOARD_URL, wait_until="domcontentloaded", timeout=30000)
-            page.wait_for_selector("#timers", timeout=15000)
-            handle_popups(page)
-            time.sleep(1)
-        except Exception as dash_err:
-            print(f"  ⚠️ No se pudo forzar /Dashboard: {dash_err}")
-
-        slot_timers = get_all_timers_for_slot(page)
+        # Primero el viewmodel que deja la navegación SPA; solo si no está enlazado
+        # al equipo del slot se fuerza la carga completa del Dashboard y se lee el dropdown.
+        slot_timers = _read_timers_viewmodel(page, slot.get("team_id"))
+        if slot_timers:
+            print(f"  ⚡ {len(slot_timers)} timers leídos del viewmodel (sin recargar /Dashboard)")
+        else:
+            # La navegación SPA (click en slot) puede dejar la página en estado parcial
+            # donde el dropdown #timers abre pero retorna vacío.
+            DASHBOARD_URL = "https://en.onlinesoccermanager.com/Dashboard"
+            try:
+                page.goto(DASHBOARD_URL, wait_until="domcontentloaded", timeout=30000)
+                page.wait_for_selector("#timers", timeout=15000)
+                handle_popups(page)
+                settle(page, site="dashboard.render")
+            except Exception as dash_err:
+                print(f"  ⚠️ No se pudo forzar /Dashboard: {dash_err}")
+            slot_timers = get_all_timers_for_slot(page)
+
         slot_events = _get_events_ko(page)
         results.append({
             "slot_index":  i,
@@ -538,5 +767,6 @@ def get_timers_all_slots(page: Page, num_slots: int = 4) -> list[dict]:
             "events":      slot_events,
         })
 
+    results.sort(key=lambda r: r["slot_index"])
     print(f"\n✅ Timers extraídos de {len(results)} slot(s).")
     return results
@@ -1,10 +1,10 @@
 # scraper_transfers.py
 import os
-import time
 import json
 from dotenv import load_dotenv
 from playwright.sync_api import TimeoutError, expect, Error as PlaywrightError
 from utils import handle_popups
+from waits import settle
 
 load_dotenv()
 
@@ -57,9 +57,8 @@ def get_transfers_data(page):
                     #    Como ya estamos "dentro" del club, esta navegación funcionará.
                     print(f"  - Navegando directamente a {TRANSFERS_URL}...")
                     page.goto(TRANSFERS_URL, wait_until="domcontentloaded", timeout=60000)
-                    for _ in range(3):
-                        handle_popups(page)
-                        time.sleep(1)
+                    settle(page, site="transfers.goto")
+                    handle_popups(page)
                     
                     page.locator("a[href='#transfer-history']").click()
                     
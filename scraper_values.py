@@ -5,6 +5,7 @@ import json
 from dotenv import load_dotenv
 from playwright.sync_api import TimeoutError, Error as PlaywrightError
 from utils import handle_popups
+from scraper_league_details import extract_league_tables_from_page
 
 load_dotenv()
 
@@ -49,40 +50,11 @@ def get_squad_values_data(page):
             try:
                 print(f"  - Navegando a la clasificación de la liga...")
                 page.goto(LEAGUE_TABLE_URL)
-                
-                print("  - Cambiando a la pestaña 'Squad Value'...")
-                page.locator("a[href='#standings-squad']").click()
-                
-                squad_value_panel = page.locator("#standings-squad")
-                squad_value_panel.wait_for(state="visible", timeout=40000)
-                print("  - Tabla de valores visible.")
+                page.wait_for_selector("table.table-sticky:has(th:has-text('Pts'))", state="attached", timeout=40000)
+
+                # Tabla completa en un solo evaluate (helper compartido con get_league_data)
+                _, squad_values_list = extract_league_tables_from_page(page, ("squad_values",))
 
-                squad_values_list = []
-                rows = squad_value_panel.locator("tbody tr.clickable")
-                
-                for row in rows.all():
-                    # Usamos los selectores correctos basados en el nuevo HTML
-                    position = row.locator("td.td-ranking").inner_text()
-                    club_name = row.locator("span.ellipsis").inner_text()
-                    manager_locator = row.locator("span.text-italic")
-                    if manager_locator.count() > 0:
-                        manager_name = manager_locator.inner_text()
-                    else:
-                        manager_name = "N/A" # Asignar un valor por defecto si no hay mánager
-                    # --- FIN DE LA CORRECCIÓN ---
-                    squad_value = row.locator("td").nth(2).locator("span.club-funds-amount").inner_text()
-                    player_count = row.locator("td").nth(3).inner_text()
-                    avg_value = row.locator("td").nth(4).locator("span.club-funds-amount").inner_text()
-                    
-                    squad_values_list.append({
-                        "Position": int(position),
-                        "Club": club_name,
-                        "Manager": manager_name,
-                        "Value": squad_value,
-                        "Players": int(player_count),
-                        "AverageValue": avg_value
-                    })
-                
                 all_leagues_squad_values.append({
                     "league_name": league_name_on_dashboard,
                     "squad_values_ranking": squad_values_list
@@ -0,0 +1,159 @@
+# squad_store.py
+"""
+Plantillas persistidas en Postgres con historial de cambios.
+
+Dos tablas:
+  - squad_snapshots: una fila por jugador y CAMBIO (stats, valor, estado…).
+    Si un jugador no cambió desde su última fila, no se escribe nada.
+  - squad_rosters:   quién está en la plantilla de cada liga y cuándo se leyó
+    por última vez (la frescura se mide aquí, no en los jugadores).
+
+La escriben el pipeline de run_update_for_user (extractor 'squad') y los
+scrapes en vivo del bot. Los lectores usan load_squad(), que devuelve None si
+la plantilla es más vieja que SQUAD_CACHE_TTL_MINUTES para que el llamador
+haga el scrape en vivo. Tras una acción que cambia la plantilla (entrenamiento,
+transferibles, alineación) el bot llama a invalidate_squads().
+
+Las tablas las crea la migración 0007.
+"""
+import hashlib
+import json
+import os
+
+import psycopg2.extras
+from dotenv import load_dotenv
+
+load_dotenv()
+
+SQUAD_CACHE_TTL_MINUTES = int(os.getenv("SQUAD_CACHE_TTL_MINUTES", "60"))
+
+
+def player_content_hash(player: dict) -> str:
+    """Huella de todos los campos del jugador (independiente del orden de claves)."""
+    return hashlib.sha256(json.dumps(player, sort_keys=True).encode("utf-8")).hexdigest()
+
+
+def save_squad_snapshots(conn, user_id, squads: list[dict], scraped_at=None) -> int:
+    """
+    Guarda en bloque las plantillas scrapeadas.
+    squads: [{league_id, team_name, matchday, players}, ...]
+    scraped_at: hora del scrape (None = ahora). Al re-sincronizar un spool es la
+    del scrape original, para que load_squad no sirva como fresca una plantilla vieja.
+    Solo inserta los jugadores cuyo contenido cambió; la lista de la plantilla
+    y su hora de lectura se actualizan salvo que ya haya una lectura más reciente.
+    Devuelve las filas de jugador escritas.
+    """
+    squads = [s for s in squads if s.get("league_id") and s.get("players")]
+    if not squads:
+        return 0
+    league_ids = [s["league_id"] for s in squads]
+
+    with conn.cursor() as cur:
+        cur.execute("""
+            SELECT DISTINCT ON (league_id, player_name) league_id, player_name, content_hash
+            FROM squad_snapshots
+            WHERE user_id = %s AND league_id = ANY(%s)
+            ORDER BY league_id, player_name, scraped_at DESC;
+        """, (str(user_id), league_ids))
+        latest = {(row[0], row[1]): row[2] for row in cur.fetchall()}
+
+        changed_rows = []
+        roster_rows = []
+        for squad in squads:
+            league_id = squad["league_id"]
+            names = []
+            for player in squad["players"]:
+                name = player.get("name")
+                if not name or name in names:
+                    continue
+                names.append(name)
+                content_hash = player_content_hash(player)
+                if latest.get((league_id, name)) != content_hash:
+                    changed_rows.append((str(user_id), league_id, name, json.dumps(player), content_hash, scraped_at))
+            roster_rows.append((str(user_id), league_id, squad.get("team_name"),
+                                json.dumps(squad.get("matchday")), names, scraped_at))
+
+        if changed_rows:
+            psycopg2.extras.execute_values(cur, """
+                INSERT INTO squad_snapshots (user_id, league_id, player_name, data, content_hash, scraped_at)
+                VALUES %s;
+            """, changed_rows, template="(%s, %s, %s, %s, %s, COALESCE(%s::timestamp, NOW()))")
+        psycopg2.extras.execute_values(cur, """
+            INSERT INTO squad_rosters (user_id, league_id, team_name, matchday, players, scraped_at)
+            VALUES %s
+            ON CONFLICT (user_id, league_id) DO UPDATE SET
+                team_name  = EXCLUDED.team_name,
+                matchday   = EXCLUDED.matchday,
+                players    = EXCLUDED.players,
+                scraped_at = EXCLUDED.scraped_at
+            WHERE squad_rosters.scraped_at IS NULL OR squad_rosters.scraped_at <= EXCLUDED.scraped_at;
+        """, roster_rows, template="(%s, %s, %s, %s, %s, COALESCE(%s::timestamp, NOW()))")
+    conn.commit()
+
+    total = sum(len(r[4]) for r in roster_rows)
+    print(f"  ✓ Plantillas guardadas: {len(roster_rows)} equipo(s), "
+          f"{len(changed_rows)}/{total} jugador(es) con cambios.")
+    return len(changed_rows)
+
+
+def invalidate_squads(conn, user_id, league_names) -> int:
+    """
+    Marca como caducadas las plantillas de esas ligas (scraped_at = NULL): la
+    siguiente lectura hace scrape en vivo. Por nombre, como las acciones del bot;
+    si dos rooms comparten nombre se invalidan las dos. Devuelve las filas tocadas.
+    """
+    names = [n.lower() for n in league_names if n]
+    if not names:
+        return 0
+    with conn.cursor() as cur:
+        cur.execute("""
+            UPDATE squad_rosters r SET scraped_at = NULL
+            FROM leagues l
+            WHERE r.league_id = l.id AND r.user_id = %s AND LOWER(l.name) = ANY(%s);
+        """, (str(user_id), names))
+        count = cur.rowcount
+    conn.commit()
+    return count
+
+
+def load_squad(conn, user_id, league_id, max_age_minutes: int | None = None) -> dict | None:
+    """
+    Plantilla guardada de la liga con la misma forma que get_squad_for_slot
+    (team_name, matchday, players) más scraped_at y from_cache=True.
+    None si no hay plantilla o tiene más de max_age_minutes (default SQUAD_CACHE_TTL_MINUTES).
+    """
+    if max_age_minutes is None:
+        max_age_minutes = SQUAD_CACHE_TTL_MINUTES
+    if not league_id or max_age_minutes <= 0:
+        return None
+
+    with conn.cursor() as cur:
+        cur.execute("""
+            SELECT team_name, matchday, players, scraped_at,
+                   EXTRACT(EPOCH FROM NOW() - scraped_at) AS age_seconds
+            FROM squad_rosters
+            WHERE user_id = %s AND league_id = %s;
+        """, (str(user_id), league_id))
+        roster = cur.fetchone()
+        # age NULL = invalidada tras una acción
+        if not roster or roster[4] is None or roster[4] > max_age_minutes * 60:
+            return None
+
+        cur.execute("""
+            SELECT DISTINCT ON (player_name) player_name, data
+            FROM squad_snapshots
+            WHERE user_id = %s AND league_id = %s AND player_name = ANY(%s)
+            ORDER BY player_name, scraped_at DESC;
+        """, (str(user_id), league_id, roster[2]))
+        by_name = {row[0]: row[1] for row in cur.fetchall()}
+
+    matchday = roster[1]
+    if isinstance(matchday, str):
+        matchday = json.loads(matchday)
+    return {
+        "team_name":  roster[0] or "",
+        "matchday":   matchday,
+        "players":    [by_name[name] for name in roster[2] if name in by_name],
+        "scraped_at": roster[3],
+        "from_cache": True,
+    }
@@ -0,0 +1,14 @@
+# timer_format.py
+"""
+Formato de cuenta atrás de los timers, sin dependencias de Playwright:
+lo usan scraper_timers (al leer OSM) y timer_projection (al proyectar entre
+scrapes), así el texto es idéntico venga de donde venga.
+"""
+
+
+def countdown_text(secs: int) -> str:
+    """Mismo texto que arma el Paso A KO-directo ('1h 5m 3s' / 'Listo')."""
+    if secs <= 0:
+        return "Listo"
+    h, m, s = secs // 3600, (secs % 3600) // 60, secs % 60
+    return (f"{h}h " if h else "") + (f"{m}m " if m or h else "") + f"{s}s"
@@ -0,0 +1,145 @@
+# timer_projection.py
+"""
+Proyección de timers entre scrapes.
+
+Cada scrape real de timers guarda, por slot y timer, la hora absoluta a la que
+expira (scraped_at + seconds). Entre scrapes el bot no necesita abrir Chromium:
+project() recalcula los segundos restantes con el reloj y marca como listos los
+timers ya vencidos, con la misma forma de datos que devuelve get_timers_all_slots.
+
+needs_scrape() decide cuándo hace falta volver a OSM:
+  - no hay proyección (arranque sin fichero o tras invalidate()),
+  - la proyección tiene más de TIMER_PROJECTION_MAX_AGE_MINUTES,
+  - el próximo timer en curso expira antes de la siguiente vuelta del loop
+    (más TIMER_SCRAPE_LEAD_MINUTES de margen).
+
+Tras cualquier acción que cambie timers (renovar entrenamiento, ampliar
+estadio, espiar) hay que llamar a invalidate(): la proyección ya no refleja OSM.
+
+Se persiste en timer_projection.json para que un reinicio del bot no obligue a
+scrapear de inmediato.
+"""
+import copy
+import json
+import os
+import time
+
+from dotenv import load_dotenv
+
+from timer_format import countdown_text
+
+load_dotenv()
+
+TIMER_PROJECTION_FILE = "timer_projection.json"
+TIMER_SCRAPE_LEAD_MINUTES = int(os.getenv("TIMER_SCRAPE_LEAD_MINUTES", "10"))
+TIMER_PROJECTION_MAX_AGE_MINUTES = int(os.getenv("TIMER_PROJECTION_MAX_AGE_MINUTES", "240"))
+
+# {"scraped_at": epoch, "slots": [slot con timers/events anotados con "expires_at"]}
+_projection: dict = {}
+
+
+def load():
+    global _projection
+    try:
+        if os.path.exists(TIMER_PROJECTION_FILE):
+            with open(TIMER_PROJECTION_FILE, encoding="utf-8") as f:
+                _projection = json.load(f)
+            print(f"✅ Proyección de timers cargada ({len(_projection.get('slots', []))} slots)")
+    except Exception as e:
+        print(f"⚠️ No se pudo cargar {TIMER_PROJECTION_FILE}: {e}")
+        _projection = {}
+
+
+def _save():
+    try:
+        with open(TIMER_PROJECTION_FILE, "w", encoding="utf-8") as f:
+            json.dump(_projection, f, ensure_ascii=False, indent=2)
+    except Exception as e:
+        print(f"⚠️ No se pudo guardar {TIMER_PROJECTION_FILE}: {e}")
+
+
+def record(slots: list[dict], scraped_at: float | None = None):
+    """Guarda el resultado de un scrape real con la expiración absoluta de cada timer/evento."""
+    global _projection
+    if not slots:
+        # Scrape fallido: se conserva la proyección anterior
+        return
+    scraped_at = scraped_at or time.time()
+    stored = copy.deepcopy(slots)
+    for slot in stored:
+        for timer in slot.get("timers", []):
+            timer["expires_at"] = scraped_at + max(0, int(timer.get("seconds") or 0))
+        for event in slot.get("events", []):
+            event["expires_at"] = scraped_at + max(0, int(event.get("seconds") or 0))
+    _projection = {"scraped_at": scraped_at, "slots": stored}
+    _save()
+
+
+def invalidate(reason: str = ""):
+    """Descarta la proyección: el próximo needs_scrape() pedirá un scrape real."""
+    global _projection
+    if _projection:
+        print(f"  [projection] invalidada{f' ({reason})' if reason else ''}")
+    _projection = {}
+    _save()
+
+
+def project(now: float | None = None) -> list[dict]:
+    """Slots del último scrape con seconds/is_ready/countdown recalculados a `now`."""
+    if not _projection:
+        return []
+    now = now or time.time()
+    slots = copy.deepcopy(_projection["slots"])
+    for slot in slots:
+        for timer in slot.get("timers", []):
+            expires_at = timer.pop("expires_at")
+            if timer.get("is_ready"):
+                continue
+            remaining = max(0, int(expires_at - now))
+            timer["seconds"] = remaining
+            if timer.get("countdown"):
+                timer["countdown"] = countdown_text(remaining)
+            if remaining == 0 and expires_at > _projection["scraped_at"]:
+                # Venció desde el scrape → listo (un timer sin cuenta atrás no cambia)
+                timer["is_ready"] = True
+        for event in slot.get("events", []):
+            event["seconds"] = max(0, int(event.pop("expires_at") - now))
+    return slots
+
+
+def _pending_expiries(now: float) -> list[float]:
+    """Expiración (epoch) de cada timer todavía en curso."""
+    return [
+        timer["expires_at"]
+        for slot in _projection.get("slots", [])
+        for timer in slot.get("timers", [])
+        if not timer.get("is_ready") and timer["expires_at"] > now
+    ]
+
+
+def next_expiry(now: float | None = None) -> float | None:
+    """Epoch del timer en curso que expira antes (None si no queda ninguno)."""
+    pending = _pending_expiries(now or time.time())
+    return min(pending) if pending else None
+
+
+def needs_scrape(interval_seconds: float, now: float | None = None) -> tuple[bool, str]:
+    """
+    (True, motivo) si hay que scrapear en esta vuelta del loop.
+    interval_seconds: tiempo hasta la siguiente vuelta; si el próximo timer vence
+    antes de entonces (+ margen), se scrapea ahora para que la proyección llegue
+    afinada a la expiración. Un solo scrape por expiración: si la proyección ya
+    se tomó dentro de esa ventana, no se repite.
+    """
+    now = now or time.time()
+    if not _projection:
+        return True, "sin proyección"
+    age = now - _projection["scraped_at"]
+    if age >= TIMER_PROJECTION_MAX_AGE_MINUTES * 60:
+        return True, f"proyección de hace {int(age // 60)} min"
+    horizon = interval_seconds + TIMER_SCRAPE_LEAD_MINUTES * 60
+    due = [e for e in _pending_expiries(now)
+           if e - now <= horizon and _projection["scraped_at"] < e - horizon]
+    if due:
+        return True, f"timer expira en {int((min(due) - now) // 60)} min"
+    return False, ""
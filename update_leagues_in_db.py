@@ -2,34 +2,22 @@
 # Este script solo ejecuta el scraper de ligas y actualiza la tabla 'leagues'.
 # Se ejecuta manualmente desde GitHub Actions una o dos veces al año.
 
+import hashlib
 import json
 import os
 import psycopg2
 import psycopg2.extras
 from dotenv import load_dotenv
-from scraper_leagues import get_data_from_website
+from scraper_leagues import crawl_leagues_parallel
 from playwright.sync_api import sync_playwright
 from utils import login_to_osm
+from db import get_db_connection
+from migrations import ensure_schema
 
 # --- Cargar configuración ---
 load_dotenv()
-DB_CONFIG = {
-    "host": os.getenv("DB_HOST"), "port": os.getenv("DB_PORT"),
-    "dbname": os.getenv("DB_NAME"), "user": os.getenv("DB_USER"),
-    "password": os.getenv("DB_PASSWORD")
-}
 
 # --- Funciones auxiliares reutilizadas ---
-def get_db_connection():
-    try:
-        conn = psycopg2.connect(**DB_CONFIG)
-        conn.cursor_factory = psycopg2.extras.DictCursor
-        print("✅ Conexión con PostgreSQL establecida.")
-        return conn
-    except psycopg2.OperationalError as e:
-        print(f"❌ ERROR: No se pudo conectar a PostgreSQL: {e}")
-        return None
-
 def parse_value_string(value_str):
     if not isinstance(value_str, str): return 0
     value_str = value_str.lower().strip().replace(',', '')
@@ -38,12 +26,23 @@ def parse_value_string(value_str):
     try: return float(value_str) / 1_000_000
     except (ValueError, TypeError): return 0
 
+def league_content_hash(teams_for_db):
+    """Huella del contenido que se guarda en leagues.teams (independiente del orden de claves)."""
+    return hashlib.sha256(json.dumps(teams_for_db, sort_keys=True).encode("utf-8")).hexdigest()
+
 def sync_all_leagues(conn, all_leagues_data):
     print("\n🔄 Sincronizando TODAS las ligas de OSM con la base de datos...")
     with conn.cursor() as cur:
+        cur.execute("SELECT name, content_hash FROM leagues;")
+        stored_hashes = {row["name"]: row["content_hash"] for row in cur.fetchall()}
+
+        changed = {}
+        unchanged = 0
         for league_info in all_leagues_data:
             league_name = league_info.get("league_name")
             if not league_name: continue
+            # Una extracción fallida no debe vaciar los equipos guardados
+            if not league_info.get("clubs"): continue
 
             teams_for_db = [
                 {
@@ -53,17 +52,23 @@ def sync_all_leagues(conn, all_leagues_data):
                     "initialCash": 0, "currentValue": 0
                 } for c in league_info.get("clubs", [])
             ]
-            teams_json = json.dumps(teams_for_db)
-            
-            # Sentencia UPSERT: Inserta una nueva liga o actualiza la existente si el nombre coincide.
-            sql = """
-                INSERT INTO leagues (name, teams) VALUES (%s, %s)
+            content_hash = league_content_hash(teams_for_db)
+            if stored_hashes.get(league_name) == content_hash:
+                unchanged += 1
+                continue
+            # Clave por nombre: ON CONFLICT no admite dos filas iguales en el mismo lote
+            changed[league_name] = (league_name, json.dumps(teams_for_db), content_hash)
+
+        if changed:
+            # UPSERT en lote: inserta ligas nuevas o actualiza las que cambiaron
+            psycopg2.extras.execute_values(cur, """
+                INSERT INTO leagues (name, teams, content_hash) VALUES %s
                 ON CONFLICT (name) DO UPDATE SET
                     teams = EXCLUDED.teams,
+                    content_hash = EXCLUDED.content_hash,
                     updated_at = NOW();
-            """
-            cur.execute(sql, (league_name, teams_json))
-        print(f"  - {cur.rowcount} ligas procesadas (insertadas o actualizadas).")
+            """, list(changed.values()), page_size=200)
+        print(f"  - {len(changed)} ligas insertadas o actualizadas, {unchanged} sin cambios.")
     conn.commit()
 
 # --- Función Principal ---
@@ -72,6 +77,7 @@ def main():
     conn = get_db_connection()
     if not conn:
         exit(1)
+    ensure_schema(conn)
         
     with sync_playwright() as p:
         try:
@@ -79,15 +85,15 @@ def main():
             browser = p.chromium.launch(headless=True) # Usar headless=True en producción
             page = browser.new_page()
 
-            # 2. Hacer login UNA SOLA VEZ
-            if not login_to_osm(page, max_retries=5):
+            # 2. Hacer login UNA SOLA VEZ (los workers del crawler reutilizan esta sesión)
+            if not login_to_osm(page, os.getenv("MI_USUARIO"), os.getenv("MI_CONTRASENA"), max_retries=5):
                 raise Exception("El proceso de login falló después de todos los reintentos.")
         except Exception as e:
             print(f"❌ ERROR CRÍTICO durante la fase de scraping: {e}")
             return # Abortar si el scraping falla
     
         try:
-            all_leagues_data = get_data_from_website(page)
+            all_leagues_data = crawl_leagues_parallel(page)
             if "error" in all_leagues_data:
                 print("❌ ERROR: El scraper de ligas falló.")
                 return
@@ -3,12 +3,44 @@ from playwright.sync_api import expect, Error as PlaywrightError, Page
 import time
 import os, re
 from playwright.sync_api import Page, TimeoutError as PlaywrightTimeoutError
+from request_policy import install_request_policy
+from popup_killer import install_popup_killer, is_installed as is_popup_killer_installed, sweep_popups
+from response_tap import install_response_tap
+from waits import wait_for_dom, wait_for_selector, wait_until, settle, pause
+from dotenv import load_dotenv
+
+# Los scripts importan utils antes de su propio load_dotenv()
+load_dotenv()
 
 # Definimos una excepción personalizada
 class InvalidCredentialsError(Exception):
     pass
 
 def handle_popups(page: Page):
+    """
+    Versión v5.0: si el contexto tiene el popup-killer (popup_killer.py), los
+    banners ya se descartan solos; aquí solo se pide una limpieza a demanda en
+    una única evaluación y se devuelve el informe de lo descartado.
+    Sin popup-killer (contextos creados fuera de login_with_session_cache) se
+    usa el sondeo clásico por selectores.
+    """
+    if is_popup_killer_installed(page):
+        try:
+            report = sweep_popups(page)
+            if report is not None:
+                if report["dismissed"]:
+                    print(f"    🧹 Popups descartados: {', '.join(report['dismissed'][:5])}")
+                try:
+                    page.keyboard.press("Escape")
+                except:
+                    pass
+                return report
+        except:
+            pass
+    return _handle_popups_probe(page)
+
+
+def _handle_popups_probe(page: Page):
     """
     Versión v4.4: Cierra modales agresivos, incluyendo avisos de Cookies, Privacidad y Password Login.
     """
@@ -41,7 +73,7 @@ def handle_popups(page: Page):
                 loc = page.locator(sel).first
                 if loc.is_visible(timeout=300):
                     loc.click(force=True)
-                    page.wait_for_timeout(300)
+                    settle(page, site="popups.probe", deadline_ms=1000)
             except:
                 pass
     except:
@@ -132,16 +164,9 @@ def wait_for_visible_slots(page: Page, timeout=40000):
                 
                 if visible_found:
                     # Esperar a que al menos un slot tenga datos de equipo cargados
-                    # (h2.clubslot-main-title solo aparece cuando KO.js pobló el slot)
-                    try:
-                        page.wait_for_selector(
-                            "h2.clubslot-main-title",
-                            timeout=8000,
-                            state="visible",
-                        )
-                    except Exception:
-                        # Si no aparece en 8s, continuar de todos modos
-                        page.wait_for_timeout(1000)
+                    # (h2.clubslot-main-title solo aparece cuando KO.js pobló el slot).
+                    # Si no aparece en 8s, continuar de todos modos.
+                    wait_for_selector(page, "h2.clubslot-main-title", deadline_ms=8000, site="career.slot_titles")
                     return True
         except:
             pass
@@ -154,10 +179,22 @@ def wait_for_visible_slots(page: Page, timeout=40000):
         except:
             pass
             
-        time.sleep(1.5)
+        # Esperar (máx 1.5s) a que algún slot sea visible antes de volver a limpiar
+        wait_for_dom(
+            page,
+            "() => [...document.querySelectorAll('.career-teamslot')].some(el => el.offsetWidth || el.offsetHeight)",
+            deadline_ms=1500,
+            site="career.slots_visible",
+        )
     
     return False
 
+
+def _slot_has_team(slot_locator) -> bool:
+    """True si algún título del slot ya muestra un equipo (no Searching/Unavailable)."""
+    texts = slot_locator.locator("h2.clubslot-main-title").all_inner_texts()
+    return any(t.strip() and "Searching" not in t and "unavailable" not in t.lower() for t in texts)
+
 def get_slot_info(slot_locator, max_retries=10):
     """
     Extrae información de un slot de carrera de forma segura.
@@ -176,7 +213,7 @@ def get_slot_info(slot_locator, max_retries=10):
             count = titles.count()
             
             if count == 0:
-                time.sleep(1)
+                wait_until(lambda: titles.count() > 0, deadline_ms=1000, site="career.slot_info")
                 continue
                 
             team_name = ""
@@ -231,14 +268,284 @@ def get_slot_info(slot_locator, max_retries=10):
                 return team_name, league_name, matchday
 
             # Si llegamos aquí es porque está en un estado no deseado, esperamos y reintentamos
-            time.sleep(2)
+            wait_until(lambda: _slot_has_team(slot_locator), deadline_ms=2000, site="career.slot_state")
 
         except Exception as e:
             print(f"    ⚠️ Error en get_slot_info (Intento {attempt+1}): {e}")
-            time.sleep(1)
+            pause(1, site="career.slot_info.retry")
 
     return None, None, None
 
+
+# ==========================================
+# CAREER SNAPSHOT (todos los slots en un evaluate)
+# ==========================================
+
+_CAREER_SNAPSHOT_ATTR = "_osm_career_snapshot"
+
+# Misma lógica que get_slot_info, pero para todos los slots en una sola llamada.
+# state: ready | searching | unavailable | empty | loading
+_CAREER_SNAPSHOT_JS = """
+() => [...document.querySelectorAll('.career-teamslot')].map((el, index) => {
+    if (el.querySelector('.career-teamslot-empty-label')) {
+        return { index, state: 'empty', team_name: null, league_name: null, matchday: null };
+    }
+    let team = '', searching = false, unavailable = false;
+    for (const t of el.querySelectorAll('h2.clubslot-main-title')) {
+        const txt = (t.innerText || '').trim();
+        if (!txt) continue;
+        if (txt.includes('Searching')) searching = true;
+        else if (txt.toLowerCase().includes('unavailable')) unavailable = true;
+        else if ((t.getAttribute('data-bind') || '').includes('teamPartial')) { team = txt; break; }
+        else if (!team) team = txt;
+    }
+    const state = searching ? 'searching' : unavailable ? 'unavailable' : team ? 'ready' : 'loading';
+    if (state !== 'ready') {
+        return { index, state, team_name: null, league_name: null, matchday: null };
+    }
+    // Ids del equipo/liga para la API directa (null si el binding no los expone)
+    let team_id = null, league_id = null;
+    try {
+        const v = o => typeof o === 'function' ? o() : o;
+        const d = window.ko && ko.dataFor(el);
+        const tp = d && v(d.teamPartial || d.team);
+        const lp = d && v(d.leaguePartial || d.league);
+        team_id = (tp && v(tp.id)) || null;
+        league_id = (lp && v(lp.id)) || (tp && v(tp.leagueId)) || null;
+    } catch (e) {}
+    const league = el.querySelector('h4.display-name');
+    let matchday = null;
+    const spans = el.querySelectorAll('.career-teamslot-matchday span');
+    if (spans.length >= 3) {
+        const current = parseInt(spans[0].innerText.trim(), 10);
+        const total = parseInt(spans[2].innerText.trim(), 10);
+        if (!isNaN(current) && !isNaN(total)) {
+            matchday = { current, total, finished: current >= total };
+        }
+    }
+    return {
+        index, state, team_name: team,
+        league_name: league ? league.innerText.trim() : 'Unknown',
+        matchday, team_id, league_id,
+    };
+})
+"""
+
+# Listo cuando el número de slots lleva 300 ms sin cambiar (OSM los pinta de forma
+# progresiva) y el slot pedido (o todos si index es null) ya no está 'loading'.
+# 'searching'/'unavailable' cuentan como resueltos: un slot atascado ahí no debe
+# costar el deadline entero en cada lectura.
+_CAREER_SNAPSHOT_READY_JS = f"""
+(index) => {{
+    const slots = ({_CAREER_SNAPSHOT_JS.strip()})();
+    const n = slots.length, now = Date.now(), seen = window.__osmCareerSlotCount;
+    if (!seen || seen.n !== n) {{
+        window.__osmCareerSlotCount = {{ n, since: now }};
+        return false;
+    }}
+    if (n === 0 || now - seen.since < 300) return false;
+    if (index === null || index === undefined) return slots.every(s => s.state !== 'loading');
+    return index >= n || slots[index].state !== 'loading';
+}}
+"""
+
+
+def _on_frame_navigated(page: Page, frame):
+    if frame != page.main_frame:
+        return
+    setattr(page, _CAREER_SNAPSHOT_ATTR, None)
+    # Volver a Career / Login deja de garantizar qué equipo está activo
+    if any(marker in frame.url for marker in _ACTIVE_SLOT_RESET_URLS):
+        clear_active_slot(page)
+
+
+def _ensure_page_listeners(page: Page):
+    if not getattr(page, "_osm_page_listeners", False):
+        page.on("framenavigated", lambda frame: _on_frame_navigated(page, frame))
+        setattr(page, "_osm_page_listeners", True)
+
+
+def read_career_snapshot(page: Page, refresh: bool = False, deadline_ms: int = 10000,
+                         slot_index: int | None = None) -> dict:
+    """
+    Lee todos los slots de Career en un solo page.evaluate.
+    Asume que la página ya está en /Career con los slots visibles.
+    Con slot_index solo se espera a que ese slot termine de pintarse.
+
+    El resultado se cachea en la página hasta la siguiente navegación.
+
+    Returns:
+        dict: {"slots": [{index, team_name, league_name, matchday, state, team_id, league_id}, ...],
+               "by_league": {league_name.lower(): slot}}  (solo slots 'ready'; el primero si se repite)
+    """
+    cached = getattr(page, _CAREER_SNAPSHOT_ATTR, None)
+    if cached and not refresh:
+        return cached
+
+    wait_for_dom(page, _CAREER_SNAPSHOT_READY_JS, arg=slot_index, deadline_ms=deadline_ms,
+                 site="career.snapshot")
+    slots = page.evaluate(_CAREER_SNAPSHOT_JS)
+
+    # Dos slots con la misma liga: gana el primero, como en los antiguos *_for_slot
+    by_league = {}
+    for s in slots:
+        if s["state"] == "ready":
+            by_league.setdefault(s["league_name"].lower(), s)
+    snapshot = {"slots": slots, "by_league": by_league}
+    _ensure_page_listeners(page)
+    setattr(page, _CAREER_SNAPSHOT_ATTR, snapshot)
+    return snapshot
+
+
+def career_slot_info(page: Page, slot_index: int):
+    """Equivalente a get_slot_info(slots.nth(i)) leyendo del snapshot: (team, league, matchday)."""
+    slots = read_career_snapshot(page)["slots"]
+    if slot_index >= len(slots) or slots[slot_index]["state"] == "loading":
+        # El snapshot puede ser anterior a que OSM renderizara este slot
+        # (searching/unavailable/empty ya son estados resueltos: no se relee)
+        slots = read_career_snapshot(page, refresh=True, slot_index=slot_index)["slots"]
+    if slot_index < len(slots) and slots[slot_index]["state"] == "ready":
+        slot = slots[slot_index]
+        return slot["team_name"], slot["league_name"], slot["matchday"]
+    if slot_index < len(slots) and slots[slot_index]["state"] == "empty":
+        print(f"    ℹ️ Slot sin utilizar detectado. Omitiendo.")
+    return None, None, None
+
+
+def find_career_slot(page: Page, league_name: str) -> dict | None:
+    """
+    Busca el slot de una liga en el snapshot de Career.
+    Coincidencia exacta por clave; si no, la misma búsqueda parcial que usaban
+    los *_for_slot ("league_name in slot_league").
+    """
+    snapshot = read_career_snapshot(page)
+    target = league_name.lower()
+    slot = snapshot["by_league"].get(target)
+    if slot:
+        return slot
+    for key, candidate in snapshot["by_league"].items():
+        if target in key:
+            return candidate
+    return None
+
+
+# ==========================================
+# SLOT ACTIVO (sesión por página)
+# ==========================================
+# Recuerda qué equipo quedó activo tras click_slot_and_wait_for_dashboard para
+# que acciones seguidas sobre la misma liga no repitan Career + click de slot.
+
+ACTIVE_SLOT_TTL_SECONDS = int(os.getenv("ACTIVE_SLOT_TTL_SECONDS", "600"))
+_ACTIVE_SLOT_ATTR = "_osm_active_slot"
+_ACTIVE_SLOT_RESET_URLS = ("/Career", "/Login", "/ChooseLeague", "/MatchExperience")
+
+
+def get_active_slot(page: Page) -> dict | None:
+    """Slot activo si es reciente (< ACTIVE_SLOT_TTL_SECONDS), si no None."""
+    active = getattr(page, _ACTIVE_SLOT_ATTR, None)
+    if not active or time.time() - active["activated_at"] > ACTIVE_SLOT_TTL_SECONDS:
+        return None
+    return active
+
+
+def mark_active_slot(page: Page, slot: dict):
+    _ensure_page_listeners(page)
+    setattr(page, _ACTIVE_SLOT_ATTR, {**slot, "activated_at": time.time()})
+
+
+def clear_active_slot(page: Page):
+    setattr(page, _ACTIVE_SLOT_ATTR, None)
+
+
+# Id del equipo al que está enlazado el widget #timers de la cabecera: se sube
+# por los contextos KO ($data, $parents, $root) buscando el equipo del viewmodel.
+_ACTIVE_TEAM_ID_JS = """
+
+() => {
+    const btn = document.querySelector('#timers');
+    const parent = btn && btn.closest('.dropdown, li.dropdown, .btn-group');
+    if (!parent || !window.ko) return null;
+    const v = o => typeof o === 'function' ? o() : o;
+    let ctx = null;
+    try { ctx = ko.contextFor(parent.querySelector('li.border, li.clickable') || btn); } catch (e) {}
+    if (!ctx) return null;
+    const vms = [ctx.$data].concat(ctx.$parents || [], [ctx.$root]);
+    for (const vm of vms) {
+        if (!vm || typeof vm !== 'object') continue;
+        try {
+            const id = v(vm.teamId) || (v(vm.activeTeam) && v(v(vm.activeTeam).id))
+                    || (v(vm.teamPartial) && v(v(vm.teamPartial).id)) || (v(vm.team) && v(v(vm.team).id));
+            if (id) return id;
+        } catch (e) {}
+    }
+    return null;
+}
+"""
+
+
+def read_active_team_id(page: Page):
+    """Id del equipo activo según el viewmodel KO de la página, o None si no se puede leer."""
+    try:
+        return page.evaluate(_ACTIVE_TEAM_ID_JS)
+    except Exception:
+        return None
+
+
+def _active_slot_still_current(page: Page, active: dict, dashboard_url: str) -> bool:
+    """
+    Recarga /Dashboard (refleja el equipo activo en el servidor, aunque se haya
+    cambiado desde la web o la app) y comprueba que sea el del slot recordado.
+    """
+    if not active.get("team_id"):
+        return False
+    try:
+        page.goto(dashboard_url, wait_until="domcontentloaded", timeout=30000)
+    except Exception:
+        return False
+    if not wait_for_dom(page, "() => !!window.ko && !!document.querySelector('#timers')",
+                        deadline_ms=10000, site="dashboard.team_check"):
+        return False
+    team_id = read_active_team_id(page)
+    return team_id is not None and str(team_id) == str(active["team_id"])
+
+
+def activate_slot_for_league(page: Page, league_name: str, career_url: str = "https://en.onlinesoccermanager.com/Career"):
+    """
+    Deja activo el equipo de `league_name`. Si ya lo está (y es reciente) no
+    toca Career.
+
+    Returns:
+        (slot, None) si quedó activo; (None, "slot_not_found:<liga>") o
+        (slot, "slot_activation_failed") si no.
+    """
+    active = get_active_slot(page)
+    dashboard_url = career_url.rsplit("/", 1)[0] + "/Dashboard"
+    if (active and active.get("league_name")
+            and league_name.casefold() == active["league_name"].casefold()):
+        if _active_slot_still_current(page, active, dashboard_url):
+            age = time.time() - active["activated_at"]
+            print(f"  ⚡ Slot ya activo: DOM {active['index']} → '{active['league_name']}' (hace {age:.0f}s)")
+            return active, None
+        print(f"  ⚠️ El equipo activo ya no es el de '{active['league_name']}'. Volviendo a Career.")
+        clear_active_slot(page)
+
+    page.goto(career_url, wait_until="domcontentloaded", timeout=30000)
+    wait_for_visible_slots(page, timeout=20000)
+    settle(page, site="career.stabilize")
+    handle_popups(page)
+
+    slot = find_career_slot(page, league_name)
+    if slot is None:
+        count = len(read_career_snapshot(page)["slots"])
+        print(f"  ❌ No se encontró slot para liga '{league_name}' (slots={count})")
+        return None, f"slot_not_found:{league_name}"
+    print(f"  ✓ Slot encontrado: DOM {slot['index']} → '{slot['league_name']}'")
+
+    if not click_slot_and_wait_for_dashboard(page, slot["index"]):
+        return slot, "slot_activation_failed"
+    return get_active_slot(page) or slot, None
+
+
     
 def safe_navigate(page: Page, url: str, verify_selector: str = None, max_retries=3):
     """
@@ -253,9 +560,7 @@ def safe_navigate(page: Page, url: str, verify_selector: str = None, max_retries
             
             # Si nos piden verificar un elemento específico (ej: la tabla)
             if verify_selector:
-                try:
-                    page.wait_for_selector(verify_selector, timeout=10000)
-                except TimeoutError:
+                if not wait_for_selector(page, verify_selector, deadline_ms=10000, site="navigate.verify"):
                     print(f"  ⚠️ Carga incompleta (falta '{verify_selector}'). Reintentando (F5)...")
                     raise Exception("Selector de validación no encontrado")
 
@@ -266,7 +571,7 @@ def safe_navigate(page: Page, url: str, verify_selector: str = None, max_retries
             print(f"  ⚠️ Error de navegación (Intento {attempt + 1}/{max_retries}): {e}")
             
             # Estrategia de "Enfriamiento" antes de reintentar
-            time.sleep(2)
+            pause(2, site="navigate.backoff")
             
             # Si no es el último intento, intentamos un Reload explícito si la URL ya está puesta
             if attempt < max_retries - 1:
@@ -303,6 +608,20 @@ def parse_value_string(value_str):
     except (ValueError, TypeError): return 0
 
 
+def parse_millions(value_str):
+    """
+    Como parse_value_string, pero un número sin sufijo se toma en unidades y
+    se pasa a millones. Es el parseo con el que se guardan los fichajes
+    (transfers.base_value / final_price).
+    """
+    if not isinstance(value_str, str): return 0
+    value_str = value_str.lower().strip().replace(',', '')
+    if 'm' in value_str: return float(value_str.replace('m', ''))
+    if 'k' in value_str: return float(value_str.replace('k', '')) / 1000
+    try: return float(value_str) / 1_000_000
+    except (ValueError, TypeError): return 0
+
+
 # --- NUEVA FUNCIÓN DE LOGIN CENTRALIZADA ---
 def login_to_osm(page: Page, osm_username: str, osm_password: str, max_retries: int = 3):
     print("🚀 Iniciando Login OSM...")
@@ -331,7 +650,8 @@ def login_to_osm(page: Page, osm_username: str, osm_password: str, max_retries:
                     if accept_btn.is_visible(timeout=5000):
                         accept_btn.click(force=True)
                         print("    ✅ Botón clickeado, esperando redirección...")
-                        page.wait_for_timeout(3000)
+                        wait_for_dom(page, "() => !window.location.href.includes('PrivacyNotice')",
+                                     deadline_ms=3000, site="login.privacy")
                         if "PrivacyNotice" in page.url:
                              page.goto(LOGIN_URL, wait_until="domcontentloaded")
                     continue
@@ -368,12 +688,14 @@ def login_to_osm(page: Page, osm_username: str, osm_password: str, max_retries:
                     else:
                         print("    ⌛ Esperando formulario...")
                 
-                time.sleep(2)
+                # Siguiente check en cuanto cambie la URL (máx 2s)
+                wait_for_dom(page, "(prev) => window.location.href !== prev", arg=current_url,
+                             deadline_ms=2000, site="login.poll")
         except InvalidCredentialsError as e: raise e
         except Exception as e:
             print(f"  ⚠️ Error en intento {attempt + 1}: {e}")
             page.context.clear_cookies()
-            page.wait_for_timeout(5000)
+            pause(5, site="login.backoff")
     return False
 
 
@@ -390,16 +712,6 @@ def load_session_from_db(conn, user_id: str) -> dict | None:
     """
     try:
         with conn.cursor() as cur:
-            # Auto-crear tabla si no existe (misma lógica que save)
-            cur.execute("""
-                CREATE TABLE IF NOT EXISTS public.user_browser_sessions (
-                    user_id UUID PRIMARY KEY,
-                    session_state TEXT NOT NULL,
-                    saved_at TIMESTAMP DEFAULT NOW()
-                );
-            """)
-            conn.commit()
-
             cur.execute("""
                 SELECT session_state, saved_at
                 FROM public.user_browser_sessions
@@ -431,18 +743,10 @@ def load_session_from_db(conn, user_id: str) -> dict | None:
 def save_session_to_db(conn, user_id: str, storage_state: dict):
     """
     Guarda el estado de sesión del navegador en la BD para reutilizarlo.
-    Auto-crea la tabla si no existe.
+    La tabla la crea la migración 0004 (migrations/).
     """
     try:
         with conn.cursor() as cur:
-            # Auto-migration: crear tabla si no existe
-            cur.execute("""
-                CREATE TABLE IF NOT EXISTS public.user_browser_sessions (
-                    user_id UUID PRIMARY KEY,
-                    session_state TEXT NOT NULL,
-                    saved_at TIMESTAMP DEFAULT NOW()
-                );
-            """)
             import json
             cur.execute("""
                 INSERT INTO public.user_browser_sessions (user_id, session_state, saved_at)
@@ -484,9 +788,12 @@ def login_with_session_cache(browser, conn, user_id: str, osm_username: str, osm
                 storage_state=cached_state,
                 viewport={'width': 1280, 'height': 720}
             )
+            install_request_policy(context)
+            install_popup_killer(context)
             page = context.new_page()
+            install_response_tap(page)
             page.goto(CAREER_URL, wait_until="domcontentloaded", timeout=30000)
-            time.sleep(2)
+            settle(page, site="session.restore")
             handle_popups(page)
             
             # Verificar si la sesión sigue activa comprobando si el perfil del manager cargó correctamente
@@ -519,7 +826,10 @@ def login_with_session_cache(browser, conn, user_id: str, osm_username: str, osm
 
     # --- 2. Login normal ---
     context = browser.new_context(viewport={'width': 1280, 'height': 720})
+    install_request_policy(context)
+    install_popup_killer(context)
     page = context.new_page()
+    install_response_tap(page)
     
     login_ok = login_to_osm(page, osm_username, osm_password)
     if not login_ok:
@@ -585,6 +895,11 @@ def click_slot_and_wait_for_dashboard(page: Page, slot_index: int, max_retries=3
     DASHBOARD_URL = "https://en.onlinesoccermanager.com/Dashboard"
     
     print(f"  - Activando Slot #{slot_index + 1}...")
+
+    # Datos del slot para la sesión (el snapshot se invalida al navegar)
+    snapshot = getattr(page, _CAREER_SNAPSHOT_ATTR, None)
+    slot_data = next((s for s in snapshot["slots"] if s["index"] == slot_index), None) if snapshot else None
+    clear_active_slot(page)
     
     for attempt in range(max_retries):
         try:
@@ -617,6 +932,8 @@ def click_slot_and_wait_for_dashboard(page: Page, slot_index: int, max_retries=3
             # Esperar confirmación de timers
             page.wait_for_selector("#timers", timeout=30000)
             handle_popups(page)
+            mark_active_slot(page, slot_data or {"index": slot_index, "team_name": None,
+                                                 "league_name": None, "matchday": None, "state": "ready"})
             return True
             
         except Exception as e:
@@ -627,7 +944,7 @@ def click_slot_and_wait_for_dashboard(page: Page, slot_index: int, max_retries=3
                     page.goto(MAIN_DASHBOARD_URL, wait_until="domcontentloaded", timeout=30000)
                     from utils import wait_for_visible_slots
                     wait_for_visible_slots(page, timeout=15000)
-                    time.sleep(1)
+                    settle(page, site="slot.recover")
                 except:
                     pass
                     
@@ -0,0 +1,221 @@
+# waits.py
+"""
+Motor de esperas adaptativas para OSM.
+
+Sustituye los time.sleep fijos (2 s tras cada goto, 1.2 s por modal...) por
+esperas que terminan en cuanto OSM está listo: viewmodel KO enlazado, un
+predicado del DOM, una respuesta XHR concreta o la red en reposo. Todas tienen
+un deadline y devuelven True/False en vez de lanzar, para que el llamador
+decida si reintentar.
+
+Cada llamada indica un `site` (punto de llamada) y se acumula cuánto tiempo
+estuvo bloqueado, para ver por ejecución dónde se va el tiempo:
+
+    reset_wait_metrics()
+    ...
+    print(format_wait_metrics())
+"""
+import time
+from playwright.sync_api import TimeoutError as PlaywrightTimeoutError
+
+DEFAULT_DEADLINE_MS = 10000
+POLL_MS = 100
+
+# site → {"calls", "blocked", "max", "timeouts"} (segundos)
+_metrics: dict[str, dict] = {}
+
+
+def _record(site: str, started: float, ok: bool):
+    elapsed = time.time() - started
+    m = _metrics.setdefault(site, {"calls": 0, "blocked": 0.0, "max": 0.0, "timeouts": 0})
+    m["calls"] += 1
+    m["blocked"] += elapsed
+    m["max"] = max(m["max"], elapsed)
+    if not ok:
+        m["timeouts"] += 1
+
+
+def reset_wait_metrics():
+    _metrics.clear()
+
+
+def get_wait_metrics() -> dict:
+    return {site: dict(m) for site, m in _metrics.items()}
+
+
+def format_wait_metrics(top: int = 10) -> str:
+    if not _metrics:
+        return "⏱️ Esperas: sin datos"
+    total = sum(m["blocked"] for m in _metrics.values())
+    ranked = sorted(_metrics.items(), key=lambda kv: kv[1]["blocked"], reverse=True)[:top]
+    lines = [f"⏱️ Esperas: {total:.1f}s bloqueado en {sum(m['calls'] for m in _metrics.values())} llamadas"]
+    for site, m in ranked:
+        timeouts = f", {m['timeouts']} timeout" if m["timeouts"] else ""
+        lines.append(f"    {site}: {m['blocked']:.1f}s / {m['calls']} (máx {m['max']:.1f}s{timeouts})")
+    return "\n".join(lines)
+
+
+# ── Predicados JS ────────────────────────────────────────────────────────────
+
+# KO cargado y, si se pasa selector, el elemento ya tiene viewmodel enlazado
+_KO_READY_JS = """
+(sel) => {
+    if (!window.ko || document.readyState === 'loading') return false;
+    if (!sel) return true;
+    const el = document.querySelector(sel);
+    return !!(el && ko.dataFor(el));
+}
+"""
+
+# Página "asentada": documento cargado, KO presente y sin overlay de carga visible
+_SETTLED_JS = """
+() => {
+    if (document.readyState === 'loading' || !window.ko) return false;
+    const busy = document.querySelector('#preloader-image, .loading-overlay');
+    return !(busy && (busy.offsetWidth || busy.offsetHeight));
+}
+"""
+
+# Resuelve cuando el DOM lleva `quiet` ms sin mutaciones (o false al agotar el deadline)
+_DOM_QUIET_JS = """
+([quiet, deadline]) => new Promise(resolve => {
+    let timer = null;
+    const finish = (ok) => { observer.disconnect(); clearTimeout(timer); clearTimeout(limit); resolve(ok); };
+    const observer = new MutationObserver(() => {
+        clearTimeout(timer);
+        timer = setTimeout(() => finish(true), quiet);
+    });
+    observer.observe(document.documentElement, { childList: true, subtree: true, attributes: true });
+    timer = setTimeout(() => finish(true), quiet);
+    const limit = setTimeout(() => finish(false), deadline);
+})
+"""
+
+
+# ── Primitivas ───────────────────────────────────────────────────────────────
+
+def wait_for_dom(page, predicate_js: str, arg=None, deadline_ms: int = DEFAULT_DEADLINE_MS,
+                 site: str = "dom") -> bool:
+    """Espera a que `predicate_js` (función JS) devuelva un valor truthy."""
+    started = time.time()
+    try:
+        page.wait_for_function(predicate_js, arg=arg, timeout=deadline_ms, polling=POLL_MS)
+        ok = True
+    except PlaywrightTimeoutError:
+        ok = False
+    _record(site, started, ok)
+    return ok
+
+
+def wait_for_selector(page, selector: str, state: str = "visible",
+                      deadline_ms: int = DEFAULT_DEADLINE_MS, site: str = "selector") -> bool:
+    started = time.time()
+    try:
+        page.wait_for_selector(selector, state=state, timeout=deadline_ms)
+        ok = True
+    except PlaywrightTimeoutError:
+        ok = False
+    _record(site, started, ok)
+    return ok
+
+
+def wait_for_ko(page, selector: str | None = None, deadline_ms: int = DEFAULT_DEADLINE_MS,
+                site: str = "ko") -> bool:
+    """Espera a que KO esté cargado y (opcional) enlazado al elemento `selector`."""
+    return wait_for_dom(page, _KO_READY_JS, arg=selector, deadline_ms=deadline_ms, site=site)
+
+
+def wait_for_text_change(page, selector: str, previous: str,
+                         deadline_ms: int = DEFAULT_DEADLINE_MS, site: str = "text_change") -> bool:
+    """Espera a que el innerText de `selector` deje de ser `previous` (p.ej. título de jornada)."""
+    return wait_for_dom(
+        page,
+        """([sel, prev]) => {
+            const el = document.querySelector(sel);
+            return !!el && el.innerText.trim() !== '' && el.innerText.trim() !== prev;
+        }""",
+        arg=[selector, (previous or "").strip()],
+        deadline_ms=deadline_ms,
+        site=site,
+    )
+
+
+_MODAL_OPEN_JS = "() => !!document.querySelector('.modal.in, .modal.show, .modal[style*=\"display: block\"]')"
+
+
+def wait_for_modal(page, opened: bool = True, deadline_ms: int = 4000, site: str = "modal") -> bool:
+    """Espera a que haya un modal abierto (opened=True) o a que no quede ninguno."""
+    predicate = _MODAL_OPEN_JS if opened else f"() => !({_MODAL_OPEN_JS})()"
+    return wait_for_dom(page, predicate, deadline_ms=deadline_ms, site=site)
+
+
+def wait_for_url(page, pattern, deadline_ms: int = DEFAULT_DEADLINE_MS, site: str = "url") -> bool:
+    started = time.time()
+    try:
+        page.wait_for_url(pattern, timeout=deadline_ms)
+        ok = True
+    except PlaywrightTimeoutError:
+        ok = False
+    _record(site, started, ok)
+    return ok
+
+
+def wait_for_network_idle(page, deadline_ms: int = 5000, site: str = "network_idle") -> bool:
+    """networkidle de Playwright (500 ms sin peticiones). OSM hace polling: usar con deadline corto."""
+    started = time.time()
+    try:
+        page.wait_for_load_state("networkidle", timeout=deadline_ms)
+        ok = True
+    except PlaywrightTimeoutError:
+        ok = False
+    _record(site, started, ok)
+    return ok
+
+
+def settle(page, site: str = "settle", deadline_ms: int = 5000, quiet_ms: int = 250) -> bool:
+    """
+    Sustituto de `time.sleep(n)` tras un goto/click: espera documento + KO sin
+    overlay de carga y después a que el DOM deje de mutar `quiet_ms`.
+    """
+    started = time.time()
+    try:
+        page.wait_for_function(_SETTLED_JS, timeout=deadline_ms, polling=POLL_MS)
+        remaining = max(int(deadline_ms - (time.time() - started) * 1000), quiet_ms)
+        ok = bool(page.evaluate(_DOM_QUIET_JS, [quiet_ms, remaining]))
+    except PlaywrightTimeoutError:
+        ok = False
+    except Exception:
+        # Navegación en curso (contexto destruido): lo tratamos como no asentado
+        ok = False
+    _record(site, started, ok)
+    return ok
+
+
+def wait_until(check, deadline_ms: int = DEFAULT_DEADLINE_MS, poll_ms: int = 250,
+               site: str = "until") -> bool:
+    """Sondea un predicado Python (p.ej. `lambda: slot.count() > 0`) hasta el deadline."""
+    started = time.time()
+    limit = started + deadline_ms / 1000
+    ok = False
+    while True:
+        try:
+            if check():
+                ok = True
+                break
+        except Exception:
+            pass
+        if time.time() >= limit:
+            break
+        time.sleep(poll_ms / 1000)
+    _record(site, started, ok)
+    return ok
+
+
+def pause(seconds: float, site: str = "pause"):
+    """
+    Pausa fija deliberada (backoff entre reintentos, debounce de auto-guardado).
+    Queda registrada para que no se confunda con tiempo de OSM.
+    """
+    started = time.time()
+    time.sleep(seconds)
+    _record(site, started, True)